@@ -0,0 +1,459 @@
+"""
+⏪ Backtest Engine - Vectorized Historical Replay of the Candlestick Rule Set
+backtest_engine.py
+
+🎯 FEATURES:
+✅ โหลดแท่งเทียนจาก CSV / NPZ (ไม่ต้องเปิด MT5 terminal)
+✅ ประเมิน candlestick pattern / volume strength / candle quality / market timing
+   เป็น array operations ทั้ง series ในครั้งเดียว
+✅ ใช้ cooldown + hourly limit เหมือน ModernRuleEngine
+✅ คำนวณ dynamic lot size ตาม formula เดียวกับ live
+
+** ทดสอบการเปลี่ยน config ได้ในไม่กี่วินาทีก่อนใช้งานจริง **
+"""
+
+import argparse
+import csv
+import json
+import time
+import numpy as np
+from datetime import datetime
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+from bar_buffer import RATES_DTYPE
+from rate_limiter import SlidingWindow
+
+# รหัส pattern (ตรงกับ MarketAnalyzer._detect_candlestick_patterns)
+PATTERN_NAMES = ["STANDARD", "DOJI", "HAMMER", "SHOOTING_STAR",
+                 "BULLISH_ENGULFING", "BEARISH_ENGULFING", "STRONG_BULL", "STRONG_BEAR"]
+
+# ========================================================================================
+# ⚙️ SETTINGS
+# ========================================================================================
+
+@dataclass
+class BacktestSettings:
+    """พารามิเตอร์ของ rule set (ค่า default ตรงกับระบบ live)"""
+    minimum_signal_strength: float = 0.3
+    min_body_ratio: float = 0.1
+    cooldown_seconds: float = 60.0
+    max_signals_per_hour: int = 20
+    volume_lookback: int = 20
+
+    # calculate_volume_factor: ratio thresholds -> factors
+    volume_thresholds: Tuple[float, ...] = (2.0, 1.5, 1.2, 0.8, 0.5)
+    volume_factors: Tuple[float, ...] = (2.0, 1.5, 1.2, 1.0, 0.7, 0.5)
+
+    # calculate_candle_strength_factor: body ratio thresholds -> base factors
+    body_ratio_thresholds: Tuple[float, ...] = (0.7, 0.4, 0.2)
+    strength_factors: Tuple[float, ...] = (1.5, 1.0, 0.6, 0.3)
+
+    # SmartDecisionScore weights (candlestick, volume, quality, timing)
+    score_weights: Tuple[float, ...] = (0.40, 0.25, 0.25, 0.10)
+
+    base_lot: float = 0.01
+
+    @classmethod
+    def from_config(cls, config: Dict) -> "BacktestSettings":
+        """🔧 สร้าง settings จาก config.json / rules_config.json (key ที่ไม่มีใช้ค่า default)"""
+        settings = cls()
+        signal_generation = config.get("signal_generation", {})
+        settings.minimum_signal_strength = signal_generation.get(
+            "minimum_signal_strength", settings.minimum_signal_strength)
+        settings.cooldown_seconds = signal_generation.get(
+            "cooldown_between_signals_seconds",
+            signal_generation.get("cooldown_between_signals", settings.cooldown_seconds))
+        settings.max_signals_per_hour = signal_generation.get(
+            "max_signals_per_hour",
+            signal_generation.get("hourly_limits", {}).get("max_signals_per_hour", settings.max_signals_per_hour))
+
+        buy_conditions = config.get("candlestick_rules", {}).get("buy_signal", {}).get("conditions", {})
+        settings.min_body_ratio = buy_conditions.get("min_body_ratio", settings.min_body_ratio)
+
+        volume_settings = config.get("volume_settings", {})
+        thresholds = volume_settings.get("volume_thresholds")
+        if thresholds:
+            settings.volume_thresholds = (
+                thresholds.get("extremely_high_ratio", 2.0), thresholds.get("high_ratio", 1.5),
+                thresholds.get("above_average_ratio", 1.2), thresholds.get("normal_min_ratio", 0.8),
+                thresholds.get("low_ratio", 0.5))
+        factors = volume_settings.get("volume_factors")
+        if factors:
+            settings.volume_factors = (
+                factors.get("extremely_high", 2.0), factors.get("high", 1.5),
+                factors.get("above_average", 1.2), factors.get("normal", 1.0),
+                factors.get("low", 0.7), factors.get("very_low", 0.5))
+
+        candle_settings = config.get("candle_strength_settings", {})
+        body_thresholds = candle_settings.get("body_ratio_thresholds")
+        if body_thresholds:
+            settings.body_ratio_thresholds = (
+                body_thresholds.get("strong_threshold", 0.7),
+                body_thresholds.get("medium_threshold", 0.4),
+                body_thresholds.get("weak_threshold", 0.2))
+        strength_factors = candle_settings.get("strength_factors")
+        if strength_factors:
+            settings.strength_factors = (
+                strength_factors.get("strong_body", 1.5), strength_factors.get("medium_body", 1.0),
+                strength_factors.get("weak_body", 0.6), strength_factors.get("doji_spinning", 0.3))
+
+        weights = signal_generation.get("score_weights")
+        if weights:
+            settings.score_weights = (
+                weights.get("candlestick_signal", 0.40), weights.get("volume_strength", 0.25),
+                weights.get("candle_quality", 0.25), weights.get("market_timing", 0.10))
+
+        settings.base_lot = config.get("dynamic_lot_sizing", {}).get("base_lot_size", settings.base_lot)
+        return settings
+
+@dataclass
+class BacktestResult:
+    """ผลลัพธ์การ replay"""
+    settings: BacktestSettings
+    bars: int
+    signal_index: np.ndarray          # index ของแท่งที่ส่งออเดอร์
+    signal_time: np.ndarray           # เวลาเปิดแท่ง (epoch)
+    direction: np.ndarray             # +1 = BUY, -1 = SELL
+    score: np.ndarray                 # final_score
+    lot_size: np.ndarray
+    raw_signals: int = 0              # สัญญาณก่อนผ่าน cooldown / hourly limit
+    elapsed_seconds: float = 0.0
+    components: Dict[str, np.ndarray] = field(default_factory=dict)
+
+    @property
+    def signal_count(self) -> int:
+        return int(len(self.signal_index))
+
+    def to_signal_stream(self) -> List[Dict]:
+        """📤 แปลงเป็น list ของ signal dicts (สำหรับ export / ตรวจสอบ)"""
+        return [
+            {
+                "time": datetime.fromtimestamp(int(t)),
+                "signal_type": "BUY_SIGNAL" if d > 0 else "SELL_SIGNAL",
+                "final_score": float(s),
+                "lot_size": float(l)
+            }
+            for t, d, s, l in zip(self.signal_time, self.direction, self.score, self.lot_size)
+        ]
+
+    def get_summary(self) -> Dict:
+        """📊 สรุปผล"""
+        return {
+            "bars": self.bars,
+            "raw_signals": self.raw_signals,
+            "signals": self.signal_count,
+            "buy_signals": int(np.sum(self.direction > 0)),
+            "sell_signals": int(np.sum(self.direction < 0)),
+            "average_score": float(self.score.mean()) if self.signal_count else 0.0,
+            "average_lot": float(self.lot_size.mean()) if self.signal_count else 0.0,
+            "elapsed_seconds": round(self.elapsed_seconds, 3)
+        }
+
+# ========================================================================================
+# 📥 DATA LOADING
+# ========================================================================================
+
+def load_bars(path: str) -> np.ndarray:
+    """📥 โหลดแท่งเทียนจาก .npz หรือ .csv เป็น structured array (RATES_DTYPE)"""
+    if path.lower().endswith(".npz"):
+        return _load_npz(path)
+    return _load_csv(path)
+
+def save_bars_npz(path: str, rates: np.ndarray):
+    """💾 บันทึกแท่งเทียนเป็น .npz (โหลดเร็วกว่า CSV มาก)"""
+    np.savez(path, rates=np.asarray(rates, dtype=RATES_DTYPE))
+
+def _load_npz(path: str) -> np.ndarray:
+    with np.load(path) as data:
+        if "rates" in data.files:
+            return np.asarray(data["rates"]).astype(RATES_DTYPE)
+
+        rates = np.zeros(len(data["time"]), dtype=RATES_DTYPE)
+        for name in RATES_DTYPE.names:
+            if name in data.files:
+                rates[name] = data[name]
+        if "tick_volume" not in data.files and "volume" in data.files:
+            rates["tick_volume"] = data["volume"]
+        return rates
+
+def _load_csv(path: str) -> np.ndarray:
+    """CSV ที่มี header: time, open, high, low, close, tick_volume (หรือ volume)"""
+    with open(path, "r", encoding="utf-8") as f:
+        sample = f.read(4096)
+        f.seek(0)
+        dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+        reader = csv.reader(f, dialect)
+        header = [h.strip().strip("<>").lower() for h in next(reader)]
+        rows = list(reader)
+
+    index = {name: i for i, name in enumerate(header)}
+    rates = np.zeros(len(rows), dtype=RATES_DTYPE)
+    volume_column = "tick_volume" if "tick_volume" in index else ("tickvol" if "tickvol" in index else "volume")
+
+    for name in ("open", "high", "low", "close"):
+        rates[name] = [float(row[index[name]]) for row in rows]
+    if volume_column in index:
+        rates["tick_volume"] = [int(float(row[index[volume_column]])) for row in rows]
+
+    if "time" in index and "date" not in index:
+        rates["time"] = [_parse_time(row[index["time"]]) for row in rows]
+    else:
+        rates["time"] = [_parse_time(f"{row[index['date']]} {row[index['time']]}") for row in rows]
+
+    return rates
+
+def _parse_time(value: str) -> int:
+    """แปลง epoch หรือวันที่ (YYYY-MM-DD / YYYY.MM.DD) เป็น epoch วินาที"""
+    value = value.strip()
+    if value.isdigit():
+        return int(value)
+    value = value.replace(".", "-")
+    for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M"):
+        try:
+            return int(datetime.strptime(value, fmt).timestamp())
+        except ValueError:
+            continue
+    raise ValueError(f"Unknown time format: {value}")
+
+# ========================================================================================
+# ⏪ VECTORIZED RULE EVALUATION
+# ========================================================================================
+
+def evaluate_components(rates: np.ndarray, settings: BacktestSettings) -> Dict[str, np.ndarray]:
+    """
+    ⏪ คำนวณ component ทั้งหมดของทุกแท่งพร้อมกัน
+
+    แท่ง i = แท่ง "ปัจจุบัน" (ประเมินตอนปิดแท่ง), แท่ง i-1 = แท่งก่อนหน้า
+    """
+    o = rates["open"].astype(np.float64)
+    h = rates["high"].astype(np.float64)
+    l = rates["low"].astype(np.float64)
+    c = rates["close"].astype(np.float64)
+    v = rates["tick_volume"].astype(np.float64)
+    n = len(rates)
+
+    po = np.roll(o, 1)
+    pc = np.roll(c, 1)
+
+    body = np.abs(c - o)
+    full_range = h - l
+    p_body = np.abs(pc - po)
+    upper_shadow = h - np.maximum(o, c)
+    lower_shadow = np.minimum(o, c) - l
+    with np.errstate(divide="ignore", invalid="ignore"):
+        body_ratio = np.where(full_range > 0, body / full_range, 0.0)
+
+    green = c > o
+    up = c > pc
+
+    # --- _detect_candlestick_patterns (ลำดับเงื่อนไขเดียวกับ live) ---
+    pattern = np.select(
+        [
+            body < full_range * 0.1,
+            (lower_shadow > body * 2) & (upper_shadow < body * 0.5) & green & up,
+            (upper_shadow > body * 2) & (lower_shadow < body * 0.5) & (c < o) & (c < pc),
+            green & (pc < po) & (c > po) & (o < pc) & (body > p_body),
+            (c < o) & (pc > po) & (c < po) & (o > pc) & (body > p_body),
+            (body > full_range * 0.7) & green,
+            body > full_range * 0.7
+        ],
+        [1, 2, 3, 4, 5, 6, 7],
+        default=0
+    )
+    pattern_strength = np.array([0.5, 0.3, 0.8, 0.8, 0.9, 0.9, 0.8, 0.8])[pattern]
+
+    # --- _get_short_term_trend_context (10 แท่งล่าสุด) ---
+    up_moves = np.concatenate(([0.0], (np.diff(c) > 0).astype(np.float64)))
+    up_cumsum = np.cumsum(up_moves)
+    trend_up_count = up_cumsum - np.concatenate((np.zeros(9), up_cumsum[:-9])) if n > 9 else up_cumsum
+    trend_strength = trend_up_count / 9.0
+    major_up = trend_strength > 0.6
+    major_down = trend_strength < 0.4
+    trend_alignment = np.where((up & major_up) | (~up & major_down), 1.0, 0.3)
+
+    c_back4 = np.concatenate((np.full(4, np.nan), c[:-4])) if n > 4 else np.full(n, np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        momentum = (c - c_back4) / c_back4 * 100
+    momentum_score = np.nan_to_num(np.minimum(1.0, np.abs(momentum) / 0.5), nan=0.5)
+
+    # --- ModernRuleEngine._evaluate_candlestick_pattern ---
+    base_strength = np.minimum(1.0, 0.5 + body_ratio * 0.5)
+    buy_bonus = np.array([0.0, -0.1, 0.2, 0.0, 0.3, 0.0, 0.15, 0.0])[pattern]
+    sell_bonus = np.array([0.0, -0.1, 0.0, 0.2, 0.0, 0.3, 0.0, 0.15])[pattern]
+    trend_bonus = (trend_alignment - 0.5) * 0.3
+    sequence_bonus = np.where(momentum_score > 0.6, 0.1, 0.0)
+
+    buy_condition = green & up & (body_ratio >= settings.min_body_ratio)
+    sell_condition = ~green & ~up & (body_ratio >= settings.min_body_ratio) & ~buy_condition
+
+    buy_strength = np.clip(base_strength + buy_bonus + trend_bonus + sequence_bonus, 0.0, 1.0)
+    sell_strength = np.clip(base_strength + sell_bonus + trend_bonus + sequence_bonus, 0.0, 1.0)
+    signal_strength = np.where(buy_condition, buy_strength, np.where(sell_condition, sell_strength, 0.0))
+    direction = np.where(buy_condition & (buy_strength >= 0.3), 1,
+                         np.where(sell_condition & (sell_strength >= 0.3), -1, 0))
+
+    # --- MarketAnalyzer.calculate_volume_factor (volume window รวมแท่งปัจจุบัน) ---
+    window = max(1, settings.volume_lookback)
+    v_cumsum = np.concatenate(([0.0], np.cumsum(v)))
+    start = np.maximum(0, np.arange(1, n + 1) - window)
+    counts = np.arange(1, n + 1) - start
+    volume_mean = (v_cumsum[1:] - v_cumsum[start]) / counts
+    with np.errstate(divide="ignore", invalid="ignore"):
+        volume_ratio = np.where(volume_mean > 0, v / volume_mean, 1.0)
+
+    t = settings.volume_thresholds
+    f = settings.volume_factors
+    volume_factor = np.select(
+        [volume_ratio > t[0], volume_ratio > t[1], volume_ratio > t[2], volume_ratio >= t[3], volume_ratio >= t[4]],
+        list(f[:5]), default=f[5]
+    )
+    volume_factor = np.where(v == 0, 1.0, volume_factor)
+
+    # fallback proxy เมื่อไม่มี volume
+    proxy_factor = np.select(
+        [body > full_range * 0.8, body > full_range * 0.5, body > full_range * 0.2],
+        [1.5, 1.2, 1.0], default=0.8
+    )
+    volume_factor = np.where(volume_mean > 0, volume_factor, proxy_factor)
+
+    # --- MarketAnalyzer.calculate_candle_strength_factor ---
+    bt = settings.body_ratio_thresholds
+    sf = settings.strength_factors
+    base_factor = np.select([body_ratio > bt[0], body_ratio >= bt[1], body_ratio >= bt[2]],
+                            list(sf[:3]), default=sf[3])
+    pattern_modifier = np.array([1.0, 0.5, 1.2, 1.2, 1.3, 1.3, 1.1, 1.1])[pattern] * (0.5 + pattern_strength * 0.5)
+    trend_modifier = 0.8 + trend_alignment * 0.4
+    candle_factor = np.clip(base_factor * pattern_modifier * trend_modifier, 0.3, 1.5)
+    quality_score = np.minimum(1.0, candle_factor / 1.5)
+
+    # --- _evaluate_market_timing (ชั่วโมงของแท่ง) ---
+    hour = (rates["time"].astype(np.int64) // 3600) % 24
+    timing_score = np.select(
+        [((hour >= 8) & (hour <= 11)) | ((hour >= 14) & (hour <= 17)) | ((hour >= 20) & (hour <= 23)),
+         ((hour >= 1) & (hour <= 7)) | ((hour >= 12) & (hour <= 13)) | ((hour >= 18) & (hour <= 19))],
+        [1.0, 0.7], default=0.4
+    )
+
+    # --- SmartDecisionScore ---
+    w = settings.score_weights
+    final_score = signal_strength * w[0] + volume_factor * w[1] + quality_score * w[2] + timing_score * w[3]
+
+    # --- _calculate_dynamic_lot_size ---
+    base_lot = settings.base_lot
+    raw_lot = np.clip(base_lot * volume_factor * candle_factor, base_lot * 0.3, base_lot * 3.0)
+    lot_size = np.clip(np.round(raw_lot / 0.01) * 0.01, 0.01, 0.10)
+
+    # 10 แท่งแรกยังไม่มี context พอ (live มี history เสมอ)
+    warmup = min(n, 10)
+    direction[:warmup] = 0
+
+    return {
+        "direction": direction,
+        "signal_strength": signal_strength,
+        "volume_factor": volume_factor,
+        "quality_score": quality_score,
+        "timing_score": timing_score,
+        "final_score": final_score,
+        "candle_factor": candle_factor,
+        "lot_size": lot_size,
+        "pattern": pattern,
+        "body_ratio": body_ratio
+    }
+
+def apply_throttles(times: np.ndarray, candidate_index: np.ndarray,
+                    cooldown_seconds: float, max_per_hour: int) -> np.ndarray:
+    """
+    🚦 cooldown + hourly limit (ตาม _should_place_order)
+
+    ใช้ SlidingWindow ตัวเดียวกับ RateLimiter ของ live (60 นาทีล่าสุด ไม่ใช่ชั่วโมงตามนาฬิกา)
+    โดยใช้เวลาแท่งเป็นนาฬิกา - เป็น sequential rule จึงวนเฉพาะแท่งที่เป็น candidate
+    """
+    accepted = []
+    cooldown = SlidingWindow(1, cooldown_seconds)
+    hourly = SlidingWindow(max_per_hour, 3600)
+
+    for i in candidate_index:
+        t = float(times[i])
+        if not cooldown.check(t)[0] or not hourly.check(t)[0]:
+            continue
+
+        accepted.append(i)
+        cooldown.record(t)
+        hourly.record(t)
+
+    return np.asarray(accepted, dtype=np.int64)
+
+def run_backtest(rates: np.ndarray, settings: Optional[BacktestSettings] = None,
+                 keep_components: bool = False) -> BacktestResult:
+    """⏪ Replay rule set ทั้ง series แล้วคืน signal stream + lot sizes"""
+    settings = settings or BacktestSettings()
+    started = time.perf_counter()
+
+    components = evaluate_components(rates, settings)
+    direction = components["direction"]
+    final_score = components["final_score"]
+
+    candidates = np.flatnonzero((direction != 0) & (final_score >= settings.minimum_signal_strength))
+    accepted = apply_throttles(rates["time"], candidates, settings.cooldown_seconds, settings.max_signals_per_hour)
+
+    return BacktestResult(
+        settings=settings,
+        bars=len(rates),
+        signal_index=accepted,
+        signal_time=rates["time"][accepted],
+        direction=direction[accepted],
+        score=final_score[accepted],
+        lot_size=components["lot_size"][accepted],
+        raw_signals=int(len(candidates)),
+        elapsed_seconds=time.perf_counter() - started,
+        components=components if keep_components else {}
+    )
+
+def generate_synthetic_bars(count: int = 105120, start_price: float = 2000.0,
+                            timeframe_seconds: int = 300, seed: int = 42) -> np.ndarray:
+    """🧪 สร้างแท่งเทียนสังเคราะห์ (random walk) สำหรับทดสอบความเร็ว - 105120 = 1 ปีของ M5"""
+    rng = np.random.default_rng(seed)
+    returns = rng.normal(0, 0.0008, count)
+    close = start_price * np.exp(np.cumsum(returns))
+    open_ = np.concatenate(([start_price], close[:-1]))
+    spread = np.abs(rng.normal(0, 0.0006, count)) * close
+
+    rates = np.zeros(count, dtype=RATES_DTYPE)
+    rates["time"] = 1704067200 + np.arange(count, dtype=np.int64) * timeframe_seconds
+    rates["open"] = open_
+    rates["close"] = close
+    rates["high"] = np.maximum(open_, close) + spread
+    rates["low"] = np.minimum(open_, close) - spread
+    rates["tick_volume"] = rng.integers(50, 1500, count)
+    return rates
+
+# ========================================================================================
+# 🧪 COMMAND LINE
+# ========================================================================================
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Vectorized candlestick rule backtest")
+    parser.add_argument("data", nargs="?", help="CSV หรือ NPZ ของแท่งเทียน (ไม่ใส่ = ใช้ข้อมูลสังเคราะห์ 1 ปี)")
+    parser.add_argument("--config", action="append", default=[],
+                        help="config JSON (ใส่ได้หลายไฟล์ - ไฟล์หลังทับไฟล์ก่อน)")
+    parser.add_argument("--export", help="บันทึก signal stream เป็น CSV")
+    args = parser.parse_args()
+
+    merged_config = {}
+    for config_path in args.config:
+        with open(config_path, "r", encoding="utf-8") as f:
+            merged_config.update(json.load(f))
+
+    bars = load_bars(args.data) if args.data else generate_synthetic_bars()
+    result = run_backtest(bars, BacktestSettings.from_config(merged_config))
+
+    print("⏪ Backtest Summary")
+    for key, value in result.get_summary().items():
+        print(f"   {key}: {value}")
+
+    if args.export:
+        with open(args.export, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=["time", "signal_type", "final_score", "lot_size"])
+            writer.writeheader()
+            writer.writerows(result.to_signal_stream())
+        print(f"💾 Exported {result.signal_count} signals to {args.export}")
@@ -0,0 +1,157 @@
+"""
+🧮 Bar Ring Buffer - Incremental OHLC Storage
+bar_buffer.py
+
+🎯 FEATURES:
+✅ Preallocated NumPy structured array (dtype เดียวกับ MT5 rates)
+✅ Warm ครั้งเดียว แล้วเติมเฉพาะแท่งใหม่ (delta)
+✅ เขียนทับเฉพาะแท่งที่กำลังก่อตัว (forming bar)
+✅ Zero-copy contiguous views ของ N แท่งล่าสุด
+
+** ไม่ต้องดึง 50 แท่งใหม่ทุกครั้ง + ไม่ต้องสร้าง DataFrame **
+"""
+
+import numpy as np
+import time
+from datetime import datetime
+from typing import Dict, Optional
+
+# dtype ตรงกับผลลัพธ์ของ mt5.copy_rates_from_pos (เรียงฟิลด์เหมือนกัน)
+RATES_DTYPE = np.dtype([
+    ('time', '<i8'),
+    ('open', '<f8'),
+    ('high', '<f8'),
+    ('low', '<f8'),
+    ('close', '<f8'),
+    ('tick_volume', '<u8'),
+    ('spread', '<i4'),
+    ('real_volume', '<u8')
+])
+
+# ========================================================================================
+# 🧮 RING BUFFER
+# ========================================================================================
+
+class BarRingBuffer:
+    """
+    🧮 Ring buffer ของแท่งเทียนต่อ symbol/timeframe
+
+    เก็บข้อมูลแบบ double-write (แต่ละแท่งเขียนที่ i และ i + capacity)
+    ทำให้ N แท่งล่าสุดเป็นช่วงต่อเนื่องในหน่วยความจำเสมอ
+    -> view() คืน slice ได้โดยไม่ต้อง copy
+    """
+
+    def __init__(self, symbol: str, timeframe: int, capacity: int = 500):
+        self.symbol = symbol
+        self.timeframe = timeframe
+        self.capacity = max(2, int(capacity))
+
+        self._data = np.zeros(self.capacity * 2, dtype=RATES_DTYPE)
+        self._head = 0      # slot ถัดไปที่จะเขียน (0..capacity-1)
+        self._count = 0
+
+        # เพิ่มทุกครั้งที่ข้อมูลเปลี่ยน / เวลา sync ล่าสุด
+        self.version = 0
+        self.closed_bars_appended = 0
+        self.last_sync = 0.0
+
+    # ========================================================================================
+    # 📥 WRITE PATH
+    # ========================================================================================
+
+    def warm(self, rates: np.ndarray):
+        """📥 โหลดข้อมูลชุดแรก (หรือโหลดใหม่หลังเจอ gap)"""
+        n = min(len(rates), self.capacity) if rates is not None else 0
+
+        self._head = n % self.capacity
+        self._count = n
+        if n:
+            window = rates[-n:]
+            self._data[:n] = window
+            self._data[self.capacity:self.capacity + n] = window
+
+        self.version += 1
+        self.last_sync = time.time()
+
+    def apply_delta(self, rates: np.ndarray) -> bool:
+        """
+        📥 เติมเฉพาะแท่งที่ใหม่กว่าแท่งล่าสุดที่เก็บไว้
+
+        Returns:
+            False ถ้า delta ไม่ต่อเนื่องกับข้อมูลเดิม (ต้อง warm ใหม่)
+        """
+        if rates is None:
+            return False
+
+        if self._count == 0:
+            self.warm(rates)
+            return True
+
+        if len(rates) == 0:
+            return True
+
+        last_time = self.last_time
+        times = rates['time']
+
+        # แท่งแรกของ delta ใหม่กว่าแท่งล่าสุด = มีแท่งหายไประหว่างกลาง
+        if times[0] > last_time:
+            return False
+
+        idx = int(np.searchsorted(times, last_time))
+        if idx < len(rates) and times[idx] == last_time:
+            # เขียนทับแท่งที่กำลังก่อตัว (ราคา/volume อาจเปลี่ยน)
+            self._write_slot((self._head - 1) % self.capacity, rates[idx])
+            idx += 1
+
+        for bar in rates[idx:]:
+            self._write_slot(self._head, bar)
+            self._head = (self._head + 1) % self.capacity
+            self._count = min(self.capacity, self._count + 1)
+            self.closed_bars_appended += 1
+
+        self.version += 1
+        self.last_sync = time.time()
+        return True
+
+    def _write_slot(self, slot: int, bar):
+        """🔧 เขียนแท่งลงทั้งสองตำแหน่งของ double buffer"""
+        self._data[slot] = bar
+        self._data[slot + self.capacity] = bar
+
+    # ========================================================================================
+    # 📤 READ PATH (ZERO-COPY)
+    # ========================================================================================
+
+    def view(self, n: Optional[int] = None) -> np.ndarray:
+        """📤 N แท่งล่าสุด (เก่า -> ใหม่) เป็น view ที่ต่อเนื่อง ไม่มีการ copy"""
+        n = self._count if n is None else max(0, min(int(n), self._count))
+        end = self._head if self._head >= n else self._head + self.capacity
+        return self._data[end - n:end]
+
+    def forming_bar(self):
+        """📤 แท่งที่กำลังก่อตัว (แท่งล่าสุด)"""
+        if self._count == 0:
+            return None
+        return self._data[(self._head - 1) % self.capacity]
+
+    @property
+    def count(self) -> int:
+        return self._count
+
+    @property
+    def last_time(self) -> int:
+        """⏰ เวลาเปิดของแท่งล่าสุด (epoch วินาที)"""
+        bar = self.forming_bar()
+        return int(bar['time']) if bar is not None else 0
+
+    def get_status(self) -> Dict:
+        """📊 สถานะ buffer"""
+        return {
+            "symbol": self.symbol,
+            "timeframe": self.timeframe,
+            "capacity": self.capacity,
+            "count": self._count,
+            "version": self.version,
+            "closed_bars_appended": self.closed_bars_appended,
+            "last_bar_time": datetime.fromtimestamp(self.last_time) if self._count else None
+        }
@@ -0,0 +1,69 @@
+"""
+🧪 Shared fixtures for tests on the simulated broker
+conftest.py
+
+✅ install mt5_simulator ก่อน import gateway (ไม่ต้องมี MetaTrader5)
+✅ broker / manager fixtures + open_positions สำหรับเปิด positions ตาม (side, volume)
+✅ live_connector - symbol registry + position book ที่ reconcile กับ simulator จริง
+"""
+
+import contextlib
+import io
+
+import pytest
+
+import mt5_simulator
+
+mt5_simulator.install()
+
+# import หลัง install -> gateway ใช้ simulator แทน MetaTrader5
+from mt5_gateway import mt5_gateway as mt5
+from position_book import PositionBook
+from position_manager import PositionManager
+from symbol_registry import SymbolRegistry
+
+SYMBOL = "XAUUSD"
+
+class SimulatorConnector:
+    is_connected = True
+
+@pytest.fixture
+def broker():
+    broker = mt5_simulator.configure()
+    mt5.invalidate_cache()
+    mt5.initialize()
+    return broker
+
+@pytest.fixture
+def manager(broker):
+    with contextlib.redirect_stdout(io.StringIO()):
+        manager = PositionManager(SimulatorConnector(), {})
+    manager.flatten_config["retry_delay"] = 0.0
+    return manager
+
+@pytest.fixture
+def live_connector(broker):
+    """connector ที่มี symbol registry + position book (start แล้ว) เหมือนแอปที่รันอยู่"""
+    connector = SimulatorConnector()
+    with contextlib.redirect_stdout(io.StringIO()):
+        connector.symbol_registry = SymbolRegistry([SYMBOL])
+        connector.symbol_registry.set_symbol(SYMBOL)
+        connector.position_book = PositionBook(connector.symbol_registry.get_symbol)
+        connector.position_book.start()
+    yield connector
+    with contextlib.redirect_stdout(io.StringIO()):
+        connector.position_book.stop()
+
+@pytest.fixture
+def open_positions(broker):
+    """เปิด positions ตาม (side, volume) แล้วคืน tickets ตามลำดับ"""
+    def open_legs(*legs):
+        tickets = []
+        for side, volume in legs:
+            result = mt5.order_send({"action": mt5.TRADE_ACTION_DEAL, "symbol": SYMBOL, "volume": volume,
+                                     "type": mt5.ORDER_TYPE_BUY if side == "BUY" else mt5.ORDER_TYPE_SELL,
+                                     "type_filling": mt5.ORDER_FILLING_IOC})
+            assert result.retcode == mt5.TRADE_RETCODE_DONE
+            tickets.append(result.order)
+        return tickets
+    return open_legs
@@ -0,0 +1,81 @@
+"""
+⚡ Flatten Benchmark - Emergency Close Latency on the Simulated Broker
+flatten_benchmark.py
+
+🎯 FEATURES:
+✅ เปิด book สังเคราะห์ (BUY/SELL ปนกัน volume ต่างกัน) บน mt5_simulator
+✅ วัด emergency_close_all แบบเดิม (ทีละตัว) เทียบ fast-flatten (close-by + close พร้อมกัน)
+✅ เปิดครบ N positions ก่อน แล้ว latency ต่อ order_send จริง (sleep) + requote แบบสุ่มเฉพาะช่วงปิด (ทดสอบ retry)
+✅ ตรวจเป้า time-to-flat (ค่าเริ่มต้น: 100 positions < 1 วินาที)
+
+** ใช้: python flatten_benchmark.py --positions 100 --target-ms 1000 **
+"""
+
+import argparse
+import contextlib
+import io
+import time
+
+import mt5_simulator
+
+def run_benchmark(positions: int = 100, target_ms: float = 1000, latency_ms: float = 5.0,
+                  reject_rate: float = 0.1) -> bool:
+    """⚡ เทียบ sequential vs fast flatten - คืน True ถ้า fast ผ่านเป้า"""
+    reject_codes = (mt5_simulator.TRADE_RETCODE_REQUOTE, mt5_simulator.TRADE_RETCODE_PRICE_CHANGED)
+    mt5_simulator.install()
+
+    # import หลัง install -> gateway ใช้ simulator แทน MetaTrader5
+    from mt5_gateway import mt5_gateway as mt5
+    from position_manager import PositionManager
+
+    class SimulatorConnector:
+        is_connected = True
+
+    volumes = (0.01, 0.02, 0.03, 0.05)
+    elapsed = {}
+
+    for mode in ("sequential", "fast"):
+        # broker ใหม่ต่อรอบ + เปิด book ครบ N positions (ไม่มี reject) - requote สุ่มเฉพาะช่วงปิด
+        broker = mt5_simulator.configure(latency_ms=latency_ms, sleep_latency=True, reject_codes=reject_codes)
+        mt5.invalidate_cache()
+        mt5.initialize()
+        for i in range(positions):
+            result = mt5.order_send({"action": mt5.TRADE_ACTION_DEAL, "symbol": "XAUUSD",
+                                     "volume": volumes[i % len(volumes)],
+                                     "type": mt5.ORDER_TYPE_BUY if i % 3 else mt5.ORDER_TYPE_SELL,
+                                     "type_filling": mt5.ORDER_FILLING_IOC})
+            if result is None or result.retcode != mt5.TRADE_RETCODE_DONE:
+                raise RuntimeError(f"open #{i} failed: {result.retcode if result else mt5.last_error()}")
+        opened = len(mt5.positions_get(symbol="XAUUSD") or ())
+        if opened != positions:
+            raise RuntimeError(f"opened {opened} positions, expected {positions}")
+        broker.config.reject_rate = reject_rate
+        rejections = broker.stats["rejections"]
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            manager = PositionManager(SimulatorConnector(), {})
+            started = time.perf_counter()
+            manager.emergency_close_all(fast=(mode == "fast"))
+            elapsed[mode] = (time.perf_counter() - started) * 1000
+
+        left = len(mt5.positions_get(symbol="XAUUSD") or ())
+        print(f"🧪 {mode:>10}: {opened} positions -> {left} left in {elapsed[mode]:.0f}ms "
+              f"({broker.stats['rejections'] - rejections} requotes)")
+        if mode == "fast":
+            report = manager.last_flatten
+            print(f"   close-by: {report.netted_pairs} | deals: {report.deal_closes} | retries: {report.retries} | "
+                  f"netting: {report.netting_ms:.0f}ms | time to flat: {report.time_to_flat_ms:.0f}ms")
+
+    passed = elapsed["fast"] < target_ms and report.success
+    print(f"{'✅' if passed else '❌'} target: {positions} positions flat in < {target_ms:.0f}ms "
+          f"(fast {elapsed['fast']:.0f}ms, sequential {elapsed['sequential']:.0f}ms)")
+    return passed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Emergency close latency benchmark (simulator)")
+    parser.add_argument("--positions", type=int, default=100)
+    parser.add_argument("--target-ms", type=float, default=1000)
+    parser.add_argument("--latency-ms", type=float, default=5.0)
+    parser.add_argument("--reject-rate", type=float, default=0.1)
+    args = parser.parse_args()
+    run_benchmark(args.positions, args.target_ms, args.latency_ms, args.reject_rate)
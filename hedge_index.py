@@ -0,0 +1,145 @@
+"""
+🔀 Hedge Index - Per-Side Sorted Position Indexes
+hedge_index.py
+
+🎯 FEATURES:
+✅ Index แยก BUY / SELL เรียงตามกำไร และตามเวลาเปิด
+✅ อัปเดตแบบ incremental - แก้เฉพาะ position ที่เปิด/ปิด/กำไรเปลี่ยน
+✅ Range query "กำไร > X" ด้วย bisect (O(log n)) แทนการวนทุก position
+✅ จำนวน position ต่อฝั่ง แบบ O(1)
+✅ Thread-safe - sync / query จากหลาย thread (scanner, tick watcher, GUI, risk guard)
+
+** หา hedge candidates ได้โดยไม่ต้องสแกน O(n²) **
+"""
+
+import bisect
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, List, Tuple
+
+class SideIndex:
+    """index ของ positions ฝั่งเดียว"""
+
+    def __init__(self):
+        self.by_profit: List[Tuple[float, int]] = []     # (profit, ticket) เรียงจากน้อยไปมาก
+        self.by_time: List[Tuple[float, int]] = []       # (open_timestamp, ticket) เก่า -> ใหม่
+        self.entries: Dict[int, Tuple[float, float, float]] = {}   # ticket -> (profit, open_ts, volume)
+
+    def add(self, ticket: int, profit: float, open_ts: float, volume: float):
+        bisect.insort(self.by_profit, (profit, ticket))
+        bisect.insort(self.by_time, (open_ts, ticket))
+        self.entries[ticket] = (profit, open_ts, volume)
+
+    def remove(self, ticket: int):
+        profit, open_ts, _ = self.entries.pop(ticket)
+        del self.by_profit[bisect.bisect_left(self.by_profit, (profit, ticket))]
+        del self.by_time[bisect.bisect_left(self.by_time, (open_ts, ticket))]
+
+    def update(self, ticket: int, profit: float, volume: float):
+        old_profit, open_ts, _ = self.entries[ticket]
+        if profit != old_profit:
+            del self.by_profit[bisect.bisect_left(self.by_profit, (old_profit, ticket))]
+            bisect.insort(self.by_profit, (profit, ticket))
+        self.entries[ticket] = (profit, open_ts, volume)
+
+# ========================================================================================
+# 🔀 HEDGE INDEX
+# ========================================================================================
+
+class HedgeIndex:
+    """
+    🔀 index ของ positions แยกฝั่ง สำหรับหา hedge candidates
+
+    - sync(positions) เทียบกับ index เดิม แล้วแก้เฉพาะส่วนที่ต่าง
+    - candidate_tickets(side, min_profit) คืน tickets ฝั่งนั้นที่กำไร > min_profit
+    - sync และ query ทุกตัวถือ lock เดียวกัน - query ไม่เห็น index ที่แก้ค้างครึ่งทาง
+    """
+
+    def __init__(self):
+        self.sides: Dict[str, SideIndex] = {"BUY": SideIndex(), "SELL": SideIndex()}
+        self._side_of: Dict[int, str] = {}
+        self._lock = threading.RLock()
+        self.stats = {"syncs": 0, "added": 0, "removed": 0, "updated": 0, "queries": 0}
+
+    def sync(self, positions: Dict[int, object]):
+        """🔄 อัปเดต index ให้ตรงกับ positions (Position ที่มี type / total_profit / volume / open_time)"""
+        # snapshot ก่อน - dict ต้นทางอาจถูกแก้จาก thread อื่นระหว่างวน
+        items = list(positions.items())
+        with self._lock:
+            self._sync_locked(dict(items))
+
+    def _sync_locked(self, positions: Dict[int, object]):
+        self.stats["syncs"] += 1
+        for ticket in [t for t in self._side_of if t not in positions]:
+            self.sides[self._side_of.pop(ticket)].remove(ticket)
+            self.stats["removed"] += 1
+
+        for ticket, position in positions.items():
+            side_name = position.type.value
+            profit = position.total_profit
+            side = self.sides[side_name]
+            entry = side.entries.get(ticket)
+            if entry is None:
+                if ticket in self._side_of:
+                    # ticket เดิมเปลี่ยนฝั่ง (ไม่ควรเกิด) - ลบจากฝั่งเก่าก่อน
+                    self.sides[self._side_of[ticket]].remove(ticket)
+                side.add(ticket, profit, position.open_time.timestamp(), position.volume)
+                self._side_of[ticket] = side_name
+                self.stats["added"] += 1
+            elif entry[0] != profit or entry[2] != position.volume:
+                side.update(ticket, profit, position.volume)
+                self.stats["updated"] += 1
+
+    def clear(self):
+        with self._lock:
+            self.sides = {"BUY": SideIndex(), "SELL": SideIndex()}
+            self._side_of.clear()
+
+    # ========================================================================================
+    # 🔍 QUERIES
+    # ========================================================================================
+
+    def count(self, side: str) -> int:
+        with self._lock:
+            return len(self.sides[side].entries)
+
+    def candidate_tickets(self, side: str, min_profit: float) -> List[int]:
+        """tickets ที่กำไร > min_profit เรียงจากกำไรมากไปน้อย"""
+        with self._lock:
+            self.stats["queries"] += 1
+            by_profit = self.sides[side].by_profit
+            start = bisect.bisect_right(by_profit, (min_profit, float("inf")))
+            return [ticket for _, ticket in reversed(by_profit[start:])]
+
+    def tickets_below(self, side: str, max_profit: float) -> List[int]:
+        """tickets ที่กำไร < max_profit เรียงจากขาดทุนมากไปน้อย"""
+        with self._lock:
+            self.stats["queries"] += 1
+            by_profit = self.sides[side].by_profit
+            end = bisect.bisect_left(by_profit, (max_profit, -1))
+            return [ticket for _, ticket in by_profit[:end]]
+
+    def opened_before(self, timestamp: float, sides: Iterable[str] = ("BUY", "SELL")) -> List[int]:
+        """tickets ที่เปิดก่อน timestamp (เก่าสุดก่อน ในแต่ละฝั่ง)"""
+        with self._lock:
+            self.stats["queries"] += 1
+            tickets = []
+            for side in sides:
+                by_time = self.sides[side].by_time
+                end = bisect.bisect_left(by_time, (timestamp, -1))
+                tickets.extend(ticket for _, ticket in by_time[:end])
+            return tickets
+
+    def get_status(self) -> Dict:
+        """📊 สถานะ index"""
+        with self._lock:
+            return {
+                "buy_positions": self.count("BUY"),
+                "sell_positions": self.count("SELL"),
+                **self.stats
+            }
+
+    def log(self, message: str):
+        """Log message with timestamp"""
+        timestamp = datetime.now().strftime("%H:%M:%S.%f")[:-3]
+        print(f"[{timestamp}] 🔀 HedgeIndex: {message}")
@@ -0,0 +1,261 @@
+"""
+🧩 Hedge Solver - Branch-and-Bound Hedge Subset Selection
+hedge_solver.py
+
+🎯 FEATURES:
+✅ เลือกชุด hedge positions ที่ดีที่สุดสำหรับปิดคู่กับ position ขาดทุน (ไม่ใช่แค่ prefix / slice ติดกัน)
+✅ Branch-and-bound - ตัด branch ที่ upper bound ไม่มีทางชนะคำตอบปัจจุบัน
+✅ Objective: ชุดที่ net ถึง min_net -> volume สมดุลที่สุด -> ขาน้อยที่สุด -> net สูงสุด -> 4D
+✅ จำกัดขนาดชุด (size cap) และเวลา (time budget) - เกินเวลา = คืนคำตอบที่ดีที่สุดที่เจอ
+✅ Benchmark เทียบ heuristic เดิมบน book สังเคราะห์ 50-500 positions
+
+** ใช้: python hedge_solver.py **
+"""
+
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+@dataclass
+class HedgeCandidate:
+    """position ที่ใช้ hedge ได้ (กำไร > 0 ฝั่งตรงข้าม)"""
+    ticket: int
+    profit: float
+    volume: float
+    four_d_score: float = 0.0
+
+@dataclass
+class HedgeSolution:
+    """ชุด hedge ที่เลือก"""
+    tickets: List[int]
+    net_result: float
+    volume_ratio: float
+    score: float                         # = volume_ratio (objective หลักเมื่อ net ถึงเกณฑ์)
+    nodes: int = 0
+    optimal: bool = True                 # False = หมดเวลาก่อนพิสูจน์ว่าดีที่สุด
+    elapsed_ms: float = 0.0
+
+@dataclass
+class HedgeObjective:
+    """
+    ลำดับความสำคัญของ objective (หลังผ่านเกณฑ์ net >= min_net):
+    volume balance -> จำนวนขาน้อย -> net result -> 4D (tie-break สุดท้าย)
+
+    volume ratio ถูกปัดเป็นขั้นละ balance_step - ชุดที่สมดุลพอๆ กัน เลือกชุดที่ขาน้อยกว่า / net สูงกว่า
+    """
+    balance_step: float = 0.05
+
+    def balance_level(self, volume_ratio: float) -> int:
+        return int(volume_ratio / self.balance_step + 1e-9) if self.balance_step > 0 else 0
+
+    def key(self, net_result: float, volume_ratio: float, size: int,
+            avg_four_d: float) -> Tuple[int, int, float, float]:
+        """key สำหรับเทียบชุดที่ผ่านเกณฑ์ net แล้ว (มากกว่า = ดีกว่า)"""
+        return self.balance_level(volume_ratio), -size, net_result, avg_four_d
+
+# ========================================================================================
+# 🧩 HEDGE SOLVER
+# ========================================================================================
+
+class HedgeSolver:
+    """
+    🧩 Branch-and-bound บนชุด hedge candidates
+
+    - candidates เรียงกำไรมากก่อน -> net สูงสุดของ branch = เพิ่ม k ตัวถัดไป; ไปไม่ถึง min_net = ตัด
+    - volume bound ใช้ volume รวมปัจจุบัน (เกิน loss แล้วเพิ่มอีกมีแต่แย่ลง)
+    - ลูกของ branch มีขามากกว่าเสมอ -> balance bound เท่าคำตอบปัจจุบันแต่ขาเกิน = ตัด
+    """
+
+    def __init__(self, max_size: int = 4, time_budget: float = 0.02, min_net: float = 0.0,
+                 objective: Optional[HedgeObjective] = None):
+        self.max_size = max(1, int(max_size))
+        self.time_budget = time_budget
+        self.min_net = min_net
+        self.objective = objective or HedgeObjective()
+
+        self.stats = {"solves": 0, "nodes": 0, "timeouts": 0, "no_solution": 0}
+
+    def solve(self, loss_profit: float, loss_volume: float, loss_four_d: float,
+              candidates: Sequence[HedgeCandidate]) -> Optional[HedgeSolution]:
+        """🧩 หาชุด hedge (1..max_size ตัว) ที่ net >= min_net (และ > 0) แล้ว volume สมดุลที่สุด / ขาน้อยที่สุด"""
+        start = time.perf_counter()
+        deadline = start + self.time_budget if self.time_budget else float("inf")
+        self.stats["solves"] += 1
+
+        items = sorted((c for c in candidates if c.profit > 0), key=lambda c: c.profit, reverse=True)
+        count = len(items)
+        if count == 0 or loss_volume <= 0:
+            self.stats["no_solution"] += 1
+            return None
+
+        objective = self.objective
+        max_size = min(self.max_size, count)
+        profits = [c.profit for c in items]
+        volumes = [c.volume for c in items]
+        four_ds = [c.four_d_score for c in items]
+
+        # prefix sum ของกำไร -> กำไรของ k ตัวถัดไปจาก index ใดๆ ใน O(1)
+        prefix = [0.0]
+        for profit in profits:
+            prefix.append(prefix[-1] + profit)
+
+        # net ต้องถึง min_net และเป็นบวก
+        net_floor = max(self.min_net, 1e-9)
+        if loss_profit + prefix[max_size] < net_floor:
+            self.stats["no_solution"] += 1
+            return None
+
+        best_key = None
+        best_set: Tuple[int, ...] = ()
+        best_net = 0.0
+        best_ratio = 0.0
+        best_level = -1
+        best_size = 0
+        nodes = 0
+        timed_out = False
+
+        # stack: (next_index, chosen indexes, profit_sum, volume_sum, four_d_sum)
+        stack = [(0, (), 0.0, 0.0, loss_four_d)]
+        while stack:
+            next_index, chosen, profit_sum, volume_sum, four_d_sum = stack.pop()
+            nodes += 1
+            if nodes & 255 == 0 and time.perf_counter() > deadline:
+                timed_out = True
+                break
+
+            size = len(chosen)
+            if size:
+                net = loss_profit + profit_sum
+                if net >= net_floor:
+                    ratio = min(loss_volume, volume_sum) / max(loss_volume, volume_sum)
+                    key = objective.key(net, ratio, size, four_d_sum / (size + 1))
+                    if best_key is None or key > best_key:
+                        best_key, best_set, best_net, best_ratio = key, chosen, net, ratio
+                        best_level, best_size = key[0], size
+
+            remaining = max_size - size
+            if remaining == 0 or next_index >= count:
+                continue
+
+            # upper bound ของ branch: net = เพิ่ม k ตัวถัดไป (กำไรมากสุด), volume = ratio ดีสุดที่ยังเป็นไปได้
+            optimistic_net = loss_profit + profit_sum + prefix[min(count, next_index + remaining)] - prefix[next_index]
+            if optimistic_net < net_floor:
+                continue
+            volume_bound = 1.0 if volume_sum < loss_volume else loss_volume / volume_sum
+            if best_key is not None:
+                level_bound = objective.balance_level(volume_bound)
+                # ลูกทุกตัวมีอย่างน้อย size + 1 ขา
+                if level_bound < best_level or (level_bound == best_level and (
+                        size + 1 > best_size or (size + 1 == best_size and optimistic_net < best_net))):
+                    continue
+
+            # push ตัวที่กำไรน้อยก่อน -> pop ตัวกำไรมากก่อน (เจอชุด net สูงเร็ว = ตัด branch ได้มาก)
+            for i in range(count - 1, next_index - 1, -1):
+                stack.append((i + 1, chosen + (i,), profit_sum + profits[i], volume_sum + volumes[i],
+                              four_d_sum + four_ds[i]))
+
+        self.stats["nodes"] += nodes
+        if timed_out:
+            self.stats["timeouts"] += 1
+        if not best_set:
+            self.stats["no_solution"] += 1
+            return None
+
+        return HedgeSolution(
+            tickets=[items[i].ticket for i in best_set],
+            net_result=best_net,
+            volume_ratio=best_ratio,
+            score=best_ratio,
+            nodes=nodes,
+            optimal=not timed_out,
+            elapsed_ms=(time.perf_counter() - start) * 1000
+        )
+
+    def get_status(self) -> Dict:
+        """📊 สถานะ solver"""
+        return {"max_size": self.max_size, "time_budget": self.time_budget, **self.stats}
+
+    def log(self, message: str):
+        """Log message with timestamp"""
+        timestamp = datetime.now().strftime("%H:%M:%S.%f")[:-3]
+        print(f"[{timestamp}] 🧩 HedgeSolver: {message}")
+
+# ========================================================================================
+# 📊 BENCHMARK (เทียบ heuristic เดิมของ PositionManager)
+# ========================================================================================
+
+def _legacy_score(net: float, avg_four_d: float, volume_ratio: float, size: int) -> float:
+    """score ผสมเดิมของ _calculate_hedge_combination_score (net เกิน $50 ไม่ได้คะแนนเพิ่ม)"""
+    net_score = min(net / 50.0, 1.0) if net > 0 else 0.0
+    return net_score * 0.40 + avg_four_d * 0.30 + volume_ratio * 0.20 + (1.0 / size) * 0.10
+
+def _legacy_best(loss: HedgeCandidate, candidates: List[HedgeCandidate]) -> Optional[Tuple[float, float, int]]:
+    """heuristic เดิม: ตัวเดียว + slice ติดกัน 2-3 ตัว (_find_best_hedge_combination)
+    และ ทั้งหมด + prefix (_analyze_single_position_recovery) - คืน (net, volume_ratio, legs) ของชุดที่ score สูงสุด"""
+    subsets = [[c] for c in candidates]
+    for i in range(min(3, len(candidates))):
+        for j in range(i + 1, min(i + 3, len(candidates))):
+            subsets.append(candidates[i:j + 1])
+    subsets.append(candidates)
+    subsets.extend(candidates[:i] for i in range(2, len(candidates)))
+
+    best = None
+    for subset in subsets:
+        if not subset:
+            continue
+        net = loss.profit + sum(c.profit for c in subset)
+        if net <= 0:
+            continue
+        volume = sum(c.volume for c in subset)
+        ratio = min(loss.volume, volume) / max(loss.volume, volume)
+        avg_four_d = (loss.four_d_score + sum(c.four_d_score for c in subset)) / (len(subset) + 1)
+        score = _legacy_score(net, avg_four_d, ratio, len(subset))
+        if best is None or score > best[0]:
+            best = (score, net, ratio, len(subset))
+    return best[1:] if best else None
+
+def run_benchmark(sizes: Sequence[int] = (50, 100, 200, 500), books_per_size: int = 20, seed: int = 11):
+    """📊 เทียบ solver กับ heuristic เดิมบน book สังเคราะห์ - รายงาน net / volume balance / ขา ต่อ solve"""
+    import random
+
+    rng = random.Random(seed)
+    solver = HedgeSolver()
+    print(f"{'positions':>9} | {'legacy net':>10} {'ratio':>6} {'legs':>5} | {'solver net':>10} {'ratio':>6} {'legs':>5} | "
+          f"{'ratio >=':>8} {'ms/solve':>8} {'optimal':>7}")
+    for size in sizes:
+        totals = {"legacy_net": 0.0, "legacy_ratio": 0.0, "legacy_legs": 0, "solver_net": 0.0, "solver_ratio": 0.0,
+                  "solver_legs": 0, "not_worse": 0, "solves": 0, "ms": 0.0, "optimal": 0}
+        for _ in range(books_per_size):
+            book = [HedgeCandidate(ticket=i, profit=rng.uniform(-150, 100),
+                                   volume=rng.choice([0.01, 0.02, 0.03, 0.05]),
+                                   four_d_score=rng.uniform(0.2, 0.8)) for i in range(size)]
+            buys, sells = book[: size // 2], book[size // 2:]
+            # position ขาดทุน 5 ตัวแรกของฝั่ง BUY เทียบกับ SELL ที่มีกำไร (ลำดับแบบ dict เหมือนระบบจริง)
+            hedges = [c for c in sells if c.profit > 0]
+            for loss in sorted(buys, key=lambda c: c.profit)[:5]:
+                legacy = _legacy_best(loss, hedges)
+                solution = solver.solve(loss.profit, loss.volume, loss.four_d_score, hedges)
+                if legacy is None and solution is None:
+                    continue
+                totals["solves"] += 1
+                if legacy:
+                    totals["legacy_net"] += legacy[0]
+                    totals["legacy_ratio"] += legacy[1]
+                    totals["legacy_legs"] += legacy[2]
+                if solution:
+                    totals["solver_net"] += solution.net_result
+                    totals["solver_ratio"] += solution.volume_ratio
+                    totals["solver_legs"] += len(solution.tickets)
+                    totals["ms"] += solution.elapsed_ms
+                    totals["optimal"] += solution.optimal
+                    if legacy is None or solution.volume_ratio >= legacy[1] - 1e-9:
+                        totals["not_worse"] += 1
+        n = max(1, totals["solves"])
+        print(f"{size:>9} | {totals['legacy_net'] / n:>10.2f} {totals['legacy_ratio'] / n:>6.2f} "
+              f"{totals['legacy_legs'] / n:>5.2f} | {totals['solver_net'] / n:>10.2f} {totals['solver_ratio'] / n:>6.2f} "
+              f"{totals['solver_legs'] / n:>5.2f} | {totals['not_worse'] / n:>8.0%} {totals['ms'] / n:>8.2f} "
+              f"{totals['optimal'] / n:>7.0%}")
+
+if __name__ == "__main__":
+    run_benchmark()
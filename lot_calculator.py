@@ -141,6 +141,9 @@ class LotCalculator:
         # Current method
         self.current_method = LotCalculationMethod.DYNAMIC_VOLUME_CANDLE
         
+        # 📈 แหล่ง streaming indicators (MarketAnalyzer) - ใช้กำหนด volatility level
+        self.indicator_source = None
+        
         self.log("🔢 Enhanced Lot Calculator - Dynamic Volume + Candle Factors Active")
     
     # ========================================================================================
@@ -206,6 +209,8 @@ class LotCalculator:
             if market_context:
                 market_condition = market_context.get("condition", "NORMAL")
                 volatility_level = market_context.get("volatility_level", "NORMAL")
+            elif self.indicator_source:
+                volatility_level = self._get_streaming_volatility_level()
             
             # Account safety
             safety_level = self._determine_safety_level()
@@ -303,6 +308,26 @@ class LotCalculator:
         except:
             return 1.0
     
+    def attach_indicator_source(self, indicator_source):
+        """📈 เชื่อมกับแหล่ง streaming indicators (ต้องมี get_indicator_values())"""
+        self.indicator_source = indicator_source
+    
+    def _get_streaming_volatility_level(self) -> str:
+        """📈 volatility level จาก ATR ratio ของ streaming indicators"""
+        try:
+            indicators = self.indicator_source.get_indicator_values()
+            if not indicators.get("ready"):
+                return "NORMAL"
+            atr_ratio = indicators.get("atr_ratio", 1.0)
+            if atr_ratio > 1.5:
+                return "HIGH"
+            elif atr_ratio < 0.7:
+                return "LOW"
+            return "NORMAL"
+        except Exception as e:
+            self.log(f"❌ Streaming volatility error: {e}")
+            return "NORMAL"
+    
     def _determine_safety_level(self) -> DynamicLotSafetyLevel:
         """🔧 กำหนดระดับความปลอดภัยตาม account"""
         try:
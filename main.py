@@ -23,6 +23,7 @@ try:
     from spacing_manager import SpacingManager
     from lot_calculator import LotCalculator
     from performance_tracker import PerformanceTracker
+    from risk_guard import RiskGuard
 except ImportError as e:
     print(f"⚠️ Import error: {e}")
     print("💡 Please ensure all 4D enhanced modules are available")
@@ -82,6 +83,7 @@ class ModernRuleBasedTradingGUI:
         self.spacing_manager = None
         self.lot_calculator = None
         self.performance_tracker = None
+        self.risk_guard = None
         
         # Configuration placeholders (จะถูกโหลดใน load_config)
         self.config = {}
@@ -707,6 +709,13 @@ class ModernRuleBasedTradingGUI:
                 self.lot_calculator = LotCalculator(account_info, self.config)
                 self.log("✅ Lot Calculator initialized")
             
+            # เชื่อม streaming indicators ของ MarketAnalyzer ให้ spacing/lot ใช้ร่วมกัน
+            if self.market_analyzer:
+                if hasattr(self.spacing_manager, 'attach_indicator_source'):
+                    self.spacing_manager.attach_indicator_source(self.market_analyzer)
+                if hasattr(self.lot_calculator, 'attach_indicator_source'):
+                    self.lot_calculator.attach_indicator_source(self.market_analyzer)
+            
             # Initialize Order Manager (ต้องการหลาย components)
             if not self.order_manager:
                 self.order_manager = OrderManager(
@@ -717,6 +726,9 @@ class ModernRuleBasedTradingGUI:
                 )
                 self.log("✅ Order Manager initialized")
             
+            if self.order_manager and hasattr(self.order_manager, 'attach_performance_tracker'):
+                self.order_manager.attach_performance_tracker(self.performance_tracker)
+            
             # Initialize Position Manager (ต้องการ mt5_connector และ config)
             if not self.position_manager:
                 self.position_manager = PositionManager(self.mt5_connector, self.config)
@@ -733,6 +745,16 @@ class ModernRuleBasedTradingGUI:
                 )
                 self.log("✅ Rule Engine initialized")
             
+            # Initialize Risk Guard (equity stop / margin guard ทุก tick)
+            if not self.risk_guard:
+                self.risk_guard = RiskGuard(
+                    self.rules_config,
+                    self.position_manager,
+                    self.order_manager,
+                    self.rule_engine
+                )
+                self.log("✅ Risk Guard initialized")
+            
             self.log("🎉 4D AI system fully initialized")
             
         except Exception as e:
@@ -761,6 +783,16 @@ class ModernRuleBasedTradingGUI:
                 self.log("🧠 Rule Engine started")
             else:
                 self.log("⚠️ Rule Engine not available")
+            
+            # 🛡️ Risk guard ตรวจ equity / margin / exposure ทุก tick (trip ครั้งก่อน = เริ่มใหม่)
+            if self.risk_guard:
+                if self.risk_guard.is_tripped:
+                    self.risk_guard.reset()
+                self.risk_guard.arm()
+                if self.risk_guard.is_armed:
+                    self.log("🛡️ Risk Guard armed")
+                else:
+                    self.log("⚠️ Risk Guard not armed - no limits in rules_config risk_management")
                 
             self.is_trading = True
             self.trading_status_label.config(text="Trading Active ✓", fg='#00ff88')
@@ -784,6 +816,9 @@ class ModernRuleBasedTradingGUI:
             if self.rule_engine:
                 self.rule_engine.stop()  # ← เพิ่มบรรทัดนี้!
                 self.log("🛑 Rule Engine stopped")
+            
+            if self.risk_guard:
+                self.risk_guard.disarm()
                 
             self.is_trading = False
             self.trading_status_label.config(text="Stopped", fg='#ff4757')
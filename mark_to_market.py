@@ -0,0 +1,237 @@
+"""
+📈 Mark-to-Market Engine - Tick-Driven Floating PnL
+mark_to_market.py
+
+🎯 FEATURES:
+✅ คำนวณ floating PnL ของทุก position ใหม่ทุก tick จาก bid/ask (vectorized ครั้งเดียว)
+✅ ใช้ contract size / tick size / tick value ที่ cache ไว้ใน SymbolMeta (ไม่มี IPC)
+✅ Net exposure (lots + มูลค่า) และ equity โดยประมาณ = balance + floating + swap + commission
+✅ Margin level ต่อ tick จาก equity ที่ mark แล้ว (margin จาก account ตอน load positions)
+✅ Snapshot แบบ immutable - อ่านได้จากทุก thread โดยไม่ต้อง lock
+✅ Subscribe กับ MarketDataWatcher ได้โดยตรง
+
+** PnL ระดับ sub-second โดยไม่ต้อง poll positions_get **
+"""
+
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Optional
+
+import numpy as np
+
+@dataclass(frozen=True)
+class MarkColumns:
+    """positions ที่ใช้ mark (columns เรียงตาม tickets)"""
+    tickets: np.ndarray
+    sign: np.ndarray                         # +1 BUY, -1 SELL
+    is_buy: np.ndarray
+    volume: np.ndarray
+    open_price: np.ndarray
+    carry: float                             # swap + commission รวม
+    row_of: Dict[int, int] = field(default_factory=dict)
+
+@dataclass(frozen=True)
+class MarkSnapshot:
+    """ผล mark ของ tick หนึ่ง"""
+    tick_time_msc: int
+    bid: float
+    ask: float
+    tickets: np.ndarray
+    prices: np.ndarray                       # ราคาปิดของแต่ละ position (BUY = bid, SELL = ask)
+    profits: np.ndarray                      # floating PnL (ไม่รวม swap / commission)
+    floating_pnl: float                      # รวม swap / commission
+    buy_volume: float
+    sell_volume: float
+    net_exposure: float                      # lots (BUY - SELL)
+    net_exposure_value: float                # มูลค่า = net lots * contract size * mid
+    balance: float
+    equity: float
+    margin: float = 0.0                      # margin ที่ใช้อยู่ (ณ load positions ครั้งล่าสุด)
+    buy_count: int = 0
+    sell_count: int = 0
+    row_of: Dict[int, int] = field(default_factory=dict)
+    marked_at: float = field(default_factory=time.monotonic)   # เวลาที่ได้รับ tick
+
+    @property
+    def age(self) -> float:
+        return time.monotonic() - self.marked_at
+
+    @property
+    def margin_level(self) -> Optional[float]:
+        """equity / margin * 100 (None ถ้าไม่มี margin)"""
+        return self.equity / self.margin * 100 if self.margin > 0 else None
+
+    @property
+    def margin_usage(self) -> Optional[float]:
+        """margin / equity (0.75 = ใช้ margin 75% ของ equity, None ถ้าไม่มี margin)"""
+        if self.margin <= 0:
+            return None
+        return self.margin / self.equity if self.equity > 0 else float("inf")
+
+    def profit_of(self, ticket: int) -> Optional[float]:
+        row = self.row_of.get(ticket)
+        return float(self.profits[row]) if row is not None else None
+
+    def price_of(self, ticket: int) -> Optional[float]:
+        row = self.row_of.get(ticket)
+        return float(self.prices[row]) if row is not None else None
+
+# ========================================================================================
+# 📈 MARK-TO-MARKET ENGINE
+# ========================================================================================
+
+class MarkToMarketEngine:
+    """
+    📈 Mark positions ทุก tick
+
+    - load_positions(positions, balance) เมื่อชุด positions / volume เปลี่ยน
+    - on_tick(bid, ask) คำนวณ PnL ทั้ง book แล้ว publish MarkSnapshot ใหม่
+    - meta_provider: callable ที่คืน SymbolMeta (trade_tick_size / trade_tick_value / trade_contract_size)
+    """
+
+    def __init__(self, meta_provider: Callable[[], Optional[object]]):
+        self.meta_provider = meta_provider
+        self.balance = 0.0
+        self.margin = 0.0
+        self._columns = self._build_columns([])
+        self._snapshot: Optional[MarkSnapshot] = None
+        self._last_tick = None
+        self._listeners = []
+        self._lock = threading.Lock()
+
+        self.stats = {"loads": 0, "ticks": 0, "last_mark_us": 0.0}
+
+    @staticmethod
+    def _build_columns(positions) -> MarkColumns:
+        count = len(positions)
+        tickets = np.fromiter((p.ticket for p in positions), dtype=np.int64, count=count)
+        is_buy = np.fromiter((p.type.value == "BUY" for p in positions), dtype=bool, count=count)
+        return MarkColumns(
+            tickets=tickets,
+            sign=np.where(is_buy, 1.0, -1.0),
+            is_buy=is_buy,
+            volume=np.fromiter((p.volume for p in positions), dtype=np.float64, count=count),
+            open_price=np.fromiter((p.open_price for p in positions), dtype=np.float64, count=count),
+            carry=float(sum(p.swap + p.commission for p in positions)),
+            row_of={ticket: row for row, ticket in enumerate(tickets.tolist())}
+        )
+
+    def load_positions(self, positions: Iterable, balance: Optional[float] = None, margin: Optional[float] = None):
+        """📥 ตั้งชุด positions (ticket / type / volume / open_price / swap / commission) แล้ว mark ใหม่ด้วย tick ล่าสุด"""
+        columns = self._build_columns(list(positions))
+        with self._lock:
+            self._columns = columns
+            if balance is not None:
+                self.balance = float(balance)
+            if margin is not None:
+                self.margin = float(margin)
+            self.stats["loads"] += 1
+            last_tick = self._last_tick
+        if last_tick:
+            self._mark(*last_tick)          # อายุ snapshot = อายุของ tick เดิม
+
+    # ========================================================================================
+    # 📈 MARKING
+    # ========================================================================================
+
+    def on_tick(self, bid: float, ask: float, tick_time_msc: int = 0) -> Optional[MarkSnapshot]:
+        """📈 mark ทุก position ด้วย bid/ask ของ tick นี้"""
+        return self._mark(bid, ask, tick_time_msc, time.monotonic())
+
+    def _mark(self, bid: float, ask: float, tick_time_msc: int, received_at: float) -> Optional[MarkSnapshot]:
+        meta = self.meta_provider()
+        if meta is None or not meta.trade_tick_size:
+            return None
+
+        start = time.perf_counter()
+        with self._lock:
+            columns = self._columns
+            balance = self.balance
+            margin = self.margin
+            self._last_tick = (bid, ask, tick_time_msc, received_at)
+
+        # มูลค่าต่อราคา 1 หน่วยต่อ 1 lot = tick_value / tick_size
+        value_per_price = meta.trade_tick_value / meta.trade_tick_size
+        prices = np.where(columns.is_buy, bid, ask)
+        profits = (prices - columns.open_price) * columns.sign * columns.volume * value_per_price
+
+        buy_volume = float(columns.volume[columns.is_buy].sum())
+        buy_count = int(columns.is_buy.sum())
+        sell_volume = float(columns.volume.sum()) - buy_volume
+        net_exposure = buy_volume - sell_volume
+        floating_pnl = float(profits.sum()) + columns.carry
+
+        snapshot = MarkSnapshot(
+            tick_time_msc=int(tick_time_msc),
+            bid=bid,
+            ask=ask,
+            tickets=columns.tickets,
+            prices=prices,
+            profits=profits,
+            floating_pnl=floating_pnl,
+            buy_volume=buy_volume,
+            sell_volume=sell_volume,
+            net_exposure=net_exposure,
+            net_exposure_value=net_exposure * meta.trade_contract_size * (bid + ask) / 2,
+            balance=balance,
+            equity=balance + floating_pnl,
+            margin=margin,
+            buy_count=buy_count,
+            sell_count=len(columns.tickets) - buy_count,
+            row_of=columns.row_of,
+            marked_at=received_at
+        )
+        self._snapshot = snapshot
+        self.stats["ticks"] += 1
+        self.stats["last_mark_us"] = (time.perf_counter() - start) * 1e6
+
+        for listener in list(self._listeners):
+            try:
+                listener(snapshot)
+            except Exception as e:
+                self.log(f"❌ Listener error: {e}")
+        return snapshot
+
+    def on_market_event(self, event):
+        """📡 subscriber ของ MarketDataWatcher - mark เฉพาะ NEW_TICK"""
+        if getattr(event.event_type, "value", None) == "NEW_TICK":
+            self.on_tick(event.bid, event.ask, event.tick_time_msc)
+
+    def add_listener(self, listener: Callable[[MarkSnapshot], None]):
+        """👂 เรียก listener(snapshot) หลัง mark ทุก tick (บน thread ของ tick)"""
+        if listener not in self._listeners:
+            self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[MarkSnapshot], None]):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    @property
+    def snapshot(self) -> Optional[MarkSnapshot]:
+        return self._snapshot
+
+    def fresh_snapshot(self, max_age: float) -> Optional[MarkSnapshot]:
+        """snapshot ล่าสุดถ้าอายุไม่เกิน max_age วินาที"""
+        snapshot = self._snapshot
+        return snapshot if snapshot is not None and snapshot.age <= max_age else None
+
+    def get_status(self) -> Dict:
+        """📊 สถานะ engine"""
+        snapshot = self._snapshot
+        status = {"positions": len(self._columns.tickets), "balance": self.balance, **self.stats}
+        if snapshot:
+            status.update({
+                "floating_pnl": round(snapshot.floating_pnl, 2),
+                "equity": round(snapshot.equity, 2),
+                "net_exposure": round(snapshot.net_exposure, 2),
+                "margin_level": round(snapshot.margin_level, 1) if snapshot.margin_level else None,
+                "age_seconds": round(snapshot.age, 3)
+            })
+        return status
+
+    def log(self, message: str):
+        """Log message with timestamp"""
+        timestamp = datetime.now().strftime("%H:%M:%S.%f")[:-3]
+        print(f"[{timestamp}] 📈 MarkToMarket: {message}")
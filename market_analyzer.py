@@ -13,13 +13,16 @@ market_analyzer.py
 ** ENHANCED FOR SIMPLE CANDLESTICK TRADING RULES **
 """
 
-import MetaTrader5 as mt5
-import pandas as pd
+from mt5_gateway import mt5_gateway as mt5   # IPC ทั้งหมดผ่าน gateway thread เดียว
 import numpy as np
+import threading
+import time
 from datetime import datetime, timedelta
 from typing import Dict, List, Tuple, Optional, Any
 from collections import deque
 import statistics
+from bar_buffer import BarRingBuffer
+from streaming_indicators import IndicatorEngine
 
 class MarketAnalyzer:
     """
@@ -50,61 +53,195 @@ class MarketAnalyzer:
         self.cached_analysis = {}
         self.cache_duration = 30  # วินาที
         
+        # 🧮 Ring buffer ต่อ symbol/timeframe (warm ครั้งเดียว แล้วเติมเฉพาะแท่งใหม่)
+        self.timeframe_seconds = 300  # M5
+        self.buffer_capacity = 500
+        self._bar_buffers: Dict[Tuple[str, int], BarRingBuffer] = {}
+        
+        # 📈 Streaming indicators ต่อ symbol/timeframe (state คงอยู่ข้าม cycle)
+        self.indicator_settings = {
+            "rsi_period": 14,
+            "ma_fast_period": 5,
+            "ma_slow_period": 20,
+            "ema_period": 20,
+            "volume_period": self.volume_lookback,
+            "atr_period": 14,
+            "range_baseline_period": 100
+        }
+        self._indicator_engines: Dict[Tuple[str, int], IndicatorEngine] = {}
+        self._active_indicator_key = None
+        
+        # 📸 Bar snapshot - ดึง rates ครั้งเดียวต่อ cycle แล้วแชร์ให้ทุก method
+        self.snapshot_bars = max(50, self.volume_lookback + 2)
+        self.snapshot_max_age = 3.0  # วินาที (สำหรับการเรียกนอก cycle เช่น GUI)
+        self._bar_snapshot = None
+        self._snapshot_cycle = 0
+        self._snapshot_lock = threading.Lock()
+        self._candlestick_cache = None
+        self._candlestick_cache_key = None
+        
         self.log("📊 Market Analyzer Enhanced with OHLC + Volume Analysis")
     
+    # ========================================================================================
+    # 📸 BAR SNAPSHOT (1 FETCH PER CYCLE)
+    # ========================================================================================
+    
+    def begin_cycle(self):
+        """📸 เริ่ม analysis cycle ใหม่ - snapshot เดิมจะถูก refresh ในการเรียกครั้งถัดไป"""
+        with self._snapshot_lock:
+            self._snapshot_cycle += 1
+    
+    def _get_bar_snapshot(self) -> Optional[Dict]:
+        """📸 ดึง snapshot ของ N แท่งล่าสุด - ใช้ร่วมกันทุก consumer ภายใน cycle เดียวกัน"""
+        try:
+            with self._snapshot_lock:
+                snapshot = self._bar_snapshot
+                now = time.time()
+                
+                # ใช้ snapshot เดิมถ้ายังอยู่ใน cycle เดียวกันและยังไม่เก่าเกินไป
+                if (snapshot and snapshot["cycle"] == self._snapshot_cycle
+                        and now - snapshot["fetched_at"] < self.snapshot_max_age):
+                    return snapshot
+                
+                if not self.mt5_connector or not self.mt5_connector.is_connected:
+                    self.log("❌ MT5 connector not available or not connected")
+                    return None
+                
+                actual_symbol = self._find_correct_gold_symbol()
+                if not actual_symbol:
+                    self.log("❌ Cannot find valid gold symbol")
+                    return None
+                
+                # Select symbol เฉพาะครั้งแรกหรือเมื่อ symbol เปลี่ยน
+                if not snapshot or snapshot["symbol"] != actual_symbol:
+                    if not mt5.symbol_select(actual_symbol, True):
+                        self.log(f"❌ Failed to select symbol {actual_symbol}")
+                        self._report_symbol_not_found(actual_symbol)
+                        return None
+                
+                buffer = self._sync_bar_buffer(actual_symbol)
+                if buffer is None or buffer.count < 1:
+                    self.log(f"❌ Failed to get rates for {actual_symbol}")
+                    self.log(f"🔧 MT5 Error: {mt5.last_error()}")
+                    if mt5.symbol_info(actual_symbol) is None:
+                        self._report_symbol_not_found(actual_symbol)
+                    return None
+                
+                # อัปเดต streaming indicators เฉพาะแท่งใหม่ / แท่งที่กำลังก่อตัว
+                self._update_indicators(buffer)
+                
+                # Zero-copy view ของ N แท่งล่าสุดจาก ring buffer
+                rates = buffer.view(self.snapshot_bars)
+                forming_bar = rates[-1]
+                key = (actual_symbol, self.main_timeframe,
+                       int(forming_bar['time']), int(forming_bar['tick_volume']))
+                
+                # แท่งที่กำลังก่อตัวไม่เปลี่ยน (time + tick_volume เท่าเดิม) = ข้อมูลเดิม
+                if snapshot and snapshot["key"] == key:
+                    snapshot["cycle"] = self._snapshot_cycle
+                    snapshot["fetched_at"] = now
+                    return snapshot
+                
+                self._bar_snapshot = {
+                    "symbol": actual_symbol,
+                    "rates": rates,
+                    "key": key,
+                    "cycle": self._snapshot_cycle,
+                    "fetched_at": now
+                }
+                return self._bar_snapshot
+                
+        except Exception as e:
+            self.log(f"❌ Bar snapshot error: {e}")
+            return None
+    
+    def _sync_bar_buffer(self, symbol: str) -> Optional[BarRingBuffer]:
+        """🧮 อัปเดต ring buffer ด้วยแท่งใหม่เท่านั้น (warm ครั้งแรก / เมื่อเจอ gap)"""
+        try:
+            buffer_key = (symbol, self.main_timeframe)
+            buffer = self._bar_buffers.get(buffer_key)
+            if buffer is None:
+                buffer = BarRingBuffer(symbol, self.main_timeframe, self.buffer_capacity)
+                self._bar_buffers[buffer_key] = buffer
+            
+            if buffer.count > 0:
+                # ดึงเฉพาะจำนวนแท่งที่อาจเกิดขึ้นตั้งแต่ sync ล่าสุด (+ แท่งที่กำลังก่อตัว)
+                elapsed_bars = int((time.time() - buffer.last_sync) / self.timeframe_seconds)
+                delta_count = min(buffer.capacity, elapsed_bars + 2)
+                delta = mt5.copy_rates_from_pos(symbol, self.main_timeframe, 0, delta_count)
+                if delta is None:
+                    return None
+                if buffer.apply_delta(delta):
+                    return buffer
+                self.log(f"🧮 Bar gap detected for {symbol} - re-warming buffer")
+            
+            rates = mt5.copy_rates_from_pos(symbol, self.main_timeframe, 0, buffer.capacity)
+            if rates is None:
+                return None
+            buffer.warm(rates)
+            return buffer
+            
+        except Exception as e:
+            self.log(f"❌ Bar buffer sync error: {e}")
+            return None
+    
+    def _update_indicators(self, buffer: BarRingBuffer):
+        """📈 ป้อนข้อมูลจาก ring buffer ให้ indicator engine (O(1) ต่อแท่ง)"""
+        try:
+            engine_key = (buffer.symbol, buffer.timeframe)
+            engine = self._indicator_engines.get(engine_key)
+            if engine is None:
+                engine = IndicatorEngine(buffer.symbol, buffer.timeframe, self.indicator_settings)
+                self._indicator_engines[engine_key] = engine
+            engine.update_from_buffer(buffer)
+            self._active_indicator_key = engine_key
+        except Exception as e:
+            self.log(f"❌ Indicator update error: {e}")
+    
+    def get_indicator_values(self) -> Dict:
+        """📈 ค่า indicators ล่าสุด (RSI, MA, EMA, volume, ATR) - อ่านจาก memory ไม่คำนวณใหม่"""
+        try:
+            engine = self._indicator_engines.get(self._active_indicator_key)
+            return engine.get_values() if engine else {}
+        except Exception as e:
+            self.log(f"❌ Get indicator values error: {e}")
+            return {}
+    
+    def _report_symbol_not_found(self, symbol: str):
+        """⚠️ แจ้ง registry ว่า symbol ใช้งานไม่ได้ - resolve ใหม่รอบถัดไป"""
+        registry = getattr(self.mt5_connector, 'symbol_registry', None)
+        if registry:
+            registry.report_symbol_not_found(symbol)
+    
+    def _bar_to_ohlc(self, bar) -> Dict:
+        """🔧 แปลง numpy bar เป็น OHLC dict"""
+        return {
+            "time": datetime.fromtimestamp(int(bar['time'])),
+            "open": float(bar['open']),
+            "high": float(bar['high']),
+            "low": float(bar['low']),
+            "close": float(bar['close']),
+            "volume": int(bar['tick_volume']),
+            "valid": True
+        }
+    
     # ========================================================================================
     # 🆕 NEW CANDLESTICK ANALYSIS METHODS
     # ========================================================================================
     
     def get_current_ohlc(self) -> Dict:
-        """📊 ดึงข้อมูล OHLC แท่งปัจจุบัน - FIXED: Symbol + Numpy handling"""
+        """📊 ดึงข้อมูล OHLC แท่งปัจจุบัน - อ่านจาก bar snapshot ของ cycle"""
         try:
-            self.log("📊 Requesting current OHLC data...")
-            
-            if not self.mt5_connector or not self.mt5_connector.is_connected:
-                self.log("❌ MT5 connector not available or not connected")
-                return self._get_fallback_ohlc()
-            
-            # ✅ ตรวจหา symbol ที่ถูกต้องก่อน
-            actual_symbol = self._find_correct_gold_symbol()
-            if not actual_symbol:
-                self.log("❌ Cannot find valid gold symbol")
-                return self._get_fallback_ohlc()
-            
-            self.log(f"🔍 Using symbol: {actual_symbol}")
-            
-            # ✅ Select symbol ก่อนดึงข้อมูล
-            if not mt5.symbol_select(actual_symbol, True):
-                self.log(f"❌ Failed to select symbol {actual_symbol}")
-                return self._get_fallback_ohlc()
-            
-            # ดึงข้อมูล 5 แท่งล่าสุด
-            rates = mt5.copy_rates_from_pos(actual_symbol, self.main_timeframe, 0, 5)
-            
-            if rates is None or len(rates) < 1:
-                self.log(f"❌ Failed to get rates for {actual_symbol}")
-                error_info = mt5.last_error()
-                self.log(f"🔧 MT5 Error: {error_info}")
+            snapshot = self._get_bar_snapshot()
+            if not snapshot:
                 return self._get_fallback_ohlc()
             
-            # ✅ แก้ไข: Handle numpy array correctly
-            current_bar = rates[-1]  # ได้ numpy.void object
-            
-            ohlc_data = {
-                "time": datetime.fromtimestamp(current_bar['time']),
-                "open": float(current_bar['open']),
-                "high": float(current_bar['high']),
-                "low": float(current_bar['low']),
-                "close": float(current_bar['close']),
-                "volume": int(current_bar['tick_volume']),  # ✅ ใช้ direct access ไม่ใช่ .get()
-                "valid": True
-            }
+            rates = snapshot["rates"]
+            ohlc_data = self._bar_to_ohlc(rates[-1])
             
-            # ✅ LOG SUCCESS
-            self.log(f"✅ Current OHLC Retrieved ({actual_symbol}):")
-            self.log(f"   ⏰ Time: {ohlc_data['time'].strftime('%Y-%m-%d %H:%M:%S')}")
-            self.log(f"   📈 OHLC: {ohlc_data['open']:.5f} | {ohlc_data['high']:.5f} | {ohlc_data['low']:.5f} | {ohlc_data['close']:.5f}")
-            self.log(f"   🔊 Volume: {ohlc_data['volume']}")
+            self.log(f"✅ Current OHLC ({snapshot['symbol']}): "
+                     f"{ohlc_data['open']:.5f} | {ohlc_data['high']:.5f} | "
+                     f"{ohlc_data['low']:.5f} | {ohlc_data['close']:.5f} - Vol: {ohlc_data['volume']}")
             
             return ohlc_data
             
@@ -113,42 +250,22 @@ class MarketAnalyzer:
             return self._get_fallback_ohlc()
 
     def get_previous_ohlc(self) -> Dict:
-        """📊 ดึงข้อมูล OHLC แท่งก่อนหน้า - FIXED: Symbol + Numpy handling"""
+        """📊 ดึงข้อมูล OHLC แท่งก่อนหน้า - อ่านจาก bar snapshot ของ cycle"""
         try:
-            self.log("📊 Requesting previous OHLC data...")
-            
-            if not self.mt5_connector or not self.mt5_connector.is_connected:
-                self.log("❌ MT5 connector not available or not connected")
-                return self._get_fallback_ohlc()
-            
-            # ใช้ symbol ที่ถูกต้อง
-            actual_symbol = self._find_correct_gold_symbol()
-            if not actual_symbol:
-                self.log("❌ Cannot find valid gold symbol")
+            snapshot = self._get_bar_snapshot()
+            if not snapshot:
                 return self._get_fallback_ohlc()
             
-            # ดึงข้อมูล 5 แท่งล่าสุด
-            rates = mt5.copy_rates_from_pos(actual_symbol, self.main_timeframe, 0, 5)
-            
-            if rates is None or len(rates) < 2:
+            rates = snapshot["rates"]
+            if len(rates) < 2:
                 self.log(f"❌ Insufficient rates for previous candle")
                 return self._get_fallback_ohlc()
             
-            # ✅ แก้ไข: Handle numpy array correctly
-            previous_bar = rates[-2]  # แท่งก่อนหน้า
+            ohlc_data = self._bar_to_ohlc(rates[-2])
             
-            ohlc_data = {
-                "time": datetime.fromtimestamp(previous_bar['time']),
-                "open": float(previous_bar['open']),
-                "high": float(previous_bar['high']),
-                "low": float(previous_bar['low']),
-                "close": float(previous_bar['close']),
-                "volume": int(previous_bar['tick_volume']),  # ✅ ใช้ direct access
-                "valid": True
-            }
-            
-            self.log(f"✅ Previous OHLC Retrieved ({actual_symbol}):")
-            self.log(f"   📈 OHLC: {ohlc_data['open']:.5f} | {ohlc_data['high']:.5f} | {ohlc_data['low']:.5f} | {ohlc_data['close']:.5f}")
+            self.log(f"✅ Previous OHLC ({snapshot['symbol']}): "
+                     f"{ohlc_data['open']:.5f} | {ohlc_data['high']:.5f} | "
+                     f"{ohlc_data['low']:.5f} | {ohlc_data['close']:.5f}")
             
             return ohlc_data
             
@@ -157,44 +274,23 @@ class MarketAnalyzer:
             return self._get_fallback_ohlc()
 
     def get_volume_data(self) -> Dict:
-        """🔊 ดึงข้อมูล Volume - FIXED: Numpy handling"""
+        """🔊 ดึงข้อมูล Volume - อ่านจาก bar snapshot ของ cycle"""
         try:
-            self.log("📊 Step 3: Getting volume data...")
-            
-            if not self.mt5_connector or not self.mt5_connector.is_connected:
-                self.log("❌ MT5 connector not available")
-                self.volume_available = False
-                return self._get_fallback_volume_data()
-            
-            # ใช้ symbol ที่ถูกต้อง
-            actual_symbol = self._find_correct_gold_symbol()
-            if not actual_symbol:
+            snapshot = self._get_bar_snapshot()
+            if not snapshot:
                 self.volume_available = False
                 return self._get_fallback_volume_data()
             
-            # ดึงข้อมูล volume หลายแท่ง
-            rates = mt5.copy_rates_from_pos(actual_symbol, self.main_timeframe, 0, self.volume_lookback + 2)
-            
-            if rates is None or len(rates) < 2:
-                self.log("❌ Failed to get volume data")
-                self.volume_available = False
-                return self._get_fallback_volume_data()
+            indicators = self.get_indicator_values()
+            average_volume = indicators.get("volume_mean", 0.0)
+            current_volume = int(indicators.get("current_volume", 0))
             
-            # ✅ แก้ไข: Handle numpy array volumes correctly
-            volumes = []
-            for rate in rates:
-                volume = int(rate['tick_volume'])  # ✅ Direct access ไม่ใช่ .get()
-                if volume > 0:
-                    volumes.append(volume)
-            
-            if not volumes:
+            if average_volume <= 0:
                 self.log("❌ No valid volume data")
                 self.volume_available = False
                 return self._get_fallback_volume_data()
             
-            current_volume = volumes[-1] if volumes else 0
-            average_volume = sum(volumes) / len(volumes) if volumes else 1
-            volume_ratio = current_volume / average_volume if average_volume > 0 else 1.0
+            volume_ratio = current_volume / average_volume
             
             self.volume_available = True
             
@@ -203,7 +299,8 @@ class MarketAnalyzer:
                 "average_volume": average_volume,
                 "volume_ratio": volume_ratio,
                 "volume_available": True,
-                "lookback_periods": len(volumes)
+                "volume_std": indicators.get("volume_std", 0.0),
+                "lookback_periods": indicators.get("volume_periods", 0)
             }
             
         except Exception as e:
@@ -212,8 +309,16 @@ class MarketAnalyzer:
             return self._get_fallback_volume_data()
     
     def _find_correct_gold_symbol(self) -> Optional[str]:
-        """🔍 หา Gold Symbol ที่ถูกต้องในโบรกเกอร์นี้"""
+        """🔍 หา Gold Symbol ที่ถูกต้องในโบรกเกอร์นี้ - ผ่าน symbol registry"""
         try:
+            # 0. ใช้ registry กลาง (resolve ครั้งเดียว แล้ว cache)
+            registry = getattr(self.mt5_connector, 'symbol_registry', None)
+            if registry:
+                resolved_symbol = registry.resolve(self.symbol)
+                if resolved_symbol:
+                    self.symbol = resolved_symbol
+                return resolved_symbol
+            
             # 1. ลองใช้ symbol ที่ mt5_connector detect ไว้
             if hasattr(self.mt5_connector, 'gold_symbol') and self.mt5_connector.gold_symbol:
                 detected_symbol = self.mt5_connector.gold_symbol
@@ -335,6 +440,12 @@ class MarketAnalyzer:
     def get_candlestick_info(self) -> Dict:
         """🆕 รวมข้อมูล candlestick ที่จำเป็นทั้งหมด - พร้อม comprehensive logging"""
         try:
+            # ✅ แท่งที่กำลังก่อตัวไม่เปลี่ยน = ใช้ผลวิเคราะห์เดิม (ไม่ดึง/คำนวณซ้ำ)
+            snapshot = self._get_bar_snapshot()
+            if (snapshot and self._candlestick_cache
+                    and self._candlestick_cache_key == snapshot["key"]):
+                return self._candlestick_cache
+            
             self.log("🕯️  === STARTING CANDLESTICK ANALYSIS ===")
             
             # ดึงข้อมูลพื้นฐาน
@@ -379,6 +490,10 @@ class MarketAnalyzer:
             self.log(f"🔊 Volume Available: {volume_data.get('volume_available', False)}")
             self.log("=" * 50)
             
+            if snapshot:
+                self._candlestick_cache = result
+                self._candlestick_cache_key = snapshot["key"]
+            
             return result
             
         except Exception as e:
@@ -633,13 +748,16 @@ class MarketAnalyzer:
     def _get_short_term_trend_context(self, current: Dict, previous: Dict) -> Dict:
         """🆕 วิเคราะห์ trend context ระยะสั้น"""
         try:
-            # ดึงข้อมูล 10 แท่งล่าสุดสำหรับ trend
-            rates = mt5.copy_rates_from_pos(self.symbol, self.main_timeframe, 0, 10)
+            # ใช้ 10 แท่งล่าสุดจาก bar snapshot สำหรับ trend
+            snapshot = self._get_bar_snapshot()
+            if not snapshot:
+                return {"trend_alignment": 0.5, "momentum_score": 0.5}
             
-            if rates is None or len(rates) < 5:
+            rates = snapshot["rates"][-10:]
+            if len(rates) < 5:
                 return {"trend_alignment": 0.5, "momentum_score": 0.5}
             
-            closes = [float(rate['close']) for rate in rates]
+            closes = rates['close'].tolist()
             
             # Simple trend direction
             trend_up_count = sum(1 for i in range(1, len(closes)) if closes[i] > closes[i-1])
@@ -914,30 +1032,27 @@ class MarketAnalyzer:
     def _get_basic_technical_analysis(self) -> Dict:
         """วิเคราะห์เทคนิคพื้นฐาน - รักษาไว้เพื่อความเข้ากันได้"""
         try:
-            # ดึงข้อมูลราคา
-            rates = mt5.copy_rates_from_pos(self.symbol, self.main_timeframe, 0, 50)
-            if rates is None:
+            # อ่านค่าจาก streaming indicators (อัปเดตแล้วใน bar snapshot)
+            snapshot = self._get_bar_snapshot()
+            if not snapshot:
                 return {}
             
-            df = pd.DataFrame(rates)
-            close_prices = df['close'].values
-            
-            if len(close_prices) < 20:
+            indicators = self.get_indicator_values()
+            if indicators.get("closed_bars_processed", 0) < 19:
                 return {}
             
-            # RSI
-            rsi = self._calculate_rsi(close_prices, 14)
-            
-            # Moving averages
-            ma_fast = np.mean(close_prices[-5:])
-            ma_slow = np.mean(close_prices[-20:])
+            rsi = indicators["rsi"]
+            ma_fast = indicators["ma_fast"]
+            ma_slow = indicators["ma_slow"]
             
             return {
                 "rsi": rsi,
                 "rsi_condition": self._classify_rsi(rsi),
                 "ma_direction": "BULLISH" if ma_fast > ma_slow else "BEARISH",
                 "trend_strength": abs(ma_fast - ma_slow) / ma_slow if ma_slow > 0 else 0,
-                "volatility_level": "NORMAL"
+                "volatility_level": self._classify_volatility(indicators.get("atr_ratio", 1.0)),
+                "atr": indicators.get("atr", 0.0),
+                "ema": indicators.get("ema", 0.0)
             }
             
         except Exception as e:
@@ -1031,6 +1146,14 @@ class MarketAnalyzer:
             self.log(f"❌ RSI calculation error: {e}")
             return 50.0
     
+    def _classify_volatility(self, atr_ratio: float) -> str:
+        """จำแนกความผันผวนจาก ATR เทียบ true range เฉลี่ย"""
+        if atr_ratio > 1.5:
+            return "HIGH"
+        elif atr_ratio < 0.7:
+            return "LOW"
+        return "NORMAL"
+    
     def _classify_rsi(self, rsi: float) -> str:
         """จำแนก RSI condition"""
         if rsi < 30:
@@ -0,0 +1,195 @@
+"""
+📡 Market Data Watcher - Tick / Bar-Close Event Publisher
+market_data_watcher.py
+
+🎯 FEATURES:
+✅ ตรวจจับ tick ใหม่จาก time_msc (poll เบาๆ ด้วย symbol_info_tick)
+✅ ตรวจจับการปิดแท่ง (tick แรกของแท่งใหม่)
+✅ ส่ง event ให้ subscriber + คิวสำหรับ rule engine (wait_for_events)
+
+** Rule engine ตื่นเฉพาะเมื่อมีข้อมูลใหม่ แทนการ sleep 3 วินาที **
+"""
+
+from mt5_gateway import mt5_gateway as mt5   # IPC ทั้งหมดผ่าน gateway thread เดียว
+import threading
+import time
+from datetime import datetime
+from dataclasses import dataclass, field
+from enum import Enum
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+class MarketEventType(Enum):
+    """ประเภท market event"""
+    NEW_TICK = "NEW_TICK"
+    BAR_CLOSED = "BAR_CLOSED"
+
+@dataclass
+class MarketEvent:
+    """ข้อมูล market event"""
+    event_type: MarketEventType
+    symbol: str
+    bid: float = 0.0
+    ask: float = 0.0
+    tick_time_msc: int = 0
+    bar_time: int = 0                     # เวลาเปิดของแท่ง (แท่งที่ปิดสำหรับ BAR_CLOSED)
+    timestamp: datetime = field(default_factory=datetime.now)
+
+# ========================================================================================
+# 📡 MARKET DATA WATCHER
+# ========================================================================================
+
+class MarketDataWatcher:
+    """
+    📡 Watcher ที่ poll tick ล่าสุดแล้ว publish event เมื่อมีการเปลี่ยนแปลง
+
+    - symbol_provider: callable ที่คืนชื่อ symbol ปัจจุบัน
+    - timeframe_seconds: ความยาวแท่ง (ใช้ตรวจจับ bar close)
+    """
+
+    def __init__(self, symbol_provider: Callable[[], Optional[str]],
+                 timeframe_seconds: int = 300, poll_interval: float = 0.1):
+        self.symbol_provider = symbol_provider
+        self.timeframe_seconds = max(1, int(timeframe_seconds))
+        self.poll_interval = max(0.01, float(poll_interval))
+
+        self.is_running = False
+        self.watcher_thread = None
+
+        self._condition = threading.Condition()
+        self._pending_events = deque(maxlen=1000)
+        self._subscribers: List[Callable[[MarketEvent], None]] = []
+
+        self.last_tick_msc = 0
+        self.current_bar_time = 0
+
+        self.stats = {
+            "polls": 0,
+            "ticks": 0,
+            "bars_closed": 0,
+            "dropped_events": 0
+        }
+
+    # ========================================================================================
+    # 🎮 CONTROL
+    # ========================================================================================
+
+    def start(self):
+        """เริ่ม watcher thread"""
+        if self.is_running:
+            return
+        self.is_running = True
+        self.watcher_thread = threading.Thread(target=self._watch_loop, daemon=True)
+        self.watcher_thread.start()
+        self.log(f"📡 Watching ticks every {self.poll_interval:.2f}s")
+
+    def stop(self):
+        """หยุด watcher thread"""
+        self.is_running = False
+        with self._condition:
+            self._condition.notify_all()
+        if self.watcher_thread:
+            self.watcher_thread.join(timeout=2)
+        self.log("🛑 Market data watcher stopped")
+
+    def subscribe(self, callback: Callable[[MarketEvent], None]):
+        """ลงทะเบียน callback ที่จะถูกเรียกทุก event (เรียกบน watcher thread)"""
+        self._subscribers.append(callback)
+
+    # ========================================================================================
+    # 📥 CONSUMER API
+    # ========================================================================================
+
+    def wait_for_events(self, timeout: float) -> List[MarketEvent]:
+        """⏳ รอจนมี event (หรือหมดเวลา) แล้วคืน event ที่ค้างทั้งหมด"""
+        with self._condition:
+            if not self._pending_events and self.is_running:
+                self._condition.wait(timeout)
+            return self._drain_locked()
+
+    def drain_events(self) -> List[MarketEvent]:
+        """📥 คืน event ที่ค้างทั้งหมดโดยไม่รอ"""
+        with self._condition:
+            return self._drain_locked()
+
+    def _drain_locked(self) -> List[MarketEvent]:
+        events = list(self._pending_events)
+        self._pending_events.clear()
+        return events
+
+    # ========================================================================================
+    # 🔄 WATCH LOOP
+    # ========================================================================================
+
+    def _watch_loop(self):
+        """🔄 Poll tick ล่าสุด - publish เฉพาะเมื่อ time_msc เปลี่ยน"""
+        while self.is_running:
+            try:
+                symbol = self.symbol_provider()
+                if symbol:
+                    self._poll_symbol(symbol)
+            except Exception as e:
+                self.log(f"❌ Watch loop error: {e}")
+                time.sleep(1.0)
+
+            time.sleep(self.poll_interval)
+
+    def _poll_symbol(self, symbol: str):
+        """🔧 ตรวจ tick ของ symbol แล้วสร้าง event"""
+        self.stats["polls"] += 1
+
+        tick = mt5.symbol_info_tick(symbol)
+        if tick is None:
+            return
+
+        tick_msc = int(getattr(tick, 'time_msc', 0) or int(tick.time) * 1000)
+        if tick_msc == self.last_tick_msc:
+            return
+        self.last_tick_msc = tick_msc
+
+        tick_seconds = tick_msc // 1000
+        bar_time = tick_seconds - tick_seconds % self.timeframe_seconds
+
+        # tick แรกของแท่งใหม่ = แท่งก่อนหน้าปิดแล้ว
+        if self.current_bar_time and bar_time > self.current_bar_time:
+            self.stats["bars_closed"] += 1
+            self._publish(MarketEvent(
+                event_type=MarketEventType.BAR_CLOSED, symbol=symbol,
+                bid=tick.bid, ask=tick.ask, tick_time_msc=tick_msc,
+                bar_time=self.current_bar_time
+            ))
+        self.current_bar_time = bar_time
+
+        self.stats["ticks"] += 1
+        self._publish(MarketEvent(
+            event_type=MarketEventType.NEW_TICK, symbol=symbol,
+            bid=tick.bid, ask=tick.ask, tick_time_msc=tick_msc, bar_time=bar_time
+        ))
+
+    def _publish(self, event: MarketEvent):
+        """📤 ส่ง event เข้าคิวและแจ้ง subscribers"""
+        with self._condition:
+            if len(self._pending_events) == self._pending_events.maxlen:
+                self.stats["dropped_events"] += 1
+            self._pending_events.append(event)
+            self._condition.notify_all()
+
+        for callback in self._subscribers:
+            try:
+                callback(event)
+            except Exception as e:
+                self.log(f"❌ Subscriber error: {e}")
+
+    def get_status(self) -> Dict:
+        """📊 สถานะ watcher"""
+        return {
+            "is_running": self.is_running,
+            "last_tick_msc": self.last_tick_msc,
+            "current_bar_time": self.current_bar_time,
+            **self.stats
+        }
+
+    def log(self, message: str):
+        """Log message with timestamp"""
+        timestamp = datetime.now().strftime("%H:%M:%S.%f")[:-3]
+        print(f"[{timestamp}] 📡 MarketWatcher: {message}")
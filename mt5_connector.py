@@ -3,7 +3,7 @@
 แค่หา MT5 ทุกตัว แล้วให้ลูกค้าเลือกเอง - เรียบง่าย ไม่ซับซ้อน
 """
 
-import MetaTrader5 as mt5
+from mt5_gateway import mt5_gateway as mt5   # IPC ทั้งหมดผ่าน gateway thread เดียว
 import os
 import time
 import re
@@ -13,6 +13,9 @@ import winreg
 from pathlib import Path
 from dataclasses import dataclass
 from typing import List, Dict, Optional
+from symbol_registry import SymbolRegistry
+from trading_preflight import TradingPreflight
+from position_book import PositionBook
 
 @dataclass
 class MT5Installation:
@@ -51,6 +54,18 @@ class MT5Connector:
             "XAUUSD_", "XAUUSD#", "XAUUSDpro", "GOLD.std"
         ]
         
+        # Registry กลางของ symbol ที่ resolve แล้ว (ใช้ร่วมกับ analyzer/order/position manager)
+        self.symbol_registry = SymbolRegistry(self.gold_symbols)
+        
+        # Gateway กลางสำหรับ IPC (serialize ทุก thread: rule engine / position scanner / GUI)
+        self.gateway = mt5
+        
+        # สิทธิ์การเทรดที่ refresh เบื้องหลัง (order path อ่านจาก memory)
+        self.trading_preflight = TradingPreflight(self.symbol_registry.get_symbol)
+        
+        # Shadow book ของ positions / pending orders (apply ผล order_send ทันที + reconcile เป็นระยะ)
+        self.position_book = PositionBook(self.symbol_registry.get_symbol)
+        
     def find_running_mt5_installations(self) -> List[MT5Installation]:
         """
         🔍 หา MT5 ที่กำลังรันอยู่เท่านั้น
@@ -287,7 +302,8 @@ class MT5Connector:
             print(f"💰 ยอดเงิน: ${account_info.balance:,.2f}")
             print(f"🏦 โบรกเกอร์: {account_info.company}")
             
-            # Detect gold symbol
+            # Detect gold symbol (reconnect = resolve ใหม่)
+            self.symbol_registry.invalidate("reconnect")
             gold_symbol = self.detect_gold_symbol()
             if not gold_symbol:
                 print("⚠️ ไม่เจอสัญลักษณ์ทองคำ")
@@ -310,6 +326,8 @@ class MT5Connector:
             }
             
             self.gold_symbol = gold_symbol
+            self.trading_preflight.start()
+            self.position_book.start()
             
             return True
             
@@ -320,8 +338,11 @@ class MT5Connector:
     # === Gold Symbol Detection (ใช้โค้ดเดิม) ===
     
     def detect_gold_symbol(self):
-        """ตรวจจับสัญลักษณ์ทองคำ"""
+        """ตรวจจับสัญลักษณ์ทองคำ - ผ่าน symbol registry (cache ผลลัพธ์)"""
         try:
+            if self.symbol_registry:
+                return self.symbol_registry.resolve()
+            
             all_symbols = mt5.symbols_get()
             if not all_symbols:
                 return None
@@ -405,9 +426,12 @@ class MT5Connector:
         """ตัดการเชื่อมต่อ"""
         try:
             if self.is_connected:
+                self.trading_preflight.stop()
+                self.position_book.stop()
                 mt5.shutdown()
                 self.is_connected = False
                 self.gold_symbol = None
+                self.symbol_registry.invalidate("disconnect")
                 self.account_info = {}
                 self.symbol_info = {}
                 print("✅ ตัดการเชื่อมต่อเรียบร้อย")
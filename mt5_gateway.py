@@ -0,0 +1,374 @@
+"""
+🚦 MT5 Gateway - Single-Threaded, Coalescing Access to the MT5 Terminal
+mt5_gateway.py
+
+🎯 FEATURES:
+✅ IPC ทั้งหมดไปยัง terminal ทำบน worker thread เดียว (MT5 client ไม่ thread-safe)
+✅ Coalescing - read ที่เหมือนกันขณะกำลังรอผล ใช้ผลลัพธ์เดียวกัน
+✅ TTL cache สั้นๆ สำหรับ read (tick 50ms, account 250ms, ...)
+✅ Priority - trading requests แซงคิว analytics reads
+✅ last_error() แยกตาม thread ผู้เรียก
+
+** ใช้แทน module MetaTrader5 ได้ตรงๆ: from mt5_gateway import mt5_gateway as mt5 **
+"""
+
+import MetaTrader5 as mt5
+import functools
+import itertools
+import queue
+import threading
+import time
+from concurrent.futures import CancelledError, Future, TimeoutError as FutureTimeoutError
+from dataclasses import dataclass, field
+from datetime import datetime
+from enum import Enum
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+class GatewayPriority(Enum):
+    """ลำดับความสำคัญของ request (ค่าน้อย = ทำก่อน)"""
+    TRADING = 0
+    STATE = 1
+    ANALYTICS = 2
+
+# priority ของแต่ละ function (ที่ไม่อยู่ในนี้ = ANALYTICS)
+FUNCTION_PRIORITY = {
+    "order_send": GatewayPriority.TRADING,
+    "order_check": GatewayPriority.TRADING,
+    "initialize": GatewayPriority.TRADING,
+    "shutdown": GatewayPriority.TRADING,
+    "positions_get": GatewayPriority.STATE,
+    "orders_get": GatewayPriority.STATE,
+    "account_info": GatewayPriority.STATE,
+    "terminal_info": GatewayPriority.STATE,
+    "symbol_info_tick": GatewayPriority.STATE,
+    "history_deals_get": GatewayPriority.STATE
+}
+
+# TTL (วินาที) ของ read cache - 0 = coalesce อย่างเดียว ไม่ cache
+DEFAULT_READ_TTLS = {
+    "symbol_info_tick": 0.05,
+    "account_info": 0.25,
+    "terminal_info": 1.0,
+    "positions_get": 0.1,
+    "orders_get": 0.1,
+    "symbol_info": 1.0,
+    "symbols_get": 30.0,
+    "copy_rates_from_pos": 0.05,
+    "history_deals_get": 0.0
+}
+
+# function ที่มีผลข้างเคียง - ห้าม coalesce / cache
+WRITE_FUNCTIONS = {"order_send", "initialize", "shutdown", "symbol_select"}
+
+# function ที่ต้องรอผลจริงเสมอ - timeout แล้วส่งซ้ำ = fill ซ้ำ
+UNBOUNDED_WAIT_FUNCTIONS = {"order_send"}
+
+@dataclass
+class GatewayRequest:
+    """request ที่รอใน queue"""
+    name: str
+    args: Tuple
+    kwargs: Dict
+    key: Optional[Tuple]
+    future: Future
+    enqueued_at: float = field(default_factory=time.perf_counter)
+
+# ========================================================================================
+# 🚦 MT5 GATEWAY
+# ========================================================================================
+
+class MT5Gateway:
+    """
+    🚦 เจ้าของ IPC ทั้งหมดกับ MT5 terminal
+
+    - call() จาก thread ใดก็ได้ -> รอผลจาก worker thread
+    - read ที่ key เหมือนกัน (function + args) ใช้ Future เดียวกันระหว่างรอ
+    - order_send สำเร็จ -> ล้าง read cache (positions/account เปลี่ยนแล้ว)
+    - order_send ไม่มี timeout; write อื่นที่ timeout ถูกยกเลิก (worker ข้าม ไม่ทำทีหลัง)
+    - stop() ยกเลิก request ที่ยังค้างใน queue - ผู้เรียกได้ None (last_error "Gateway stopped")
+    - attribute อื่นๆ (constants) ส่งต่อไปที่ module MetaTrader5
+    """
+
+    def __init__(self, read_ttls: Optional[Dict[str, float]] = None, call_timeout: float = 10.0):
+        self.read_ttls = dict(DEFAULT_READ_TTLS)
+        self.read_ttls.update(read_ttls or {})
+        self.call_timeout = call_timeout
+
+        self._queue = queue.PriorityQueue()
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        self._inflight: Dict[Tuple, Future] = {}
+        self._cache: Dict[Tuple, Tuple[float, Any]] = {}
+        self._thread_state = threading.local()
+        self._bound_calls: Dict[str, Any] = {}
+        self._send_listeners: List[Callable] = []
+        self._sends_pending = 0
+        self._sends_idle = threading.Condition(self._lock)
+
+        self.worker_thread = None
+        self.is_running = False
+
+        self.stats = {
+            "requests": 0,
+            "executed": 0,
+            "coalesced": 0,
+            "cache_hits": 0,
+            "timeouts": 0,
+            "abandoned": 0,
+            "max_queue_depth": 0,
+            "queue_wait_ms": {priority.name: 0.0 for priority in GatewayPriority}
+        }
+
+    # ========================================================================================
+    # 🎮 CONTROL
+    # ========================================================================================
+
+    def start(self):
+        """เริ่ม worker thread (เรียกอัตโนมัติเมื่อมี call แรก)"""
+        with self._lock:
+            if self.is_running:
+                return
+            self.is_running = True
+            self.worker_thread = threading.Thread(target=self._worker_loop, daemon=True,
+                                                  name="MT5Gateway")
+            self.worker_thread.start()
+
+    def stop(self):
+        """หยุด worker thread - request ที่ยังค้างใน queue ถูกยกเลิก (ผู้เรียกได้ None ไม่ค้างรอ)"""
+        self.is_running = False
+        self._queue.put((-1, next(self._sequence), None))
+        if self.worker_thread:
+            self.worker_thread.join(timeout=2)
+
+        while True:
+            try:
+                _, _, request = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if request is None:
+                continue
+            with self._lock:
+                if request.key is not None:
+                    self._inflight.pop(request.key, None)
+            # ยังไม่ถูกส่งไป terminal -> ยกเลิกได้ปลอดภัย (order_send ก็ไม่ fill)
+            request.future.cancel()
+            self._finish_send(request)
+
+    def invalidate_cache(self, name: Optional[str] = None):
+        """🔄 ล้าง read cache (ทั้งหมด หรือเฉพาะ function)"""
+        with self._lock:
+            if name is None:
+                self._cache.clear()
+            else:
+                for key in [k for k in self._cache if k[0] == name]:
+                    del self._cache[key]
+
+    def add_send_listener(self, listener: Callable):
+        """📣 listener(request, result) ถูกเรียกหลัง order_send ทุกครั้ง (ก่อนผู้เรียกได้ผล)"""
+        if listener not in self._send_listeners:
+            self._send_listeners.append(listener)
+
+    def remove_send_listener(self, listener: Callable):
+        if listener in self._send_listeners:
+            self._send_listeners.remove(listener)
+
+    # ========================================================================================
+    # 📞 CALL PATH
+    # ========================================================================================
+
+    def call(self, name: str, *args, **kwargs):
+        """📞 เรียก function ของ MetaTrader5 ผ่าน gateway"""
+        with self._lock:
+            self.stats["requests"] += 1
+
+        # worker เรียกซ้อน (ไม่ควรเกิด) -> ทำตรงๆ กัน deadlock
+        if threading.current_thread() is self.worker_thread:
+            return self._execute(name, args, kwargs)[0]
+
+        if not self.is_running:
+            self.start()
+
+        key = self._make_key(name, args, kwargs)
+        ttl = self.read_ttls.get(name, 0.0)
+
+        with self._lock:
+            inflight = None
+            if key is not None:
+                cached = self._cache.get(key)
+                if cached and time.perf_counter() - cached[0] <= ttl:
+                    self.stats["cache_hits"] += 1
+                    self._thread_state.last_error = (1, "Success")
+                    return cached[1]
+
+                inflight = self._inflight.get(key)
+
+            if inflight is not None:
+                self.stats["coalesced"] += 1
+            else:
+                future = Future()
+                if key is not None:
+                    self._inflight[key] = future
+                if name == "order_send":
+                    self._sends_pending += 1
+
+        # รอนอก lock - worker ต้องใช้ lock ตอน _complete
+        if inflight is not None:
+            return self._wait(inflight)
+
+        priority = FUNCTION_PRIORITY.get(name, GatewayPriority.ANALYTICS)
+        self._queue.put((priority.value, next(self._sequence),
+                         GatewayRequest(name=name, args=args, kwargs=kwargs, key=key, future=future)))
+        with self._lock:
+            self.stats["max_queue_depth"] = max(self.stats["max_queue_depth"], self._queue.qsize())
+        if name in UNBOUNDED_WAIT_FUNCTIONS:
+            return self._wait(future, timeout=None)
+        return self._wait(future, abandon_on_timeout=key is None)
+
+    def _wait(self, future: Future, timeout: Optional[float] = -1.0, abandon_on_timeout: bool = False):
+        """⏳ รอผลจาก worker แล้วเก็บ last_error ของ thread ผู้เรียก (timeout=None = รอจนเสร็จ)"""
+        if timeout is not None and timeout < 0:
+            timeout = self.call_timeout
+        try:
+            result, error = future.result(timeout=timeout)
+        except CancelledError:
+            # gateway หยุด (stop) ก่อน request ถูกทำ
+            self._thread_state.last_error = (-10004, "Gateway stopped")
+            return None
+        except FutureTimeoutError:
+            # write ที่ยังไม่เริ่ม -> ยกเลิกเลย ผู้เรียกได้ None แล้วจะไม่ถูกทำทีหลัง
+            abandoned = abandon_on_timeout and future.cancel()
+            with self._lock:
+                self.stats["timeouts"] += 1
+                if abandoned:
+                    self.stats["abandoned"] += 1
+            self._thread_state.last_error = (-10005, "Gateway timeout")
+            return None
+        self._thread_state.last_error = error
+        return result
+
+    def wait_for_sends(self, timeout: Optional[float] = None) -> bool:
+        """⏳ รอจน order_send ที่ค้างใน queue / กำลังทำ เสร็จหมด (ใช้ก่อนส่งซ้ำ)"""
+        with self._sends_idle:
+            return self._sends_idle.wait_for(lambda: self._sends_pending == 0, timeout=timeout)
+
+    def last_error(self) -> Tuple[int, str]:
+        """❌ error ของ call ล่าสุดของ thread นี้ (ไม่ปนกับ thread อื่น)"""
+        return getattr(self._thread_state, "last_error", (1, "Success"))
+
+    @staticmethod
+    def _make_key(name: str, args: Tuple, kwargs: Dict) -> Optional[Tuple]:
+        """🔑 key สำหรับ coalesce/cache - None ถ้าเป็น write หรือ hash ไม่ได้"""
+        if name in WRITE_FUNCTIONS:
+            return None
+        key = (name, args, tuple(sorted(kwargs.items())))
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+    # ========================================================================================
+    # 👷 WORKER
+    # ========================================================================================
+
+    def _worker_loop(self):
+        """👷 ทำ request ทีละตัวตามลำดับ priority"""
+        while self.is_running:
+            priority, _, request = self._queue.get()
+            if request is None:
+                continue
+
+            # ผู้เรียกเลิกรอแล้ว (timeout) -> ไม่ทำ
+            if not request.future.set_running_or_notify_cancel():
+                self._finish_send(request)
+                continue
+
+            wait_ms = (time.perf_counter() - request.enqueued_at) * 1000
+            bucket = GatewayPriority(priority).name
+            with self._lock:
+                self.stats["queue_wait_ms"][bucket] = self.stats["queue_wait_ms"][bucket] * 0.9 + wait_ms * 0.1
+
+            try:
+                outcome = self._execute(request.name, request.args, request.kwargs)
+                self._complete(request, outcome)
+            except Exception as e:
+                with self._lock:
+                    if request.key is not None:
+                        self._inflight.pop(request.key, None)
+                request.future.set_exception(e)
+                self._finish_send(request)
+
+    def _execute(self, name: str, args: Tuple, kwargs: Dict) -> Tuple[Any, Tuple[int, str]]:
+        """🔧 เรียก MT5 จริง + เก็บ last_error ทันที (ก่อน call อื่นจะเขียนทับ)"""
+        with self._lock:
+            self.stats["executed"] += 1
+        result = getattr(mt5, name)(*args, **kwargs)
+        error = mt5.last_error() if result is None else (1, "Success")
+        return result, error
+
+    def _complete(self, request: GatewayRequest, outcome: Tuple[Any, Tuple[int, str]]):
+        result = outcome[0]
+        with self._lock:
+            if request.key is not None:
+                self._inflight.pop(request.key, None)
+                if result is not None and self.read_ttls.get(request.name, 0.0) > 0:
+                    self._cache[request.key] = (time.perf_counter(), result)
+            elif request.name in ("order_send", "initialize", "shutdown"):
+                # สถานะบัญชี/positions เปลี่ยน -> read cache ใช้ไม่ได้แล้ว
+                self._cache.clear()
+        if request.name == "order_send" and result is not None:
+            self._notify_send_listeners(request, result)
+        request.future.set_result(outcome)
+        self._finish_send(request)
+
+    def _finish_send(self, request: GatewayRequest):
+        if request.name != "order_send":
+            return
+        with self._sends_idle:
+            self._sends_pending -= 1
+            if self._sends_pending == 0:
+                self._sends_idle.notify_all()
+
+    def _notify_send_listeners(self, request: GatewayRequest, result: Any):
+        send_request = request.args[0] if request.args else request.kwargs.get("request")
+        for listener in list(self._send_listeners):
+            try:
+                listener(send_request, result)
+            except Exception as e:
+                self.log(f"❌ Send listener error: {e}")
+
+    # ========================================================================================
+    # 🔌 MetaTrader5 MODULE COMPATIBILITY
+    # ========================================================================================
+
+    def __getattr__(self, name: str):
+        """🔌 mt5.<function>(...) -> gateway.call, mt5.<CONSTANT> -> ค่าเดิม"""
+        if name.startswith("_"):
+            raise AttributeError(name)
+        attr = getattr(mt5, name)
+        if not callable(attr):
+            return attr
+        bound = self._bound_calls.get(name)
+        if bound is None:
+            bound = self._bound_calls[name] = functools.partial(self.call, name)
+        return bound
+
+    def get_status(self) -> Dict:
+        """📊 สถานะ gateway"""
+        with self._lock:
+            return {
+                "is_running": self.is_running,
+                "queue_depth": self._queue.qsize(),
+                "inflight": len(self._inflight),
+                "cached_entries": len(self._cache),
+                **self.stats,
+                "queue_wait_ms": dict(self.stats["queue_wait_ms"])
+            }
+
+    def log(self, message: str):
+        """Log message with timestamp"""
+        timestamp = datetime.now().strftime("%H:%M:%S.%f")[:-3]
+        print(f"[{timestamp}] 🚦 MT5Gateway: {message}")
+
+# gateway เดียวต่อ process (MetaTrader5 เองก็เป็น global ต่อ process)
+mt5_gateway = MT5Gateway()
@@ -0,0 +1,919 @@
+"""
+🧪 MT5 Simulator - Deterministic Drop-in for the MetaTrader5 Package
+mt5_simulator.py
+
+🎯 FEATURES:
+✅ API ชุดเดียวกับที่ระบบใช้: initialize, account_info, terminal_info, symbols_get,
+   symbol_info, symbol_info_tick, symbol_select, copy_rates_from_pos, positions_get,
+   orders_get, order_send, last_error (+ history_deals_get, shutdown)
+✅ ขับด้วย price path ที่บันทึกไว้ หรือ synthetic (seed เดิม = ผลเดิมทุกครั้ง)
+✅ จำลอง latency / slippage / rejection codes / response หาย (timeout)
+✅ เวลาเสมือน - เร็วกว่า real time (speed) หรือเดินทีละ step (advance)
+✅ Hedging account: market / pending / close-by / SL-TP
+
+** รันและ benchmark ทั้งระบบบน Linux ได้โดยไม่ต้องมี MT5 terminal **
+
+การใช้งาน:
+    import mt5_simulator
+    mt5_simulator.install()          # ต้องเรียกก่อน import module อื่นของระบบ
+    import main
+"""
+
+import sys
+import threading
+import time
+import numpy as np
+from collections import namedtuple
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from bar_buffer import RATES_DTYPE
+
+# ========================================================================================
+# 📋 CONSTANTS (ค่าเดียวกับ MetaTrader5 package)
+# ========================================================================================
+
+TIMEFRAME_M1 = 1
+TIMEFRAME_M5 = 5
+TIMEFRAME_M15 = 15
+TIMEFRAME_M30 = 30
+TIMEFRAME_H1 = 16385
+TIMEFRAME_H4 = 16388
+TIMEFRAME_D1 = 16408
+
+_TIMEFRAME_SECONDS = {
+    TIMEFRAME_M1: 60, TIMEFRAME_M5: 300, TIMEFRAME_M15: 900, TIMEFRAME_M30: 1800,
+    TIMEFRAME_H1: 3600, TIMEFRAME_H4: 14400, TIMEFRAME_D1: 86400
+}
+
+ORDER_TYPE_BUY = 0
+ORDER_TYPE_SELL = 1
+ORDER_TYPE_BUY_LIMIT = 2
+ORDER_TYPE_SELL_LIMIT = 3
+ORDER_TYPE_BUY_STOP = 4
+ORDER_TYPE_SELL_STOP = 5
+
+POSITION_TYPE_BUY = 0
+POSITION_TYPE_SELL = 1
+
+TRADE_ACTION_DEAL = 1
+TRADE_ACTION_PENDING = 5
+TRADE_ACTION_SLTP = 6
+TRADE_ACTION_MODIFY = 7
+TRADE_ACTION_REMOVE = 8
+TRADE_ACTION_CLOSE_BY = 10
+
+ORDER_FILLING_FOK = 0
+ORDER_FILLING_IOC = 1
+ORDER_FILLING_RETURN = 2
+
+ORDER_TIME_GTC = 0
+
+ORDER_STATE_PLACED = 1
+ORDER_STATE_FILLED = 4
+
+SYMBOL_FILLING_FOK = 1
+SYMBOL_FILLING_IOC = 2
+
+SYMBOL_TRADE_MODE_DISABLED = 0
+SYMBOL_TRADE_MODE_FULL = 4
+
+DEAL_TYPE_BUY = 0
+DEAL_TYPE_SELL = 1
+DEAL_ENTRY_IN = 0
+DEAL_ENTRY_OUT = 1
+DEAL_ENTRY_OUT_BY = 3
+
+TRADE_RETCODE_REQUOTE = 10004
+TRADE_RETCODE_REJECT = 10006
+TRADE_RETCODE_PLACED = 10008
+TRADE_RETCODE_DONE = 10009
+TRADE_RETCODE_ERROR = 10011
+TRADE_RETCODE_TIMEOUT = 10012
+TRADE_RETCODE_INVALID = 10013
+TRADE_RETCODE_INVALID_VOLUME = 10014
+TRADE_RETCODE_INVALID_PRICE = 10015
+TRADE_RETCODE_TRADE_DISABLED = 10017
+TRADE_RETCODE_MARKET_CLOSED = 10018
+TRADE_RETCODE_NO_MONEY = 10019
+TRADE_RETCODE_PRICE_CHANGED = 10020
+TRADE_RETCODE_PRICE_OFF = 10021
+TRADE_RETCODE_TOO_MANY_REQUESTS = 10024
+TRADE_RETCODE_CLIENT_DISABLES_AT = 10027
+TRADE_RETCODE_INVALID_FILL = 10030
+TRADE_RETCODE_CONNECTION = 10031
+TRADE_RETCODE_POSITION_CLOSED = 10036
+
+RES_S_OK = 1
+RES_E_NOT_FOUND = -4
+RES_E_INTERNAL_FAIL_CONNECT = -10004
+RES_E_INTERNAL_FAIL_TIMEOUT = -10005
+
+# ========================================================================================
+# 📦 RETURN RECORDS (named tuples เหมือน package จริง)
+# ========================================================================================
+
+AccountInfo = namedtuple("AccountInfo", [
+    "login", "trade_mode", "leverage", "limit_orders", "margin_so_mode", "trade_allowed", "trade_expert",
+    "balance", "credit", "profit", "equity", "margin", "margin_free", "margin_level",
+    "margin_so_call", "margin_so_so", "name", "server", "currency", "company"])
+
+TerminalInfo = namedtuple("TerminalInfo", [
+    "connected", "trade_allowed", "tradeapi_disabled", "ping_last", "build", "name", "company", "path"])
+
+SymbolInfo = namedtuple("SymbolInfo", [
+    "name", "visible", "select", "description", "path", "digits", "spread", "point",
+    "trade_tick_size", "trade_tick_value", "trade_contract_size", "trade_mode", "trade_stops_level",
+    "volume_min", "volume_max", "volume_step", "filling_mode", "bid", "ask", "time",
+    "currency_base", "currency_profit"])
+
+Tick = namedtuple("Tick", ["time", "bid", "ask", "last", "volume", "time_msc", "flags", "volume_real"])
+
+TradePosition = namedtuple("TradePosition", [
+    "ticket", "time", "time_msc", "time_update", "time_update_msc", "type", "magic", "identifier",
+    "reason", "volume", "price_open", "sl", "tp", "price_current", "swap", "profit", "symbol",
+    "comment", "external_id"])
+
+TradeOrder = namedtuple("TradeOrder", [
+    "ticket", "time_setup", "time_setup_msc", "time_done", "time_done_msc", "time_expiration", "type",
+    "type_time", "type_filling", "state", "magic", "position_id", "position_by_id", "reason",
+    "volume_initial", "volume_current", "price_open", "sl", "tp", "price_current", "price_stoplimit",
+    "symbol", "comment", "external_id"])
+
+TradeDeal = namedtuple("TradeDeal", [
+    "ticket", "order", "time", "time_msc", "type", "entry", "magic", "position_id", "reason",
+    "volume", "price", "commission", "swap", "profit", "fee", "symbol", "comment", "external_id"])
+
+OrderSendResult = namedtuple("OrderSendResult", [
+    "retcode", "deal", "order", "volume", "price", "bid", "ask", "comment", "request_id",
+    "retcode_external", "request"])
+
+# ========================================================================================
+# ⚙️ CONFIGURATION
+# ========================================================================================
+
+@dataclass
+class SimulatorConfig:
+    """พารามิเตอร์ของ broker จำลอง"""
+    symbol: str = "XAUUSD"
+    extra_symbols: Tuple[str, ...] = ("EURUSD", "GBPUSD", "USDJPY")
+    digits: int = 2
+    point: float = 0.01
+    spread: float = 0.20                       # ราคา (ไม่ใช่ points)
+    contract_size: float = 100.0
+    volume_min: float = 0.01
+    volume_max: float = 100.0
+    volume_step: float = 0.01
+    allowed_fillings: Tuple[int, ...] = (ORDER_FILLING_FOK, ORDER_FILLING_IOC)
+
+    # price path (synthetic)
+    seed: int = 7
+    start_price: float = 2000.0
+    start_time: int = 1704096000               # 2024-01-01 08:00 UTC
+    tick_count: int = 300000
+    mean_tick_interval: float = 1.0            # วินาที (exponential -> tick volume ไม่คงที่)
+    tick_volatility: float = 0.00008
+
+    # account
+    login: int = 10000001
+    balance: float = 10000.0
+    leverage: int = 100
+    currency: str = "USD"
+    trade_allowed: bool = True
+    trade_expert: bool = True
+
+    # execution model
+    latency_ms: float = 5.0                    # เวลาเสมือนที่ใช้ต่อ order_send
+    sleep_latency: bool = False                # True = sleep จริงตาม latency_ms
+    max_slippage_points: int = 3
+    reject_rate: float = 0.0
+    reject_codes: Tuple[int, ...] = (TRADE_RETCODE_REQUOTE,)
+    lost_response_rate: float = 0.0            # order fill แล้วแต่ response หาย (คืน None)
+
+    # เวลาเสมือนต่อ 1 วินาทีจริง (0 = เดินเฉพาะตอนเรียก advance())
+    speed: float = 0.0
+
+# ========================================================================================
+# 🏦 SIMULATED BROKER
+# ========================================================================================
+
+class SimulatedBroker:
+    """
+    🏦 Broker จำลองแบบ deterministic (hedging account)
+
+    - price path เก็บเป็น NumPy arrays (time, bid, ask)
+    - เวลาเสมือน = offset จาก advance() + เวลาจริงที่ผ่านไป x speed
+    - pending orders / SL / TP ถูกตรวจเมื่อเวลาเดิน (เฉพาะช่วง tick ใหม่)
+    """
+
+    def __init__(self, config: Optional[SimulatorConfig] = None):
+        self.config = config or SimulatorConfig()
+        self._lock = threading.RLock()
+        self._rng = np.random.default_rng(self.config.seed)
+
+        self.initialized = False
+        self._last_error = (RES_S_OK, "Success")
+        self._selected = {self.config.symbol}
+
+        self._generate_price_path()
+        self._virtual_offset = 0.0
+        self._wall_start = time.time()
+        self._tick_index = 0
+        self._processed_index = 0
+        self._bar_cache: Dict[int, Tuple[np.ndarray, np.ndarray]] = {}
+
+        self.balance = self.config.balance
+        self._next_ticket = 100000
+        self._positions: Dict[int, Dict] = {}
+        self._orders: Dict[int, Dict] = {}
+        self._deals: List[Dict] = []
+
+        # ผลรวมต่อฝั่ง (volume, volume x open price) -> profit / margin รวมแบบ O(1)
+        self._side_volume = [0.0, 0.0]
+        self._side_cost = [0.0, 0.0]
+        self._sltp_tickets = set()
+
+        self._forced_retcodes: List[int] = []
+        self._forced_lost_responses = 0
+
+        self.stats = {
+            "order_send_calls": 0,
+            "deals": 0,
+            "rejections": 0,
+            "lost_responses": 0,
+            "api_calls": 0
+        }
+
+    # ========================================================================================
+    # 📈 PRICE PATH
+    # ========================================================================================
+
+    def _generate_price_path(self):
+        """📈 สร้าง synthetic tick path (random walk, ช่วงเวลา tick แบบ exponential)"""
+        cfg = self.config
+        intervals = self._rng.exponential(cfg.mean_tick_interval, cfg.tick_count)
+        times = cfg.start_time + np.cumsum(intervals)
+        returns = self._rng.normal(0, cfg.tick_volatility, cfg.tick_count)
+        bids = np.round(cfg.start_price * np.exp(np.cumsum(returns)), cfg.digits)
+        self.set_price_path(times, bids)
+
+    def set_price_path(self, times: np.ndarray, bids: np.ndarray, asks: Optional[np.ndarray] = None):
+        """📥 ใช้ price path ที่บันทึกไว้ (times = epoch วินาที, float ได้)"""
+        with self._lock:
+            self._times = np.asarray(times, dtype=np.float64)
+            self._bids = np.asarray(bids, dtype=np.float64)
+            self._asks = (np.asarray(asks, dtype=np.float64) if asks is not None
+                          else np.round(self._bids + self.config.spread, self.config.digits))
+            self._bar_cache = {}
+            self._tick_index = 0
+            self._processed_index = 0
+            self._virtual_offset = 0.0
+            self._wall_start = time.time()
+
+    def load_bars(self, rates: np.ndarray):
+        """📥 ใช้แท่งเทียนเป็น price path (4 tick ต่อแท่ง: O -> H/L -> L/H -> C)"""
+        n = len(rates)
+        step = (rates["time"][1] - rates["time"][0]) / 4.0 if n > 1 else 60.0
+        green = rates["close"] >= rates["open"]
+        first = np.where(green, rates["low"], rates["high"])
+        second = np.where(green, rates["high"], rates["low"])
+
+        times = (rates["time"][:, None] + np.arange(4)[None, :] * step).ravel()
+        bids = np.column_stack((rates["open"], first, second, rates["close"])).ravel()
+        self.set_price_path(times, bids)
+
+    def _now(self) -> float:
+        """⏰ เวลาเสมือนปัจจุบัน (epoch วินาที)"""
+        elapsed = (time.time() - self._wall_start) * self.config.speed if self.config.speed > 0 else 0.0
+        return self._times[0] + self._virtual_offset + elapsed
+
+    def advance(self, seconds: float):
+        """⏩ เดินเวลาเสมือนไปข้างหน้า"""
+        with self._lock:
+            self._virtual_offset += max(0.0, seconds)
+            self._sync()
+
+    def advance_ticks(self, count: int = 1):
+        """⏩ เดินไปอีก N tick"""
+        with self._lock:
+            self._sync()
+            target = min(len(self._times) - 1, self._tick_index + max(0, count))
+            self._virtual_offset += max(0.0, self._times[target] - self._now())
+            self._sync()
+
+    @property
+    def path_exhausted(self) -> bool:
+        return self._tick_index >= len(self._times) - 1
+
+    def _sync(self):
+        """🔄 อัปเดต tick ปัจจุบัน + ตรวจ pending / SL / TP ในช่วง tick ที่ผ่านมา"""
+        index = int(np.searchsorted(self._times, self._now(), side="right")) - 1
+        self._tick_index = max(0, min(index, len(self._times) - 1))
+
+        if self._tick_index > self._processed_index:
+            start, end = self._processed_index + 1, self._tick_index + 1
+            self._processed_index = self._tick_index
+            if self._orders or self._sltp_tickets:
+                self._process_triggers(start, end)
+
+    def _process_triggers(self, start: int, end: int):
+        """🎯 ตรวจ pending orders และ SL/TP จาก min/max ของช่วง tick"""
+        bids, asks = self._bids[start:end], self._asks[start:end]
+        min_bid, max_bid, min_ask, max_ask = bids.min(), bids.max(), asks.min(), asks.max()
+
+        for ticket, order in list(self._orders.items()):
+            price, order_type = order["price_open"], order["type"]
+            triggered = ((order_type == ORDER_TYPE_BUY_LIMIT and min_ask <= price) or
+                         (order_type == ORDER_TYPE_SELL_LIMIT and max_bid >= price) or
+                         (order_type == ORDER_TYPE_BUY_STOP and max_ask >= price) or
+                         (order_type == ORDER_TYPE_SELL_STOP and min_bid <= price))
+            if triggered:
+                del self._orders[ticket]
+                side = ORDER_TYPE_BUY if order_type in (ORDER_TYPE_BUY_LIMIT, ORDER_TYPE_BUY_STOP) else ORDER_TYPE_SELL
+                self._open_position(ticket, side, order["volume_current"], price, order["sl"], order["tp"],
+                                    order["magic"], order["comment"])
+
+        for ticket in list(self._sltp_tickets):
+            position = self._positions[ticket]
+            is_buy = position["type"] == POSITION_TYPE_BUY
+            low, high = (min_bid, max_bid) if is_buy else (min_ask, max_ask)
+            sl, tp = position["sl"], position["tp"]
+            exit_price = None
+            if sl and ((is_buy and low <= sl) or (not is_buy and high >= sl)):
+                exit_price = sl
+            elif tp and ((is_buy and high >= tp) or (not is_buy and low <= tp)):
+                exit_price = tp
+            if exit_price is not None:
+                self._close_position(ticket, position["volume"], exit_price, self._next_id(), position["comment"])
+
+    # ========================================================================================
+    # 📊 MARKET DATA
+    # ========================================================================================
+
+    def current_tick(self) -> Tick:
+        i = self._tick_index
+        t = self._times[i]
+        return Tick(time=int(t), bid=float(self._bids[i]), ask=float(self._asks[i]), last=0.0, volume=0,
+                    time_msc=int(t * 1000), flags=6, volume_real=0.0)
+
+    def _bars_for(self, timeframe_seconds: int) -> Tuple[np.ndarray, np.ndarray]:
+        """🧮 แท่งทั้ง path ของ timeframe (คำนวณครั้งเดียวแล้ว cache)"""
+        cached = self._bar_cache.get(timeframe_seconds)
+        if cached is not None:
+            return cached
+
+        bar_ids = (self._times // timeframe_seconds).astype(np.int64) * timeframe_seconds
+        starts = np.concatenate(([0], np.flatnonzero(np.diff(bar_ids)) + 1))
+        ends = np.concatenate((starts[1:], [len(bar_ids)]))
+
+        bars = np.zeros(len(starts), dtype=RATES_DTYPE)
+        bars["time"] = bar_ids[starts]
+        bars["open"] = self._bids[starts]
+        bars["high"] = np.maximum.reduceat(self._bids, starts)
+        bars["low"] = np.minimum.reduceat(self._bids, starts)
+        bars["close"] = self._bids[ends - 1]
+        bars["tick_volume"] = ends - starts
+        bars["spread"] = int(round(self.config.spread / self.config.point))
+
+        self._bar_cache[timeframe_seconds] = (bars, starts)
+        return bars, starts
+
+    def copy_rates(self, timeframe: int, start_pos: int, count: int) -> Optional[np.ndarray]:
+        """📊 N แท่ง (เก่า -> ใหม่) ถึงแท่งที่กำลังก่อตัว ณ เวลาเสมือน"""
+        seconds = _TIMEFRAME_SECONDS.get(timeframe)
+        if seconds is None:
+            return None
+
+        bars, starts = self._bars_for(seconds)
+        k = self._tick_index
+        current = int(np.searchsorted(starts, k, side="right")) - 1
+        last = current - max(0, start_pos)
+        if last < 0 or count <= 0:
+            return np.zeros(0, dtype=RATES_DTYPE)
+
+        first = max(0, last - count + 1)
+        rates = bars[first:last + 1].copy()
+
+        if last == current:
+            # แท่งที่กำลังก่อตัว: รวมเฉพาะ tick ที่เกิดขึ้นแล้ว
+            window = self._bids[starts[current]:k + 1]
+            rates[-1]["high"] = window.max()
+            rates[-1]["low"] = window.min()
+            rates[-1]["close"] = window[-1]
+            rates[-1]["tick_volume"] = len(window)
+        return rates
+
+    def symbol_info(self, symbol: str) -> Optional[SymbolInfo]:
+        if symbol != self.config.symbol and symbol not in self.config.extra_symbols:
+            return None
+
+        tick = self.current_tick()
+        is_gold = symbol == self.config.symbol
+        filling_flags = ((SYMBOL_FILLING_FOK if ORDER_FILLING_FOK in self.config.allowed_fillings else 0) |
+                         (SYMBOL_FILLING_IOC if ORDER_FILLING_IOC in self.config.allowed_fillings else 0))
+        return SymbolInfo(
+            name=symbol, visible=symbol in self._selected, select=symbol in self._selected,
+            description=symbol, path=f"Simulated\\{symbol}",
+            digits=self.config.digits if is_gold else 5,
+            spread=int(round(self.config.spread / self.config.point)),
+            point=self.config.point if is_gold else 0.00001,
+            trade_tick_size=self.config.point if is_gold else 0.00001,
+            trade_tick_value=self.config.point * self.config.contract_size if is_gold else 1.0,
+            trade_contract_size=self.config.contract_size if is_gold else 100000.0,
+            trade_mode=SYMBOL_TRADE_MODE_FULL, trade_stops_level=0,
+            volume_min=self.config.volume_min, volume_max=self.config.volume_max,
+            volume_step=self.config.volume_step, filling_mode=filling_flags,
+            bid=tick.bid if is_gold else 1.1, ask=tick.ask if is_gold else 1.1001, time=tick.time,
+            currency_base=symbol[:3], currency_profit=self.config.currency)
+
+    # ========================================================================================
+    # 👤 ACCOUNT
+    # ========================================================================================
+
+    def _position_profit(self, position: Dict) -> float:
+        if position["type"] == POSITION_TYPE_BUY:
+            move = float(self._bids[self._tick_index]) - position["price_open"]
+        else:
+            move = position["price_open"] - float(self._asks[self._tick_index])
+        return round(move * position["volume"] * self.config.contract_size, 2)
+
+    def _floating_profit(self) -> float:
+        bid, ask = float(self._bids[self._tick_index]), float(self._asks[self._tick_index])
+        buy_profit = self._side_volume[POSITION_TYPE_BUY] * bid - self._side_cost[POSITION_TYPE_BUY]
+        sell_profit = self._side_cost[POSITION_TYPE_SELL] - self._side_volume[POSITION_TYPE_SELL] * ask
+        return (buy_profit + sell_profit) * self.config.contract_size
+
+    def account_info(self) -> AccountInfo:
+        profit = self._floating_profit()
+        price = float(self._bids[self._tick_index])
+        margin = sum(self._side_volume) * self.config.contract_size * price / self.config.leverage
+        equity = self.balance + profit
+        return AccountInfo(
+            login=self.config.login, trade_mode=0, leverage=self.config.leverage, limit_orders=200,
+            margin_so_mode=0, trade_allowed=self.config.trade_allowed, trade_expert=self.config.trade_expert,
+            balance=round(self.balance, 2), credit=0.0, profit=round(profit, 2), equity=round(equity, 2),
+            margin=round(margin, 2), margin_free=round(equity - margin, 2),
+            margin_level=round(equity / margin * 100, 2) if margin > 0 else 0.0,
+            margin_so_call=50.0, margin_so_so=30.0, name="Simulated Account", server="Simulator-Demo",
+            currency=self.config.currency, company="Simulated Broker")
+
+    def _free_margin(self) -> float:
+        return self.account_info().margin_free
+
+    # ========================================================================================
+    # 🚀 ORDER EXECUTION
+    # ========================================================================================
+
+    def inject_retcodes(self, *retcodes: int):
+        """🧪 บังคับให้ order_send ครั้งถัดๆ ไปคืน retcode เหล่านี้ (ตามลำดับ)"""
+        with self._lock:
+            self._forced_retcodes.extend(retcodes)
+
+    def inject_lost_responses(self, count: int = 1):
+        """🧪 บังคับให้ order_send N ครั้งถัดไป fill แล้วแต่คืน None"""
+        with self._lock:
+            self._forced_lost_responses += count
+
+    def order_send(self, request: Dict):
+        """🚀 ประมวลผล trade request"""
+        self.stats["order_send_calls"] += 1
+
+        if self.config.latency_ms > 0:
+            if self.config.sleep_latency:
+                time.sleep(self.config.latency_ms / 1000.0)
+            else:
+                self._virtual_offset += self.config.latency_ms / 1000.0
+        self._sync()
+
+        # 1. rejection จำลอง
+        if self._forced_retcodes:
+            return self._result(self._forced_retcodes.pop(0), request, comment="Injected")
+        if self.config.reject_rate > 0 and self._rng.random() < self.config.reject_rate:
+            self.stats["rejections"] += 1
+            code = self.config.reject_codes[int(self._rng.integers(len(self.config.reject_codes)))]
+            return self._result(code, request, comment="Rejected")
+
+        if not (self.config.trade_allowed and self.config.trade_expert):
+            return self._result(TRADE_RETCODE_CLIENT_DISABLES_AT, request, comment="AutoTrading disabled")
+
+        action = request.get("action")
+        if action == TRADE_ACTION_DEAL:
+            result = self._execute_deal(request)
+        elif action == TRADE_ACTION_PENDING:
+            result = self._place_pending(request)
+        elif action == TRADE_ACTION_REMOVE:
+            result = self._remove_pending(request)
+        elif action == TRADE_ACTION_CLOSE_BY:
+            result = self._close_by(request)
+        elif action == TRADE_ACTION_SLTP:
+            result = self._modify_sltp(request)
+        else:
+            result = self._result(TRADE_RETCODE_INVALID, request, comment="Unsupported action")
+
+        # 2. response หาย (ผลลัพธ์เกิดขึ้นจริงแล้ว)
+        lost = self._forced_lost_responses > 0 or (
+            self.config.lost_response_rate > 0 and self._rng.random() < self.config.lost_response_rate)
+        if lost:
+            self._forced_lost_responses = max(0, self._forced_lost_responses - 1)
+            self.stats["lost_responses"] += 1
+            self._last_error = (RES_E_INTERNAL_FAIL_TIMEOUT, "IPC timeout")
+            return None
+        return result
+
+    def _validate_volume(self, volume: float) -> bool:
+        cfg = self.config
+        steps = round(volume / cfg.volume_step)
+        return cfg.volume_min <= volume <= cfg.volume_max and abs(steps * cfg.volume_step - volume) < 1e-9
+
+    def _execute_deal(self, request: Dict):
+        """🚀 market order - เปิดใหม่ หรือปิดถ้ามี 'position'"""
+        if request.get("symbol") != self.config.symbol:
+            return self._result(TRADE_RETCODE_INVALID, request, comment="Unknown symbol")
+
+        volume = float(request.get("volume", 0.0))
+        if not self._validate_volume(volume):
+            return self._result(TRADE_RETCODE_INVALID_VOLUME, request, comment="Invalid volume")
+
+        filling = request.get("type_filling", ORDER_FILLING_FOK)
+        if filling not in self.config.allowed_fillings:
+            return self._result(TRADE_RETCODE_INVALID_FILL, request, comment="Unsupported filling mode")
+
+        order_type = request.get("type")
+        if order_type not in (ORDER_TYPE_BUY, ORDER_TYPE_SELL):
+            return self._result(TRADE_RETCODE_INVALID, request, comment="Invalid order type")
+
+        # slippage ในทิศที่เสียเปรียบ (0..max points)
+        slip_points = int(self._rng.integers(0, self.config.max_slippage_points + 1)) if self.config.max_slippage_points else 0
+        deviation = request.get("deviation")
+        if deviation is not None and slip_points > deviation:
+            return self._result(TRADE_RETCODE_REQUOTE, request, comment="Requote")
+
+        slip = slip_points * self.config.point
+        tick = self.current_tick()
+        price = round(tick.ask + slip if order_type == ORDER_TYPE_BUY else tick.bid - slip, self.config.digits)
+
+        position_ticket = request.get("position")
+        if position_ticket:
+            position = self._positions.get(position_ticket)
+            if position is None:
+                return self._result(TRADE_RETCODE_POSITION_CLOSED, request, comment="Position not found")
+            if volume > position["volume"] + 1e-9:
+                return self._result(TRADE_RETCODE_INVALID_VOLUME, request, comment="Volume exceeds position")
+            order_ticket = self._next_id()
+            deal_ticket = self._close_position(position_ticket, volume, price, order_ticket,
+                                               request.get("comment", ""))
+            return self._result(TRADE_RETCODE_DONE, request, deal=deal_ticket, order=order_ticket,
+                                volume=volume, price=price)
+
+        required_margin = volume * self.config.contract_size * price / self.config.leverage
+        if required_margin > self._free_margin():
+            return self._result(TRADE_RETCODE_NO_MONEY, request, comment="No money")
+
+        ticket = self._next_id()
+        deal_ticket = self._open_position(ticket, order_type, volume, price, request.get("sl", 0.0),
+                                          request.get("tp", 0.0), request.get("magic", 0),
+                                          request.get("comment", ""))
+        return self._result(TRADE_RETCODE_DONE, request, deal=deal_ticket, order=ticket, volume=volume, price=price)
+
+    def _place_pending(self, request: Dict):
+        order_type = request.get("type")
+        if order_type not in (ORDER_TYPE_BUY_LIMIT, ORDER_TYPE_SELL_LIMIT, ORDER_TYPE_BUY_STOP, ORDER_TYPE_SELL_STOP):
+            return self._result(TRADE_RETCODE_INVALID, request, comment="Invalid pending type")
+
+        volume = float(request.get("volume", 0.0))
+        if not self._validate_volume(volume):
+            return self._result(TRADE_RETCODE_INVALID_VOLUME, request, comment="Invalid volume")
+
+        price = float(request.get("price", 0.0))
+        tick = self.current_tick()
+        valid_price = ((order_type == ORDER_TYPE_BUY_LIMIT and price < tick.ask) or
+                       (order_type == ORDER_TYPE_SELL_LIMIT and price > tick.bid) or
+                       (order_type == ORDER_TYPE_BUY_STOP and price > tick.ask) or
+                       (order_type == ORDER_TYPE_SELL_STOP and price < tick.bid))
+        if not valid_price:
+            return self._result(TRADE_RETCODE_INVALID_PRICE, request, comment="Invalid price")
+
+        ticket = self._next_id()
+        self._orders[ticket] = {
+            "ticket": ticket, "time_setup": tick.time, "type": order_type, "volume_initial": volume,
+            "volume_current": volume, "price_open": price, "sl": request.get("sl", 0.0),
+            "tp": request.get("tp", 0.0), "magic": request.get("magic", 0),
+            "comment": request.get("comment", ""), "type_filling": request.get("type_filling", ORDER_FILLING_RETURN)
+        }
+        return self._result(TRADE_RETCODE_PLACED, request, order=ticket, volume=volume, price=price)
+
+    def _remove_pending(self, request: Dict):
+        if self._orders.pop(request.get("order"), None) is None:
+            return self._result(TRADE_RETCODE_INVALID, request, comment="Order not found")
+        return self._result(TRADE_RETCODE_DONE, request, order=request.get("order"))
+
+    def _close_by(self, request: Dict):
+        """🔁 ปิด position ด้วย position ฝั่งตรงข้าม (ไม่เสีย spread)"""
+        first = self._positions.get(request.get("position"))
+        second = self._positions.get(request.get("position_by"))
+        if first is None or second is None:
+            return self._result(TRADE_RETCODE_POSITION_CLOSED, request, comment="Position not found")
+        if first["type"] == second["type"]:
+            return self._result(TRADE_RETCODE_INVALID, request, comment="Positions on the same side")
+
+        volume = round(min(first["volume"], second["volume"]), 8)
+        order_ticket = self._next_id()
+        # ทั้งสองฝั่งปิดที่ราคาเปิดของ position_by -> กำไรรวม = ผลต่างราคาเปิด
+        close_price = second["price_open"]
+        self._close_position(first["ticket"], volume, close_price, order_ticket,
+                             request.get("comment", ""), DEAL_ENTRY_OUT_BY)
+        deal_ticket = self._close_position(second["ticket"], volume, close_price, order_ticket,
+                                           request.get("comment", ""), DEAL_ENTRY_OUT_BY)
+        return self._result(TRADE_RETCODE_DONE, request, deal=deal_ticket, order=order_ticket, volume=volume)
+
+    def _modify_sltp(self, request: Dict):
+        position = self._positions.get(request.get("position"))
+        if position is None:
+            return self._result(TRADE_RETCODE_POSITION_CLOSED, request, comment="Position not found")
+        position["sl"] = request.get("sl", 0.0)
+        position["tp"] = request.get("tp", 0.0)
+        self._track_sltp(position)
+        return self._result(TRADE_RETCODE_DONE, request, order=position["ticket"])
+
+    def _open_position(self, ticket: int, order_type: int, volume: float, price: float,
+                       sl: float, tp: float, magic: int, comment: str) -> int:
+        tick = self.current_tick()
+        side = POSITION_TYPE_BUY if order_type == ORDER_TYPE_BUY else POSITION_TYPE_SELL
+        position = {
+            "ticket": ticket, "time": tick.time, "time_msc": tick.time_msc, "type": side,
+            "magic": magic, "volume": volume, "price_open": price, "sl": sl or 0.0, "tp": tp or 0.0,
+            "comment": comment, "swap": 0.0
+        }
+        self._positions[ticket] = position
+        self._side_volume[side] += volume
+        self._side_cost[side] += volume * price
+        self._track_sltp(position)
+        return self._add_deal(ticket, ticket, order_type, DEAL_ENTRY_IN, volume, price, 0.0, magic, comment)
+
+    def _close_position(self, ticket: int, volume: float, price: float, order_ticket: int,
+                        comment: str, entry: int = DEAL_ENTRY_OUT) -> int:
+        position = self._positions[ticket]
+        direction = 1 if position["type"] == POSITION_TYPE_BUY else -1
+        profit = round((price - position["price_open"]) * direction * volume * self.config.contract_size, 2)
+        self.balance += profit
+
+        side = position["type"]
+        self._side_volume[side] -= volume
+        self._side_cost[side] -= volume * position["price_open"]
+
+        position["volume"] = round(position["volume"] - volume, 8)
+        if position["volume"] <= 1e-9:
+            del self._positions[ticket]
+            self._sltp_tickets.discard(ticket)
+            if not self._positions:
+                self._side_volume = [0.0, 0.0]
+                self._side_cost = [0.0, 0.0]
+
+        deal_type = DEAL_TYPE_SELL if direction > 0 else DEAL_TYPE_BUY
+        return self._add_deal(order_ticket, ticket, deal_type, entry, volume, price, profit,
+                              position["magic"], comment)
+
+    def _track_sltp(self, position: Dict):
+        if position["sl"] or position["tp"]:
+            self._sltp_tickets.add(position["ticket"])
+        else:
+            self._sltp_tickets.discard(position["ticket"])
+
+    def _add_deal(self, order_ticket: int, position_id: int, deal_type: int, entry: int,
+                  volume: float, price: float, profit: float, magic: int, comment: str) -> int:
+        tick = self.current_tick()
+        deal_ticket = self._next_id()
+        self._deals.append({
+            "ticket": deal_ticket, "order": order_ticket, "time": tick.time, "time_msc": tick.time_msc,
+            "type": deal_type, "entry": entry, "magic": magic, "position_id": position_id,
+            "volume": volume, "price": price, "profit": profit, "comment": comment
+        })
+        self.stats["deals"] += 1
+        return deal_ticket
+
+    def _next_id(self) -> int:
+        self._next_ticket += 1
+        return self._next_ticket
+
+    def _result(self, retcode: int, request: Dict, deal: int = 0, order: int = 0, volume: float = 0.0,
+                price: float = 0.0, comment: str = "") -> OrderSendResult:
+        tick = self.current_tick()
+        if retcode in (TRADE_RETCODE_DONE, TRADE_RETCODE_PLACED):
+            comment = comment or "Request executed"
+            self._last_error = (RES_S_OK, "Success")
+        return OrderSendResult(retcode=retcode, deal=deal, order=order, volume=volume, price=price,
+                               bid=tick.bid, ask=tick.ask, comment=comment, request_id=self.stats["order_send_calls"],
+                               retcode_external=0, request=dict(request))
+
+    # ========================================================================================
+    # 📋 RECORD VIEWS
+    # ========================================================================================
+
+    def position_record(self, p: Dict) -> TradePosition:
+        tick = self.current_tick()
+        current = tick.bid if p["type"] == POSITION_TYPE_BUY else tick.ask
+        return TradePosition(
+            ticket=p["ticket"], time=p["time"], time_msc=p["time_msc"], time_update=p["time"],
+            time_update_msc=p["time_msc"], type=p["type"], magic=p["magic"], identifier=p["ticket"],
+            reason=3, volume=p["volume"], price_open=p["price_open"], sl=p["sl"], tp=p["tp"],
+            price_current=current, swap=p["swap"], profit=self._position_profit(p),
+            symbol=self.config.symbol, comment=p["comment"], external_id="")
+
+    def order_record(self, o: Dict) -> TradeOrder:
+        tick = self.current_tick()
+        return TradeOrder(
+            ticket=o["ticket"], time_setup=o["time_setup"], time_setup_msc=o["time_setup"] * 1000, time_done=0,
+            time_done_msc=0, time_expiration=0, type=o["type"], type_time=ORDER_TIME_GTC,
+            type_filling=o["type_filling"], state=ORDER_STATE_PLACED, magic=o["magic"], position_id=0,
+            position_by_id=0, reason=3, volume_initial=o["volume_initial"], volume_current=o["volume_current"],
+            price_open=o["price_open"], sl=o["sl"], tp=o["tp"], price_current=tick.bid, price_stoplimit=0.0,
+            symbol=self.config.symbol, comment=o["comment"], external_id="")
+
+    def deal_record(self, d: Dict) -> TradeDeal:
+        return TradeDeal(
+            ticket=d["ticket"], order=d["order"], time=d["time"], time_msc=d["time_msc"], type=d["type"],
+            entry=d["entry"], magic=d["magic"], position_id=d["position_id"], reason=3, volume=d["volume"],
+            price=d["price"], commission=0.0, swap=0.0, profit=d["profit"], fee=0.0,
+            symbol=self.config.symbol, comment=d["comment"], external_id="")
+
+    def get_status(self) -> Dict:
+        """📊 สถานะ simulator"""
+        return {
+            "virtual_time": datetime.fromtimestamp(int(self._now())),
+            "tick_index": self._tick_index,
+            "path_exhausted": self.path_exhausted,
+            "positions": len(self._positions),
+            "pending_orders": len(self._orders),
+            "balance": round(self.balance, 2),
+            **self.stats
+        }
+
+    def log(self, message: str):
+        """Log message with timestamp"""
+        timestamp = datetime.now().strftime("%H:%M:%S.%f")[:-3]
+        print(f"[{timestamp}] 🧪 MT5Simulator: {message}")
+
+# ========================================================================================
+# 🔌 MODULE-LEVEL API (เหมือน MetaTrader5 package)
+# ========================================================================================
+
+_broker = SimulatedBroker()
+
+def configure(config: Optional[SimulatorConfig] = None, **overrides) -> SimulatedBroker:
+    """⚙️ สร้าง broker ใหม่ (reset ทุกอย่าง) - overrides = field ของ SimulatorConfig"""
+    global _broker
+    config = config or SimulatorConfig()
+    for key, value in overrides.items():
+        setattr(config, key, value)
+    _broker = SimulatedBroker(config)
+    return _broker
+
+def get_broker() -> SimulatedBroker:
+    return _broker
+
+def install(config: Optional[SimulatorConfig] = None, **overrides) -> SimulatedBroker:
+    """🔌 ลงทะเบียน module นี้เป็น 'MetaTrader5' ใน sys.modules"""
+    sys.modules["MetaTrader5"] = sys.modules[__name__]
+    if config is not None or overrides:
+        configure(config, **overrides)
+    return _broker
+
+def _call(fn, default=None, require_init: bool = True):
+    """🔧 lock + sync เวลา + ตรวจ initialize เหมือน IPC จริง"""
+    with _broker._lock:
+        _broker.stats["api_calls"] += 1
+        if require_init and not _broker.initialized:
+            _broker._last_error = (RES_E_INTERNAL_FAIL_CONNECT, "No IPC connection")
+            return default
+        _broker._sync()
+        return fn()
+
+def initialize(path: Optional[str] = None, **kwargs) -> bool:
+    with _broker._lock:
+        _broker.initialized = True
+        _broker._last_error = (RES_S_OK, "Success")
+        return True
+
+def shutdown():
+    with _broker._lock:
+        _broker.initialized = False
+
+def last_error() -> Tuple[int, str]:
+    return _broker._last_error
+
+def version():
+    return (500, 4000, "01 Jan 2024")
+
+def account_info() -> Optional[AccountInfo]:
+    return _call(_broker.account_info)
+
+def terminal_info() -> Optional[TerminalInfo]:
+    return _call(lambda: TerminalInfo(
+        connected=True, trade_allowed=_broker.config.trade_allowed, tradeapi_disabled=False, ping_last=0,
+        build=4000, name="MetaTrader 5 Simulator", company="Simulated Broker", path="/simulator"))
+
+def symbols_total() -> int:
+    return _call(lambda: 1 + len(_broker.config.extra_symbols), default=0)
+
+def symbols_get(group: Optional[str] = None):
+    names = (_broker.config.symbol,) + tuple(_broker.config.extra_symbols)
+    return _call(lambda: tuple(_broker.symbol_info(name) for name in names))
+
+def symbol_info(symbol: str) -> Optional[SymbolInfo]:
+    return _call(lambda: _broker.symbol_info(symbol))
+
+def symbol_info_tick(symbol: str) -> Optional[Tick]:
+    return _call(lambda: _broker.current_tick() if symbol == _broker.config.symbol else None)
+
+def symbol_select(symbol: str, enable: bool = True) -> bool:
+    def select():
+        if _broker.symbol_info(symbol) is None:
+            return False
+        if enable:
+            _broker._selected.add(symbol)
+        else:
+            _broker._selected.discard(symbol)
+        return True
+    return _call(select, default=False)
+
+def copy_rates_from_pos(symbol: str, timeframe: int, start_pos: int, count: int):
+    return _call(lambda: _broker.copy_rates(timeframe, start_pos, count) if symbol == _broker.config.symbol else None)
+
+def positions_total() -> int:
+    return _call(lambda: len(_broker._positions), default=0)
+
+def positions_get(symbol: Optional[str] = None, group: Optional[str] = None, ticket: Optional[int] = None):
+    def select():
+        if ticket is not None:
+            p = _broker._positions.get(ticket)
+            return (_broker.position_record(p),) if p else ()
+        if symbol is not None and symbol != _broker.config.symbol:
+            return ()
+        return tuple(_broker.position_record(p) for p in _broker._positions.values())
+    return _call(select)
+
+def orders_total() -> int:
+    return _call(lambda: len(_broker._orders), default=0)
+
+def orders_get(symbol: Optional[str] = None, group: Optional[str] = None, ticket: Optional[int] = None):
+    def select():
+        if ticket is not None:
+            o = _broker._orders.get(ticket)
+            return (_broker.order_record(o),) if o else ()
+        if symbol is not None and symbol != _broker.config.symbol:
+            return ()
+        return tuple(_broker.order_record(o) for o in _broker._orders.values())
+    return _call(select)
+
+def history_deals_get(date_from=None, date_to=None, group: Optional[str] = None,
+                      ticket: Optional[int] = None, position: Optional[int] = None):
+    def select():
+        start = _to_epoch(date_from, 0)
+        end = _to_epoch(date_to, float("inf"))
+        deals = _broker._deals
+        if ticket is not None:
+            deals = [d for d in deals if d["order"] == ticket]
+        elif position is not None:
+            deals = [d for d in deals if d["position_id"] == position]
+        else:
+            deals = [d for d in deals if start <= d["time"] <= end]
+        return tuple(_broker.deal_record(d) for d in deals)
+    return _call(select)
+
+def order_send(request: Dict) -> Optional[OrderSendResult]:
+    return _call(lambda: _broker.order_send(request))
+
+def _to_epoch(value, default) -> float:
+    if value is None:
+        return default
+    if isinstance(value, datetime):
+        return value.timestamp()
+    return float(value)
+
+# ========================================================================================
+# 🧪 BENCHMARK
+# ========================================================================================
+
+if __name__ == "__main__":
+    install(speed=0.0, latency_ms=5.0, reject_rate=0.02)
+    initialize()
+    broker = get_broker()
+
+    started = time.perf_counter()
+    orders = 0
+    for step in range(20000):
+        broker.advance_ticks(5)
+        side = ORDER_TYPE_BUY if step % 2 == 0 else ORDER_TYPE_SELL
+        tick = symbol_info_tick("XAUUSD")
+        order_send({"action": TRADE_ACTION_DEAL, "symbol": "XAUUSD", "volume": 0.01, "type": side,
+                    "price": tick.ask if side == ORDER_TYPE_BUY else tick.bid, "deviation": 20,
+                    "type_filling": ORDER_FILLING_IOC})
+        orders += 1
+        if step % 500 == 0:
+            copy_rates_from_pos("XAUUSD", TIMEFRAME_M5, 0, 50)
+
+    elapsed = time.perf_counter() - started
+    status = broker.get_status()
+    print(f"🧪 {orders} order_send in {elapsed:.2f}s ({orders / elapsed:.0f}/s)")
+    print(f"   virtual time: {status['virtual_time']} | positions: {status['positions']} | "
+          f"rejections: {status['rejections']} | balance: {status['balance']}")
@@ -17,12 +17,16 @@ import time
 import threading
 from datetime import datetime, timedelta
 from typing import Dict, List, Tuple, Optional, Any
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from enum import Enum
-import MetaTrader5 as mt5
+from mt5_gateway import mt5_gateway as mt5   # IPC ทั้งหมดผ่าน gateway thread เดียว
 import numpy as np
 from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
 import json
+import uuid
+from order_queue import OrderExecutionQueue
+from rate_limiter import RateLimiter, ORDERS_PER_DAY, ORDER_SEND_RATE
 
 # ========================================================================================
 # 📊 DATA CLASSES & ENUMS - ใช้ชื่อเดิม
@@ -71,6 +75,7 @@ class OrderRequest:
     magic_number: int = 100001
     four_d_score: float = 0.0             
     hybrid_factors: Dict = None           
+    client_order_id: str = ""             # ID เฉพาะของออเดอร์ (ใส่ใน comment) - กันการ fill ซ้ำตอน retry
 
 @dataclass
 class OrderResult:
@@ -89,6 +94,30 @@ class OrderResult:
         if self.metadata is None:
             self.metadata = {}
 
+@dataclass
+class GridPlacementResult:
+    """ผลลัพธ์การวาง grid - ผลแยกต่อ level (ลำดับเดียวกับ levels)"""
+    levels: List[OrderRequest]
+    results: List[OrderResult]
+    cancelled_tickets: List[int] = field(default_factory=list)
+    execution_time: float = 0.0
+    
+    @property
+    def placed(self) -> List[OrderResult]:
+        return [result for result in self.results if result.success]
+    
+    @property
+    def failed(self) -> List[OrderResult]:
+        return [result for result in self.results if not result.success]
+    
+    @property
+    def all_placed(self) -> bool:
+        return bool(self.results) and not self.failed
+    
+    @property
+    def partial(self) -> bool:
+        return bool(self.placed) and bool(self.failed)
+
 # ========================================================================================
 # 🎯 ORDER MANAGER CLASS - ใช้ชื่อเดิม
 # ========================================================================================
@@ -99,6 +128,15 @@ class OrderManager:
     แก้ไขปัญหาการส่ง Order แล้ว
     """
     
+    FILLING_NAMES = {
+        mt5.ORDER_FILLING_IOC: "IOC",
+        mt5.ORDER_FILLING_FOK: "FOK",
+        mt5.ORDER_FILLING_RETURN: "RETURN"
+    }
+    
+    # retcode ที่ไม่รู้ว่าออเดอร์ fill ไปแล้วหรือยัง - ต้องเช็คก่อนส่งซ้ำ
+    UNCERTAIN_RETCODES = {mt5.TRADE_RETCODE_TIMEOUT, mt5.TRADE_RETCODE_CONNECTION}
+    
     def __init__(self, mt5_connector, spacing_manager, lot_calculator, config):
         """Initialize Enhanced Order Manager - ชื่อเดิม"""
         # Core components
@@ -108,7 +146,7 @@ class OrderManager:
         self.config = config
         
         # Trading parameters
-        self.symbol = config.get("trading", {}).get("symbol", "XAUUSD")
+        self.configured_symbol = config.get("trading", {}).get("symbol", "XAUUSD")
         self.max_daily_orders = config.get("risk_management", {}).get("max_daily_orders", 100)
         self.min_lot = config.get("trading", {}).get("min_lot_size", 0.01)
         self.max_lot = config.get("trading", {}).get("max_lot_size", 1.0)
@@ -119,8 +157,32 @@ class OrderManager:
             "retry_attempts": 3,              
             "retry_delay": 0.5,               
             "execution_timeout": 10.0,        
-            "min_spacing_override": False      
+            "min_spacing_override": False,
+            "queue_max_depth": 5,             # คิวเต็ม = ข้าม signal
+            "queue_max_order_age": 5.0        # ออเดอร์ที่รอนานกว่านี้ไม่ส่ง (ราคาเปลี่ยนแล้ว)
+        }
+        self.market_order_config.update(config.get("order_execution", {}).get("market_order_queue", {}))
+        
+        # Grid (pending order) parameters
+        self.grid_order_config = {
+            "max_levels": 20,                 # level สูงสุดต่อ batch
+            "workers": 3,                     # worker ที่ส่ง pending orders พร้อมกัน
+            "retry_attempts": 2,
+            "retry_delay": 0.2,
+            "batch_timeout": 15.0,
+            "cancel_on_partial_failure": False  # True = วางไม่ครบ -> ยกเลิกที่วางแล้วทั้งหมด
         }
+        self.grid_order_config.update(config.get("order_execution", {}).get("grid_orders", {}))
+        
+        # 🧠 Filling mode ที่เรียนรู้แล้วต่อ symbol (ไม่ต้องลอง IOC -> RETURN -> FOK ทุกออเดอร์)
+        self.filling_mode_cache: Dict[str, int] = {}
+        self.filling_error_retcodes = set(self.market_order_config.get(
+            "filling_error_retcodes", [mt5.TRADE_RETCODE_INVALID_FILL]))
+        self.filling_stats = {"detections": 0, "invalidations": 0, "relearned": 0}
+        
+        # 🔑 Idempotent retry (client order ID ใน comment)
+        self.idempotency_stats = {"lookups": 0, "recovered_fills": 0}
+        self._filling_cache_generation = 0
         
         # Symbol info
         self.point_value = 0.01
@@ -131,15 +193,34 @@ class OrderManager:
         self.order_performance = {}
         self.execution_stats = {
             "market_orders": {"count": 0, "success": 0, "avg_slippage": 0.0, "avg_execution_time": 0.0},
-            "limit_orders": {"count": 0, "success": 0, "fill_rate": 0.0},
+            "limit_orders": {"count": 0, "success": 0, "fill_rate": 0.0, "batches": 0, "partial_batches": 0, "cancelled": 0},
             "recovery_orders": {"count": 0, "success": 0, "recovery_rate": 0.0}
         }
         
+        # ⏳ Rate limits (ใช้ร่วมกับ rule engine) - orders ต่อ 24 ชม. แบบ sliding window + อัตราส่งออเดอร์
+        self.rate_limiter = RateLimiter.from_config(risk_management=config.get("risk_management", {}))
+        
         # State tracking
-        self.daily_order_count = 0
-        self.last_reset_date = datetime.now().date()
         self.last_order_time = datetime.now()
         self.order_history = deque(maxlen=100)
+        self.performance_tracker = None
+        
+        # 📮 Worker สำหรับส่งออเดอร์ (place_market_order คืน Future ทันที)
+        self.order_queue = OrderExecutionQueue(
+            self._execute_queued_market_order,
+            self._create_skipped_result,
+            max_depth=self.market_order_config["queue_max_depth"],
+            max_order_age=self.market_order_config["queue_max_order_age"]
+        )
+        
+        # 🧱 Worker pool สำหรับ pending orders ของ grid (ส่งทั้ง batch พร้อมกัน)
+        self.grid_queue = OrderExecutionQueue(
+            self._execute_pending_order,
+            self._create_skipped_result,
+            max_depth=self.grid_order_config["max_levels"],
+            max_order_age=0,
+            workers=self.grid_order_config["workers"]
+        )
         
         # Initialize symbol info
         self._update_symbol_info()
@@ -148,12 +229,131 @@ class OrderManager:
         print(f"   Symbol: {self.symbol}")
         print(f"   Market Order Config: {self.market_order_config}")
 
+    @property
+    def symbol(self) -> str:
+        """📊 symbol ที่ใช้เทรด - จาก symbol registry กลาง (fallback เป็นค่าใน config)"""
+        registry = getattr(self.mt5_connector, 'symbol_registry', None)
+        resolved_symbol = registry.get_symbol() if registry else None
+        return resolved_symbol or self.configured_symbol
+
+    @symbol.setter
+    def symbol(self, value: str):
+        self.configured_symbol = value
+
+    @property
+    def daily_order_count(self) -> int:
+        """📊 จำนวนออเดอร์ใน 24 ชม. ล่าสุด (จาก rate limiter)"""
+        return self.rate_limiter.count(ORDERS_PER_DAY)
+
     # ========================================================================================
     # ⚡ MAIN METHODS - ใช้ชื่อเดิมทั้งหมด
     # ========================================================================================
     
-    def place_market_order(self, order_request: OrderRequest) -> OrderResult:
-        """⚡ วาง Market Order ทันที - METHOD หลัก - แก้ไขแล้ว"""
+    def place_market_order(self, order_request: OrderRequest) -> Future:
+        """
+        ⚡ วาง Market Order - METHOD หลัก - ส่งเข้าคิวแล้วคืน Future ทันที
+        
+        Future ให้ผลเป็น OrderResult เมื่อส่งเสร็จ (คิวเต็ม -> OrderResult ที่ metadata["skipped"] = True)
+        """
+        if not order_request.client_order_id:
+            order_request.client_order_id = self._generate_client_order_id()
+        
+        if self.order_queue.is_halted:
+            future = Future()
+            future.set_result(self._create_skipped_result(
+                order_request, f"Trading halted: {self.order_queue.halt_reason}"))
+            return future
+        
+        future = self.order_queue.submit(order_request)
+        if future is None:
+            self.log(f"⏭️ Order queue full ({self.order_queue.depth}) - skipping {order_request.order_type.value}")
+            future = Future()
+            future.set_result(self._create_skipped_result(order_request, "Order queue full - signal skipped"))
+            return future
+        
+        future.add_done_callback(lambda done: self._on_market_order_completed(order_request, done.result()))
+        return future
+
+    def place_market_order_sync(self, order_request: OrderRequest) -> OrderResult:
+        """⚡ วาง Market Order แล้วรอผล (สำหรับ caller ที่ต้องการผลทันที)"""
+        return self.place_market_order(order_request).result()
+
+    def can_accept_order(self) -> bool:
+        """📮 คิวออเดอร์ยังมีที่ว่างหรือไม่ (halt อยู่ = ไม่รับ)"""
+        return self.order_queue.can_accept()
+
+    @property
+    def is_trading_halted(self) -> bool:
+        return self.order_queue.is_halted
+
+    def halt_trading(self, reason: str) -> int:
+        """⛔ หยุดรับออเดอร์ใหม่ทันที + ยกเลิกออเดอร์ที่ค้างในคิว market / grid (ไม่มี IPC)"""
+        cancelled = self.order_queue.halt(reason) + self.grid_queue.halt(reason)
+        self.log(f"⛔ Trading halted ({reason}) - {cancelled} queued orders cancelled")
+        return cancelled
+
+    def resume_trading(self):
+        """▶️ รับออเดอร์ใหม่อีกครั้ง"""
+        self.order_queue.resume()
+        self.grid_queue.resume()
+        self.log("▶️ Trading resumed")
+
+    def cancel_all_pending_orders(self) -> int:
+        """🗑️ ยกเลิก pending orders ทั้งหมดของ symbol (ไม่ให้ grid level fill หลังปิด positions) - คืนจำนวนที่ยกเลิก"""
+        return sum(self.cancel_pending_order(order["ticket"]) for order in self.get_pending_orders())
+
+    def attach_performance_tracker(self, performance_tracker):
+        """📈 เชื่อม performance tracker สำหรับบันทึกผลการ execute"""
+        self.performance_tracker = performance_tracker
+
+    def _create_skipped_result(self, order_request: OrderRequest, message: str) -> OrderResult:
+        """⏭️ ผลลัพธ์ของออเดอร์ที่ไม่ได้ส่ง (คิวเต็ม / หมดอายุในคิว)"""
+        return OrderResult(False, 0, 0.0, 0.0, message, metadata={"skipped": True})
+
+    def _on_market_order_completed(self, order_request: OrderRequest, result: OrderResult):
+        """📊 callback เมื่อออเดอร์เสร็จ - อัปเดต stats / history / performance tracker"""
+        try:
+            if result.metadata.get("skipped"):
+                return
+            
+            if result.success:
+                self.rate_limiter.record(ORDERS_PER_DAY)
+                self.last_order_time = datetime.now()
+                print(f"✅ Market order SUCCESS: Ticket {result.ticket}")
+            else:
+                print(f"❌ Market order FAILED: {result.message}")
+            
+            self._update_execution_stats(result.success, result.execution_time, result.slippage)
+            
+            self.order_history.append({
+                "time": datetime.now(),
+                "ticket": result.ticket,
+                "order_type": order_request.order_type.value,
+                "volume": result.volume if result.success else order_request.volume,
+                "price": result.price,
+                "success": result.success,
+                "message": result.message,
+                "reason": order_request.reason.value,
+                "execution_time": result.execution_time
+            })
+            
+            if self.performance_tracker:
+                self.performance_tracker.log_market_order_execution({
+                    "symbol": self.symbol,
+                    "order_type": "BUY" if order_request.order_type == OrderType.MARKET_BUY else "SELL",
+                    "requested_volume": order_request.volume,
+                    "requested_price": result.metadata.get("requested_price", result.price),
+                    "executed_price": result.price,
+                    "executed_volume": result.volume,
+                    "execution_time_ms": result.execution_time * 1000,
+                    "success": result.success
+                })
+                
+        except Exception as e:
+            self.log(f"❌ Order completion callback error: {e}")
+
+    def _execute_queued_market_order(self, order_request: OrderRequest) -> OrderResult:
+        """⚡ ส่ง Market Order จริง (ทำงานบน order worker thread)"""
         try:
             start_time = time.time()
             
@@ -175,6 +375,9 @@ class OrderManager:
             if not self._validate_mt5_connection_enhanced():
                 return OrderResult(False, 0, 0.0, 0.0, "MT5 connection validation failed", metadata={})
             
+            if not self._acquire_send_slot():
+                return OrderResult(False, 0, 0.0, 0.0, "Order send rate limit reached", metadata={})
+            
             # 🔧 FIX 4: Get current price
             current_price = self._get_current_price()
             if current_price <= 0:
@@ -188,27 +391,327 @@ class OrderManager:
             # 🔧 FIX 6: Execute with smart retry
             result = self._execute_market_order_with_retry(mt5_request, order_request)
             
-            # Set execution time
-            execution_time = time.time() - start_time
-            result.execution_time = execution_time
+            # Set execution time (stats อัปเดตใน _on_market_order_completed)
+            result.execution_time = time.time() - start_time
+            result.metadata["requested_price"] = mt5_request.get("price", current_price)
             
-            # Update tracking
-            if result.success:
-                self.daily_order_count += 1
-                self.last_order_time = datetime.now()
-                print(f"✅ Market order SUCCESS: Ticket {result.ticket}")
-            else:
-                print(f"❌ Market order FAILED: {result.message}")
+            return result
+            
+        except Exception as e:
+            print(f"❌ Place market order error: {e}")
+            return OrderResult(False, 0, 0.0, 0.0, f"Execution error: {e}", metadata={})
+
+    # ========================================================================================
+    # 🧱 GRID PLACEMENT (PENDING ORDERS)
+    # ========================================================================================
+
+    def build_grid_levels(self, current_price: float, market_analysis: Dict,
+                          levels_per_side: int = 3, volume: Optional[float] = None) -> List[OrderRequest]:
+        """
+        🧱 แปลง placement recommendations ของ SpacingManager เป็น BUY_LIMIT / SELL_LIMIT levels
+        
+        level ที่ i ของแต่ละฝั่งห่างจากราคาปัจจุบัน i เท่าของ spacing ที่แนะนำ
+        """
+        try:
+            if not self.spacing_manager:
+                return []
+            
+            recommendations = self.spacing_manager.get_placement_recommendations(current_price, market_analysis)
+            levels = []
+            for recommendation in recommendations:
+                if not recommendation.get("placement_allowed", True):
+                    continue
+                is_buy = recommendation["order_type"] == "BUY"
+                step = recommendation["spacing"] * self.point_value
+                for i in range(1, levels_per_side + 1):
+                    levels.append(self._create_grid_level_request({
+                        **recommendation,
+                        "order_type": "BUY_LIMIT" if is_buy else "SELL_LIMIT",
+                        "price": current_price - step * i if is_buy else current_price + step * i,
+                        "volume": volume or recommendation.get("volume", self.min_lot)
+                    }))
+            return levels
+            
+        except Exception as e:
+            self.log(f"❌ Build grid levels error: {e}")
+            return []
+
+    def place_grid(self, levels: List, cancel_on_partial_failure: Optional[bool] = None) -> GridPlacementResult:
+        """
+        🧱 วาง grid ทั้ง batch เป็น pending orders - ส่งพร้อมกันผ่าน grid worker pool
+        
+        levels: OrderRequest (BUY_LIMIT / SELL_LIMIT) หรือ dict แบบ placement recommendation
+        คืนผลแยกต่อ level - level ที่ล้มเหลวไม่กระทบ level อื่น
+        (ยกเว้น cancel_on_partial_failure = True -> ยกเลิก level ที่วางแล้วทั้งหมด)
+        level ที่เกิน batch_timeout = ล้มเหลว: ยังไม่เริ่ม -> ยกเลิกในคิว, กำลังส่ง -> ยกเลิก order เมื่อวางเสร็จ
+        จำนวน level ถูกจำกัดด้วย quota ออเดอร์รายวันที่เหลือ (เหมือน market order)
+        """
+        start_time = time.time()
+        if cancel_on_partial_failure is None:
+            cancel_on_partial_failure = self.grid_order_config["cancel_on_partial_failure"]
+        
+        requests = [level if isinstance(level, OrderRequest) else self._create_grid_level_request(level)
+                    for level in levels]
+        max_levels = self.grid_order_config["max_levels"]
+        if len(requests) > max_levels:
+            self.log(f"⚠️ Grid batch of {len(requests)} levels truncated to {max_levels}")
+            requests = requests[:max_levels]
+        
+        # ⏳ quota ออเดอร์รายวันที่เหลือ - level ที่เกินไม่ส่งเลย
+        daily_limit = self.rate_limiter.get_limit(ORDERS_PER_DAY)
+        remaining_quota = len(requests) if daily_limit is None else max(0, daily_limit - self.daily_order_count)
+        
+        # ส่งทุก level เข้าคิวก่อน แล้วค่อยรอผล
+        futures = []
+        for index, order_request in enumerate(requests):
+            if not order_request.client_order_id:
+                order_request.client_order_id = self._generate_client_order_id()
+            futures.append(self.grid_queue.submit(order_request) if index < remaining_quota else None)
+        
+        deadline = start_time + self.grid_order_config["batch_timeout"]
+        results = []
+        for index, (order_request, future) in enumerate(zip(requests, futures)):
+            if future is None:
+                if index >= remaining_quota:
+                    message = "Daily order limit reached - level skipped"
+                elif self.grid_queue.is_halted:
+                    message = f"Trading halted: {self.grid_queue.halt_reason}"
+                else:
+                    message = "Grid queue full - level skipped"
+                results.append(self._create_skipped_result(order_request, message))
+                continue
+            try:
+                results.append(future.result(timeout=max(0.0, deadline - time.time())))
+            except FutureTimeoutError:
+                results.append(self._abandon_grid_level(order_request, future))
+            except Exception as e:
+                results.append(OrderResult(False, 0, 0.0, 0.0, f"Grid level error: {e}", metadata={}))
+        
+        grid_result = GridPlacementResult(levels=requests, results=results)
+        
+        if cancel_on_partial_failure and grid_result.partial:
+            for result in grid_result.placed:
+                if self.cancel_pending_order(result.ticket):
+                    grid_result.cancelled_tickets.append(result.ticket)
+        
+        grid_result.execution_time = time.time() - start_time
+        self._record_grid_result(grid_result)
+        
+        self.log(f"🧱 Grid placed {len(grid_result.placed)}/{len(requests)} levels "
+                 f"in {grid_result.execution_time * 1000:.0f}ms"
+                 + (f" - cancelled {len(grid_result.cancelled_tickets)}" if grid_result.cancelled_tickets else ""))
+        return grid_result
+
+    def _abandon_grid_level(self, order_request: OrderRequest, future: Future) -> OrderResult:
+        """⌛ level เกิน batch_timeout - ไม่ให้เหลือ pending order ที่รายงานว่าล้มเหลวไปแล้ว"""
+        if future.cancel():
+            return OrderResult(False, 0, 0.0, 0.0, "Grid level timeout - cancelled before sending",
+                               metadata={"client_order_id": order_request.client_order_id})
+        
+        # กำลังส่งอยู่ -> รอผลบน worker แล้วยกเลิก order ที่วางได้
+        future.add_done_callback(lambda done: self._cancel_late_grid_level(order_request, done))
+        return OrderResult(False, 0, 0.0, 0.0, "Grid level timeout - late placement will be cancelled",
+                           metadata={"client_order_id": order_request.client_order_id})
+
+    def _cancel_late_grid_level(self, order_request: OrderRequest, future: Future):
+        """🗑️ callback ของ level ที่ timeout แต่วางสำเร็จทีหลัง"""
+        try:
+            result = future.result()
+            if not result.success or not result.ticket:
+                return
+            if self.cancel_pending_order(result.ticket):
+                self.execution_stats["limit_orders"]["cancelled"] += 1
+                self.log(f"🗑️ Late grid level {order_request.client_order_id} (ticket {result.ticket}) cancelled")
+        except Exception as e:
+            self.log(f"❌ Late grid level cancel error: {e}")
+
+    def cancel_pending_order(self, ticket: int) -> bool:
+        """🗑️ ยกเลิก pending order"""
+        try:
+            result = mt5.order_send({"action": mt5.TRADE_ACTION_REMOVE, "order": ticket})
+            if result and result.retcode == mt5.TRADE_RETCODE_DONE:
+                return True
+            self.log(f"❌ Cancel pending order {ticket} failed: "
+                     f"{result.retcode if result else mt5.last_error()}")
+            return False
+            
+        except Exception as e:
+            self.log(f"❌ Cancel pending order error: {e}")
+            return False
+
+    def _create_grid_level_request(self, level: Dict) -> OrderRequest:
+        """🧱 dict ของ level -> OrderRequest"""
+        order_type = level.get("order_type", "BUY_LIMIT")
+        if order_type in ("BUY", "SELL"):
+            order_type = f"{order_type}_LIMIT"
+        score = level.get("four_d_score", 0.0)
+        return OrderRequest(
+            order_type=OrderType(order_type),
+            volume=level.get("volume", self.min_lot),
+            price=level.get("price", level.get("suggested_price", 0.0)),
+            sl=level.get("sl", 0.0),
+            tp=level.get("tp", 0.0),
+            reason=OrderReason.GRID_EXPANSION,
+            confidence=score,
+            reasoning=level.get("reasoning", ""),
+            four_d_score=score
+        )
+
+    def _execute_pending_order(self, order_request: OrderRequest) -> OrderResult:
+        """🧱 วาง pending order หนึ่ง level (ทำงานบน grid worker thread)"""
+        try:
+            start_time = time.time()
+            
+            type_mapping = {
+                OrderType.BUY_LIMIT: mt5.ORDER_TYPE_BUY_LIMIT,
+                OrderType.SELL_LIMIT: mt5.ORDER_TYPE_SELL_LIMIT,
+                OrderType.BUY_STOP: mt5.ORDER_TYPE_BUY_STOP,
+                OrderType.SELL_STOP: mt5.ORDER_TYPE_SELL_STOP
+            }
+            type_order = type_mapping.get(order_request.order_type)
+            if type_order is None:
+                return OrderResult(False, 0, 0.0, 0.0, f"Invalid pending order type: {order_request.order_type}", metadata={})
+            if order_request.price <= 0:
+                return OrderResult(False, 0, 0.0, 0.0, "Invalid pending order price", metadata={})
+            if not (self.min_lot <= order_request.volume <= self.max_lot):
+                return OrderResult(False, 0, 0.0, 0.0, f"Invalid volume: {order_request.volume}", metadata={})
+            
+            if not self._check_daily_limits():
+                return OrderResult(False, 0, 0.0, 0.0, "Daily order limit reached", metadata={})
             
-            # Update stats
-            self._update_execution_stats(result.success, execution_time, result.slippage)
+            trading_ok, reason = self._check_trading_permissions()
+            if not trading_ok:
+                return OrderResult(False, 0, 0.0, 0.0, reason, metadata={})
             
+            if not self._acquire_send_slot():
+                return OrderResult(False, 0, 0.0, 0.0, "Order send rate limit reached", metadata={})
+            
+            symbol = self.symbol
+            price = round(order_request.price / self.tick_size) * self.tick_size if self.tick_size else order_request.price
+            request = {
+                "action": mt5.TRADE_ACTION_PENDING,
+                "symbol": symbol,
+                "volume": order_request.volume,
+                "type": type_order,
+                "price": round(price, 8),
+                "sl": order_request.sl if order_request.sl > 0 else 0.0,
+                "tp": order_request.tp if order_request.tp > 0 else 0.0,
+                "deviation": order_request.max_slippage,
+                "magic": order_request.magic_number,
+                "comment": self._build_order_comment(order_request),
+                "type_time": mt5.ORDER_TIME_GTC,
+                "type_filling": mt5.ORDER_FILLING_RETURN
+            }
+            
+            result = self._send_pending_order_with_retry(request, order_request)
+            result.execution_time = time.time() - start_time
+            if result.success:
+                self.rate_limiter.record(ORDERS_PER_DAY)
             return result
             
         except Exception as e:
-            print(f"❌ Place market order error: {e}")
+            self.log(f"❌ Pending order error: {e}")
             return OrderResult(False, 0, 0.0, 0.0, f"Execution error: {e}", metadata={})
 
+    def _send_pending_order_with_retry(self, request: Dict, order_request: OrderRequest) -> OrderResult:
+        """🔄 ส่ง pending order - retry เฉพาะ error ชั่วคราว, เช็ค client order ID ก่อนส่งซ้ำ"""
+        retry_retcodes = self.UNCERTAIN_RETCODES | {
+            mt5.TRADE_RETCODE_REQUOTE, mt5.TRADE_RETCODE_PRICE_CHANGED, mt5.TRADE_RETCODE_TOO_MANY_REQUESTS}
+        last_error = "No attempt made"
+        fill_uncertain = False
+        
+        for attempt in range(self.grid_order_config["retry_attempts"]):
+            if attempt > 0:
+                time.sleep(self.grid_order_config["retry_delay"])
+            
+            if fill_uncertain:
+                existing_order = self._resolve_uncertain_pending(order_request, request["symbol"])
+                if existing_order:
+                    return existing_order
+            
+            result = mt5.order_send(request)
+            if result is None:
+                last_error = f"No response from MT5: {mt5.last_error()}"
+                fill_uncertain = True
+                continue
+            
+            if result.retcode in (mt5.TRADE_RETCODE_PLACED, mt5.TRADE_RETCODE_DONE):
+                return OrderResult(
+                    success=True,
+                    ticket=result.order,
+                    price=request["price"],
+                    volume=request["volume"],
+                    message="Pending order placed",
+                    four_d_score=order_request.four_d_score,
+                    metadata={"client_order_id": order_request.client_order_id,
+                              "order_type": order_request.order_type.value}
+                )
+            
+            last_error = f"Retcode {result.retcode}: {getattr(result, 'comment', '')}"
+            fill_uncertain = result.retcode in self.UNCERTAIN_RETCODES
+            if result.retcode not in retry_retcodes:
+                break
+        
+        # ครั้งสุดท้ายไม่รู้ผล -> อาจวางแล้ว ห้ามรายงานว่าล้มเหลว
+        existing_order = fill_uncertain and self._resolve_uncertain_pending(order_request, request["symbol"])
+        if existing_order:
+            return existing_order
+        return OrderResult(False, 0, 0.0, 0.0, f"Pending order failed: {last_error}",
+                           metadata={"client_order_id": order_request.client_order_id})
+
+    def _resolve_uncertain_pending(self, order_request: OrderRequest, symbol: str) -> Optional[OrderResult]:
+        """🔍 ส่งครั้งก่อนไม่รู้ผล -> รอ order_send ที่ค้างให้จบ แล้วหา pending order จาก client order ID"""
+        mt5.wait_for_sends()
+        return self._find_existing_pending_order(order_request, symbol)
+
+    def _find_existing_pending_order(self, order_request: OrderRequest, symbol: str) -> Optional[OrderResult]:
+        """🔍 หา pending order ที่มี client order ID นี้ (วางแล้วแต่ response หาย)"""
+        try:
+            self.idempotency_stats["lookups"] += 1
+            for order in mt5.orders_get(symbol=symbol) or ():
+                if order_request.client_order_id in (order.comment or ""):
+                    self.idempotency_stats["recovered_fills"] += 1
+                    return OrderResult(
+                        success=True,
+                        ticket=order.ticket,
+                        price=order.price_open,
+                        volume=order.volume_initial,
+                        message="Pending order already placed (recovered by client order ID)",
+                        four_d_score=order_request.four_d_score,
+                        metadata={"recovered_fill": True, "client_order_id": order_request.client_order_id,
+                                  "order_type": order_request.order_type.value}
+                    )
+            return None
+            
+        except Exception as e:
+            self.log(f"❌ Existing pending order lookup error: {e}")
+            return None
+
+    def _record_grid_result(self, grid_result: GridPlacementResult):
+        """📊 อัปเดต stats / history ของ grid batch"""
+        stats = self.execution_stats["limit_orders"]
+        stats["batches"] += 1
+        stats["count"] += len(grid_result.results)
+        stats["success"] += len(grid_result.placed)
+        stats["cancelled"] += len(grid_result.cancelled_tickets)
+        if grid_result.partial:
+            stats["partial_batches"] += 1
+        
+        for order_request, result in zip(grid_result.levels, grid_result.results):
+            if result.metadata.get("skipped"):
+                continue
+            self.order_history.append({
+                "time": datetime.now(),
+                "ticket": result.ticket,
+                "order_type": order_request.order_type.value,
+                "volume": order_request.volume,
+                "price": result.price if result.success else order_request.price,
+                "success": result.success and result.ticket not in grid_result.cancelled_tickets,
+                "message": result.message,
+                "reason": order_request.reason.value,
+                "execution_time": result.execution_time
+            })
+
     def execute_market_order_to_mt5(self, order_request: OrderRequest) -> OrderResult:
         """Execute market order โดยส่งออเดอร์จริงไป MT5 - ใช้ชื่อเดิม - แก้ไขแล้ว"""
         try:
@@ -225,25 +728,10 @@ class OrderManager:
             if not self.mt5_connector.is_connected:
                 return OrderResult(False, 0, 0.0, 0.0, "MT5 not connected", metadata={})
             
-            # Check MT5 connection and trading permissions
-            terminal_info = mt5.terminal_info()
-            if terminal_info is None:
-                return OrderResult(False, 0, 0.0, 0.0, "MT5 terminal not accessible", metadata={})
-            
-            print(f"🔌 MT5 Terminal: {terminal_info.name} (Connected: {terminal_info.connected})")
-            
-            # Check account info
-            account_info = mt5.account_info()
-            if account_info is None:
-                return OrderResult(False, 0, 0.0, 0.0, "MT5 account not logged in", metadata={})
-            
-            print(f"👤 Account: {account_info.login} (Trade Allowed: {account_info.trade_allowed})")
-            
-            if not account_info.trade_allowed:
-                return OrderResult(False, 0, 0.0, 0.0, "Trading not allowed on account", metadata={})
-            
-            if not account_info.trade_expert:
-                return OrderResult(False, 0, 0.0, 0.0, "Expert Advisor trading not allowed", metadata={})
+            # Check MT5 connection and trading permissions (preflight ใน memory)
+            permitted, reason = self._check_trading_permissions()
+            if not permitted:
+                return OrderResult(False, 0, 0.0, 0.0, reason, metadata={})
             
             # Get current price
             tick = mt5.symbol_info_tick(self.symbol)
@@ -275,9 +763,9 @@ class OrderManager:
                 "tp": order_request.tp if order_request.tp > 0 else 0.0,
                 "deviation": order_request.max_slippage,
                 "magic": order_request.magic_number,
-                "comment": f"4D_AI_{order_request.reason.value}",
+                "comment": self._build_order_comment(order_request),
                 "type_time": mt5.ORDER_TIME_GTC,
-                "type_filling": mt5.ORDER_FILLING_IOC
+                "type_filling": self._get_filling_mode(self.symbol)
             }
             
             print(f"📋 MT5 Request prepared: {request}")
@@ -291,6 +779,7 @@ class OrderManager:
             if result is None:
                 error_msg = f"MT5 order_send returned None - {mt5.last_error()}"
                 print(f"❌ {error_msg}")
+                self._invalidate_preflight(error_msg)
                 return OrderResult(False, 0, 0.0, 0.0, error_msg, execution_time=execution_time, metadata={})
             
             # Check result
@@ -324,6 +813,9 @@ class OrderManager:
                 )
             else:
                 # Failed
+                if self._is_filling_error(result.retcode):
+                    self._forget_filling_mode(self.symbol, result.retcode)
+                self._invalidate_preflight(f"retcode {result.retcode}")
                 error_msg = f"Order failed - Code: {result.retcode}, Comment: {result.comment if hasattr(result, 'comment') else 'N/A'}"
                 print(f"❌ {error_msg}")
                 
@@ -346,59 +838,73 @@ class OrderManager:
             return OrderResult(False, 0, 0.0, 0.0, f"Execution error: {e}", metadata={})
     
     def _execute_market_order_with_retry(self, mt5_request: Dict, order_request: OrderRequest) -> OrderResult:
-        """Execute market order with retry logic - ใช้ชื่อเดิม - แก้ไขแล้ว"""
+        """Execute market order with retry logic - ใช้ชื่อเดิม - ส่งด้วย filling mode ที่เรียนรู้แล้ว"""
         try:
             max_attempts = self.market_order_config.get("retry_attempts", 3)
             retry_delay = self.market_order_config.get("retry_delay", 0.5)
+            symbol = mt5_request.get("symbol", self.symbol)
             
-            # 🔧 FIX: ลำดับ filling types ที่ดีกว่า
-            filling_options = [
-                (mt5.ORDER_FILLING_IOC, "IOC"),      # Immediate or Cancel (ดีที่สุด)
-                (mt5.ORDER_FILLING_RETURN, "RETURN"), # Return/Partial fill
-                (mt5.ORDER_FILLING_FOK, "FOK"),      # Fill or Kill (เข้มงวดที่สุด)
-            ]
+            # True = ส่งไปแล้วแต่ไม่รู้ผล (ไม่มี response / timeout) -> ต้องเช็คก่อนส่งซ้ำ
+            fill_uncertain = False
             
             for attempt in range(max_attempts):
                 try:
                     self.log(f"🚀 Executing market order (attempt {attempt + 1}/{max_attempts})")
                     
-                    # ลอง filling types ทีละตัว
                     last_error = None
                     successful_result = None
                     
-                    for filling_type, filling_name in filling_options:
+                    # 🔧 ส่งด้วย filling mode ที่ cache ไว้ก่อน - ลองตัวอื่นเฉพาะเมื่อ broker บอกว่า filling ผิด
+                    for filling_type in self._get_filling_candidates(symbol):
+                        filling_name = self.FILLING_NAMES.get(filling_type, str(filling_type))
                         try:
-                            # ตั้ง filling type
-                            mt5_request["type_filling"] = filling_type
+                            # 🔑 ครั้งก่อนอาจ fill ไปแล้ว -> รอ send ที่ค้างให้จบ แล้วหาจาก client order ID แทนการส่งซ้ำ
+                            if fill_uncertain:
+                                existing_fill = self._resolve_uncertain_fill(order_request, symbol)
+                                if existing_fill:
+                                    return existing_fill
+                                fill_uncertain = False
                             
-                            print(f"🚀 Trying {filling_name} filling type...")
+                            mt5_request["type_filling"] = filling_type
                             
-                            # ส่ง order
+                            print(f"🚀 Sending with {filling_name} filling type...")
                             result = mt5.order_send(mt5_request)
                             
                             if result is None:
                                 last_error = f"{filling_name}: No response from MT5"
                                 print(f"❌ {last_error}")
-                                continue
+                                fill_uncertain = True
+                                break
+                            
+                            if result.retcode in self.UNCERTAIN_RETCODES:
+                                fill_uncertain = True
                             
                             print(f"📨 MT5 Response ({filling_name}): Retcode={result.retcode}")
                             
-                            # เช็คความสำเร็จ
                             if result.retcode == mt5.TRADE_RETCODE_DONE:
                                 print(f"✅ Order executed successfully with {filling_name}")
+                                self._learn_filling_mode(symbol, filling_type)
                                 successful_result = result
                                 break
-                            else:
-                                error_msg = f"{filling_name}: Error {result.retcode}"
-                                if hasattr(result, 'comment'):
-                                    error_msg += f" - {result.comment}"
-                                last_error = error_msg
-                                print(f"❌ {error_msg}")
+                            
+                            error_msg = f"{filling_name}: Error {result.retcode}"
+                            if hasattr(result, 'comment'):
+                                error_msg += f" - {result.comment}"
+                            last_error = error_msg
+                            print(f"❌ {error_msg}")
+                            
+                            if not self._is_filling_error(result.retcode):
+                                # ไม่ใช่ปัญหา filling (requote / no money / ...) - ลอง filling อื่นไม่ช่วย
+                                break
+                            
+                            # broker ตอบว่า filling mode ผิด -> ลอง mode ถัดไป
+                            self._forget_filling_mode(symbol, result.retcode)
                                 
                         except Exception as filling_error:
                             last_error = f"{filling_name} exception: {filling_error}"
                             print(f"❌ {last_error}")
-                            continue
+                            fill_uncertain = True
+                            break
                     
                     # ตรวจสอบผลลัพธ์
                     if successful_result:
@@ -420,12 +926,17 @@ class OrderManager:
                         )
                         
                     else:
-                        # ❌ ล้มเหลวทุก filling type
+                        # ❌ ล้มเหลว - สิทธิ์/การเชื่อมต่ออาจเปลี่ยน
+                        self._invalidate_preflight(last_error)
                         if attempt < max_attempts - 1:
-                            self.log(f"🔄 All filling types failed, retrying in {retry_delay} seconds...")
+                            self.log(f"🔄 Order failed ({last_error}), retrying in {retry_delay} seconds...")
                             time.sleep(retry_delay)
                             continue
                         else:
+                            # ครั้งสุดท้ายไม่รู้ผล -> อาจ fill แล้ว ห้ามรายงานว่าล้มเหลว (signal จะส่งซ้ำ)
+                            existing_fill = fill_uncertain and self._resolve_uncertain_fill(order_request, symbol)
+                            if existing_fill:
+                                return existing_fill
                             return OrderResult(
                                 success=False,
                                 ticket=0,
@@ -441,6 +952,9 @@ class OrderManager:
                     if attempt < max_attempts - 1:
                         time.sleep(retry_delay)
                         continue
+                    existing_fill = fill_uncertain and self._resolve_uncertain_fill(order_request, symbol)
+                    if existing_fill:
+                        return existing_fill
                     return OrderResult(False, 0, 0, 0, f"Execution error: {e}")
             
             return OrderResult(False, 0, 0, 0, "Max retry attempts reached")
@@ -449,6 +963,129 @@ class OrderManager:
             self.log(f"❌ Execute market order with retry error: {e}")
             return OrderResult(False, 0, 0, 0, f"Retry execution error: {e}")
 
+    # ========================================================================================
+    # 🔑 IDEMPOTENT CLIENT ORDER IDS
+    # ========================================================================================
+
+    def _generate_client_order_id(self) -> str:
+        """🔑 ID เฉพาะของออเดอร์ (10 ตัวอักษร - comment ของ MT5 ยาวได้ 31)"""
+        return uuid.uuid4().hex[:10]
+
+    def _build_order_comment(self, order_request: OrderRequest) -> str:
+        """🔑 comment = ID + เหตุผล (ตัดให้อยู่ใน 31 ตัวอักษร)"""
+        if not order_request.client_order_id:
+            order_request.client_order_id = self._generate_client_order_id()
+        return f"SG{order_request.client_order_id}|{order_request.reason.value[:15]}"[:31]
+
+    def _resolve_uncertain_fill(self, order_request: OrderRequest, symbol: str) -> Optional[OrderResult]:
+        """🔍 ส่งครั้งก่อนไม่รู้ผล -> รอ order_send ที่ค้างให้จบ แล้วหา fill จาก client order ID"""
+        mt5.wait_for_sends()
+        return self._find_existing_fill(order_request, symbol)
+
+    def _find_existing_fill(self, order_request: OrderRequest, symbol: str) -> Optional[OrderResult]:
+        """🔍 หา position / deal ที่มี client order ID นี้ (ออเดอร์ก่อนหน้า fill แล้วแต่ response หาย)"""
+        try:
+            client_id = order_request.client_order_id
+            if not client_id:
+                return None
+            self.idempotency_stats["lookups"] += 1
+            
+            for position in mt5.positions_get(symbol=symbol) or ():
+                if client_id in (position.comment or ""):
+                    return self._recovered_fill_result(order_request, position.ticket,
+                                                       position.price_open, position.volume)
+            
+            # position อาจถูกปิดไปแล้ว -> ดู deal เข้า
+            now = datetime.now()
+            deals = mt5.history_deals_get(now - timedelta(days=1), now + timedelta(days=1)) or ()
+            for deal in reversed(deals):
+                if deal.entry == mt5.DEAL_ENTRY_IN and client_id in (deal.comment or ""):
+                    return self._recovered_fill_result(order_request, deal.position_id, deal.price, deal.volume)
+            
+            return None
+            
+        except Exception as e:
+            self.log(f"❌ Existing fill lookup error: {e}")
+            return None
+
+    def _recovered_fill_result(self, order_request: OrderRequest, ticket: int,
+                               price: float, volume: float) -> OrderResult:
+        self.idempotency_stats["recovered_fills"] += 1
+        self.log(f"🔑 Order {order_request.client_order_id} already filled (ticket {ticket}) - not resending")
+        return OrderResult(
+            success=True,
+            ticket=ticket,
+            price=price,
+            volume=volume,
+            message="Market order already filled (recovered by client order ID)",
+            four_d_score=order_request.four_d_score,
+            metadata={"recovered_fill": True, "client_order_id": order_request.client_order_id}
+        )
+
+    # ========================================================================================
+    # 🧠 FILLING MODE CACHE
+    # ========================================================================================
+
+    def _get_filling_mode(self, symbol: str) -> int:
+        """🧠 filling mode ของ symbol - หาจาก filling_mode flags ครั้งเดียวแล้ว cache"""
+        self._check_filling_cache_generation()
+        cached = self.filling_mode_cache.get(symbol)
+        if cached is not None:
+            return cached
+
+        filling_type = self._detect_filling_mode(symbol)
+        self.filling_mode_cache[symbol] = filling_type
+        self.filling_stats["detections"] += 1
+        self.log(f"🧠 Filling mode for {symbol}: {self.FILLING_NAMES.get(filling_type, filling_type)}")
+        return filling_type
+
+    def _detect_filling_mode(self, symbol: str) -> int:
+        """🔧 แปลง symbol_info().filling_mode (bit flags) เป็น ORDER_FILLING_*"""
+        registry = getattr(self.mt5_connector, 'symbol_registry', None)
+        meta = registry.get_meta() if registry else None
+        if meta is not None and meta.name == symbol:
+            flags = meta.filling_mode
+        else:
+            symbol_info = mt5.symbol_info(symbol)
+            flags = getattr(symbol_info, 'filling_mode', 0) if symbol_info else 0
+
+        # SYMBOL_FILLING_IOC = 2, SYMBOL_FILLING_FOK = 1 (ลำดับความชอบเดิม: IOC ก่อน)
+        if flags & 2:
+            return mt5.ORDER_FILLING_IOC
+        if flags & 1:
+            return mt5.ORDER_FILLING_FOK
+        return mt5.ORDER_FILLING_RETURN
+
+    def _get_filling_candidates(self, symbol: str) -> List[int]:
+        """🧠 mode ที่ cache ไว้ก่อน แล้วตามด้วย mode อื่น (ใช้เฉพาะเมื่อ broker ตอบว่า filling ผิด)"""
+        preferred = self._get_filling_mode(symbol)
+        fallback = [mt5.ORDER_FILLING_IOC, mt5.ORDER_FILLING_FOK, mt5.ORDER_FILLING_RETURN]
+        return [preferred] + [mode for mode in fallback if mode != preferred]
+
+    def _is_filling_error(self, retcode: int) -> bool:
+        """❓ retcode นี้หมายถึง 'filling mode ไม่รองรับ' หรือไม่"""
+        return retcode in self.filling_error_retcodes
+
+    def _forget_filling_mode(self, symbol: str, retcode: int):
+        """🔄 broker ปฏิเสธ filling mode -> ล้าง cache ของ symbol"""
+        if self.filling_mode_cache.pop(symbol, None) is not None:
+            self.filling_stats["invalidations"] += 1
+            self.log(f"🔄 Filling mode for {symbol} rejected (retcode {retcode}) - relearning")
+
+    def _learn_filling_mode(self, symbol: str, filling_type: int):
+        """✅ บันทึก filling mode ที่ส่งสำเร็จ"""
+        if self.filling_mode_cache.get(symbol) != filling_type:
+            self.filling_mode_cache[symbol] = filling_type
+            self.filling_stats["relearned"] += 1
+
+    def _check_filling_cache_generation(self):
+        """🔄 symbol registry resolve ใหม่ (reconnect / เปลี่ยน broker) -> ล้าง cache"""
+        registry = getattr(self.mt5_connector, 'symbol_registry', None)
+        generation = registry.generation if registry else 0
+        if generation != self._filling_cache_generation:
+            self.filling_mode_cache.clear()
+            self._filling_cache_generation = generation
+
     def _prepare_mt5_market_request_enhanced(self, order_request: OrderRequest, current_price: float) -> Dict:
         """เตรียม MT5 request สำหรับ Market Order - ใช้ชื่อเดิม - แก้ไขแล้ว"""
         try:
@@ -482,7 +1119,7 @@ class OrderManager:
                 "price": execution_price,               
                 "deviation": order_request.max_slippage,
                 "magic": getattr(order_request, 'magic_number', 100001),
-                "comment": f"SmartGrid: {order_request.reason.value[:15]}",
+                "comment": self._build_order_comment(order_request),
                 "type_time": mt5.ORDER_TIME_GTC,
                 # type_filling จะถูกตั้งค่าใน _execute_market_order_with_retry
             }
@@ -540,6 +1177,16 @@ class OrderManager:
                 print("❌ MT5 connector not connected")
                 return False
             
+            # 🛫 ใช้ preflight ที่ refresh เบื้องหลัง (ไม่มี IPC)
+            preflight = self._get_preflight()
+            if preflight:
+                permitted, reason = preflight.check()
+                if not permitted:
+                    print(f"❌ {reason}")
+                    if preflight.state.symbol and not preflight.state.symbol_found:
+                        self.mt5_connector.symbol_registry.report_symbol_not_found(preflight.state.symbol)
+                return permitted
+            
             # ตรวจสอบ terminal info
             terminal_info = mt5.terminal_info()
             if terminal_info is None:
@@ -574,6 +1221,9 @@ class OrderManager:
             symbol_info = mt5.symbol_info(self.symbol)
             if symbol_info is None:
                 print(f"❌ Symbol {self.symbol} not found")
+                registry = getattr(self.mt5_connector, 'symbol_registry', None)
+                if registry:
+                    registry.report_symbol_not_found(self.symbol)
                 # ลองหา symbol ใหม่
                 symbols = mt5.symbols_get()
                 if symbols:
@@ -597,6 +1247,36 @@ class OrderManager:
             return False
 
 
+    def _get_preflight(self):
+        """🛫 preflight ของ connector (None ถ้ายังไม่เริ่ม)"""
+        preflight = getattr(self.mt5_connector, 'trading_preflight', None)
+        return preflight if preflight and preflight.is_running else None
+
+    def _check_trading_permissions(self) -> Tuple[bool, str]:
+        """🛫 ตรวจสิทธิ์การเทรด - จาก preflight ถ้ามี, ไม่งั้นถาม terminal ตรงๆ"""
+        preflight = self._get_preflight()
+        if preflight:
+            return preflight.check()
+        
+        terminal_info = mt5.terminal_info()
+        if terminal_info is None:
+            return False, "MT5 terminal not accessible"
+        
+        account_info = mt5.account_info()
+        if account_info is None:
+            return False, "MT5 account not logged in"
+        if not account_info.trade_allowed:
+            return False, "Trading not allowed on account"
+        if not account_info.trade_expert:
+            return False, "Expert Advisor trading not allowed"
+        return True, "OK"
+
+    def _invalidate_preflight(self, reason: str):
+        """⚠️ ส่งออเดอร์ล้มเหลว -> refresh preflight ทันที"""
+        preflight = self._get_preflight()
+        if preflight:
+            preflight.invalidate(reason)
+
     def _get_current_price(self) -> float:
         """ดึงราคาปัจจุบัน - ใช้ชื่อเดิม - แก้ไขแล้ว"""
         try:
@@ -614,17 +1294,12 @@ class OrderManager:
             return 0.0
 
     def _check_daily_limits(self) -> bool:
-        """ตรวจสอบขีดจำกัดรายวัน - ใช้ชื่อเดิม"""
+        """ตรวจสอบขีดจำกัดรายวัน (sliding window 24 ชม.) - ใช้ชื่อเดิม"""
         try:
-            # ตรวจสอบว่าวันเปลี่ยนหรือไม่
-            today = datetime.now().date()
-            if today != self.last_reset_date:
-                self.daily_order_count = 0
-                self.last_reset_date = today
-            
-            # ตรวจสอบขีดจำกัด
-            if self.daily_order_count >= self.max_daily_orders:
-                print(f"⚠️ Daily order limit reached: {self.daily_order_count}/{self.max_daily_orders}")
+            allowed, retry_after = self.rate_limiter.check(ORDERS_PER_DAY)
+            if not allowed:
+                print(f"⚠️ Daily order limit reached: {self.daily_order_count}/{self.max_daily_orders} "
+                      f"(next slot in {retry_after / 60:.0f} min)")
                 return False
             
             return True
@@ -633,6 +1308,16 @@ class OrderManager:
             print(f"❌ Check daily limits error: {e}")
             return True  # Safe default
 
+    def _acquire_send_slot(self, max_wait: float = 1.0) -> bool:
+        """🪣 ขอ token ส่งออเดอร์ - รอได้ไม่เกิน max_wait (burst เกิน = รอ refill สั้นๆ)"""
+        allowed, retry_after = self.rate_limiter.try_acquire(ORDER_SEND_RATE)
+        if not allowed and retry_after <= max_wait:
+            time.sleep(retry_after)
+            allowed, retry_after = self.rate_limiter.try_acquire(ORDER_SEND_RATE)
+        if not allowed:
+            self.log(f"⏳ Order send rate limit - retry in {retry_after:.2f}s")
+        return allowed
+
     def _update_execution_stats(self, success: bool, execution_time: float, slippage: float):
         """อัปเดตสถิติการ execute - ใช้ชื่อเดิม"""
         try:
@@ -664,7 +1349,11 @@ class OrderManager:
     def _update_symbol_info(self):
         """อัปเดตข้อมูล Symbol - ใช้ชื่อเดิม"""
         try:
-            symbol_info = mt5.symbol_info(self.symbol)
+            # ใช้ metadata ที่ registry cache ไว้ก่อน (ไม่ต้อง IPC)
+            registry = getattr(self.mt5_connector, 'symbol_registry', None)
+            symbol_info = registry.get_meta() if registry else None
+            if symbol_info is None:
+                symbol_info = mt5.symbol_info(self.symbol)
             if symbol_info:
                 self.point_value = symbol_info.point
                 self.tick_size = symbol_info.trade_tick_size
@@ -713,7 +1402,7 @@ class OrderManager:
             )
             
             # Execute
-            result = self.place_market_order(order_request)
+            result = self.place_market_order_sync(order_request)
             
             # แปลงกลับเป็น legacy format
             return {
@@ -746,7 +1435,7 @@ class OrderManager:
                 max_slippage=20
             )
             
-            result = self.place_market_order(order_request)
+            result = self.place_market_order_sync(order_request)
             return result.success
             
         except Exception as e:
@@ -769,7 +1458,7 @@ class OrderManager:
                 max_slippage=20
             )
             
-            result = self.place_market_order(order_request)
+            result = self.place_market_order_sync(order_request)
             return result.success
             
         except Exception as e:
@@ -782,7 +1471,8 @@ class OrderManager:
             if not self.mt5_connector.is_connected:
                 return []
             
-            positions = mt5.positions_get(symbol=self.symbol)
+            book = self._get_position_book()
+            positions = book.get_positions() if book else mt5.positions_get(symbol=self.symbol)
             if not positions:
                 return []
             
@@ -809,7 +1499,8 @@ class OrderManager:
             if not self.mt5_connector.is_connected:
                 return []
             
-            orders = mt5.orders_get(symbol=self.symbol)
+            book = self._get_position_book()
+            orders = book.get_orders() if book else mt5.orders_get(symbol=self.symbol)
             if not orders:
                 return []
             
@@ -831,6 +1522,11 @@ class OrderManager:
             self.log(f"❌ Get pending orders error: {e}")
             return []
 
+    def _get_position_book(self):
+        """📒 position book ของ connector (None ถ้ายังไม่ reconcile)"""
+        book = getattr(self.mt5_connector, 'position_book', None)
+        return book if book is not None and book.is_ready else None
+
     def _determine_order_reason(self, reasoning: str) -> OrderReason:
         """แปลง reasoning text เป็น OrderReason - ใช้ชื่อเดิม"""
         reasoning_lower = reasoning.lower()
@@ -0,0 +1,216 @@
+"""
+📮 Order Execution Queue - Asynchronous Order Submission with Backpressure
+order_queue.py
+
+🎯 FEATURES:
+✅ Worker thread แยกสำหรับส่งออเดอร์ (rule engine ไม่ต้องรอ retry / filling loop)
+✅ submit() คืน Future ทันที
+✅ Bounded queue - คิวเต็ม = ปฏิเสธทันที (ข้าม signal แทนการสะสมออเดอร์เก่า)
+✅ ออเดอร์ที่รอนานเกิน max_order_age ถูกยกเลิกก่อนส่ง (ราคาเปลี่ยนไปแล้ว)
+✅ halt() - ยกเลิกออเดอร์ที่ค้างในคิวและปฏิเสธออเดอร์ใหม่จนกว่าจะ resume()
+
+** วิเคราะห์ตลาดต่อได้ระหว่างที่ออเดอร์กำลังส่ง **
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+@dataclass
+class QueuedOrder:
+    """ออเดอร์ที่รอใน queue"""
+    request: Any
+    future: Future
+    executor: Optional[Callable] = None      # None = ใช้ executor หลักของ queue
+    enqueued_at: float = field(default_factory=time.time)
+
+# ========================================================================================
+# 📮 ORDER EXECUTION QUEUE
+# ========================================================================================
+
+class OrderExecutionQueue:
+    """
+    📮 คิวส่งออเดอร์แบบ asynchronous
+
+    - executor: function(request) -> result ที่ทำงานบน worker thread
+    - stale_result_factory: function(request, message) -> result สำหรับออเดอร์ที่ไม่ได้ส่ง
+    """
+
+    def __init__(self, executor: Callable, stale_result_factory: Callable,
+                 max_depth: int = 5, max_order_age: float = 5.0, workers: int = 1):
+        self.executor = executor
+        self.stale_result_factory = stale_result_factory
+        self.max_depth = max(1, int(max_depth))
+        self.max_order_age = max_order_age
+        self.worker_count = max(1, int(workers))
+
+        self._queue = queue.Queue(maxsize=self.max_depth)
+        self._workers: List[threading.Thread] = []
+        self._lock = threading.Lock()
+        self.is_running = False
+        self.in_progress = 0
+        self.halt_reason: Optional[str] = None
+
+        self.stats = {
+            "submitted": 0,
+            "executed": 0,
+            "rejected_full": 0,
+            "rejected_halted": 0,
+            "cancelled_halt": 0,
+            "expired": 0,
+            "errors": 0,
+            "avg_queue_wait_ms": 0.0,
+            "max_depth_seen": 0
+        }
+
+    # ========================================================================================
+    # 🎮 CONTROL
+    # ========================================================================================
+
+    def start(self):
+        """เริ่ม worker threads"""
+        with self._lock:
+            if self.is_running:
+                return
+            self.is_running = True
+            self._workers = [
+                threading.Thread(target=self._worker_loop, daemon=True, name=f"OrderWorker-{i}")
+                for i in range(self.worker_count)
+            ]
+            for worker in self._workers:
+                worker.start()
+        self.log(f"📮 Order queue started (depth {self.max_depth}, workers {self.worker_count})")
+
+    def stop(self):
+        """หยุด worker threads - ออเดอร์ที่ค้างในคิวถูกยกเลิก"""
+        self.is_running = False
+        self._drain("Order queue stopped")
+        for _ in self._workers:
+            try:
+                self._queue.put_nowait(None)
+            except queue.Full:
+                break
+        for worker in self._workers:
+            worker.join(timeout=2)
+        self._workers = []
+
+    def halt(self, reason: str) -> int:
+        """⛔ ปฏิเสธออเดอร์ใหม่และยกเลิกที่ค้างในคิว (worker ยังทำงาน) - คืนจำนวนที่ยกเลิก"""
+        self.halt_reason = reason
+        cancelled = self._drain(f"Order queue halted: {reason}")
+        self.stats["cancelled_halt"] += cancelled
+        return cancelled
+
+    def resume(self):
+        """▶️ รับออเดอร์ใหม่อีกครั้งหลัง halt()"""
+        self.halt_reason = None
+
+    @property
+    def is_halted(self) -> bool:
+        return self.halt_reason is not None
+
+    def _drain(self, message: str) -> int:
+        """ยกเลิกทุกออเดอร์ที่ยังรอในคิว"""
+        drained = 0
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None and item.future.set_running_or_notify_cancel():
+                item.future.set_result(self.stale_result_factory(item.request, message))
+                drained += 1
+        return drained
+
+    # ========================================================================================
+    # 📤 SUBMIT
+    # ========================================================================================
+
+    def can_accept(self) -> bool:
+        """📊 มีที่ว่างในคิวหรือไม่ (ใช้ตัดสินใจก่อนสร้างออเดอร์)"""
+        return not self.is_halted and self._queue.qsize() < self.max_depth
+
+    def submit(self, request: Any, executor: Optional[Callable] = None) -> Optional[Future]:
+        """📤 ส่งออเดอร์เข้าคิว - คืน Future หรือ None ถ้าคิวเต็ม / halt อยู่"""
+        if self.is_halted:
+            self.stats["rejected_halted"] += 1
+            return None
+        if not self.is_running:
+            self.start()
+
+        future = Future()
+        try:
+            self._queue.put_nowait(QueuedOrder(request=request, future=future, executor=executor))
+        except queue.Full:
+            self.stats["rejected_full"] += 1
+            return None
+
+        self.stats["submitted"] += 1
+        self.stats["max_depth_seen"] = max(self.stats["max_depth_seen"], self._queue.qsize())
+        return future
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    # ========================================================================================
+    # 👷 WORKER
+    # ========================================================================================
+
+    def _worker_loop(self):
+        while self.is_running:
+            item = self._queue.get()
+            if item is None:
+                continue
+            if not item.future.set_running_or_notify_cancel():
+                continue
+
+            # halt ระหว่างที่ worker ดึงออเดอร์ออกจากคิว - ไม่ส่ง
+            if self.is_halted:
+                self.stats["cancelled_halt"] += 1
+                item.future.set_result(self.stale_result_factory(
+                    item.request, f"Order queue halted: {self.halt_reason}"))
+                continue
+
+            wait = time.time() - item.enqueued_at
+            self.stats["avg_queue_wait_ms"] = self.stats["avg_queue_wait_ms"] * 0.9 + wait * 1000 * 0.1
+
+            if self.max_order_age and wait > self.max_order_age:
+                self.stats["expired"] += 1
+                item.future.set_result(self.stale_result_factory(
+                    item.request, f"Order expired in queue after {wait:.1f}s"))
+                continue
+
+            with self._lock:
+                self.in_progress += 1
+            try:
+                result = (item.executor or self.executor)(item.request)
+                self.stats["executed"] += 1
+                item.future.set_result(result)
+            except Exception as e:
+                self.stats["errors"] += 1
+                self.log(f"❌ Order execution error: {e}")
+                item.future.set_result(self.stale_result_factory(item.request, f"Execution error: {e}"))
+            finally:
+                with self._lock:
+                    self.in_progress -= 1
+
+    def get_status(self) -> Dict:
+        """📊 สถานะคิว"""
+        return {
+            "is_running": self.is_running,
+            "depth": self._queue.qsize(),
+            "max_depth": self.max_depth,
+            "in_progress": self.in_progress,
+            "halt_reason": self.halt_reason,
+            **self.stats
+        }
+
+    def log(self, message: str):
+        """Log message with timestamp"""
+        timestamp = datetime.now().strftime("%H:%M:%S.%f")[:-3]
+        print(f"[{timestamp}] 📮 OrderQueue: {message}")
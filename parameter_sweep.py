@@ -0,0 +1,205 @@
+"""
+🧪 Parameter Sweep - Parallel Grid Search over Rule Thresholds
+parameter_sweep.py
+
+🎯 FEATURES:
+✅ Grid ของ minimum_signal_strength / volume_thresholds / body_ratio_thresholds / score weights
+✅ กระจายงานด้วย process pool (ใช้ทุก core)
+✅ แท่งเทียนแชร์ผ่าน memory-mapped .npy (ไม่ pickle ข้อมูลไปทุก worker)
+✅ จัดอันดับตาม signal count / hit rate / simulated PnL
+
+** จูน config ได้ในไม่กี่นาทีแทนการลองบนบัญชีจริงหลายวัน **
+"""
+
+import argparse
+import itertools
+import json
+import os
+import tempfile
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field, replace
+from typing import Dict, List, Optional, Tuple
+from backtest_engine import BacktestSettings, generate_synthetic_bars, load_bars, run_backtest
+
+# แท่งเทียนของ worker (โหลดครั้งเดียวตอนเริ่ม process - เป็น memmap ไม่ใช่ copy)
+_worker_rates = None
+_worker_outcome = None
+
+# ========================================================================================
+# ⚙️ SWEEP DEFINITION
+# ========================================================================================
+
+@dataclass
+class SweepGrid:
+    """ค่าที่จะลองในแต่ละมิติ (ทุก combination = 1 configuration)"""
+    minimum_signal_strength: List[float] = field(default_factory=lambda: [0.3, 0.4, 0.5, 0.6, 0.7])
+    volume_thresholds: List[Tuple[float, ...]] = field(default_factory=lambda: [
+        (2.0, 1.5, 1.2, 0.8, 0.5),
+        (2.5, 1.8, 1.3, 0.9, 0.6),
+        (1.8, 1.3, 1.1, 0.7, 0.4)
+    ])
+    body_ratio_thresholds: List[Tuple[float, ...]] = field(default_factory=lambda: [
+        (0.7, 0.4, 0.2),
+        (0.6, 0.35, 0.15),
+        (0.8, 0.5, 0.25)
+    ])
+    score_weights: List[Tuple[float, ...]] = field(default_factory=lambda: [
+        (0.40, 0.25, 0.25, 0.10),
+        (0.50, 0.20, 0.20, 0.10),
+        (0.35, 0.30, 0.25, 0.10)
+    ])
+
+    def iter_settings(self, base: BacktestSettings):
+        """🔄 สร้าง BacktestSettings ทุก combination"""
+        for strength, volume, body, weights in itertools.product(
+                self.minimum_signal_strength, self.volume_thresholds,
+                self.body_ratio_thresholds, self.score_weights):
+            yield replace(base, minimum_signal_strength=strength, volume_thresholds=tuple(volume),
+                          body_ratio_thresholds=tuple(body), score_weights=tuple(weights))
+
+    @property
+    def size(self) -> int:
+        return (len(self.minimum_signal_strength) * len(self.volume_thresholds) *
+                len(self.body_ratio_thresholds) * len(self.score_weights))
+
+@dataclass
+class OutcomeSettings:
+    """วิธีวัดผลของแต่ละสัญญาณ (ถือ N แท่งแล้วปิดที่ close)"""
+    horizon_bars: int = 12                # 12 x M5 = 1 ชั่วโมง
+    spread_cost: float = 0.30             # ต้นทุน spread ต่อ 1 oz (USD)
+    contract_size: float = 100.0          # XAUUSD 1 lot = 100 oz
+
+# ========================================================================================
+# 👷 WORKER SIDE
+# ========================================================================================
+
+def _init_worker(rates_path: str, outcome: OutcomeSettings):
+    """👷 เปิด memmap ครั้งเดียวต่อ process"""
+    global _worker_rates, _worker_outcome
+    _worker_rates = np.load(rates_path, mmap_mode="r")
+    _worker_outcome = outcome
+
+def _evaluate_settings(settings: BacktestSettings) -> Dict:
+    """👷 รัน backtest 1 configuration แล้ววัด hit rate / PnL"""
+    result = run_backtest(_worker_rates, settings)
+    return {"settings": settings, **score_signals(_worker_rates, result, _worker_outcome)}
+
+def score_signals(rates: np.ndarray, result, outcome: OutcomeSettings) -> Dict:
+    """📊 วัดผลสัญญาณ: ถือ horizon_bars แท่ง (vectorized)"""
+    close = rates["close"]
+    exit_index = np.minimum(result.signal_index + outcome.horizon_bars, len(close) - 1)
+    move = (close[exit_index] - close[result.signal_index]) * result.direction
+
+    pnl = (move - outcome.spread_cost) * result.lot_size * outcome.contract_size
+    count = result.signal_count
+
+    return {
+        "signals": count,
+        "hit_rate": float(np.mean(move > outcome.spread_cost)) if count else 0.0,
+        "pnl": float(pnl.sum()) if count else 0.0,
+        "average_pnl": float(pnl.mean()) if count else 0.0,
+        "max_drawdown": _max_drawdown(pnl) if count else 0.0
+    }
+
+def _max_drawdown(pnl: np.ndarray) -> float:
+    equity = np.cumsum(pnl)
+    peak = np.maximum.accumulate(np.concatenate(([0.0], equity)))[1:]
+    return float(np.max(peak - equity))
+
+# ========================================================================================
+# 🧪 SWEEP RUNNER
+# ========================================================================================
+
+class ParameterSweep:
+    """
+    🧪 รัน grid search แบบขนาน
+
+    - เขียนแท่งเทียนลง .npy ครั้งเดียว -> worker เปิดเป็น memmap (OS แชร์ page cache)
+    - ส่งเฉพาะ BacktestSettings (เล็ก) ไปแต่ละ task
+    """
+
+    def __init__(self, rates: np.ndarray, base_settings: Optional[BacktestSettings] = None,
+                 outcome: Optional[OutcomeSettings] = None, workers: Optional[int] = None):
+        self.rates = rates
+        self.base_settings = base_settings or BacktestSettings()
+        self.outcome = outcome or OutcomeSettings()
+        self.workers = workers or os.cpu_count() or 1
+        self.results: List[Dict] = []
+        self.elapsed_seconds = 0.0
+
+    def run(self, grid: SweepGrid, min_signals: int = 10) -> List[Dict]:
+        """🚀 รันทุก configuration แล้วคืนผลที่จัดอันดับแล้ว"""
+        started = time.perf_counter()
+        self.log(f"🚀 Sweeping {grid.size} configurations on {len(self.rates)} bars "
+                 f"with {self.workers} workers")
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            rates_path = os.path.join(temp_dir, "rates.npy")
+            np.save(rates_path, np.ascontiguousarray(self.rates))
+
+            with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                     initargs=(rates_path, self.outcome)) as executor:
+                chunksize = max(1, grid.size // (self.workers * 4))
+                results = list(executor.map(_evaluate_settings,
+                                            grid.iter_settings(self.base_settings),
+                                            chunksize=chunksize))
+
+        self.results = self.rank(results, min_signals)
+        self.elapsed_seconds = time.perf_counter() - started
+        self.log(f"✅ Sweep finished in {self.elapsed_seconds:.1f}s")
+        return self.results
+
+    @staticmethod
+    def rank(results: List[Dict], min_signals: int = 10) -> List[Dict]:
+        """🏆 เรียงตาม PnL -> hit rate -> signal count (ตัดชุดที่สัญญาณน้อยเกินไป)"""
+        eligible = [r for r in results if r["signals"] >= min_signals]
+        return sorted(eligible, key=lambda r: (r["pnl"], r["hit_rate"], r["signals"]), reverse=True)
+
+    def get_top(self, n: int = 10) -> List[Dict]:
+        """🏆 N configuration ที่ดีที่สุด (settings แปลงเป็น dict)"""
+        top = []
+        for result in self.results[:n]:
+            settings = result["settings"]
+            top.append({
+                "minimum_signal_strength": settings.minimum_signal_strength,
+                "volume_thresholds": settings.volume_thresholds,
+                "body_ratio_thresholds": settings.body_ratio_thresholds,
+                "score_weights": settings.score_weights,
+                **{k: v for k, v in result.items() if k != "settings"}
+            })
+        return top
+
+    def log(self, message: str):
+        """Log message with timestamp"""
+        timestamp = time.strftime("%H:%M:%S")
+        print(f"[{timestamp}] 🧪 ParameterSweep: {message}")
+
+# ========================================================================================
+# 🧪 COMMAND LINE
+# ========================================================================================
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parallel rule threshold sweep")
+    parser.add_argument("data", nargs="?", help="CSV หรือ NPZ ของแท่งเทียน (ไม่ใส่ = ใช้ข้อมูลสังเคราะห์ 1 ปี)")
+    parser.add_argument("--config", action="append", default=[], help="config JSON สำหรับค่าพื้นฐาน")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--horizon", type=int, default=12, help="จำนวนแท่งที่ถือก่อนวัดผล")
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    merged_config = {}
+    for config_path in args.config:
+        with open(config_path, "r", encoding="utf-8") as f:
+            merged_config.update(json.load(f))
+
+    bars = load_bars(args.data) if args.data else generate_synthetic_bars()
+    sweep = ParameterSweep(bars, BacktestSettings.from_config(merged_config),
+                           OutcomeSettings(horizon_bars=args.horizon), workers=args.workers)
+    sweep.run(SweepGrid())
+
+    for rank, row in enumerate(sweep.get_top(args.top), 1):
+        print(f"#{rank:2d} pnl={row['pnl']:9.2f} hit={row['hit_rate']:.1%} signals={row['signals']:5d} | "
+              f"min_strength={row['minimum_signal_strength']} volume={row['volume_thresholds']} "
+              f"body={row['body_ratio_thresholds']} weights={row['score_weights']}")
@@ -0,0 +1,405 @@
+"""
+📒 Position Book - Local Shadow Book of Positions and Pending Orders
+position_book.py
+
+🎯 FEATURES:
+✅ ผล order_send ถูก apply เข้า book ทันที (ผ่าน send listener ของ gateway)
+✅ Reconcile กับ positions_get / orders_get เป็นระยะบน background thread
+✅ Delta จาก (ticket, volume, price) - เพิ่ม / ลบ / เปลี่ยน เฉพาะที่ต่างจริง
+✅ Snapshot แบบ versioned + immutable - ผู้อ่านไม่ต้อง IPC และไม่ต้อง lock
+
+** อ่าน positions ได้ทันทีจาก memory **
+"""
+
+import threading
+import time
+from dataclasses import dataclass, field, replace
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+from mt5_gateway import mt5_gateway as mt5   # IPC ทั้งหมดผ่าน gateway thread เดียว
+
+# ========================================================================================
+# 📊 BOOK RECORDS (ชื่อ field เหมือน TradePosition / TradeOrder ของ MT5)
+# ========================================================================================
+
+@dataclass(frozen=True)
+class BookPosition:
+    """position ใน book"""
+    ticket: int
+    symbol: str
+    type: int
+    volume: float
+    price_open: float
+    price_current: float
+    profit: float = 0.0
+    swap: float = 0.0
+    commission: float = 0.0
+    sl: float = 0.0
+    tp: float = 0.0
+    time: int = 0
+    comment: str = ""
+    magic: int = 0
+    local: bool = False                  # True = มาจากผล order_send ยังไม่ยืนยันกับ terminal
+
+@dataclass(frozen=True)
+class BookOrder:
+    """pending order ใน book"""
+    ticket: int
+    symbol: str
+    type: int
+    volume_initial: float
+    volume_current: float
+    price_open: float
+    sl: float = 0.0
+    tp: float = 0.0
+    time_setup: int = 0
+    comment: str = ""
+    magic: int = 0
+    local: bool = False
+
+@dataclass(frozen=True)
+class BookSnapshot:
+    """snapshot ที่ไม่เปลี่ยนแปลง - version เพิ่มเมื่อ positions / orders เปลี่ยน (ราคา / PnL ที่สดขึ้นไม่นับ)"""
+    version: int = 0
+    positions: Dict[int, BookPosition] = field(default_factory=dict)
+    orders: Dict[int, BookOrder] = field(default_factory=dict)
+    reconciled_at: float = 0.0
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.reconciled_at if self.reconciled_at else float("inf")
+
+# ========================================================================================
+# 📒 POSITION BOOK
+# ========================================================================================
+
+class PositionBook:
+    """
+    📒 shadow book ของ positions / pending orders สำหรับ symbol ที่เทรด
+
+    - apply_order_result() ถูกเรียกจาก gateway หลัง order_send ทุกครั้ง
+    - reconcile() ดึงจาก terminal แล้ว apply เฉพาะ delta
+    - snapshot() / get_positions() / get_orders() อ่านจาก memory
+    """
+
+    VOLUME_TOLERANCE = 1e-8
+
+    def __init__(self, symbol_provider: Callable[[], Optional[str]],
+                 reconcile_interval: float = 2.0, local_grace_seconds: float = 1.0):
+        self.symbol_provider = symbol_provider
+        self.reconcile_interval = reconcile_interval
+        self.local_grace_seconds = local_grace_seconds
+
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._snapshot = BookSnapshot()
+        # ticket -> เวลาที่เปลี่ยนในเครื่อง (reconcile ที่เริ่มก่อนเวลานี้ห้ามทับ)
+        self._local_changes: Dict[int, float] = {}
+
+        self.is_running = False
+        self.reconcile_thread = None
+
+        self.stats = {
+            "local_applies": 0,
+            "reconciles": 0,
+            "positions_added": 0,
+            "positions_removed": 0,
+            "positions_changed": 0,
+            "orders_added": 0,
+            "orders_removed": 0,
+            "local_confirmed": 0,
+            "reconcile_errors": 0
+        }
+
+    # ========================================================================================
+    # 🎮 CONTROL
+    # ========================================================================================
+
+    def start(self):
+        """เริ่ม reconcile loop + รับผล order_send จาก gateway"""
+        if self.is_running:
+            return
+        mt5.add_send_listener(self.apply_order_result)
+        self.reconcile()
+        self.is_running = True
+        self.reconcile_thread = threading.Thread(target=self._reconcile_loop, daemon=True, name="PositionBook")
+        self.reconcile_thread.start()
+
+    def stop(self):
+        """หยุด reconcile loop"""
+        self.is_running = False
+        mt5.remove_send_listener(self.apply_order_result)
+        self._wakeup.set()
+        if self.reconcile_thread:
+            self.reconcile_thread.join(timeout=2)
+        with self._lock:
+            self._snapshot = BookSnapshot(version=self._snapshot.version + 1)
+            self._local_changes.clear()
+
+    def request_reconcile(self):
+        """🔄 ขอ reconcile รอบถัดไปทันที"""
+        if self.is_running:
+            self._wakeup.set()
+        else:
+            self.reconcile()
+
+    def _reconcile_loop(self):
+        while self.is_running:
+            self._wakeup.wait(self.reconcile_interval)
+            self._wakeup.clear()
+            if self.is_running:
+                self.reconcile()
+
+    # ========================================================================================
+    # 📖 READ (ไม่มี IPC)
+    # ========================================================================================
+
+    @property
+    def is_ready(self) -> bool:
+        """reconcile กับ terminal แล้วอย่างน้อย 1 ครั้ง"""
+        return self._snapshot.reconciled_at > 0
+
+    @property
+    def version(self) -> int:
+        return self._snapshot.version
+
+    def snapshot(self) -> BookSnapshot:
+        """📸 snapshot ปัจจุบัน (immutable - อ่านได้จากทุก thread)"""
+        return self._snapshot
+
+    def get_positions(self) -> List[BookPosition]:
+        return list(self._snapshot.positions.values())
+
+    def get_orders(self) -> List[BookOrder]:
+        return list(self._snapshot.orders.values())
+
+    # ========================================================================================
+    # ⚡ LOCAL APPLY (ผล order_send)
+    # ========================================================================================
+
+    def apply_order_result(self, request: Dict, result):
+        """⚡ apply ผล order_send ที่สำเร็จเข้า book ทันที"""
+        try:
+            if not request or result is None:
+                return
+            if result.retcode not in (mt5.TRADE_RETCODE_DONE, mt5.TRADE_RETCODE_PLACED):
+                return
+
+            action = request.get("action")
+            symbol = request.get("symbol")
+            if symbol and symbol != self.symbol_provider():
+                return
+
+            with self._lock:
+                positions = dict(self._snapshot.positions)
+                orders = dict(self._snapshot.orders)
+                now = time.time()
+                changed = []
+
+                if action == mt5.TRADE_ACTION_DEAL:
+                    position_ticket = request.get("position")
+                    if position_ticket:
+                        changed.append(position_ticket)
+                        self._reduce_position(positions, position_ticket, result.volume or request.get("volume", 0.0))
+                    elif result.order:
+                        is_buy = request.get("type") == mt5.ORDER_TYPE_BUY
+                        positions[result.order] = BookPosition(
+                            ticket=result.order,
+                            symbol=symbol,
+                            type=mt5.POSITION_TYPE_BUY if is_buy else mt5.POSITION_TYPE_SELL,
+                            volume=result.volume or request.get("volume", 0.0),
+                            price_open=result.price,
+                            price_current=result.price,
+                            sl=request.get("sl", 0.0),
+                            tp=request.get("tp", 0.0),
+                            time=int(now),
+                            comment=request.get("comment", ""),
+                            magic=request.get("magic", 0),
+                            local=True
+                        )
+                        changed.append(result.order)
+
+                elif action == mt5.TRADE_ACTION_CLOSE_BY:
+                    first = positions.get(request.get("position"))
+                    second = positions.get(request.get("position_by"))
+                    if first and second:
+                        volume = min(first.volume, second.volume)
+                        self._reduce_position(positions, first.ticket, volume)
+                        self._reduce_position(positions, second.ticket, volume)
+                        changed.extend([first.ticket, second.ticket])
+
+                elif action == mt5.TRADE_ACTION_SLTP:
+                    position = positions.get(request.get("position"))
+                    if position:
+                        positions[position.ticket] = replace(position, sl=request.get("sl", 0.0),
+                                                             tp=request.get("tp", 0.0))
+
+                elif action == mt5.TRADE_ACTION_PENDING and result.order:
+                    volume = result.volume or request.get("volume", 0.0)
+                    orders[result.order] = BookOrder(
+                        ticket=result.order,
+                        symbol=symbol,
+                        type=request.get("type"),
+                        volume_initial=volume,
+                        volume_current=volume,
+                        price_open=request.get("price", result.price),
+                        sl=request.get("sl", 0.0),
+                        tp=request.get("tp", 0.0),
+                        time_setup=int(now),
+                        comment=request.get("comment", ""),
+                        magic=request.get("magic", 0),
+                        local=True
+                    )
+                    changed.append(result.order)
+
+                elif action == mt5.TRADE_ACTION_REMOVE:
+                    orders.pop(request.get("order"), None)
+                    changed.append(request.get("order"))
+
+                else:
+                    return
+
+                for ticket in changed:
+                    self._local_changes[ticket] = now
+                self.stats["local_applies"] += 1
+                self._publish(positions, orders)
+
+        except Exception as e:
+            self.log(f"❌ Apply order result error: {e}")
+
+    def _reduce_position(self, positions: Dict[int, BookPosition], ticket: int, volume: float):
+        position = positions.get(ticket)
+        if position is None:
+            return
+        remaining = round(position.volume - volume, 8)
+        if remaining <= self.VOLUME_TOLERANCE:
+            del positions[ticket]
+        else:
+            positions[ticket] = replace(position, volume=remaining)
+
+    # ========================================================================================
+    # 🔄 RECONCILE
+    # ========================================================================================
+
+    def reconcile(self) -> Tuple[int, int, int]:
+        """🔄 เทียบกับ terminal - คืน (added, removed, changed) ของ positions"""
+        symbol = self.symbol_provider()
+        if not symbol:
+            return 0, 0, 0
+        try:
+            fetch_started = time.time()
+            terminal_positions = mt5.positions_get(symbol=symbol)
+            terminal_orders = mt5.orders_get(symbol=symbol)
+            if terminal_positions is None or terminal_orders is None:
+                # None = error (ไม่มี position จะได้ tuple ว่าง) - ไม่ล้าง book
+                self.stats["reconcile_errors"] += 1
+                return 0, 0, 0
+        except Exception as e:
+            self.stats["reconcile_errors"] += 1
+            self.log(f"❌ Reconcile error: {e}")
+            return 0, 0, 0
+
+        with self._lock:
+            positions = dict(self._snapshot.positions)
+            orders = dict(self._snapshot.orders)
+            # ticket ที่เปลี่ยนในเครื่องหลังเริ่มดึงข้อมูล - ข้อมูลจาก terminal เก่ากว่า
+            protected = {ticket for ticket, changed_at in self._local_changes.items()
+                         if changed_at >= fetch_started - self.local_grace_seconds}
+
+            added, removed, changed = self._apply_position_delta(positions, terminal_positions, protected)
+            orders_added, orders_removed = self._apply_order_delta(orders, terminal_orders, protected)
+
+            self._local_changes = {ticket: changed_at for ticket, changed_at in self._local_changes.items()
+                                   if ticket in protected}
+            self.stats["reconciles"] += 1
+            self.stats["positions_added"] += added
+            self.stats["positions_removed"] += removed
+            self.stats["positions_changed"] += changed
+            self.stats["orders_added"] += orders_added
+            self.stats["orders_removed"] += orders_removed
+            # version เพิ่มเฉพาะเมื่อมี delta - reconcile ที่ไม่มีอะไรเปลี่ยนไม่ทำให้ผู้อ่าน reload
+            self._publish(positions, orders, reconciled_at=time.time(),
+                          bump=bool(added or removed or changed or orders_added or orders_removed))
+
+        if added or removed or changed:
+            self.log(f"🔄 Reconciled: +{added} -{removed} ~{changed} positions "
+                     f"(+{orders_added} -{orders_removed} orders)")
+        return added, removed, changed
+
+    def _apply_position_delta(self, positions: Dict[int, BookPosition], terminal_positions,
+                              protected: set) -> Tuple[int, int, int]:
+        added = removed = changed = 0
+        seen = set()
+        for tp in terminal_positions:
+            seen.add(tp.ticket)
+            if tp.ticket in protected:
+                continue
+            current = positions.get(tp.ticket)
+            record = BookPosition(
+                ticket=tp.ticket, symbol=tp.symbol, type=tp.type, volume=tp.volume,
+                price_open=tp.price_open, price_current=tp.price_current,
+                profit=getattr(tp, 'profit', 0.0), swap=getattr(tp, 'swap', 0.0),
+                commission=getattr(tp, 'commission', 0.0), sl=tp.sl, tp=tp.tp, time=tp.time,
+                comment=getattr(tp, 'comment', ''), magic=getattr(tp, 'magic', 0)
+            )
+            if current is None:
+                added += 1
+            elif (abs(current.volume - tp.volume) > self.VOLUME_TOLERANCE or
+                  current.price_open != tp.price_open):
+                changed += 1
+            elif current.local:
+                self.stats["local_confirmed"] += 1
+            positions[tp.ticket] = record
+
+        for ticket in [t for t in positions if t not in seen and t not in protected]:
+            del positions[ticket]
+            removed += 1
+        return added, removed, changed
+
+    def _apply_order_delta(self, orders: Dict[int, BookOrder], terminal_orders,
+                           protected: set) -> Tuple[int, int]:
+        added = removed = 0
+        seen = set()
+        for to in terminal_orders:
+            seen.add(to.ticket)
+            if to.ticket in protected:
+                continue
+            if to.ticket not in orders:
+                added += 1
+            orders[to.ticket] = BookOrder(
+                ticket=to.ticket, symbol=to.symbol, type=to.type, volume_initial=to.volume_initial,
+                volume_current=to.volume_current, price_open=to.price_open, sl=to.sl, tp=to.tp,
+                time_setup=to.time_setup, comment=getattr(to, 'comment', ''), magic=getattr(to, 'magic', 0)
+            )
+
+        for ticket in [t for t in orders if t not in seen and t not in protected]:
+            del orders[ticket]
+            removed += 1
+        return added, removed
+
+    def _publish(self, positions: Dict[int, BookPosition], orders: Dict[int, BookOrder],
+                 reconciled_at: Optional[float] = None, bump: bool = True):
+        """📸 แทนที่ snapshot ทั้งก้อน (เรียกภายใต้ lock) - bump=False = ข้อมูลเดิม (ราคา/PnL สดขึ้น) version เดิม"""
+        self._snapshot = BookSnapshot(
+            version=self._snapshot.version + 1 if bump else self._snapshot.version,
+            positions=positions,
+            orders=orders,
+            reconciled_at=reconciled_at if reconciled_at is not None else self._snapshot.reconciled_at
+        )
+
+    def get_status(self) -> Dict:
+        """📊 สถานะ book"""
+        snapshot = self._snapshot
+        return {
+            "is_running": self.is_running,
+            "version": snapshot.version,
+            "positions": len(snapshot.positions),
+            "orders": len(snapshot.orders),
+            "age_seconds": round(snapshot.age, 2) if snapshot.reconciled_at else None,
+            **self.stats
+        }
+
+    def log(self, message: str):
+        """Log message with timestamp"""
+        timestamp = datetime.now().strftime("%H:%M:%S.%f")[:-3]
+        print(f"[{timestamp}] 📒 PositionBook: {message}")
@@ -18,10 +18,15 @@ from datetime import datetime, timedelta
 from typing import Dict, List, Tuple, Optional, Any
 from dataclasses import dataclass, field
 from enum import Enum
-import MetaTrader5 as mt5
+from mt5_gateway import mt5_gateway as mt5   # IPC ทั้งหมดผ่าน gateway thread เดียว
 import numpy as np
 from collections import deque, defaultdict
 import statistics
+from concurrent.futures import ThreadPoolExecutor
+from hedge_index import HedgeIndex
+from hedge_solver import HedgeSolver, HedgeCandidate, HedgeObjective
+from position_table import PositionTable
+from mark_to_market import MarkToMarketEngine
 
 class PositionType(Enum):
     """ประเภท Position"""
@@ -56,30 +61,80 @@ class RecoveryStrategy(Enum):
     STRATEGIC_WAIT = "STRATEGIC_WAIT"              # รอโอกาสที่ดีกว่า
     EMERGENCY_CLOSE = "EMERGENCY_CLOSE"            # ปิดฉุกเฉิน
 
-@dataclass
 class Position:
-    """ข้อมูล Position from REAL MT5 - Enhanced with 4D Analysis"""
-    ticket: int
-    symbol: str
-    type: PositionType
-    volume: float
-    open_price: float
-    current_price: float
-    profit: float
-    swap: float
-    commission: float
-    open_time: datetime
-    age_hours: float
-    comment: str
-    magic: int
-    
-    # 4D Analysis fields
-    four_d_value_score: float = 0.0                # Dimension 1: Position Value
-    four_d_safety_impact: float = 0.0              # Dimension 2: Safety Impact
-    four_d_hedge_potential: float = 0.0            # Dimension 3: Hedge Potential
-    four_d_market_alignment: float = 0.0           # Dimension 4: Market Alignment
-    recovery_priority: float = 0.0                 # Priority for recovery
-    hedge_candidates: List[int] = field(default_factory=list)  # Potential hedge partners
+    """ข้อมูล Position from REAL MT5 - Enhanced with 4D Analysis
+    
+    record แบบ __slots__ - ticket เดิมถูกแก้ค่าในที่เดิม (refresh) แทนการสร้าง object ใหม่ทุกรอบ
+    """
+    __slots__ = ("ticket", "symbol", "type", "volume", "open_price", "current_price", "profit",
+                 "swap", "commission", "open_time", "age_hours", "comment", "magic", "_table")
+    
+    def __init__(self, ticket: int, symbol: str, type: PositionType, volume: float, open_price: float,
+                 current_price: float, profit: float, swap: float, commission: float, open_time: datetime,
+                 age_hours: float, comment: str, magic: int, _table: Any = None):
+        self.ticket = ticket
+        self.symbol = symbol
+        self.type = type
+        self.volume = volume
+        self.open_price = open_price
+        self.current_price = current_price
+        self.profit = profit
+        self.swap = swap
+        self.commission = commission
+        self.open_time = open_time
+        self.age_hours = age_hours
+        self.comment = comment
+        self.magic = magic
+        
+        # 4D Analysis - คะแนนอยู่ใน PositionTable (อ่านตาม ticket)
+        self._table = _table
+    
+    def refresh(self, volume: float, current_price: float, profit: float, swap: float,
+                commission: float, age_hours: float):
+        """🔄 อัปเดตค่าที่เปลี่ยนได้ของ position ที่ยังเปิดอยู่ (in place)"""
+        self.volume = volume
+        self.current_price = current_price
+        self.profit = profit
+        self.swap = swap
+        self.commission = commission
+        self.age_hours = age_hours
+    
+    def __repr__(self) -> str:
+        return (f"Position(ticket={self.ticket}, type={self.type.value}, volume={self.volume}, "
+                f"open_price={self.open_price}, current_price={self.current_price}, profit={self.profit})")
+    
+    def _table_value(self, column: str, default=0.0):
+        return self._table.get(self.ticket, column, default) if self._table is not None else default
+    
+    @property
+    def four_d_value_score(self) -> float:
+        """Dimension 1: Position Value"""
+        return self._table_value("value")
+    
+    @property
+    def four_d_safety_impact(self) -> float:
+        """Dimension 2: Safety Impact"""
+        return self._table_value("safety")
+    
+    @property
+    def four_d_hedge_potential(self) -> float:
+        """Dimension 3: Hedge Potential"""
+        return self._table_value("hedge")
+    
+    @property
+    def four_d_market_alignment(self) -> float:
+        """Dimension 4: Market Alignment"""
+        return self._table_value("market")
+    
+    @property
+    def recovery_priority(self) -> float:
+        """Priority for recovery"""
+        return self._table_value("priority")
+    
+    @property
+    def hedge_candidates(self) -> List[int]:
+        """Potential hedge partners (กำไรมากก่อน)"""
+        return self._table_value("hedge_candidates", [])
     
     @property
     def total_profit(self) -> float:
@@ -124,6 +179,23 @@ class HedgeOpportunity:
                 self.four_d_alignment > 0.7 and 
                 self.net_result > 0)
 
+@dataclass
+class FlattenReport:
+    """ผลการ fast-flatten (ปิดทุก position ให้เร็วที่สุด)"""
+    positions: int                           # จำนวน positions ตอนเริ่ม
+    closed: List[int]                        # tickets ที่ปิดหมดแล้ว
+    failed: List[int]                        # tickets ที่ปิดไม่สำเร็จ
+    netted_pairs: int                        # close-by ที่สำเร็จ
+    deal_closes: int                         # deal ที่สำเร็จ (volume ที่ net ไม่ได้)
+    retries: int                             # ส่งซ้ำหลัง requote / price changed
+    netting_ms: float                        # เวลาช่วง close-by
+    time_to_flat_ms: float                   # เวลาตั้งแต่เริ่มจนปิด request สุดท้าย
+    flat: bool                               # terminal ไม่เหลือ position ในชุดที่สั่งปิด
+    
+    @property
+    def success(self) -> bool:
+        return self.flat and not self.failed
+
 @dataclass
 class PortfolioStatus:
     """สถานะ Portfolio - Enhanced with 4D Insights"""
@@ -194,7 +266,7 @@ class PositionManager:
         self.config = config
         
         # Trading parameters
-        self.symbol = config.get("trading", {}).get("symbol", "XAUUSD")
+        self.configured_symbol = config.get("trading", {}).get("symbol", "XAUUSD")
         self.max_positions = config.get("trading", {}).get("max_positions", 20)
         
         # 4D Analysis parameters
@@ -205,11 +277,21 @@ class PositionManager:
             "min_hedge_net_positive": 5.0,        # $5 ขั้นต่ำสำหรับ net positive hedge
             "max_position_age_hours": 48,         # ชั่วโมงสูงสุดก่อนพิจารณา recovery เร่งด่วน
             "portfolio_health_threshold": 0.4,    # เกณฑ์ portfolio health
-            "hedge_urgency_threshold": 0.8        # เกณฑ์ความเร่งด่วนของ hedge
+            "hedge_urgency_threshold": 0.8,       # เกณฑ์ความเร่งด่วนของ hedge
+            "max_hedge_size": 4,                  # จำนวน hedge positions สูงสุดต่อชุด
+            "hedge_solver_budget": 0.02,          # วินาที - time budget ของ hedge solver ต่อครั้ง
+            "hedge_balance_step": 0.05,           # volume ratio ต่างกันไม่เกินขั้นนี้ = เลือกชุดที่ขาน้อย / net สูงกว่า
+            "use_close_by": True                  # ปิดคู่ BUY/SELL ด้วย TRADE_ACTION_CLOSE_BY
         }
         
         # Position tracking
         self.active_positions: Dict[int, Position] = {}
+        self.hedge_index = HedgeIndex()           # index แยกฝั่ง เรียงตามกำไร/เวลาเปิด
+        self.position_table = PositionTable()     # columns สำหรับ 4D scoring ทั้ง book
+        self.hedge_solver = HedgeSolver(max_size=self.four_d_config["max_hedge_size"],
+                                        time_budget=self.four_d_config["hedge_solver_budget"],
+                                        min_net=self.four_d_config["min_hedge_net_positive"],
+                                        objective=HedgeObjective(self.four_d_config["hedge_balance_step"]))
         self.position_history = deque(maxlen=500)
         self.close_performance = defaultdict(lambda: {"count": 0, "success": 0, "total_profit": 0.0})
         
@@ -228,6 +310,23 @@ class PositionManager:
             "avg_confidence": 0.0,
             "strategy_performance": defaultdict(int)
         }
+        self.close_by_stats = {"requests": 0, "netted_volume": 0.0, "failed": 0, "residual_deals": 0}
+        
+        # Fast-flatten (emergency close)
+        self.flatten_config = {
+            "workers": 4,                         # close requests พร้อมกันสูงสุด
+            "max_retries": 3,                     # ส่งซ้ำเมื่อ requote / price changed
+            "retry_delay": 0.02                   # วินาที
+        }
+        self.last_flatten: Optional[FlattenReport] = None
+        
+        # Mark-to-market: PnL จาก tick ล่าสุด (ไม่ต้องรอ positions_get)
+        self.mark_to_market = MarkToMarketEngine(self._get_symbol_meta)
+        self.mark_max_age = 2.0                   # วินาที - snapshot เก่ากว่านี้ไม่ใช้
+        self.market_watcher = None
+        self.mark_loader_thread = None
+        self._mark_reload = threading.Event()
+        self._marked_book_version = -1
         
         # Portfolio optimization
         self.portfolio_optimizer_running = False
@@ -237,6 +336,77 @@ class PositionManager:
         print(f"   Symbol: {self.symbol}")
         print(f"   4D Analysis Interval: {self.four_d_config['analysis_interval']}s")
         print(f"   Recovery Scanner: {self.four_d_config['recovery_scan_interval']}s")
+
+    @property
+    def symbol(self) -> str:
+        """📊 symbol ที่ใช้เทรด - จาก symbol registry กลาง (fallback เป็นค่าใน config)"""
+        registry = getattr(self.mt5_connector, 'symbol_registry', None)
+        resolved_symbol = registry.get_symbol() if registry else None
+        return resolved_symbol or self.configured_symbol
+
+    @symbol.setter
+    def symbol(self, value: str):
+        self.configured_symbol = value
+    
+    def _get_symbol_meta(self):
+        """📊 SymbolMeta ที่ cache ใน symbol registry (contract size / tick value)"""
+        registry = getattr(self.mt5_connector, 'symbol_registry', None)
+        return registry.get_meta() if registry else None
+    
+    # ========================================================================================
+    # 📈 MARK-TO-MARKET
+    # ========================================================================================
+    
+    def attach_market_watcher(self, watcher):
+        """📡 รับ tick จาก MarketDataWatcher เพื่อ mark positions ทุก tick"""
+        if self.market_watcher is watcher:
+            return
+        self.market_watcher = watcher
+        watcher.subscribe(self._on_market_event)
+        if self.mark_loader_thread is None:
+            self.mark_loader_thread = threading.Thread(target=self._mark_loader_loop, daemon=True,
+                                                       name="MarkLoader")
+            self.mark_loader_thread.start()
+        self.log("📡 Mark-to-market attached to tick stream")
+    
+    def _on_market_event(self, event):
+        """📈 NEW_TICK -> mark ชุด positions ที่โหลดไว้ - book เปลี่ยน = ปลุก loader thread (ไม่ reload บน watcher thread)"""
+        if event.symbol != self.symbol:
+            return
+        self.mark_to_market.on_market_event(event)
+        book = self._get_position_book()
+        if book is not None and book.version != self._marked_book_version:
+            self._mark_reload.set()
+    
+    def _mark_loader_loop(self):
+        """📥 reload ชุด positions ของ mark-to-market เมื่อ position book เปลี่ยน version"""
+        while True:
+            self._mark_reload.wait(timeout=1.0)
+            self._mark_reload.clear()
+            book = self._get_position_book()
+            if book is None or book.version == self._marked_book_version:
+                continue
+            # จำ version ก่อน reload - book ที่เปลี่ยนระหว่าง reload จะถูก reload อีกรอบ
+            self._marked_book_version = book.version
+            self.update_positions()
+    
+    def _load_mark_positions(self):
+        """📥 ส่งชุด positions + balance / margin ให้ mark-to-market engine (เมื่อ ticket / volume เปลี่ยน)"""
+        account = mt5.account_info()
+        self.mark_to_market.load_positions(self.active_positions.values(),
+                                           balance=account.balance if account else None,
+                                           margin=account.margin if account else None)
+    
+    def _apply_marks(self):
+        """📈 ใช้ PnL จาก tick ล่าสุดกับ Position objects (ถ้า snapshot ยังสด)"""
+        snapshot = self.mark_to_market.fresh_snapshot(self.mark_max_age)
+        if snapshot is None:
+            return
+        for ticket, position in self.active_positions.items():
+            row = snapshot.row_of.get(ticket)
+            if row is not None:
+                position.profit = float(snapshot.profits[row])
+                position.current_price = float(snapshot.prices[row])
     
     # ========================================================================================
     # 🧠 4D ANALYSIS SYSTEM - CORE FEATURES
@@ -318,22 +488,14 @@ class PositionManager:
             
             print(f"🧠 === 4D POSITION ANALYSIS ({len(self.active_positions)} positions) ===")
             
+            # PnL จาก tick ล่าสุด + index ต้องตรงกับ active_positions ก่อนวิเคราะห์ (แก้เฉพาะส่วนที่ต่าง)
+            self._apply_marks()
+            self.hedge_index.sync(self.active_positions)
+            
+            # 4D ทุกมิติ + recovery priority ของทุก position ในครั้งเดียว (vectorized, publish ทีเดียว)
+            self.position_table.load(self.active_positions.values())
+            
             for ticket, position in self.active_positions.items():
-                # Dimension 1: Position Value Analysis (30%)
-                position.four_d_value_score = self._analyze_position_value(position)
-                
-                # Dimension 2: Safety Impact Analysis (25%)
-                position.four_d_safety_impact = self._analyze_safety_impact(position)
-                
-                # Dimension 3: Hedge Potential Analysis (25%)
-                position.four_d_hedge_potential = self._analyze_hedge_potential(position)
-                
-                # Dimension 4: Market Alignment Analysis (20%)
-                position.four_d_market_alignment = self._analyze_market_alignment(position)
-                
-                # Calculate recovery priority
-                position.recovery_priority = self._calculate_recovery_priority(position)
-                
                 print(f"   📊 Position #{ticket}:")
                 print(f"      4D Scores: V:{position.four_d_value_score:.2f} | S:{position.four_d_safety_impact:.2f} | H:{position.four_d_hedge_potential:.2f} | M:{position.four_d_market_alignment:.2f}")
                 print(f"      Overall: {position.four_d_overall_score:.2f} | Priority: {position.recovery_priority:.2f}")
@@ -344,288 +506,6 @@ class PositionManager:
         except Exception as e:
             print(f"❌ 4D position analysis error: {e}")
     
-    def _analyze_position_value(self, position: Position) -> float:
-        """Dimension 1: วิเคราะห์มูลค่า Position (30% weight)"""
-        try:
-            score_factors = []
-            
-            # 1. Profit/Loss assessment (40%)
-            if position.total_profit > 0:
-                # Profitable position
-                profit_score = min(position.total_profit / 50, 1.0)  # Scale to $50 max
-            else:
-                # Loss position - penalty based on loss amount
-                profit_score = max(0, 1 + (position.total_profit / 200))  # -$200 = 0 score
-            
-            score_factors.append(("profit", profit_score, 0.40))
-            
-            # 2. Age vs Performance correlation (25%)
-            age_days = position.age_hours / 24
-            if position.total_profit > 0:
-                # Profitable - newer is better (less risk exposure)
-                age_score = max(0, 1 - (age_days / 7))  # Decline over 7 days
-            else:
-                # Loss - older needs more urgent attention
-                age_score = min(age_days / 2, 1.0)  # Increase urgency over 2 days
-            
-            score_factors.append(("age_performance", age_score, 0.25))
-            
-            # 3. Volume efficiency (20%)
-            # Larger positions have higher impact
-            volume_score = min(position.volume / 0.1, 1.0)  # Scale to 0.1 lots
-            score_factors.append(("volume", volume_score, 0.20))
-            
-            # 4. Margin efficiency (15%)
-            # Estimate margin usage
-            estimated_margin = position.volume * 100  # Rough estimate
-            margin_score = min(estimated_margin / 500, 1.0)  # Scale to $500
-            score_factors.append(("margin", margin_score, 0.15))
-            
-            # Calculate weighted average
-            weighted_sum = sum(score * weight for name, score, weight in score_factors)
-            total_weight = sum(weight for name, score, weight in score_factors)
-            
-            final_score = weighted_sum / total_weight if total_weight > 0 else 0.5
-            return max(0, min(1, final_score))
-            
-        except Exception as e:
-            print(f"❌ Position value analysis error: {e}")
-            return 0.5
-    
-    def _analyze_safety_impact(self, position: Position) -> float:
-        """Dimension 2: วิเคราะห์ผลกระทบต่อความปลอดภัย (25% weight)"""
-        try:
-            score_factors = []
-            
-            # 1. Risk contribution to portfolio (40%)
-            total_exposure = sum(pos.volume for pos in self.active_positions.values())
-            if total_exposure > 0:
-                position_risk_ratio = position.volume / total_exposure
-                # Lower ratio = safer
-                risk_score = 1 - min(position_risk_ratio * 5, 1.0)  # Penalize if >20% of portfolio
-            else:
-                risk_score = 0.5
-            
-            score_factors.append(("risk_contribution", risk_score, 0.40))
-            
-            # 2. Loss potential impact (30%)
-            if position.total_profit >= 0:
-                loss_impact_score = 0.8  # Profitable positions have lower risk
-            else:
-                # Calculate potential further loss
-                current_loss = abs(position.total_profit)
-                potential_loss_score = max(0, 1 - (current_loss / 300))  # Scale to $300
-                loss_impact_score = potential_loss_score
-            
-            score_factors.append(("loss_impact", loss_impact_score, 0.30))
-            
-            # 3. Portfolio balance impact (20%)
-            buy_count = sum(1 for pos in self.active_positions.values() if pos.type == PositionType.BUY)
-            total_count = len(self.active_positions)
-            current_ratio = buy_count / total_count if total_count > 0 else 0.5
-            
-            # If closing this position would improve balance
-            if position.type == PositionType.BUY and current_ratio > 0.6:
-                balance_score = 0.8  # Good to close BUY when BUY-heavy
-            elif position.type == PositionType.SELL and current_ratio < 0.4:
-                balance_score = 0.8  # Good to close SELL when SELL-heavy
-            else:
-                balance_score = 0.4  # Neutral impact
-            
-            score_factors.append(("balance_impact", balance_score, 0.20))
-            
-            # 4. Correlation risk (10%)
-            # Simplified - all positions on same symbol have high correlation
-            correlation_score = 0.3 if len(self.active_positions) > 5 else 0.6
-            score_factors.append(("correlation", correlation_score, 0.10))
-            
-            # Calculate weighted average
-            weighted_sum = sum(score * weight for name, score, weight in score_factors)
-            total_weight = sum(weight for name, score, weight in score_factors)
-            
-            final_score = weighted_sum / total_weight if total_weight > 0 else 0.5
-            return max(0, min(1, final_score))
-            
-        except Exception as e:
-            print(f"❌ Safety impact analysis error: {e}")
-            return 0.5
-    
-    def _analyze_hedge_potential(self, position: Position) -> float:
-        """Dimension 3: วิเคราะห์ศักยภาพ Hedge (25% weight)"""
-        try:
-            score_factors = []
-            
-            # 1. Hedge pair availability (35%)
-            hedge_candidates = []
-            target_type = PositionType.SELL if position.type == PositionType.BUY else PositionType.BUY
-            
-            for other_pos in self.active_positions.values():
-                if (other_pos.ticket != position.ticket and 
-                    other_pos.type == target_type):
-                    
-                    # Check if they can offset each other
-                    net_result = position.total_profit + other_pos.total_profit
-                    if net_result > -50:  # Within reasonable range
-                        hedge_candidates.append({
-                            'position': other_pos,
-                            'net_result': net_result,
-                            'compatibility': self._calculate_hedge_compatibility(position, other_pos)
-                        })
-            
-            position.hedge_candidates = [candidate['position'].ticket for candidate in hedge_candidates]
-            
-            if hedge_candidates:
-                best_hedge = max(hedge_candidates, key=lambda x: x['compatibility'])
-                hedge_availability_score = min(len(hedge_candidates) / 3, 1.0)  # Max at 3 candidates
-            else:
-                hedge_availability_score = 0.0
-            
-            score_factors.append(("hedge_availability", hedge_availability_score, 0.35))
-            
-            # 2. Net positive potential (30%)
-            if hedge_candidates:
-                positive_hedges = [h for h in hedge_candidates if h['net_result'] > 0]
-                if positive_hedges:
-                    best_net = max(h['net_result'] for h in positive_hedges)
-                    net_positive_score = min(best_net / 30, 1.0)  # Scale to $30
-                else:
-                    # Even if net negative, smaller loss is better
-                    best_net = max(h['net_result'] for h in hedge_candidates)
-                    net_positive_score = max(0, (best_net + 100) / 100)  # Scale from -$100
-            else:
-                net_positive_score = 0.0
-            
-            score_factors.append(("net_positive", net_positive_score, 0.30))
-            
-            # 3. Volume compatibility (20%)
-            if hedge_candidates:
-                volume_compatibilities = []
-                for candidate in hedge_candidates:
-                    other_volume = candidate['position'].volume
-                    volume_ratio = min(position.volume, other_volume) / max(position.volume, other_volume)
-                    volume_compatibilities.append(volume_ratio)
-                
-                avg_volume_compatibility = np.mean(volume_compatibilities)
-                volume_score = avg_volume_compatibility
-            else:
-                volume_score = 0.0
-            
-            score_factors.append(("volume_compatibility", volume_score, 0.20))
-            
-            # 4. Timing synergy (15%)
-            if hedge_candidates:
-                timing_scores = []
-                for candidate in hedge_candidates:
-                    other_age = candidate['position'].age_hours
-                    age_diff = abs(position.age_hours - other_age)
-                    timing_score = max(0, 1 - (age_diff / 24))  # Best if opened within 24 hours
-                    timing_scores.append(timing_score)
-                
-                avg_timing_score = np.mean(timing_scores)
-            else:
-                avg_timing_score = 0.0
-            
-            score_factors.append(("timing_synergy", avg_timing_score, 0.15))
-            
-            # Calculate weighted average
-            weighted_sum = sum(score * weight for name, score, weight in score_factors)
-            total_weight = sum(weight for name, score, weight in score_factors)
-            
-            final_score = weighted_sum / total_weight if total_weight > 0 else 0.5
-            return max(0, min(1, final_score))
-            
-        except Exception as e:
-            print(f"❌ Hedge potential analysis error: {e}")
-            return 0.5
-    
-    def _analyze_market_alignment(self, position: Position) -> float:
-        """Dimension 4: วิเคราะห์การสอดคล้องกับตลาด (20% weight)"""
-        try:
-            score_factors = []
-            
-            # 1. Current session alignment (30%)
-            current_hour = datetime.now().hour
-            if 7 <= current_hour <= 17:  # London + NY sessions
-                session_score = 0.8
-            elif 1 <= current_hour <= 7:  # Asian session
-                session_score = 0.6
-            else:  # Quiet hours
-                session_score = 0.4
-            
-            score_factors.append(("session", session_score, 0.30))
-            
-            # 2. Position age alignment (25%)
-            # Newer positions are more aligned with current market
-            age_alignment = max(0, 1 - (position.age_hours / 48))  # Decline over 48 hours
-            score_factors.append(("age_alignment", age_alignment, 0.25))
-            
-            # 3. Volume appropriateness (25%)
-            # Standard lot sizes are more market-aligned
-            if 0.01 <= position.volume <= 0.05:
-                volume_alignment = 1.0  # Standard range
-            elif 0.005 <= position.volume <= 0.1:
-                volume_alignment = 0.8  # Acceptable range
-            else:
-                volume_alignment = 0.4  # Unusual sizes
-            
-            score_factors.append(("volume_alignment", volume_alignment, 0.25))
-            
-            # 4. Market efficiency (20%)
-            # Positions with reasonable spread exposure
-            current_spread = 0.003  # Approximate spread
-            position_cost = position.commission + abs(position.swap)
-            efficiency = max(0, 1 - (position_cost / 10))  # Scale to $10
-            
-            score_factors.append(("efficiency", efficiency, 0.20))
-            
-            # Calculate weighted average
-            weighted_sum = sum(score * weight for name, score, weight in score_factors)
-            total_weight = sum(weight for name, score, weight in score_factors)
-            
-            final_score = weighted_sum / total_weight if total_weight > 0 else 0.5
-            return max(0, min(1, final_score))
-            
-        except Exception as e:
-            print(f"❌ Market alignment analysis error: {e}")
-            return 0.5
-    
-    def _calculate_recovery_priority(self, position: Position) -> float:
-        """คำนวณลำดับความสำคัญสำหรับ Recovery"""
-        try:
-            priority_factors = []
-            
-            # 1. Loss magnitude (30%)
-            if position.total_profit < 0:
-                loss_amount = abs(position.total_profit)
-                loss_priority = min(loss_amount / 200, 1.0)  # Scale to $200
-            else:
-                loss_priority = 0.1  # Low priority for profitable positions
-            
-            priority_factors.append(("loss", loss_priority, 0.30))
-            
-            # 2. Age urgency (25%)
-            age_urgency = min(position.age_hours / 48, 1.0)  # Max urgency at 48 hours
-            priority_factors.append(("age", age_urgency, 0.25))
-            
-            # 3. Hedge potential (25%)
-            hedge_priority = position.four_d_hedge_potential
-            priority_factors.append(("hedge", hedge_priority, 0.25))
-            
-            # 4. Safety impact (20%)
-            safety_priority = 1 - position.four_d_safety_impact  # Invert - lower safety = higher priority
-            priority_factors.append(("safety", safety_priority, 0.20))
-            
-            # Calculate weighted average
-            weighted_sum = sum(priority * weight for name, priority, weight in priority_factors)
-            total_weight = sum(weight for name, priority, weight in priority_factors)
-            
-            final_priority = weighted_sum / total_weight if total_weight > 0 else 0.5
-            return max(0, min(1, final_priority))
-            
-        except Exception as e:
-            print(f"❌ Recovery priority calculation error: {e}")
-            return 0.5
-    
     def _calculate_hedge_compatibility(self, pos1: Position, pos2: Position) -> float:
         """คำนวณความเข้ากันได้ของ hedge pair"""
         try:
@@ -673,9 +553,11 @@ class PositionManager:
             
             opportunities = []
             
-            # หา losing positions ที่ต้องการ recovery
-            losing_positions = [pos for pos in self.active_positions.values() 
-                              if pos.total_profit < -10]  # Loss > $10
+            # หา losing positions ที่ต้องการ recovery (Loss > $10) จาก index
+            losing_positions = [self.active_positions[ticket]
+                                for side in (PositionType.BUY.value, PositionType.SELL.value)
+                                for ticket in self.hedge_index.tickets_below(side, -10)
+                                if ticket in self.active_positions]
             
             if not losing_positions:
                 print("   ℹ️ No significant losing positions found")
@@ -713,53 +595,32 @@ class PositionManager:
             if not target_position.hedge_candidates:
                 return None
             
-            # หา hedge positions ที่เป็นไปได้
-            hedge_positions = []
-            for ticket in target_position.hedge_candidates:
-                if ticket in self.active_positions:
-                    hedge_pos = self.active_positions[ticket]
-                    if hedge_pos.total_profit > 0:  # Only profitable hedge candidates
-                        hedge_positions.append(hedge_pos)
+            # หา hedge positions ที่เป็นไปได้: ฝั่งตรงข้าม, มีกำไร, net > -50 (กำไรมากก่อน)
+            target_side = PositionType.SELL.value if target_position.type == PositionType.BUY else PositionType.BUY.value
+            min_profit = max(0.0, -50 - target_position.total_profit)
+            hedge_positions = [self.active_positions[ticket]
+                               for ticket in self.hedge_index.candidate_tickets(target_side, min_profit)
+                               if ticket in self.active_positions]
             
             if not hedge_positions:
                 return None
             
-            # วิเคราะห์ strategy ที่ดีที่สุด
-            best_strategy = None
-            best_net_result = float('-inf')
-            best_confidence = 0.0
-            
-            # Strategy 1: Single best hedge
-            best_hedge = max(hedge_positions, key=lambda p: p.total_profit)
-            single_net = target_position.total_profit + best_hedge.total_profit
+            # วิเคราะห์ strategy ที่ดีที่สุด: เลือกชุด hedge ด้วย solver (net ถึงเกณฑ์ แล้ว volume สมดุล / ขาน้อย)
+            solution = self._solve_hedge_set(target_position, hedge_positions)
             
-            if single_net > best_net_result:
-                best_strategy = RecoveryStrategy.NET_POSITIVE_CLOSE
-                best_net_result = single_net
-                selected_hedges = [best_hedge]
-            
-            # Strategy 2: Multiple hedge combination
-            if len(hedge_positions) > 1:
-                total_hedge_profit = sum(p.total_profit for p in hedge_positions)
-                multi_net = target_position.total_profit + total_hedge_profit
-                
-                if multi_net > best_net_result:
+            if solution:
+                selected_hedges, best_net_result = solution
+                if len(selected_hedges) == 1:
+                    best_strategy = RecoveryStrategy.NET_POSITIVE_CLOSE
+                elif len(selected_hedges) == len(hedge_positions):
                     best_strategy = RecoveryStrategy.FULL_HEDGE
-                    best_net_result = multi_net
-                    selected_hedges = hedge_positions
-            
-            # Strategy 3: Partial hedge (best subset)
-            if len(hedge_positions) > 2:
-                # Find optimal subset
-                for i in range(2, len(hedge_positions)):
-                    subset = hedge_positions[:i]
-                    subset_profit = sum(p.total_profit for p in subset)
-                    partial_net = target_position.total_profit + subset_profit
-                    
-                    if partial_net > 0 and partial_net > best_net_result:
-                        best_strategy = RecoveryStrategy.PARTIAL_HEDGE
-                        best_net_result = partial_net
-                        selected_hedges = subset
+                else:
+                    best_strategy = RecoveryStrategy.PARTIAL_HEDGE
+            else:
+                # ไม่มีชุดไหน net เป็นบวก - ใช้ hedge ทั้งหมดลดขาดทุน
+                best_strategy = RecoveryStrategy.FULL_HEDGE
+                selected_hedges = hedge_positions
+                best_net_result = target_position.total_profit + sum(p.total_profit for p in hedge_positions)
             
             if not best_strategy or best_net_result < -100:  # Don't suggest if too negative
                 return None
@@ -1141,7 +1002,7 @@ class PositionManager:
                 suggestions.append(f"High loss ratio: {len(losing_positions)} positions need recovery")
             
             # Age suggestions
-            old_positions = [pos for pos in self.active_positions.values() if pos.age_hours > 24]
+            old_positions = self.hedge_index.opened_before((datetime.now() - timedelta(hours=24)).timestamp())
             if len(old_positions) > len(self.active_positions) * 0.3:
                 suggestions.append(f"Aging positions: {len(old_positions)} positions > 24 hours old")
             
@@ -1179,70 +1040,112 @@ class PositionManager:
     # 🔧 UTILITY & COMPATIBILITY METHODS
     # ========================================================================================
     
-    def update_positions(self):
-        """อัปเดตข้อมูล positions จาก MT5 - FIXED: Handle missing commission attribute"""
+    def update_positions(self, reload_marks: bool = False):
+        """อัปเดตข้อมูล positions จาก MT5 - FIXED: Handle missing commission attribute
+
+        reload_marks=True: โหลด positions + balance / margin ให้ mark-to-market ใหม่แม้ชุด positions ไม่เปลี่ยน
+        """
         try:
             if not self.mt5_connector.is_connected:
                 return
             
-            # ดึงข้อมูลจาก MT5
-            mt5_positions = mt5.positions_get(symbol=self.symbol)
+            # ดึงจาก position book (ไม่มี IPC) - fallback เป็น MT5 ถ้า book ยังไม่พร้อม
+            mt5_positions = self._get_book_positions()
+            if mt5_positions is None:
+                mt5_positions = mt5.positions_get(symbol=self.symbol)
             
             if mt5_positions is None:
                 mt5_positions = []
             
-            # แปลงเป็น Position objects
-            updated_positions = {}
+            # ticket เดิม = แก้ค่าในที่เดิม, สร้าง Position ใหม่เฉพาะ ticket ใหม่
+            now = datetime.now()
+            positions = self.active_positions
+            new_positions = {}
+            refreshed = 0
+            volume_changed = False
             
             for mt5_pos in mt5_positions:
-                # แปลง position type
-                pos_type = PositionType.BUY if mt5_pos.type == mt5.POSITION_TYPE_BUY else PositionType.SELL
+                position = positions.get(mt5_pos.ticket)
+                if position is None:
+                    new_positions[mt5_pos.ticket] = self._create_position(mt5_pos, now)
+                    continue
                 
-                # คำนวณ age
-                open_time = datetime.fromtimestamp(mt5_pos.time)
-                age_hours = (datetime.now() - open_time).total_seconds() / 3600
+                if position.volume != mt5_pos.volume:
+                    volume_changed = True
                 
                 # FIXED: Safe attribute access with defaults
-                commission = getattr(mt5_pos, 'commission', 0.0)
-                swap = getattr(mt5_pos, 'swap', 0.0)
-                profit = getattr(mt5_pos, 'profit', 0.0)
-                comment = getattr(mt5_pos, 'comment', '')
-                magic = getattr(mt5_pos, 'magic', 0)
-                
-                # สร้าง Position object
-                position = Position(
-                    ticket=mt5_pos.ticket,
-                    symbol=mt5_pos.symbol,
-                    type=pos_type,
+                position.refresh(
                     volume=mt5_pos.volume,
-                    open_price=mt5_pos.price_open,
                     current_price=mt5_pos.price_current,
-                    profit=profit,
-                    swap=swap,
-                    commission=commission,  # ← Use safe value
-                    open_time=open_time,
-                    age_hours=age_hours,
-                    comment=comment,
-                    magic=magic
+                    profit=getattr(mt5_pos, 'profit', 0.0),
+                    swap=getattr(mt5_pos, 'swap', 0.0),
+                    commission=getattr(mt5_pos, 'commission', 0.0),
+                    age_hours=(now - position.open_time).total_seconds() / 3600
                 )
-                
-                # รักษา 4D analysis scores ถ้ามีอยู่แล้ว
-                if mt5_pos.ticket in self.active_positions:
-                    old_pos = self.active_positions[mt5_pos.ticket]
-                    position.four_d_value_score = old_pos.four_d_value_score
-                    position.four_d_safety_impact = old_pos.four_d_safety_impact
-                    position.four_d_hedge_potential = old_pos.four_d_hedge_potential
-                    position.four_d_market_alignment = old_pos.four_d_market_alignment
-                    position.recovery_priority = old_pos.recovery_priority
-                    position.hedge_candidates = old_pos.hedge_candidates
-                
-                updated_positions[mt5_pos.ticket] = position
+                refreshed += 1
+            
+            # มี ticket เปิด/ปิด -> dict ใหม่ (object เดิมใช้ต่อ) ไม่แก้ dict ที่ thread อื่นอาจวนอยู่
+            if new_positions or refreshed != len(positions):
+                open_tickets = {mt5_pos.ticket for mt5_pos in mt5_positions}
+                updated_positions = {ticket: position for ticket, position in positions.items()
+                                     if ticket in open_tickets}
+                updated_positions.update(new_positions)
+                self.active_positions = updated_positions
             
-            self.active_positions = updated_positions
+            # mark-to-market: reload เมื่อชุด positions เปลี่ยน แล้วใช้ PnL จาก tick ล่าสุด
+            if (reload_marks or new_positions or volume_changed or refreshed != len(positions)
+                    or not self.mark_to_market.stats["loads"]):
+                self._load_mark_positions()
+            self._apply_marks()
+            
+            self.hedge_index.sync(self.active_positions)
             
         except Exception as e:
             self.log(f"❌ Update positions error: {e}")
 
+    def _create_position(self, mt5_pos, now: datetime) -> Position:
+        """สร้าง Position จาก MT5 position (ticket ใหม่)"""
+        # แปลง position type
+        pos_type = PositionType.BUY if mt5_pos.type == mt5.POSITION_TYPE_BUY else PositionType.SELL
+        
+        # คำนวณ age
+        open_time = datetime.fromtimestamp(mt5_pos.time)
+        age_hours = (now - open_time).total_seconds() / 3600
+        
+        # FIXED: Safe attribute access with defaults
+        commission = getattr(mt5_pos, 'commission', 0.0)
+        swap = getattr(mt5_pos, 'swap', 0.0)
+        profit = getattr(mt5_pos, 'profit', 0.0)
+        comment = getattr(mt5_pos, 'comment', '')
+        magic = getattr(mt5_pos, 'magic', 0)
+        
+        # สร้าง Position object
+        return Position(
+            ticket=mt5_pos.ticket,
+            symbol=mt5_pos.symbol,
+            type=pos_type,
+            volume=mt5_pos.volume,
+            open_price=mt5_pos.price_open,
+            current_price=mt5_pos.price_current,
+            profit=profit,
+            swap=swap,
+            commission=commission,  # ← Use safe value
+            open_time=open_time,
+            age_hours=age_hours,
+            comment=comment,
+            magic=magic,
+            _table=self.position_table   # 4D scores จาก analysis ล่าสุด (ตาม ticket)
+        )
+
+    def _get_position_book(self):
+        """📒 position book ของ connector (None ถ้ายังไม่ reconcile)"""
+        book = getattr(self.mt5_connector, 'position_book', None)
+        return book if book is not None and book.is_ready else None
+
+    def _get_book_positions(self) -> Optional[List]:
+        book = self._get_position_book()
+        return book.get_positions() if book else None
+
     def get_active_positions(self) -> List[Dict]:
         """ดึงข้อมูล active positions - FIXED: Handle missing commission safely"""
         try:
@@ -1296,7 +1199,8 @@ class PositionManager:
             if not self.mt5_connector.is_connected:
                 return []
             
-            orders = mt5.orders_get(symbol=self.symbol)
+            book = self._get_position_book()
+            orders = book.get_orders() if book else mt5.orders_get(symbol=self.symbol)
             if not orders:
                 return []
             
@@ -1341,47 +1245,19 @@ class PositionManager:
             self.log(f"❌ Get account info error: {e}")
             return {}
     
-    def _close_single_position(self, position: Position, reason: CloseReason) -> bool:
-        """ปิด position เดียว"""
+    def _close_single_position(self, position: Position, reason: CloseReason,
+                               volume: Optional[float] = None) -> bool:
+        """ปิด position เดียว (volume = ปิดเฉพาะ volume ที่เหลือหลัง close-by)"""
         try:
             if not self.mt5_connector.is_connected:
                 return False
             
-            # สร้าง close request
-            if position.type == PositionType.BUY:
-                close_type = mt5.ORDER_TYPE_SELL
-            else:
-                close_type = mt5.ORDER_TYPE_BUY
-            
-            close_request = {
-                "action": mt5.TRADE_ACTION_DEAL,
-                "symbol": position.symbol,
-                "volume": position.volume,
-                "type": close_type,
-                "position": position.ticket,
-                "deviation": 20,
-                "magic": position.magic,
-                "comment": f"Close|{reason.value}|4D:{position.four_d_overall_score:.2f}",
-                "type_time": mt5.ORDER_TIME_GTC,
-                "type_filling": mt5.ORDER_FILLING_IOC
-            }
-            
             # Execute close
-            result = mt5.order_send(close_request)
+            result = self._send_close_request(position, reason, volume)
             
             if result and result.retcode == mt5.TRADE_RETCODE_DONE:
                 self.log(f"✅ Position #{position.ticket} closed: ${position.total_profit:.2f}")
-                
-                # Track in history
-                self.position_history.append({
-                    'ticket': position.ticket,
-                    'close_time': datetime.now(),
-                    'close_reason': reason.value,
-                    'final_profit': position.total_profit,
-                    'age_hours': position.age_hours,
-                    'four_d_score': position.four_d_overall_score
-                })
-                
+                self._record_closed_position(position, reason)
                 return True
             else:
                 error_msg = f"Failed to close #{position.ticket}"
@@ -1394,6 +1270,146 @@ class PositionManager:
             self.log(f"❌ Close single position error: {e}")
             return False
     
+    def _send_close_request(self, position: Position, reason: CloseReason, volume: Optional[float] = None):
+        """ส่ง TRADE_ACTION_DEAL ปิด position (ทั้งหมด หรือเฉพาะ volume) - คืนผล order_send"""
+        if position.type == PositionType.BUY:
+            close_type = mt5.ORDER_TYPE_SELL
+        else:
+            close_type = mt5.ORDER_TYPE_BUY
+        
+        close_request = {
+            "action": mt5.TRADE_ACTION_DEAL,
+            "symbol": position.symbol,
+            "volume": volume if volume is not None else position.volume,
+            "type": close_type,
+            "position": position.ticket,
+            "deviation": 20,
+            "magic": position.magic,
+            "comment": f"Close|{reason.value}|4D:{position.four_d_overall_score:.2f}",
+            "type_time": mt5.ORDER_TIME_GTC,
+            "type_filling": mt5.ORDER_FILLING_IOC
+        }
+        return mt5.order_send(close_request)
+    
+    def _record_closed_position(self, position: Position, reason: CloseReason):
+        """Track in history"""
+        self.position_history.append({
+            'ticket': position.ticket,
+            'close_time': datetime.now(),
+            'close_reason': reason.value,
+            'final_profit': position.total_profit,
+            'age_hours': position.age_hours,
+            'four_d_score': position.four_d_overall_score
+        })
+    
+    # ========================================================================================
+    # 🔁 CLOSE-BY NETTING
+    # ========================================================================================
+    
+    def _plan_close_by(self, positions: List[Position]) -> List[Tuple[Position, Position, float]]:
+        """🔁 จับคู่ BUY/SELL สำหรับ close-by - คืน [(position, position_by, volume)]
+        
+        1. volume เท่ากันจับคู่ก่อน (ปิดหมดทั้งคู่ใน request เดียว)
+        2. ที่เหลือเรียง volume มากก่อนแล้วจับคู่แบบ two-pointer (net ได้ volume สูงสุด = min(BUY รวม, SELL รวม))
+        """
+        buys = [[pos, round(pos.volume, 8)] for pos in positions if pos.type == PositionType.BUY]
+        sells = [[pos, round(pos.volume, 8)] for pos in positions if pos.type == PositionType.SELL]
+        pairs = []
+        
+        sells_by_volume = defaultdict(list)
+        for entry in sells:
+            sells_by_volume[entry[1]].append(entry)
+        for entry in buys:
+            matches = sells_by_volume.get(entry[1])
+            if matches:
+                other = matches.pop()
+                pairs.append((entry[0], other[0], entry[1]))
+                entry[1] = other[1] = 0.0
+        
+        buys = sorted((entry for entry in buys if entry[1] > 0), key=lambda e: e[1], reverse=True)
+        sells = sorted((entry for entry in sells if entry[1] > 0), key=lambda e: e[1], reverse=True)
+        i = j = 0
+        while i < len(buys) and j < len(sells):
+            volume = min(buys[i][1], sells[j][1])
+            pairs.append((buys[i][0], sells[j][0], volume))
+            buys[i][1] = round(buys[i][1] - volume, 8)
+            sells[j][1] = round(sells[j][1] - volume, 8)
+            if buys[i][1] <= 0:
+                i += 1
+            if sells[j][1] <= 0:
+                j += 1
+        
+        return pairs
+    
+    def _close_by(self, position: Position, position_by: Position, reason: CloseReason) -> bool:
+        """🔁 ปิด position ด้วย position ฝั่งตรงข้าม (TRADE_ACTION_CLOSE_BY - ไม่เสีย spread ซ้ำ)"""
+        try:
+            close_request = {
+                "action": mt5.TRADE_ACTION_CLOSE_BY,
+                "symbol": position.symbol,
+                "position": position.ticket,
+                "position_by": position_by.ticket,
+                "magic": position.magic,
+                "comment": f"CloseBy|{reason.value}"
+            }
+            
+            self.close_by_stats["requests"] += 1
+            result = mt5.order_send(close_request)
+            
+            if result and result.retcode == mt5.TRADE_RETCODE_DONE:
+                return True
+            
+            self.close_by_stats["failed"] += 1
+            error_msg = f"Close-by #{position.ticket} by #{position_by.ticket} failed"
+            if result:
+                error_msg += f": {result.retcode} {result.comment}"
+            self.log(f"❌ {error_msg}")
+            return False
+            
+        except Exception as e:
+            self.close_by_stats["failed"] += 1
+            self.log(f"❌ Close-by error: {e}")
+            return False
+    
+    def _close_positions_netted(self, positions: List[Position],
+                                reasons: Optional[Dict[int, CloseReason]] = None,
+                                default_reason: CloseReason = CloseReason.HEDGE_OPTIMIZATION) -> List[int]:
+        """🔁 ปิดชุด positions: net คู่ BUY/SELL ด้วย close-by ก่อน แล้วปิด volume ที่เหลือด้วย deal
+        
+        close-by ล้มเหลว (เช่น broker ไม่รองรับ) -> หยุด netting แล้วปิดส่วนที่เหลือทั้งหมดด้วย deal
+        คืน tickets ที่ปิดหมดแล้ว
+        """
+        reasons = reasons or {}
+        remaining = {pos.ticket: round(pos.volume, 8) for pos in positions}
+        closed = []
+        
+        pairs = self._plan_close_by(positions) if self.four_d_config.get("use_close_by", True) else []
+        for position, position_by, volume in pairs:
+            reason = reasons.get(position.ticket, default_reason)
+            if not self._close_by(position, position_by, reason):
+                break
+            
+            self.close_by_stats["netted_volume"] += volume
+            for pos in (position, position_by):
+                remaining[pos.ticket] = round(remaining[pos.ticket] - volume, 8)
+                if remaining[pos.ticket] <= 0:
+                    closed.append(pos.ticket)
+                    self._record_closed_position(pos, reasons.get(pos.ticket, default_reason))
+            self.log(f"🔁 #{position.ticket} closed by #{position_by.ticket}: {volume:.2f} lots")
+        
+        # volume ที่ net ไม่ได้ -> deal ตามลำดับเดิม
+        for pos in positions:
+            volume = remaining[pos.ticket]
+            if volume <= 0:
+                continue
+            if volume < round(pos.volume, 8):
+                self.close_by_stats["residual_deals"] += 1
+            if self._close_single_position(pos, reasons.get(pos.ticket, default_reason),
+                                           volume=volume if volume < round(pos.volume, 8) else None):
+                closed.append(pos.ticket)
+        
+        return closed
+    
     def _order_type_to_string(self, order_type: int) -> str:
         """แปลง MT5 order type เป็น string"""
         type_mapping = {
@@ -1554,57 +1570,37 @@ class PositionManager:
             if not available_profits:
                 return None
             
-            loss_amount = abs(loss_position.total_profit)
-            best_combination = None
-            best_score = 0
-            
-            # Test single hedge
-            for profit_pos in available_profits:
-                net_result = loss_position.total_profit + profit_pos.total_profit
-                if net_result > 0:
-                    # Calculate combination score
-                    score = self._calculate_hedge_combination_score(
-                        loss_position, [profit_pos], net_result
-                    )
-                    
-                    if score > best_score:
-                        best_score = score
-                        best_combination = {
-                            'hedge_positions': [profit_pos],
-                            'net_result': net_result,
-                            'score': score,
-                            'strategy': 'single_hedge'
-                        }
-            
-            # Test multiple hedge (if available)
-            if len(available_profits) > 1:
-                # Try combinations of 2-3 positions
-                for i in range(min(3, len(available_profits))):
-                    for j in range(i+1, min(i+3, len(available_profits))):
-                        combination = available_profits[i:j+1]
-                        combo_profit = sum(pos.total_profit for pos in combination)
-                        net_result = loss_position.total_profit + combo_profit
-                        
-                        if net_result > 0:
-                            score = self._calculate_hedge_combination_score(
-                                loss_position, combination, net_result
-                            )
-                            
-                            if score > best_score:
-                                best_score = score
-                                best_combination = {
-                                    'hedge_positions': combination,
-                                    'net_result': net_result,
-                                    'score': score,
-                                    'strategy': 'multi_hedge'
-                                }
-            
-            return best_combination
+            solution = self._solve_hedge_set(loss_position, available_profits)
+            if not solution:
+                return None
+            
+            hedge_positions, net_result = solution
+            return {
+                'hedge_positions': hedge_positions,
+                'net_result': net_result,
+                'score': self._calculate_hedge_combination_score(loss_position, hedge_positions, net_result),
+                'strategy': 'single_hedge' if len(hedge_positions) == 1 else 'multi_hedge'
+            }
             
         except Exception as e:
             print(f"❌ Find best hedge combination error: {e}")
             return None
     
+    def _solve_hedge_set(self, loss_position: Position,
+                         hedge_positions: List[Position]) -> Optional[Tuple[List[Position], float]]:
+        """🧩 เลือกชุด hedge (net >= min_hedge_net_positive) ที่ volume สมดุลที่สุด / ขาน้อยที่สุด ด้วย branch-and-bound
+        - คืน (positions, net_result)"""
+        candidates = [HedgeCandidate(ticket=pos.ticket, profit=pos.total_profit,
+                                     volume=pos.volume, four_d_score=pos.four_d_overall_score)
+                      for pos in hedge_positions]
+        solution = self.hedge_solver.solve(loss_position.total_profit, loss_position.volume,
+                                           loss_position.four_d_overall_score, candidates)
+        if not solution:
+            return None
+        
+        by_ticket = {pos.ticket: pos for pos in hedge_positions}
+        return [by_ticket[ticket] for ticket in solution.tickets], solution.net_result
+    
     def _calculate_hedge_combination_score(self, loss_pos: Position, 
                                          hedge_positions: List[Position], net_result: float) -> float:
         """คำนวณคะแนนของ hedge combination"""
@@ -1643,21 +1639,15 @@ class PositionManager:
             print(f"         Hedge Positions: {len(combination['hedge_positions'])}")
             print(f"         Expected Net: ${combination['net_result']:.2f}")
             
-            closed_positions = []
+            # hedge legs + loss position: คู่ BUY/SELL net ด้วย close-by, ส่วนที่เหลือปิดด้วย deal
+            hedge_positions = combination['hedge_positions']
+            reasons = {pos.ticket: CloseReason.HEDGE_OPTIMIZATION for pos in hedge_positions}
+            reasons[loss_position.ticket] = CloseReason.SMART_RECOVERY
             
-            # ปิด hedge positions ก่อน (กำไร)
-            for hedge_pos in combination['hedge_positions']:
-                if self._close_single_position(hedge_pos, CloseReason.HEDGE_OPTIMIZATION):
-                    closed_positions.append(hedge_pos.ticket)
-                    time.sleep(0.3)  # Brief delay
-                else:
-                    print(f"         ❌ Failed to close hedge #{hedge_pos.ticket}")
-            
-            # ปิด loss position ท้ายสุด
-            if self._close_single_position(loss_position, CloseReason.SMART_RECOVERY):
-                closed_positions.append(loss_position.ticket)
-            else:
-                print(f"         ❌ Failed to close loss position #{loss_position.ticket}")
+            closed_positions = self._close_positions_netted(hedge_positions + [loss_position], reasons)
+            for pos in hedge_positions + [loss_position]:
+                if pos.ticket not in closed_positions:
+                    print(f"         ❌ Failed to close #{pos.ticket}")
             
             success = len(closed_positions) == len(combination['hedge_positions']) + 1
             
@@ -1787,8 +1777,8 @@ class PositionManager:
             print(f"❌ All profitable close error: {e}")
             return False
     
-    def emergency_close_all(self) -> bool:
-        """🚨 ปิดทุก positions ในสถานการณ์ฉุกเฉิน"""
+    def emergency_close_all(self, fast: bool = True) -> bool:
+        """🚨 ปิดทุก positions ในสถานการณ์ฉุกเฉิน (fast = close-by + close พร้อมกัน)"""
         try:
             print("🚨 === EMERGENCY CLOSE ALL ===")
             
@@ -1804,26 +1794,165 @@ class PositionManager:
             print(f"🚨 Emergency closing {total_positions} positions")
             print(f"   Net P&L: ${total_profit:.2f}")
             
-            closed_count = 0
-            for pos in list(self.active_positions.values()):
-                if self._close_single_position(pos, CloseReason.EMERGENCY):
-                    closed_count += 1
-                    time.sleep(0.2)  # Quick succession
-            
-            success = closed_count == total_positions
+            if fast:
+                report = self.fast_flatten(CloseReason.EMERGENCY)
+                closed_count = len(report.closed)
+                success = report.success
+                print(f"   ⏱️ Time to flat: {report.time_to_flat_ms:.0f}ms "
+                      f"(close-by: {report.netted_pairs}, deals: {report.deal_closes}, retries: {report.retries})")
+            else:
+                closed_count = 0
+                for pos in list(self.active_positions.values()):
+                    if self._close_single_position(pos, CloseReason.EMERGENCY):
+                        closed_count += 1
+                        time.sleep(0.2)  # Quick succession
+                success = closed_count == total_positions
             
             if success:
                 print(f"✅ Emergency close successful: {closed_count}/{total_positions}")
             else:
                 print(f"⚠️ Partial emergency close: {closed_count}/{total_positions}")
             
-            self._track_close_performance(CloseReason.EMERGENCY, success)
+            self._track_close_performance(CloseReason.EMERGENCY, success, total_profit)
             return success
             
         except Exception as e:
             self.log(f"❌ Emergency close error: {e}")
             return False
     
+    def _track_close_performance(self, reason: CloseReason, success: bool, profit: float = 0.0):
+        """📊 นับผลการปิดตามเหตุผล (count / success / total_profit)"""
+        performance = self.close_performance[reason.value]
+        performance["count"] += 1
+        if success:
+            performance["success"] += 1
+            performance["total_profit"] += profit
+    
+    # ========================================================================================
+    # ⚡ FAST FLATTEN
+    # ========================================================================================
+    
+    def fast_flatten(self, reason: CloseReason = CloseReason.EMERGENCY) -> FlattenReport:
+        """⚡ ปิดทุก position ให้เร็วที่สุด
+        
+        0. reconcile position book กับ terminal แล้วโหลด positions ใหม่
+        1. net คู่ BUY/SELL ด้วย close-by (แต่ละ chain ของคู่ที่ใช้ ticket ร่วมกันทำตามลำดับ, chain ต่างกันทำพร้อมกัน)
+        2. volume ที่เหลือปิดด้วย deal พร้อมกันไม่เกิน workers requests, requote = ส่งซ้ำทันที
+        """
+        start = time.perf_counter()
+        if not self.mt5_connector.is_connected:
+            self.log("❌ Flatten skipped: MT5 not connected")
+            return FlattenReport(positions=0, closed=[], failed=[], netted_pairs=0, deal_closes=0, retries=0,
+                                 netting_ms=0.0, time_to_flat_ms=0.0, flat=False)
+        
+        # reconcile book กับ terminal ก่อน -> ไม่ปิดตาม cache ที่เก่า (ticket ที่หาย / ticket ใหม่)
+        book = self._get_position_book()
+        if book is not None:
+            book.reconcile()
+        self.update_positions()
+        positions = list(self.active_positions.values())
+        remaining = {pos.ticket: round(pos.volume, 8) for pos in positions}
+        workers = max(1, int(self.flatten_config["workers"]))
+        netted_pairs = deal_closes = retries = 0
+        failed = []
+        
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="flatten") as pool:
+            # 1. close-by netting
+            if self.four_d_config.get("use_close_by", True):
+                chains = self._group_close_by_chains(self._plan_close_by(positions))
+                for done_pairs in pool.map(lambda chain: self._run_close_by_chain(chain, reason), chains):
+                    for position, position_by, volume in done_pairs:
+                        netted_pairs += 1
+                        self.close_by_stats["netted_volume"] += volume
+                        for pos in (position, position_by):
+                            remaining[pos.ticket] = round(remaining[pos.ticket] - volume, 8)
+                            if remaining[pos.ticket] <= 0:
+                                self._record_closed_position(pos, reason)
+            netting_ms = (time.perf_counter() - start) * 1000
+            
+            # 2. deal ปิด volume ที่เหลือ
+            leftovers = [(pos, remaining[pos.ticket]) for pos in positions if remaining[pos.ticket] > 0]
+            self.close_by_stats["residual_deals"] += sum(1 for pos, volume in leftovers
+                                                         if volume < round(pos.volume, 8))
+            for (pos, volume), (closed, attempts) in zip(
+                    leftovers, pool.map(lambda item: self._close_with_retry(item[0], reason, item[1]), leftovers)):
+                retries += max(0, attempts - 1)
+                if closed:
+                    deal_closes += 1
+                    remaining[pos.ticket] = 0.0
+                else:
+                    failed.append(pos.ticket)
+        
+        time_to_flat_ms = (time.perf_counter() - start) * 1000
+        # flat = ไม่เหลือ ticket ในชุดที่สั่งปิด (กรองแบบเดียวกับ positions - ticket ที่เปิดหลัง reconcile ไม่นับ)
+        open_positions = mt5.positions_get(symbol=self.symbol)
+        tickets = set(remaining)
+        report = FlattenReport(
+            positions=len(positions),
+            closed=[pos.ticket for pos in positions if remaining[pos.ticket] <= 0],
+            failed=failed,
+            netted_pairs=netted_pairs,
+            deal_closes=deal_closes,
+            retries=retries,
+            netting_ms=netting_ms,
+            time_to_flat_ms=time_to_flat_ms,
+            flat=open_positions is not None and not any(pos.ticket in tickets for pos in open_positions)
+        )
+        self.last_flatten = report
+        self.log(f"⚡ Flatten {len(report.closed)}/{report.positions} in {time_to_flat_ms:.0f}ms "
+                 f"(close-by {netted_pairs}, deals {deal_closes}, retries {retries}, flat: {report.flat})")
+        return report
+    
+    @staticmethod
+    def _group_close_by_chains(pairs: List[Tuple[Position, Position, float]]) -> List[List[Tuple]]:
+        """แยกคู่ close-by เป็น chains - คู่ที่ใช้ ticket ร่วมกับคู่ก่อนหน้าต้องทำต่อกันตามลำดับ"""
+        chains = []
+        previous = set()
+        for pair in pairs:
+            tickets = {pair[0].ticket, pair[1].ticket}
+            if chains and tickets & previous:
+                chains[-1].append(pair)
+            else:
+                chains.append([pair])
+            previous = tickets
+        return chains
+    
+    def _run_close_by_chain(self, chain: List[Tuple[Position, Position, float]],
+                            reason: CloseReason) -> List[Tuple[Position, Position, float]]:
+        """ทำ close-by ตามลำดับใน chain - หยุดเมื่อล้มเหลว (ที่เหลือปิดด้วย deal) - คืนคู่ที่สำเร็จ"""
+        done = []
+        for position, position_by, volume in chain:
+            if not self._close_by(position, position_by, reason):
+                break
+            done.append((position, position_by, volume))
+        return done
+    
+    def _close_with_retry(self, position: Position, reason: CloseReason, volume: float) -> Tuple[bool, int]:
+        """ปิดด้วย deal - requote / price changed / ไม่มี response ส่งซ้ำ, position หายไปแล้ว = สำเร็จ
+        (ส่งซ้ำปลอดภัย: ปิดตาม ticket, ถ้าปิดไปแล้ว broker ตอบ POSITION_CLOSED) - คืน (closed, attempts)"""
+        retry_codes = {mt5.TRADE_RETCODE_REQUOTE, mt5.TRADE_RETCODE_PRICE_CHANGED, mt5.TRADE_RETCODE_PRICE_OFF}
+        partial = volume < round(position.volume, 8)
+        attempts = 0
+        
+        while attempts <= self.flatten_config["max_retries"]:
+            attempts += 1
+            try:
+                result = self._send_close_request(position, reason, volume if partial else None)
+            except Exception as e:
+                self.log(f"❌ Flatten close #{position.ticket} error: {e}")
+                result = None
+            
+            if result and result.retcode in (mt5.TRADE_RETCODE_DONE, mt5.TRADE_RETCODE_POSITION_CLOSED):
+                self._record_closed_position(position, reason)
+                return True, attempts
+            if result is not None and result.retcode not in retry_codes:
+                self.log(f"❌ Flatten close #{position.ticket} failed: {result.retcode} {result.comment}")
+                return False, attempts
+            time.sleep(self.flatten_config["retry_delay"])
+        
+        self.log(f"❌ Flatten close #{position.ticket} failed after {attempts} attempts")
+        return False, attempts
+    
     # ========================================================================================
     # 📊 ENHANCED STATUS & REPORTING METHODS
     # ========================================================================================
@@ -1884,7 +2013,9 @@ class PositionManager:
                 'total_hedge_candidates': total_hedge_candidates,
                 'recovery_scanner_active': self.recovery_scanner_running,
                 'last_recovery_scan': self.last_recovery_scan.strftime('%H:%M:%S') if self.last_recovery_scan else 'Never',
-                'hedge_execution_stats': self.hedge_execution_stats
+                'hedge_execution_stats': self.hedge_execution_stats,
+                'close_by_stats': self.close_by_stats,
+                'mark_to_market': self.mark_to_market.get_status()
             }
             
         except Exception as e:
@@ -2090,7 +2221,7 @@ class PositionManager:
                 suggestions.append(f"⚠️ {len(low_4d_positions)} positions have low 4D scores - review strategy")
             
             # Age analysis
-            old_positions = [pos for pos in self.active_positions.values() if pos.age_hours > 48]
+            old_positions = self.hedge_index.opened_before((datetime.now() - timedelta(hours=48)).timestamp())
             if len(old_positions) > 0:
                 suggestions.append(f"⏰ {len(old_positions)} positions aged >48h - consider recovery or closure")
             
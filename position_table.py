@@ -0,0 +1,364 @@
+"""
+📐 Position Table - Columnar 4D Position Scoring
+position_table.py
+
+🎯 FEATURES:
+✅ เก็บ positions เป็น NumPy columns (profit, volume, age, side, open price, ...)
+✅ คำนวณ 4D ครบทุกมิติ + recovery priority ของทุก position ในไม่กี่ vector operations
+✅ Hedge potential จากฝั่งตรงข้ามที่เรียงตามกำไร - candidates = suffix จาก searchsorted
+   (ผลรวม volume / timing ของ suffix สะสมด้วย Fenwick tree - O(n log n) ไม่มี matrix BUY x SELL)
+✅ Position objects อ่านคะแนนผ่าน table ตาม ticket (thin views)
+✅ Snapshot แบบ immutable - สร้าง columns + คะแนนครบแล้วค่อยสลับ (thread อื่นไม่เห็นตารางครึ่งทาง)
+✅ สูตรและน้ำหนักเดียวกับการวิเคราะห์ทีละ position เดิม
+
+** 4D analysis ทั้ง book ในครั้งเดียว **
+"""
+
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+SECONDS_PER_DAY = 86400.0
+
+# น้ำหนักของแต่ละ factor (ลำดับเดียวกับการวิเคราะห์เดิม)
+VALUE_WEIGHTS = (0.40, 0.25, 0.20, 0.15)        # profit, age_performance, volume, margin
+SAFETY_WEIGHTS = (0.40, 0.30, 0.20, 0.10)       # risk_contribution, loss_impact, balance_impact, correlation
+HEDGE_WEIGHTS = (0.35, 0.30, 0.20, 0.15)        # hedge_availability, net_positive, volume_compatibility, timing_synergy
+MARKET_WEIGHTS = (0.30, 0.25, 0.25, 0.20)       # session, age_alignment, volume_alignment, efficiency
+PRIORITY_WEIGHTS = (0.30, 0.25, 0.25, 0.20)     # loss, age, hedge, safety
+
+SCORE_COLUMNS = ("value", "safety", "hedge", "market", "priority")
+
+def _weighted(factors: Iterable[np.ndarray], weights: Iterable[float]) -> np.ndarray:
+    """weighted average แล้ว clip 0-1"""
+    weighted_sum = 0
+    for factor, weight in zip(factors, weights):
+        weighted_sum = weighted_sum + factor * weight
+    return np.clip(weighted_sum / sum(weights), 0.0, 1.0)
+
+def _session_score(hour: int) -> float:
+    if 7 <= hour <= 17:      # London + NY sessions
+        return 0.8
+    if 1 <= hour <= 7:       # Asian session
+        return 0.6
+    return 0.4               # Quiet hours
+
+class _FenwickSums:
+    """Fenwick tree ของผลรวมหลาย column (prefix sum + point add แบบ O(log n))"""
+
+    def __init__(self, size: int, columns: int):
+        self.size = size
+        self.trees = [[0.0] * (size + 1) for _ in range(columns)]
+
+    def add(self, index: int, *values: float):
+        i = index + 1
+        while i <= self.size:
+            for tree, value in zip(self.trees, values):
+                tree[i] += value
+            i += i & -i
+
+    def prefix(self, end: int) -> List[float]:
+        """ผลรวมของ index [0, end)"""
+        sums = [0.0] * len(self.trees)
+        i = end
+        while i > 0:
+            for column, tree in enumerate(self.trees):
+                sums[column] += tree[i]
+            i -= i & -i
+        return sums
+
+    def range(self, start: int, end: int) -> List[float]:
+        return [b - a for a, b in zip(self.prefix(start), self.prefix(end))]
+
+# ========================================================================================
+# 📐 TABLE SNAPSHOT
+# ========================================================================================
+
+class TableSnapshot:
+    """
+    📐 columns + คะแนนของ positions ชุดหนึ่ง (struct-of-arrays)
+
+    สร้างและ score ให้เสร็จก่อน publish - หลังจากนั้นไม่ถูกแก้อีก
+    """
+
+    def __init__(self, positions: List):
+        count = len(positions)
+        self.tickets = np.fromiter((p.ticket for p in positions), dtype=np.int64, count=count)
+        self.is_buy = np.fromiter((p.type.value == "BUY" for p in positions), dtype=bool, count=count)
+        self.profit = np.fromiter((p.total_profit for p in positions), dtype=np.float64, count=count)
+        self.volume = np.fromiter((p.volume for p in positions), dtype=np.float64, count=count)
+        self.age_hours = np.fromiter((p.age_hours for p in positions), dtype=np.float64, count=count)
+        self.open_ts = np.fromiter((p.open_time.timestamp() for p in positions), dtype=np.float64, count=count)
+        self.open_price = np.fromiter((p.open_price for p in positions), dtype=np.float64, count=count)
+        self.swap = np.fromiter((p.swap for p in positions), dtype=np.float64, count=count)
+        self.commission = np.fromiter((p.commission for p in positions), dtype=np.float64, count=count)
+        self.row_of: Dict[int, int] = {ticket: row for row, ticket in enumerate(self.tickets.tolist())}
+
+        for column in SCORE_COLUMNS:
+            setattr(self, column, np.zeros(count))
+        # hedge candidates ของแถว = tickets ฝั่งตรงข้าม (กำไรมากก่อน) [:hedge_count] - สร้าง list เมื่อถูกอ่าน
+        self.hedge_count = np.zeros(count, dtype=np.int64)
+        self._opposite_tickets = {True: np.zeros(0, dtype=np.int64), False: np.zeros(0, dtype=np.int64)}
+
+    def rescored(self, now: datetime) -> "TableSnapshot":
+        """snapshot ใหม่ที่ใช้ columns เดิม (arrays ไม่ถูกแก้ - แชร์ได้) แล้ว score ใหม่"""
+        snapshot = TableSnapshot.__new__(TableSnapshot)
+        snapshot.__dict__.update(self.__dict__)
+        snapshot.score(now)
+        return snapshot
+
+    def __len__(self) -> int:
+        return len(self.tickets)
+
+    def get(self, ticket: int, column: str, default=0.0):
+        """คะแนนของ ticket จาก column (default ถ้าไม่มีแถว)"""
+        row = self.row_of.get(ticket)
+        if row is None:
+            return default
+        if column == "hedge_candidates":
+            return self._opposite_tickets[bool(self.is_buy[row])][:int(self.hedge_count[row])].tolist()
+        return float(getattr(self, column)[row])
+
+    # ========================================================================================
+    # 🧠 4D SCORING
+    # ========================================================================================
+
+    def score(self, now: datetime):
+        """🧠 คำนวณ 4D + recovery priority ของทุก position (เรียกก่อน publish เท่านั้น)"""
+        if len(self) == 0:
+            return
+
+        self.value = self._score_value()
+        self.safety = self._score_safety()
+        self.hedge = self._score_hedge()
+        self.market = self._score_market(now.hour)
+        self.priority = self._score_priority()
+
+    def overall(self) -> np.ndarray:
+        """คะแนน 4D รวม (น้ำหนักเดียวกับ Position.four_d_overall_score)"""
+        return self.value * 0.30 + self.safety * 0.25 + self.hedge * 0.25 + self.market * 0.20
+
+    def _score_value(self) -> np.ndarray:
+        """Dimension 1: Position Value"""
+        profit = self.profit
+        profitable = profit > 0
+
+        # 1. Profit/Loss: กำไร scale ถึง $50, ขาดทุน -$200 = 0
+        profit_score = np.where(profitable, np.minimum(profit / 50, 1.0), np.maximum(0, 1 + profit / 200))
+
+        # 2. Age vs Performance: กำไร ใหม่ดีกว่า (7 วัน), ขาดทุน เก่ายิ่งเร่ง (2 วัน)
+        age_days = self.age_hours / 24
+        age_score = np.where(profitable, np.maximum(0, 1 - age_days / 7), np.minimum(age_days / 2, 1.0))
+
+        # 3. Volume efficiency (scale ถึง 0.1 lots) / 4. Margin efficiency (ประมาณ volume * 100, scale $500)
+        volume_score = np.minimum(self.volume / 0.1, 1.0)
+        margin_score = np.minimum(self.volume * 100 / 500, 1.0)
+
+        return _weighted((profit_score, age_score, volume_score, margin_score), VALUE_WEIGHTS)
+
+    def _score_safety(self) -> np.ndarray:
+        """Dimension 2: Safety Impact"""
+        count = len(self)
+
+        # 1. Risk contribution: > 20% ของ volume รวม = 0
+        total_exposure = self.volume.sum()
+        if total_exposure > 0:
+            risk_score = 1 - np.minimum(self.volume / total_exposure * 5, 1.0)
+        else:
+            risk_score = np.full(count, 0.5)
+
+        # 2. Loss potential impact (scale ถึง $300)
+        loss_impact_score = np.where(self.profit >= 0, 0.8, np.maximum(0, 1 - np.abs(self.profit) / 300))
+
+        # 3. Portfolio balance: ปิดฝั่งที่หนักอยู่ = ดี
+        buy_ratio = self.is_buy.sum() / count
+        heavy_side = (self.is_buy & (buy_ratio > 0.6)) | (~self.is_buy & (buy_ratio < 0.4))
+        balance_score = np.where(heavy_side, 0.8, 0.4)
+
+        # 4. Correlation risk - symbol เดียวกันทั้งหมด
+        correlation_score = np.full(count, 0.3 if count > 5 else 0.6)
+
+        return _weighted((risk_score, loss_impact_score, balance_score, correlation_score), SAFETY_WEIGHTS)
+
+    def _score_hedge(self) -> np.ndarray:
+        """Dimension 3: Hedge Potential - candidates = ฝั่งตรงข้ามที่ net > -50"""
+        count = len(self)
+        availability = np.zeros(count)
+        net_positive = np.zeros(count)
+        volume_compat = np.zeros(count)
+        timing = np.zeros(count)
+        self.hedge_count = np.zeros(count, dtype=np.int64)
+
+        for own_is_buy in (True, False):
+            own_mask = self.is_buy if own_is_buy else ~self.is_buy
+            rows = np.flatnonzero(own_mask)
+            other = np.flatnonzero(~own_mask)
+            other = other[np.lexsort((self.tickets[other], self.profit[other]))]
+            self._opposite_tickets[own_is_buy] = self.tickets[other][::-1]          # กำไรมากก่อน
+            if rows.size == 0:
+                continue
+
+            # ฝั่งตรงข้ามเรียงตาม (กำไร, ticket) - candidates = suffix ที่กำไร > -50 - profit
+            other_profit = self.profit[other]
+            starts = np.searchsorted(other_profit, -50 - self.profit[rows], side="right")
+            hedge_count = other.size - starts
+            has_hedge = hedge_count > 0
+            divisor = np.maximum(hedge_count, 1)
+            best_net = self.profit[rows] + (other_profit[-1] if other.size else 0.0)
+
+            volume_sums, timing_sums = self._suffix_hedge_sums(rows, other, starts)
+
+            self.hedge_count[rows] = hedge_count
+            availability[rows] = np.minimum(hedge_count / 3, 1.0)
+            net_positive[rows] = np.where(
+                has_hedge,
+                np.where(best_net > 0, np.minimum(best_net / 30, 1.0), np.maximum(0, (best_net + 100) / 100)),
+                0.0)
+            volume_compat[rows] = np.where(has_hedge, volume_sums / divisor, 0.0)
+            timing[rows] = np.where(has_hedge, timing_sums / divisor, 0.0)
+
+        return _weighted((availability, net_positive, volume_compat, timing), HEDGE_WEIGHTS)
+
+    def _suffix_hedge_sums(self, rows: np.ndarray, other: np.ndarray, starts: np.ndarray):
+        """ผลรวมของ volume ratio และ timing score ของ candidates (other[start:]) ของแต่ละแถว
+
+        sweep แถวตาม start จากมากไปน้อย - เพิ่ม candidate ทีละตัวเข้า Fenwick tree (ตาม volume / เวลาเปิด)
+        - volume ratio: a <= v -> a / v, a > v -> v / a  => sum(a) / v + v * sum(1 / a)
+        - timing: max(0, 1 - |dt| / 24h) => count - |sum(dt)| / 24h แยกฝั่งก่อน / หลัง ภายในหน้าต่าง 24h
+        """
+        volume_sums = np.zeros(rows.size)
+        timing_sums = np.zeros(rows.size)
+        if other.size == 0:
+            return volume_sums, timing_sums
+
+        base_ts = float(self.open_ts.min())
+        other_volume = self.volume[other]
+        other_ts = self.open_ts[other] - base_ts
+        volume_keys = np.unique(other_volume)
+        time_keys = np.unique(other_ts)
+        volume_rank = np.searchsorted(volume_keys, other_volume).tolist()
+        time_rank = np.searchsorted(time_keys, other_ts).tolist()
+
+        own_volume = self.volume[rows]
+        own_ts = self.open_ts[rows] - base_ts
+        volume_split = np.searchsorted(volume_keys, own_volume, side="right").tolist()
+        window_start = np.searchsorted(time_keys, own_ts - SECONDS_PER_DAY, side="left").tolist()
+        window_mid = np.searchsorted(time_keys, own_ts, side="right").tolist()
+        window_end = np.searchsorted(time_keys, own_ts + SECONDS_PER_DAY, side="right").tolist()
+
+        volumes_tree = _FenwickSums(volume_keys.size, 2)     # sum(a), sum(1 / a)
+        times_tree = _FenwickSums(time_keys.size, 2)         # count, sum(ts)
+        other_volume_list = other_volume.tolist()
+        other_ts_list = other_ts.tolist()
+        own_volume_list = own_volume.tolist()
+        own_ts_list = own_ts.tolist()
+
+        inserted = other.size
+        for i in np.argsort(-starts, kind="stable").tolist():
+            start = int(starts[i])
+            while inserted > start:
+                inserted -= 1
+                volume = other_volume_list[inserted]
+                volumes_tree.add(volume_rank[inserted], volume, 1.0 / volume)
+                times_tree.add(time_rank[inserted], 1.0, other_ts_list[inserted])
+            if inserted >= other.size:
+                continue
+
+            volume, ts = own_volume_list[i], own_ts_list[i]
+            below, _ = volumes_tree.prefix(volume_split[i])
+            _, above_inverse = volumes_tree.range(volume_split[i], volume_keys.size)
+            volume_sums[i] = below / volume + volume * above_inverse
+
+            before_count, before_ts = times_tree.range(window_start[i], window_mid[i])
+            after_count, after_ts = times_tree.range(window_mid[i], window_end[i])
+            timing_sums[i] = (before_count - (ts * before_count - before_ts) / SECONDS_PER_DAY +
+                              after_count - (after_ts - ts * after_count) / SECONDS_PER_DAY)
+        return volume_sums, timing_sums
+
+    def _score_market(self, hour: int) -> np.ndarray:
+        """Dimension 4: Market Alignment"""
+        count = len(self)
+        session_score = np.full(count, _session_score(hour))
+
+        # position ใหม่สอดคล้องกับตลาดมากกว่า (ลดลงใน 48 ชม.)
+        age_alignment = np.maximum(0, 1 - self.age_hours / 48)
+
+        # lot มาตรฐาน 0.01-0.05 = 1.0, 0.005-0.1 = 0.8, อื่นๆ = 0.4
+        volume = self.volume
+        volume_alignment = np.where((volume >= 0.01) & (volume <= 0.05), 1.0,
+                                    np.where((volume >= 0.005) & (volume <= 0.1), 0.8, 0.4))
+
+        # ต้นทุน commission + swap (scale ถึง $10)
+        efficiency = np.maximum(0, 1 - (self.commission + np.abs(self.swap)) / 10)
+
+        return _weighted((session_score, age_alignment, volume_alignment, efficiency), MARKET_WEIGHTS)
+
+    def _score_priority(self) -> np.ndarray:
+        """Recovery priority (ใช้ hedge / safety ที่คำนวณแล้ว)"""
+        loss_priority = np.where(self.profit < 0, np.minimum(np.abs(self.profit) / 200, 1.0), 0.1)
+        age_urgency = np.minimum(self.age_hours / 48, 1.0)
+        return _weighted((loss_priority, age_urgency, self.hedge, 1 - self.safety), PRIORITY_WEIGHTS)
+
+# ========================================================================================
+# 📐 POSITION TABLE
+# ========================================================================================
+
+class PositionTable:
+    """
+    📐 ตาราง positions สำหรับ 4D scoring ทั้ง book
+
+    - load(positions) สร้าง columns + คะแนนใน snapshot ใหม่ แล้วสลับเข้าด้วย assignment เดียว
+    - score() คำนวณคะแนนใหม่บน columns เดิม (snapshot ใหม่เช่นกัน)
+    - get(ticket, column) อ่านจาก snapshot ปัจจุบัน (ticket ที่ยังไม่ถูกวิเคราะห์ = default)
+    """
+
+    def __init__(self):
+        self._snapshot = TableSnapshot([])
+        self.stats = {"loads": 0, "scores": 0, "last_score_ms": 0.0}
+
+    @property
+    def snapshot(self) -> TableSnapshot:
+        return self._snapshot
+
+    def load(self, positions: Iterable, now: Optional[datetime] = None):
+        """📥 columns จาก Position objects (type / total_profit / volume / age_hours / open_time ...) + score แล้ว publish"""
+        start = datetime.now()
+        positions = list(positions)
+        snapshot = TableSnapshot(positions)
+        snapshot.score(now or start)
+        self._snapshot = snapshot
+        for position in positions:
+            position._table = self
+        self.stats["loads"] += 1
+        self._record_score(start)
+
+    def score(self, now: Optional[datetime] = None):
+        """🧠 คำนวณ 4D + recovery priority ของทุก position ใหม่ (เช่น session เปลี่ยน)"""
+        start = datetime.now()
+        self._snapshot = self._snapshot.rescored(now or start)
+        self._record_score(start)
+
+    def _record_score(self, start: datetime):
+        self.stats["scores"] += 1
+        self.stats["last_score_ms"] = (datetime.now() - start).total_seconds() * 1000
+
+    def __len__(self) -> int:
+        return len(self._snapshot)
+
+    def get(self, ticket: int, column: str, default=0.0):
+        """คะแนนของ ticket จาก column (default ถ้าไม่มีแถว)"""
+        return self._snapshot.get(ticket, column, default)
+
+    def overall(self) -> np.ndarray:
+        """คะแนน 4D รวม (น้ำหนักเดียวกับ Position.four_d_overall_score)"""
+        return self._snapshot.overall()
+
+    def get_status(self) -> Dict:
+        """📊 สถานะ table"""
+        return {"rows": len(self), **self.stats}
+
+    def log(self, message: str):
+        """Log message with timestamp"""
+        timestamp = datetime.now().strftime("%H:%M:%S.%f")[:-3]
+        print(f"[{timestamp}] 📐 PositionTable: {message}")
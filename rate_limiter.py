@@ -0,0 +1,238 @@
+"""
+⏳ Rate Limiter - Shared Token Buckets and Sliding Windows
+rate_limiter.py
+
+🎯 FEATURES:
+✅ Token bucket - จำกัด burst ของการส่งออเดอร์ไป broker
+✅ Sliding window แบบ exact - "ไม่เกิน N ครั้งใน X วินาทีล่าสุด" (ไม่ reset ตามต้นชั่วโมง/ต้นวัน)
+✅ Cooldown = sliding window 1 ครั้งต่อ X วินาที
+✅ Thread-safe - rule engine และ order worker ใช้ตัวเดียวกัน
+✅ check() / record() แยกกัน - ตรวจก่อน, นับเมื่อส่งสำเร็จจริง
+
+** ตัวนับ throttling ทั้งระบบอยู่ที่เดียว **
+"""
+
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+# ชื่อ limit ที่ใช้ร่วมกันระหว่าง modules
+SIGNAL_COOLDOWN = "signal_cooldown"
+SIGNALS_PER_HOUR = "signals_per_hour"
+ORDERS_PER_DAY = "orders_per_day"
+ORDER_SEND_RATE = "order_send_rate"
+
+# ========================================================================================
+# 🪣 LIMIT PRIMITIVES
+# ========================================================================================
+
+class TokenBucket:
+    """🪣 token bucket - capacity = burst สูงสุด, refill_rate = token ต่อวินาที"""
+
+    def __init__(self, capacity: float, refill_rate: float):
+        self.capacity = float(capacity)
+        self.refill_rate = float(refill_rate)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self, now: float):
+        if now > self.updated_at:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.refill_rate)
+            self.updated_at = now
+
+    def check(self, now: float) -> Tuple[bool, float]:
+        """คืน (allowed, retry_after_seconds)"""
+        self._refill(now)
+        if self.tokens >= 1.0:
+            return True, 0.0
+        if self.refill_rate <= 0:
+            return False, float("inf")
+        return False, (1.0 - self.tokens) / self.refill_rate
+
+    def record(self, now: float):
+        self._refill(now)
+        self.tokens = max(0.0, self.tokens - 1.0)
+
+    def count(self, now: float) -> int:
+        self._refill(now)
+        return int(self.capacity - self.tokens)
+
+    def reset(self):
+        self.tokens = self.capacity
+
+class SlidingWindow:
+    """🪟 ไม่เกิน limit ครั้งใน window วินาทีล่าสุด (เก็บ timestamp - ออก/เข้า deque ครั้งเดียวต่อ event)"""
+
+    def __init__(self, limit: int, window_seconds: float):
+        self.limit = max(0, int(limit))
+        self.window_seconds = float(window_seconds)
+        self.events = deque()
+
+    def _expire(self, now: float):
+        cutoff = now - self.window_seconds
+        while self.events and self.events[0] <= cutoff:
+            self.events.popleft()
+
+    def check(self, now: float) -> Tuple[bool, float]:
+        """คืน (allowed, retry_after_seconds)"""
+        self._expire(now)
+        if len(self.events) < self.limit:
+            return True, 0.0
+        if not self.events:
+            return False, float("inf")
+        # event ที่ต้องหมดอายุก่อนถึงจะมีที่ว่าง
+        blocking_event = self.events[len(self.events) - self.limit]
+        return False, blocking_event + self.window_seconds - now
+
+    def record(self, now: float):
+        self._expire(now)
+        self.events.append(now)
+
+    def count(self, now: float) -> int:
+        self._expire(now)
+        return len(self.events)
+
+    def reset(self):
+        self.events.clear()
+
+# ========================================================================================
+# ⏳ RATE LIMITER
+# ========================================================================================
+
+class RateLimiter:
+    """
+    ⏳ limits ที่ตั้งชื่อไว้ (token bucket / sliding window) ใช้ร่วมกันทั้งระบบ
+
+    - check(name) ไม่ใช้ quota, record(name) นับ 1 ครั้ง, try_acquire(name) = check + record แบบ atomic
+    - limit ที่ไม่ได้ configure = ผ่านเสมอ
+    """
+
+    def __init__(self):
+        self._limits: Dict[str, object] = {}
+        self._lock = threading.Lock()
+        self.stats = {"checks": 0, "allowed": 0, "blocked": {}}
+
+    @classmethod
+    def from_config(cls, signal_generation: Optional[Dict] = None,
+                    risk_management: Optional[Dict] = None) -> "RateLimiter":
+        """🔧 สร้างจาก config sections signal_generation / risk_management"""
+        limiter = cls()
+        limiter.configure_signal_limits(signal_generation or {})
+        limiter.configure_order_limits(risk_management or {})
+        return limiter
+
+    # ========================================================================================
+    # 🔧 CONFIGURATION
+    # ========================================================================================
+
+    def configure_window(self, name: str, limit: int, window_seconds: float):
+        """🪟 ตั้ง sliding window (เก็บ events เดิมไว้ถ้ามี)"""
+        with self._lock:
+            window = SlidingWindow(limit, window_seconds)
+            previous = self._limits.get(name)
+            if isinstance(previous, SlidingWindow):
+                window.events = previous.events
+            self._limits[name] = window
+
+    def configure_bucket(self, name: str, capacity: float, refill_rate: float):
+        """🪣 ตั้ง token bucket"""
+        with self._lock:
+            self._limits[name] = TokenBucket(capacity, refill_rate)
+
+    def configure_signal_limits(self, signal_generation: Dict):
+        """🔧 cooldown + signals ต่อชั่วโมง จาก signal_generation"""
+        cooldown = signal_generation.get("cooldown_between_signals_seconds",
+                                         signal_generation.get("cooldown_between_signals", 60))
+        per_hour = signal_generation.get("max_signals_per_hour",
+                                         signal_generation.get("hourly_limits", {}).get("max_signals_per_hour", 20))
+        self.configure_window(SIGNAL_COOLDOWN, 1, cooldown)
+        self.configure_window(SIGNALS_PER_HOUR, per_hour, 3600)
+
+    def configure_order_limits(self, risk_management: Dict):
+        """🔧 orders ต่อ 24 ชม. + อัตราส่งออเดอร์ จาก risk_management"""
+        self.configure_window(ORDERS_PER_DAY, risk_management.get("max_daily_orders", 100), 86400)
+        self.configure_bucket(ORDER_SEND_RATE,
+                              risk_management.get("order_burst_limit", 20),
+                              risk_management.get("orders_per_second", 5.0))
+
+    # ========================================================================================
+    # ✅ CHECK / RECORD
+    # ========================================================================================
+
+    def check(self, name: str) -> Tuple[bool, float]:
+        """✅ ผ่าน limit หรือไม่ - คืน (allowed, retry_after_seconds) โดยไม่ใช้ quota"""
+        with self._lock:
+            return self._check_locked(name, time.monotonic())
+
+    def record(self, name: str):
+        """📝 นับ 1 ครั้ง (เรียกเมื่อ action เกิดขึ้นจริง)"""
+        with self._lock:
+            limit = self._limits.get(name)
+            if limit is not None:
+                limit.record(time.monotonic())
+
+    def try_acquire(self, name: str) -> Tuple[bool, float]:
+        """🎟️ check + record ในครั้งเดียว (atomic)"""
+        with self._lock:
+            now = time.monotonic()
+            allowed, retry_after = self._check_locked(name, now)
+            if allowed and name in self._limits:
+                self._limits[name].record(now)
+            return allowed, retry_after
+
+    def _check_locked(self, name: str, now: float) -> Tuple[bool, float]:
+        self.stats["checks"] += 1
+        limit = self._limits.get(name)
+        if limit is None:
+            self.stats["allowed"] += 1
+            return True, 0.0
+        allowed, retry_after = limit.check(now)
+        if allowed:
+            self.stats["allowed"] += 1
+        else:
+            self.stats["blocked"][name] = self.stats["blocked"].get(name, 0) + 1
+        return allowed, retry_after
+
+    def count(self, name: str) -> int:
+        """📊 จำนวนครั้งใน window ปัจจุบัน (bucket = token ที่ใช้ไป)"""
+        with self._lock:
+            limit = self._limits.get(name)
+            return limit.count(time.monotonic()) if limit is not None else 0
+
+    def get_limit(self, name: str) -> Optional[int]:
+        """📊 ขีดจำกัดของ limit (window = limit, bucket = capacity)"""
+        limit = self._limits.get(name)
+        if isinstance(limit, SlidingWindow):
+            return limit.limit
+        if isinstance(limit, TokenBucket):
+            return int(limit.capacity)
+        return None
+
+    def reset(self, name: Optional[str] = None):
+        """🔄 ล้างตัวนับ (ทั้งหมด หรือเฉพาะ limit)"""
+        with self._lock:
+            for key, limit in self._limits.items():
+                if name is None or key == name:
+                    limit.reset()
+
+    def get_status(self) -> Dict:
+        """📊 สถานะทุก limit"""
+        now = time.monotonic()
+        with self._lock:
+            limits = {}
+            for name, limit in self._limits.items():
+                allowed, retry_after = limit.check(now)
+                limits[name] = {
+                    "used": limit.count(now),
+                    "limit": limit.limit if isinstance(limit, SlidingWindow) else int(limit.capacity),
+                    "allowed": allowed,
+                    "retry_after": round(retry_after, 2)
+                }
+            return {"limits": limits, **self.stats}
+
+    def log(self, message: str):
+        """Log message with timestamp"""
+        timestamp = datetime.now().strftime("%H:%M:%S.%f")[:-3]
+        print(f"[{timestamp}] ⏳ RateLimiter: {message}")
@@ -0,0 +1,265 @@
+"""
+🛡️ Risk Guard - Tick-Driven Equity Stop & Margin Guard
+risk_guard.py
+
+🎯 FEATURES:
+✅ ประเมินทุก tick จาก MarkSnapshot (ไม่มี IPC บน tick thread)
+✅ Limits จาก rules_config.json risk_management: emergency_stop_loss (% drawdown จาก peak equity),
+   margin_usage_limit (margin / equity), position_limits.max_buy_positions / max_sell_positions
+✅ ไม่มี limit ที่ตั้งไว้ = ไม่ arm (log อย่างเดียว) - ไม่มีค่า default ที่ trip เอง
+✅ ก่อน arm โหลด positions + balance / margin ให้ mark-to-market และตั้ง peak equity จาก equity ของ account
+✅ ผิดเงื่อนไข = halt rule engine + order queues ทันทีใน tick เดียวกัน
+✅ Fast-flatten บน thread แยก (close-by + close พร้อมกัน) + ยกเลิก pending orders
+   เฉพาะเมื่อ safety_protocols.emergency_close_enabled = true
+✅ Latch - trip แล้วไม่ trade ต่อจนกว่าจะ reset()
+
+** หยุดขาดทุนภายใน tick เดียว ไม่ต้องรอ health check รอบ 30 วินาที **
+"""
+
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Optional
+
+from market_data_watcher import MarketDataWatcher
+from mt5_gateway import mt5_gateway as mt5   # IPC ทั้งหมดผ่าน gateway thread เดียว
+from position_manager import CloseReason
+
+@dataclass
+class RiskBreach:
+    """เงื่อนไขที่ผิด ณ tick ที่ trip"""
+    limit: str                               # emergency_stop_loss / margin_usage_limit / max_buy_positions / max_sell_positions
+    value: float
+    threshold: float
+    message: str
+    tick_time_msc: int = 0
+    detected_at: float = 0.0                 # time.monotonic() ตอนตรวจพบ
+
+# ========================================================================================
+# 🛡️ RISK GUARD
+# ========================================================================================
+
+class RiskGuard:
+    """
+    🛡️ Equity stop + margin guard บน tick stream
+
+    - arm() subscribe กับ mark-to-market ของ PositionManager (listener ทำงานบน tick thread)
+      ถ้า PositionManager ยังไม่มี tick stream (rule engine แบบ polling) guard เปิด MarketDataWatcher เอง
+    - evaluate(snapshot) ตรวจ limits จาก rules_config["risk_management"] - ไม่ได้ตั้ง / 0 = ปิด limit นั้น
+    - trip: halt order manager + rule engine แล้ว flatten บน thread "RiskGuardFlatten" (ถ้าเปิด emergency close)
+    """
+
+    def __init__(self, rules_config: Dict, position_manager, order_manager=None, rule_engine=None):
+        self.position_manager = position_manager
+        self.order_manager = order_manager
+        self.rule_engine = rule_engine
+
+        # ไม่มี default - limit ที่ไม่ได้ตั้งใน rules_config ไม่ถูกตรวจ
+        risk_management = rules_config.get("risk_management", {})
+        position_limits = risk_management.get("position_limits", {})
+        safety_protocols = risk_management.get("safety_protocols", {})
+        self.limits = {
+            "emergency_stop_loss": risk_management.get("emergency_stop_loss"),      # % drawdown จาก peak equity
+            "margin_usage_limit": risk_management.get("margin_usage_limit"),        # margin / equity (0.75 = 75%)
+            "max_buy_positions": position_limits.get("max_buy_positions"),
+            "max_sell_positions": position_limits.get("max_sell_positions")
+        }
+        self.flatten_enabled = safety_protocols.get("emergency_close_enabled", False)
+        self.flatten_passes = risk_management.get("flatten_passes", 2)   # flatten ซ้ำถ้ามีออเดอร์ที่กำลังส่ง fill หลัง flatten
+        self.poll_interval = risk_management.get("guard_poll_interval", 0.1)
+
+        self.is_armed = False
+        self.peak_equity = 0.0
+        self.breach: Optional[RiskBreach] = None
+        self.flatten_thread = None
+        self.market_watcher = None             # watcher ของ guard เอง (None = ใช้ของ rule engine)
+        self._trip_lock = threading.Lock()
+
+        self.stats = {
+            "ticks": 0,
+            "trips": 0,
+            "last_eval_us": 0.0,
+            "trip_latency_ms": 0.0,            # tick ถึง halt
+            "time_to_flat_ms": 0.0,            # tick ถึง flat
+            "pending_cancelled": 0
+        }
+
+    # ========================================================================================
+    # 🎮 CONTROL
+    # ========================================================================================
+
+    @property
+    def has_limits(self) -> bool:
+        return any(self.limits.values())
+
+    def arm(self):
+        """🛡️ เริ่มตรวจทุก tick (ไม่มี limit ที่ตั้งไว้ = ไม่ arm)"""
+        if self.is_armed:
+            return
+        if not self.has_limits:
+            self.log("⚠️ No limits in rules_config risk_management - guard not armed")
+            return
+        # positions + balance / margin ต้องอยู่ใน mark-to-market ก่อน tick แรก (ไม่งั้น equity = 0, ไม่มี margin)
+        self.position_manager.update_positions(reload_marks=True)
+        self.peak_equity = self._account_equity()
+        self.is_armed = True
+        self.position_manager.mark_to_market.add_listener(self.evaluate)
+
+        watcher = self.position_manager.market_watcher
+        if watcher is None or not watcher.is_running:
+            self.market_watcher = MarketDataWatcher(lambda: self.position_manager.symbol,
+                                                    poll_interval=self.poll_interval)
+            # subscribe ก่อน start - tick แรกต้องไม่หลุดก่อนมี subscriber
+            self.position_manager.attach_market_watcher(self.market_watcher)
+            self.market_watcher.start()
+        limits = ", ".join(f"{key} {value}" for key, value in self.limits.items() if value)
+        self.log(f"🛡️ Armed - {limits} (emergency close: {'on' if self.flatten_enabled else 'off'})")
+
+    def disarm(self):
+        """หยุดตรวจ (ไม่ยกเลิก halt ที่ trip ไปแล้ว)"""
+        self.is_armed = False
+        self.position_manager.mark_to_market.remove_listener(self.evaluate)
+        if self.market_watcher:
+            self.market_watcher.stop()
+            self.market_watcher = None
+
+    def reset(self):
+        """🔄 ล้าง latch + peak equity แล้วให้ engine / order queues กลับมาเทรดได้"""
+        if self.flatten_thread and self.flatten_thread.is_alive():
+            self.log("⚠️ Flatten still running - reset ignored")
+            return
+        self.breach = None
+        self.peak_equity = self._account_equity()
+        if self.order_manager:
+            self.order_manager.resume_trading()
+        if self.rule_engine:
+            self.rule_engine.resume()
+        self.log("🔄 Reset - trading allowed")
+
+    @property
+    def is_tripped(self) -> bool:
+        return self.breach is not None
+
+    def _account_equity(self) -> float:
+        """equity จริงของ account (fallback เป็น snapshot ล่าสุดของ mark-to-market)"""
+        account = mt5.account_info()
+        if account is not None:
+            return float(account.equity)
+        snapshot = self.position_manager.mark_to_market.snapshot
+        return snapshot.equity if snapshot else 0.0
+
+    # ========================================================================================
+    # 🔍 EVALUATION (tick thread)
+    # ========================================================================================
+
+    def evaluate(self, snapshot) -> Optional[RiskBreach]:
+        """🔍 ตรวจ limits กับ snapshot ของ tick นี้ - ผิดเงื่อนไข = trip ทันที"""
+        if not self.is_armed or self.breach is not None:
+            return None
+
+        start = time.perf_counter()
+        self.stats["ticks"] += 1
+        breach = self._check_limits(snapshot)
+        self.stats["last_eval_us"] = (time.perf_counter() - start) * 1e6
+
+        if breach:
+            self._trip(breach, snapshot)
+        return breach
+
+    def _check_limits(self, snapshot) -> Optional[RiskBreach]:
+        limits = self.limits
+        equity = snapshot.equity
+        self.peak_equity = max(self.peak_equity, equity)
+
+        stop_loss = limits["emergency_stop_loss"]
+        if stop_loss and self.peak_equity > 0:
+            drawdown = (self.peak_equity - equity) / self.peak_equity * 100
+            if drawdown >= stop_loss:
+                return RiskBreach("emergency_stop_loss", drawdown, stop_loss,
+                                  f"Equity drawdown {drawdown:.1f}% (equity ${equity:.2f}, peak ${self.peak_equity:.2f})")
+
+        margin_usage_limit = limits["margin_usage_limit"]
+        margin_usage = snapshot.margin_usage
+        if margin_usage_limit and margin_usage is not None and margin_usage > margin_usage_limit:
+            return RiskBreach("margin_usage_limit", margin_usage, margin_usage_limit,
+                              f"Margin usage {margin_usage:.0%} > {margin_usage_limit:.0%} of equity")
+
+        for key, side, count in (("max_buy_positions", "BUY", snapshot.buy_count),
+                                 ("max_sell_positions", "SELL", snapshot.sell_count)):
+            if limits[key] and count > limits[key]:
+                return RiskBreach(key, count, limits[key], f"{count} {side} positions > {limits[key]}")
+        return None
+
+    # ========================================================================================
+    # 🚨 TRIP
+    # ========================================================================================
+
+    def _trip(self, breach: RiskBreach, snapshot):
+        """🚨 halt ทุกทางที่เปิดออเดอร์ใหม่ (บน tick thread) แล้ว flatten บน thread แยก"""
+        with self._trip_lock:
+            if self.breach is not None:
+                return
+            breach.tick_time_msc = snapshot.tick_time_msc
+            breach.detected_at = time.monotonic()
+            self.breach = breach
+        self.stats["trips"] += 1
+
+        reason = f"Risk guard: {breach.message}"
+        if self.order_manager:
+            self.order_manager.halt_trading(reason)
+        if self.rule_engine:
+            self.rule_engine.halt(reason)
+        self.stats["trip_latency_ms"] = (time.monotonic() - snapshot.marked_at) * 1000
+        self.log(f"🚨 TRIPPED - {breach.message} (halted {self.stats['trip_latency_ms']:.2f}ms after tick)")
+
+        if not self.flatten_enabled:
+            self.log("⚠️ emergency_close_enabled is off - positions left open")
+            return
+        flatten_thread = threading.Thread(target=self._flatten, args=(snapshot.marked_at,),
+                                          daemon=True, name="RiskGuardFlatten")
+        flatten_thread.start()
+        self.flatten_thread = flatten_thread
+
+    def _flatten(self, tick_received_at: float):
+        """⚡ flatten ทุก position - ถ้ายังเหลือ (ออเดอร์ที่กำลังส่งตอน halt fill ทีหลัง) ทำซ้ำ"""
+        try:
+            for attempt in range(max(1, int(self.flatten_passes))):
+                self.position_manager.update_positions()
+                if not self.position_manager.active_positions:
+                    break
+                report = self.position_manager.fast_flatten(CloseReason.RISK_MANAGEMENT)
+                self.log(f"⚡ Flatten pass {attempt + 1}: {len(report.closed)}/{report.positions} closed "
+                         f"in {report.time_to_flat_ms:.0f}ms (close-by: {report.netted_pairs}, deals: {report.deal_closes})")
+
+            if self.order_manager:
+                self.stats["pending_cancelled"] += self.order_manager.cancel_all_pending_orders()
+
+            self.stats["time_to_flat_ms"] = (time.monotonic() - tick_received_at) * 1000
+            self.position_manager.update_positions()
+            remaining = len(self.position_manager.active_positions)
+            if remaining:
+                self.log(f"⚠️ {remaining} positions still open after flatten")
+            else:
+                self.log(f"✅ Flat {self.stats['time_to_flat_ms']:.0f}ms after breach tick")
+
+        except Exception as e:
+            self.log(f"❌ Flatten error: {e}")
+
+    def get_status(self) -> Dict:
+        """📊 สถานะ guard"""
+        return {
+            "is_armed": self.is_armed,
+            "is_tripped": self.is_tripped,
+            "own_watcher": self.market_watcher is not None,
+            "breach": self.breach.message if self.breach else None,
+            "peak_equity": round(self.peak_equity, 2),
+            "limits": self.limits.copy(),
+            "flatten_enabled": self.flatten_enabled,
+            **self.stats
+        }
+
+    def log(self, message: str):
+        """Log message with timestamp"""
+        timestamp = datetime.now().strftime("%H:%M:%S.%f")[:-3]
+        print(f"[{timestamp}] 🛡️ RiskGuard: {message}")
@@ -22,6 +22,8 @@ import numpy as np
 from collections import deque, defaultdict
 import json
 import os
+from market_data_watcher import MarketDataWatcher, MarketEventType
+from rate_limiter import RateLimiter, SIGNAL_COOLDOWN, SIGNALS_PER_HOUR
 
 # ========================================================================================
 # 📊 SIMPLIFIED DATA STRUCTURES
@@ -101,6 +103,7 @@ class ModernRuleEngine:
         self.is_running = False
         self.current_mode = TradingMode.MODERATE
         self.engine_thread = None
+        self.halt_reason = None                # ⛔ ตั้งโดย risk guard - ไม่วางออเดอร์ใหม่จน resume()
         
         # ✨ Load signal settings from config
         candlestick_rules = self.rules_config.get("candlestick_rules", {})
@@ -116,11 +119,42 @@ class ModernRuleEngine:
             "cooldown_between_signals": signal_generation.get("cooldown_between_signals_seconds", 60)
         }
         
+        # 📡 Event-driven loop settings
+        event_driven = signal_generation.get("event_driven", {})
+        self.event_settings = {
+            "enabled": event_driven.get("enabled", False),
+            "debounce_seconds": event_driven.get("debounce_seconds", 0.25),
+            "min_tick_interval": event_driven.get("min_tick_interval_seconds", 3.0),
+            "tick_poll_interval": event_driven.get("tick_poll_interval_seconds", 0.1),
+            "max_idle_seconds": event_driven.get("max_idle_seconds", 30)
+        }
+        self.market_watcher = None
+        self.event_stats = {
+            "wakeups": 0,
+            "events_coalesced": 0,
+            "bar_close_evaluations": 0,
+            "ticks_deferred": 0,
+            "trailing_evaluations": 0,
+            "last_trigger_latency_ms": 0.0
+        }
+        self._last_evaluation_time = 0.0
+        
+        # 🧠 Bar-level decision memo: {(symbol, timeframe, bar_time): {...}}
+        self._decision_memo: Dict[Tuple, Dict] = {}
+        self._current_bar_record = None
+        self._last_counted_bar_key = None
+        self.memo_stats = {"hits": 0, "partial_hits": 0, "misses": 0}
+        
+        # ข้อมูล candlestick ของ cycle ปัจจุบัน (ใช้ซ้ำใน lot calculation)
+        self._cycle_candlestick_data = None
+        
         # Signal tracking
         self.last_signal_time = datetime.min
         self.signal_history = deque(maxlen=100)
-        self.hourly_signal_count = 0
-        self.last_hour_check = datetime.now().hour
+        
+        # ⏳ Cooldown / signals ต่อชั่วโมง - ใช้ rate limiter ตัวเดียวกับ order manager
+        self.rate_limiter = getattr(order_manager, 'rate_limiter', None) or RateLimiter()
+        self._configure_signal_limits()
         
         # Performance tracking
         self.daily_stats = {
@@ -146,13 +180,31 @@ class ModernRuleEngine:
             return
             
         self.is_running = True
-        self.engine_thread = threading.Thread(target=self._simple_engine_loop, daemon=True)
+        
+        # 📡 Event-driven mode: ตื่นเมื่อมี tick ใหม่ / แท่งปิด แทนการ sleep 3 วินาที
+        loop_target = self._simple_engine_loop
+        if self.event_settings["enabled"] and self.market_analyzer:
+            self.market_watcher = MarketDataWatcher(
+                self.market_analyzer._find_correct_gold_symbol,
+                timeframe_seconds=getattr(self.market_analyzer, 'timeframe_seconds', 300),
+                poll_interval=self.event_settings["tick_poll_interval"]
+            )
+            self.market_watcher.start()
+            if self.position_manager and hasattr(self.position_manager, 'attach_market_watcher'):
+                self.position_manager.attach_market_watcher(self.market_watcher)
+            loop_target = self._event_engine_loop
+        
+        self.engine_thread = threading.Thread(target=loop_target, daemon=True)
         self.engine_thread.start()
-        print("🚀 Simple Candlestick Rule Engine started!")
+        mode = "Event-driven" if loop_target == self._event_engine_loop else "Polling"
+        print(f"🚀 Simple Candlestick Rule Engine started! ({mode})")
     
     def stop(self):
         """หยุด Rule Engine"""
         self.is_running = False
+        if self.market_watcher:
+            self.market_watcher.stop()
+            self.market_watcher = None
         if self.engine_thread:
             self.engine_thread.join(timeout=5)
         print("🛑 Simple Rule Engine stopped")
@@ -165,6 +217,16 @@ class ModernRuleEngine:
         except ValueError:
             print(f"⚠️ Unknown trading mode: {mode}")
     
+    def halt(self, reason: str):
+        """⛔ หยุดวางออเดอร์ใหม่ทันที (loop และ market watcher ยังทำงาน - tick ยังไหลไปที่ risk guard)"""
+        self.halt_reason = reason
+        print(f"⛔ Rule Engine halted: {reason}")
+    
+    def resume(self):
+        """▶️ กลับมาวางออเดอร์ได้หลัง halt()"""
+        self.halt_reason = None
+        print("▶️ Rule Engine resumed")
+    
     # ========================================================================================
     # 🔄 MAIN ENGINE LOOP
     # ========================================================================================
@@ -177,47 +239,7 @@ class ModernRuleEngine:
             try:
                 loop_start = time.time()
                 
-                # 1. Reset hourly counter
-                self._check_hourly_reset()
-                
-                # ✅ เพิ่ม: Log current analysis cycle
-                print(f"🔍 === Analysis Cycle {datetime.now().strftime('%H:%M:%S')} ===")
-                
-                # 2. Simple candlestick analysis
-                print("🕯️  Analyzing candlestick data...")
-                decision = self._analyze_candlestick_signal()
-                
-                # ✅ เพิ่ม: Log analysis results
-                if decision.signal_type != EntryDecision.NO_SIGNAL:
-                    print(f"📊 Signal Found: {decision.signal_type.value}")
-                    print(f"🎯 Confidence: {decision.final_score:.3f}")
-                    print(f"💡 Reasoning: {decision.reasoning[:100]}...")
-                else:
-                    print(f"⚪ No Signal - Score: {decision.final_score:.3f}")
-                
-                # 3. Check if should place order
-                if self._should_place_order(decision):
-                    print(f"✅ Order Placement Approved!")
-                    
-                    # 4. Calculate dynamic lot size
-                    lot_size = self._calculate_dynamic_lot_size(decision)
-                    print(f"📏 Calculated Lot Size: {lot_size}")
-                    
-                    # 5. Execute order with intelligent placement
-                    print(f"🎯 Executing {decision.signal_type.value} order...")
-                    self._execute_candlestick_order(decision, lot_size)
-                else:
-                    if decision.signal_type != EntryDecision.NO_SIGNAL:
-                        print(f"🚫 Signal BLOCKED: {decision.warnings}")
-                    else:
-                        print("⏳ Waiting for valid signal...")
-                
-                # 6. Update statistics
-                self._update_daily_stats(decision)
-                
-                # ✅ เพิ่ม: Log current statistics
-                if self.daily_stats["signals_generated"] > 0:
-                    print(f"📈 Today: {self.daily_stats['signals_generated']} signals, {self.daily_stats['orders_placed']} orders")
+                self._run_analysis_cycle()
                 
                 # Loop timing - เร็วขึ้นเพื่อจับ signal มากขึ้น
                 loop_time = time.time() - loop_start
@@ -232,6 +254,120 @@ class ModernRuleEngine:
                 print(f"❌ Simple Engine Loop error: {e}")
                 print(f"🔧 Error details: {str(e)}")
                 time.sleep(5)
+    
+    def _event_engine_loop(self):
+        """📡 Event-driven loop - ประเมินเฉพาะเมื่อมี tick ใหม่ / แท่งปิด"""
+        print("📡 Event-driven Engine Loop Started...")
+        
+        debounce = self.event_settings["debounce_seconds"]
+        min_tick_interval = self.event_settings["min_tick_interval"]
+        max_idle = self.event_settings["max_idle_seconds"]
+        
+        deferred = []      # tick ระหว่างแท่งที่รอประเมินตอนท้าย min_tick_interval
+        
+        while self.is_running:
+            try:
+                trailing = bool(deferred)
+                if trailing:
+                    # รอจนครบ min_tick_interval (หรือแท่งปิด) แล้วประเมินครั้งเดียวด้วย tick ล่าสุด
+                    remaining = min_tick_interval - (time.time() - self._last_evaluation_time)
+                    events = deferred + (self.market_watcher.wait_for_events(timeout=remaining)
+                                         if remaining > 0 else [])
+                else:
+                    events = self.market_watcher.wait_for_events(timeout=max_idle)
+                if not self.is_running:
+                    break
+                
+                if not events:
+                    # ไม่มี tick (ตลาดปิด/เงียบ)
+                    continue
+                
+                bar_closed = any(e.event_type == MarketEventType.BAR_CLOSED for e in events)
+                
+                # Debounce: รวม tick ที่เข้ามาติดๆ กันเป็นการประเมินครั้งเดียว (แท่งปิด = ประเมินทันที)
+                if not bar_closed and not trailing and debounce > 0:
+                    time.sleep(debounce)
+                    more_events = self.market_watcher.drain_events()
+                    events.extend(more_events)
+                    bar_closed = any(e.event_type == MarketEventType.BAR_CLOSED for e in more_events)
+                
+                # Tick ระหว่างแท่ง: ประเมินไม่ถี่กว่า min_tick_interval - tick ที่มาเร็วไปเลื่อนไปประเมินตอนท้าย
+                # ช่วง (trailing) ไม่ทิ้ง (แท่งปิด = ประเมินทันที)
+                if not bar_closed and time.time() - self._last_evaluation_time < min_tick_interval:
+                    self.event_stats["ticks_deferred"] += len(events) - len(deferred)
+                    deferred = events
+                    continue
+                deferred = []
+                if trailing and not bar_closed:
+                    self.event_stats["trailing_evaluations"] += 1
+                
+                self.event_stats["wakeups"] += 1
+                self.event_stats["events_coalesced"] += len(events)
+                if bar_closed:
+                    self.event_stats["bar_close_evaluations"] += 1
+                
+                # latency จาก tick ล่าสุดถึงเริ่มประเมิน
+                last_event = events[-1]
+                self.event_stats["last_trigger_latency_ms"] = (
+                    (datetime.now() - last_event.timestamp).total_seconds() * 1000
+                )
+                
+                loop_start = time.time()
+                self._last_evaluation_time = loop_start
+                self._run_analysis_cycle()
+                print(f"⏱️  Event cycle ({'BAR_CLOSED' if bar_closed else 'TICK'} x{len(events)}) "
+                      f"completed in {time.time() - loop_start:.2f}s")
+                print("=" * 50)
+                
+            except Exception as e:
+                print(f"❌ Event Engine Loop error: {e}")
+                time.sleep(1)
+    
+    def _run_analysis_cycle(self):
+        """🔍 วิเคราะห์ 1 รอบ - ใช้ร่วมกันทั้ง polling loop และ event loop"""
+        # เริ่ม cycle ใหม่ - market analyzer ดึง rates ครั้งเดียวต่อ cycle
+        self._cycle_candlestick_data = None
+        if hasattr(self.market_analyzer, 'begin_cycle'):
+            self.market_analyzer.begin_cycle()
+        
+        # ✅ เพิ่ม: Log current analysis cycle
+        print(f"🔍 === Analysis Cycle {datetime.now().strftime('%H:%M:%S')} ===")
+        
+        # 2. Simple candlestick analysis
+        print("🕯️  Analyzing candlestick data...")
+        decision = self._analyze_candlestick_signal()
+        
+        # ✅ เพิ่ม: Log analysis results
+        if decision.signal_type != EntryDecision.NO_SIGNAL:
+            print(f"📊 Signal Found: {decision.signal_type.value}")
+            print(f"🎯 Confidence: {decision.final_score:.3f}")
+            print(f"💡 Reasoning: {decision.reasoning[:100]}...")
+        else:
+            print(f"⚪ No Signal - Score: {decision.final_score:.3f}")
+        
+        # 3. Check if should place order
+        if self._should_place_order(decision):
+            print(f"✅ Order Placement Approved!")
+            
+            # 4. Calculate dynamic lot size
+            lot_size = self._calculate_dynamic_lot_size(decision)
+            print(f"📏 Calculated Lot Size: {lot_size}")
+            
+            # 5. Execute order with intelligent placement
+            print(f"🎯 Executing {decision.signal_type.value} order...")
+            self._execute_candlestick_order(decision, lot_size)
+        else:
+            if decision.signal_type != EntryDecision.NO_SIGNAL:
+                print(f"🚫 Signal BLOCKED: {decision.warnings}")
+            else:
+                print("⏳ Waiting for valid signal...")
+        
+        # 6. Update statistics
+        self._update_daily_stats(decision)
+        
+        # ✅ เพิ่ม: Log current statistics
+        if self.daily_stats["signals_generated"] > 0:
+            print(f"📈 Today: {self.daily_stats['signals_generated']} signals, {self.daily_stats['orders_placed']} orders")
 
     # ✅ เพิ่ม method ใหม่สำหรับ detailed candlestick logging
     def _analyze_candlestick_signal(self) -> SmartDecisionScore:
@@ -349,7 +485,7 @@ class ModernRuleEngine:
     # ========================================================================================
     
     def _analyze_candlestick_signal(self) -> SmartDecisionScore:
-        """🕯️ วิเคราะห์สัญญาณจาก Candlestick - CORE LOGIC ใหม่"""
+        """🕯️ วิเคราะห์สัญญาณจาก Candlestick - CORE LOGIC ใหม่ (memoized ต่อแท่ง)"""
         try:
             # ดึงข้อมูล OHLC + Volume
             candlestick_data = self._get_candlestick_data()
@@ -357,33 +493,49 @@ class ModernRuleEngine:
             if not candlestick_data.get("valid", False):
                 return self._create_no_signal_decision("No valid candlestick data")
             
-            # วิเคราะห์ pattern
-            signal_analysis = self._evaluate_candlestick_pattern(candlestick_data)
-            
-            # ประเมิน volume strength
-            volume_analysis = self._evaluate_volume_strength(candlestick_data)
-            
-            # ประเมิน candle quality
-            quality_analysis = self._evaluate_candle_quality(candlestick_data)
+            bar_key, forming_hash = self._get_bar_identity(candlestick_data)
+            memo = self._decision_memo.get(bar_key) if bar_key else None
             
-            # ประเมิน market timing
-            timing_analysis = self._evaluate_market_timing()
-            
-            # สร้าง decision
-            decision = SmartDecisionScore(
-                candlestick_signal=signal_analysis["signal_strength"],
-                volume_strength=volume_analysis["volume_factor"],
-                candle_quality=quality_analysis["quality_score"],
-                market_timing=timing_analysis["timing_score"]
-            )
+            if memo and memo["forming_hash"] == forming_hash:
+                # แท่งเดิม + ข้อมูลแท่งที่กำลังก่อตัวเดิม = ใช้ผลเดิมทั้งหมด
+                self.memo_stats["hits"] += 1
+                components = memo["components"]
+            else:
+                if memo:
+                    # แท่งเดิมแต่ forming bar เปลี่ยน - ใช้ส่วนระดับแท่ง (timing) ซ้ำ
+                    self.memo_stats["partial_hits"] += 1
+                    timing_analysis = memo["components"]["timing"]
+                else:
+                    self.memo_stats["misses"] += 1
+                    timing_analysis = self._evaluate_market_timing()
+                
+                # ส่วนที่ขึ้นกับแท่งที่กำลังก่อตัว - คำนวณใหม่
+                signal_analysis = self._evaluate_candlestick_pattern(candlestick_data)
+                volume_analysis = self._evaluate_volume_strength(candlestick_data)
+                quality_analysis = self._evaluate_candle_quality(candlestick_data)
+                
+                components = {
+                    "signal": signal_analysis,
+                    "volume": volume_analysis,
+                    "quality": quality_analysis,
+                    "timing": timing_analysis,
+                    "reasoning": self._generate_candlestick_reasoning(
+                        signal_analysis, volume_analysis, quality_analysis, timing_analysis
+                    )
+                }
+                
+                if bar_key:
+                    if memo is None:
+                        self._on_new_bar(bar_key)
+                    self._decision_memo[bar_key] = {
+                        "forming_hash": forming_hash,
+                        "components": components
+                    }
             
-            # กำหนด signal type
-            decision.signal_type = signal_analysis["signal_type"]
+            decision = self._build_decision(components)
             
-            # สร้าง reasoning
-            decision.reasoning = self._generate_candlestick_reasoning(
-                signal_analysis, volume_analysis, quality_analysis, timing_analysis
-            )
+            if bar_key:
+                self._record_bar_decision(bar_key, decision)
             
             return decision
             
@@ -391,19 +543,96 @@ class ModernRuleEngine:
             print(f"❌ Candlestick signal analysis error: {e}")
             return self._create_no_signal_decision(f"Analysis error: {e}")
     
+    def _build_decision(self, components: Dict) -> SmartDecisionScore:
+        """🔧 สร้าง SmartDecisionScore ใหม่จาก components (object ใหม่ทุกครั้ง - warnings ไม่ปนกัน)"""
+        decision = SmartDecisionScore(
+            candlestick_signal=components["signal"]["signal_strength"],
+            volume_strength=components["volume"]["volume_factor"],
+            candle_quality=components["quality"]["quality_score"],
+            market_timing=components["timing"]["timing_score"]
+        )
+        
+        # กำหนด signal type
+        decision.signal_type = components["signal"]["signal_type"]
+        decision.reasoning = list(components["reasoning"])
+        
+        return decision
+    
+    # ========================================================================================
+    # 🧠 BAR-LEVEL DECISION MEMO
+    # ========================================================================================
+    
+    def _get_bar_identity(self, candlestick_data: Dict) -> Tuple[Optional[Tuple], Optional[int]]:
+        """🔑 (symbol, timeframe, bar open time) + hash ของแท่งที่กำลังก่อตัว"""
+        try:
+            current_ohlc = candlestick_data.get("current_ohlc", {})
+            bar_time = current_ohlc.get("time")
+            if not current_ohlc.get("valid") or bar_time is None:
+                return None, None
+            
+            bar_key = (
+                getattr(self.market_analyzer, 'symbol', ''),
+                getattr(self.market_analyzer, 'main_timeframe', 0),
+                bar_time
+            )
+            forming_hash = hash((
+                current_ohlc.get("open"), current_ohlc.get("high"),
+                current_ohlc.get("low"), current_ohlc.get("close"),
+                current_ohlc.get("volume")
+            ))
+            return bar_key, forming_hash
+            
+        except Exception as e:
+            print(f"❌ Bar identity error: {e}")
+            return None, None
+    
+    def _on_new_bar(self, bar_key: Tuple):
+        """🕯️ แท่งใหม่เริ่ม - บันทึกผลสุดท้ายของแท่งก่อนหน้าลง history ครั้งเดียว แล้วล้าง memo"""
+        if self._current_bar_record:
+            self.signal_history.append(self._current_bar_record)
+        self._current_bar_record = None
+        self._decision_memo.clear()
+    
+    def _record_bar_decision(self, bar_key: Tuple, decision: SmartDecisionScore):
+        """📝 อัปเดต record ของแท่งปัจจุบัน (แทนการเพิ่ม history ทุก poll)"""
+        record = self._current_bar_record
+        if record is None or record["bar_key"] != bar_key:
+            record = {
+                "bar_key": bar_key,
+                "symbol": bar_key[0],
+                "bar_time": bar_key[2],
+                "evaluations": 0,
+                "orders_placed": 0
+            }
+            self._current_bar_record = record
+        
+        record["evaluations"] += 1
+        record["signal_type"] = decision.signal_type.value
+        record["final_score"] = decision.final_score
+        record["confidence_level"] = decision.confidence_level
+        record["reasoning"] = decision.reasoning
+        record["updated_at"] = datetime.now()
+    
     def _get_candlestick_data(self) -> Dict:
         """🔧 ดึงข้อมูล OHLC จาก market analyzer"""
         try:
             if not self.market_analyzer:
                 return {"valid": False}
             
+            # ใช้ข้อมูลที่ดึงไว้แล้วใน cycle นี้
+            if self._cycle_candlestick_data is not None:
+                return self._cycle_candlestick_data
+            
             # ใช้ method ใหม่จาก market_analyzer
             if hasattr(self.market_analyzer, 'get_candlestick_info'):
-                return self.market_analyzer.get_candlestick_info()
+                result = self.market_analyzer.get_candlestick_info()
+            else:
+                # Fallback ถึง method เดิม
+                analysis = self.market_analyzer.get_comprehensive_analysis()
+                result = analysis.get("candlestick_data", {"valid": False})
             
-            # Fallback ถึง method เดิม
-            analysis = self.market_analyzer.get_comprehensive_analysis()
-            return analysis.get("candlestick_data", {"valid": False})
+            self._cycle_candlestick_data = result
+            return result
             
         except Exception as e:
             print(f"❌ Get candlestick data error: {e}")
@@ -775,6 +1004,8 @@ class ModernRuleEngine:
             volume_data = candlestick_data.get("volume_data", {})
             if hasattr(self.market_analyzer, 'calculate_volume_factor'):
                 volume_factor = self.market_analyzer.calculate_volume_factor(volume_data)
+                if isinstance(volume_factor, dict):
+                    volume_factor = volume_factor.get("factor", 1.0)
             else:
                 volume_factor = 1.0
             
@@ -809,6 +1040,11 @@ class ModernRuleEngine:
     def _should_place_order(self, decision: SmartDecisionScore) -> bool:
         """🎯 ตัดสินใจว่าควรวางออเดอร์หรือไม่"""
         try:
+            # 0. Risk guard halt
+            if self.halt_reason:
+                decision.warnings.append(f"Trading halted: {self.halt_reason}")
+                return False
+            
             # 1. Check signal strength
             if decision.final_score < self.signal_settings["minimum_signal_strength"]:
                 decision.warnings.append(f"Signal too weak: {decision.final_score:.3f}")
@@ -820,14 +1056,15 @@ class ModernRuleEngine:
                 return False
             
             # 3. Check cooldown
-            time_since_last = (datetime.now() - self.last_signal_time).total_seconds()
-            if time_since_last < self.signal_settings["cooldown_between_signals"]:
-                decision.warnings.append(f"Cooldown active: {time_since_last:.1f}s")
+            allowed, retry_after = self.rate_limiter.check(SIGNAL_COOLDOWN)
+            if not allowed:
+                decision.warnings.append(f"Cooldown active: {retry_after:.1f}s remaining")
                 return False
             
-            # 4. Check hourly limit
-            if self.hourly_signal_count >= self.signal_settings["max_signals_per_hour"]:
-                decision.warnings.append("Hourly signal limit reached")
+            # 4. Check hourly limit (sliding window 60 นาที)
+            allowed, retry_after = self.rate_limiter.check(SIGNALS_PER_HOUR)
+            if not allowed:
+                decision.warnings.append(f"Hourly signal limit reached (next slot in {retry_after:.0f}s)")
                 return False
             
             # 5. Check spacing (ถ้ามี spacing_manager)
@@ -835,6 +1072,12 @@ class ModernRuleEngine:
                 decision.warnings.append("Spacing requirements not met")
                 return False
             
+            # 6. Backpressure - คิวออเดอร์เต็ม = ข้าม signal (ไม่สะสมออเดอร์เก่า)
+            if self.order_manager and hasattr(self.order_manager, 'can_accept_order'):
+                if not self.order_manager.can_accept_order():
+                    decision.warnings.append("Order queue full - signal skipped")
+                    return False
+            
             return True
             
         except Exception as e:
@@ -879,8 +1122,11 @@ class ModernRuleEngine:
                 
                 if success:
                     self.last_signal_time = datetime.now()
-                    self.hourly_signal_count += 1
-                    print(f"✅ {direction} order placed: {lot_size:.3f} lots")
+                    self.rate_limiter.record(SIGNAL_COOLDOWN)
+                    self.rate_limiter.record(SIGNALS_PER_HOUR)
+                    if self._current_bar_record:
+                        self._current_bar_record["orders_placed"] += 1
+                    print(f"✅ {direction} order submitted: {lot_size:.3f} lots")
                 else:
                     print(f"❌ Failed to place {direction} order")
             else:
@@ -926,39 +1172,54 @@ class ModernRuleEngine:
                 hybrid_factors=None
             )
             
-            # ✅ เรียก method ที่ถูกต้อง (รับ 1 parameter เท่านั้น)
-            result = self.order_manager.place_market_order(order_request)
+            # ✅ ส่งเข้าคิวของ order manager - ได้ Future กลับมาทันที (ไม่ block การวิเคราะห์)
+            future = self.order_manager.place_market_order(order_request)
             
-            # ตรวจสอบผลลัพธ์
-            if result.success:
-                print(f"✅ Order SUCCESS: Ticket {result.ticket}, Price: {result.price:.5f}")
-                return True
-            else:
-                print(f"❌ Order FAILED: {result.message}")
+            # คิวเต็ม / ถูกปฏิเสธทันที
+            if future.done() and future.result().metadata.get("skipped"):
+                print(f"⏭️ Order SKIPPED: {future.result().message}")
                 return False
+            
+            future.add_done_callback(lambda done: self._on_order_result(direction, done.result()))
+            print(f"📮 {direction} order queued")
+            return True
                 
         except Exception as e:
             print(f"❌ Place order with context error: {e}")
             print(f"🔧 Error details: {str(e)}")
             return False
     
+    def _on_order_result(self, direction: str, result):
+        """📨 ผลการส่งออเดอร์ (เรียกจาก order worker thread)"""
+        if result.success:
+            print(f"✅ Order SUCCESS: {direction} Ticket {result.ticket}, Price: {result.price:.5f}")
+        else:
+            print(f"❌ Order FAILED: {direction} {result.message}")
+    
     # ========================================================================================
     # 📊 STATISTICS & MAINTENANCE
     # ========================================================================================
     
-    def _check_hourly_reset(self):
-        """🔄 รีเซ็ตตัวนับสัญญาณรายชั่วโมง"""
-        current_hour = datetime.now().hour
-        if current_hour != self.last_hour_check:
-            self.hourly_signal_count = 0
-            self.last_hour_check = current_hour
-            if self.daily_stats["signals_generated"] > 0:
-                print(f"📊 Hour {current_hour}: Signals generated so far today: {self.daily_stats['signals_generated']}")
+    @property
+    def hourly_signal_count(self) -> int:
+        """📊 จำนวน signal ที่ส่งออเดอร์ใน 60 นาทีล่าสุด"""
+        return self.rate_limiter.count(SIGNALS_PER_HOUR)
+    
+    def _configure_signal_limits(self):
+        """⏳ ตั้ง cooldown / hourly limit ใน rate limiter ตาม signal_settings ปัจจุบัน"""
+        self.rate_limiter.configure_signal_limits({
+            "cooldown_between_signals_seconds": self.signal_settings["cooldown_between_signals"],
+            "max_signals_per_hour": self.signal_settings["max_signals_per_hour"]
+        })
     
     def _update_daily_stats(self, decision: SmartDecisionScore):
-        """📈 อัปเดตสถิติรายวัน"""
+        """📈 อัปเดตสถิติรายวัน - นับ signal ครั้งเดียวต่อแท่ง (ไม่ใช่ทุกการประเมิน)"""
         try:
-            if decision.signal_type != EntryDecision.NO_SIGNAL:
+            bar_key = self._current_bar_record["bar_key"] if self._current_bar_record else None
+            already_counted = bar_key is not None and bar_key == self._last_counted_bar_key
+            
+            if decision.signal_type != EntryDecision.NO_SIGNAL and not already_counted:
+                self._last_counted_bar_key = bar_key
                 self.daily_stats["signals_generated"] += 1
                 
                 if decision.signal_type == EntryDecision.BUY_SIGNAL:
@@ -1027,11 +1288,17 @@ class ModernRuleEngine:
         """📊 ดึงสถานะของ engine"""
         return {
             "is_running": self.is_running,
+            "halt_reason": self.halt_reason,
             "current_mode": self.current_mode.value,
             "daily_stats": self.daily_stats.copy(),
             "hourly_signal_count": self.hourly_signal_count,
             "last_signal_time": self.last_signal_time.strftime("%H:%M:%S") if self.last_signal_time != datetime.min else "Never",
-            "signal_settings": self.signal_settings.copy()
+            "signal_settings": self.signal_settings.copy(),
+            "event_driven": self.market_watcher is not None,
+            "event_stats": self.event_stats.copy(),
+            "decision_memo_stats": self.memo_stats.copy(),
+            "rate_limits": self.rate_limiter.get_status(),
+            "watcher_status": self.market_watcher.get_status() if self.market_watcher else {}
         }
     
     # ========================================================================================
@@ -1059,7 +1326,7 @@ class ModernRuleEngine:
         """🔄 รีเซ็ตระบบ (รักษาไว้เพื่อความเข้ากันได้)"""
         try:
             self.signal_settings["minimum_signal_strength"] = 0.25  # ลดให้ง่ายขึ้น
-            self.hourly_signal_count = 0
+            self.rate_limiter.reset(SIGNALS_PER_HOUR)
             self.daily_stats = {
                 "signals_generated": 0, "orders_placed": 0,
                 "buy_signals": 0, "sell_signals": 0,
@@ -1087,14 +1354,18 @@ class ModernRuleEngine:
                 self.signal_settings["minimum_signal_strength"] = 0.3
                 self.signal_settings["max_signals_per_hour"] = 20
                 self.signal_settings["cooldown_between_signals"] = 60
+            self._configure_signal_limits()
                 
             print(f"🎯 Trading mode set to: {self.current_mode.value}")
         except ValueError:
             print(f"⚠️ Unknown trading mode: {mode}")
     
     def get_decision_history(self) -> List[Dict]:
-        """🔄 ดึงประวัติการตัดสินใจ"""
-        return list(self.signal_history)
+        """🔄 ดึงประวัติการตัดสินใจ (1 record ต่อแท่ง + แท่งปัจจุบัน)"""
+        history = list(self.signal_history)
+        if self._current_bar_record:
+            history.append(dict(self._current_bar_record))
+        return history
     
     def get_performance_summary(self) -> Dict:
         """🔄 สรุปผลการทำงาน"""
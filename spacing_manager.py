@@ -152,6 +152,9 @@ class SpacingManager:
             "cache_duration": 15
         }
         
+        # 📈 แหล่ง streaming indicators (MarketAnalyzer) - อ่านค่า ATR โดยไม่คำนวณใหม่
+        self.indicator_source = None
+        
         self.log("Enhanced 4D Spacing Manager initialized - Smart Collision Detection Active")
     
     # ========================================================================================
@@ -812,8 +815,19 @@ class SpacingManager:
         """คำนวณ session factor - ต้องเขียน implementation"""
         return market_analysis.get('session_multiplier', 1.0)
     
+    def attach_indicator_source(self, indicator_source):
+        """📈 เชื่อมกับแหล่ง streaming indicators (ต้องมี get_indicator_values())"""
+        self.indicator_source = indicator_source
+    
     def _calculate_4d_volatility_factor(self, market_analysis: Dict) -> float:
-        """คำนวณ volatility factor - ต้องเขียน implementation"""
+        """คำนวณ volatility factor - ใช้ ATR ratio จาก streaming indicators ถ้ามี"""
+        try:
+            if self.indicator_source:
+                indicators = self.indicator_source.get_indicator_values()
+                if indicators.get("ready"):
+                    return max(0.5, min(2.0, indicators.get("atr_ratio", 1.0)))
+        except Exception as e:
+            self.log(f"❌ Volatility factor error: {e}")
         return market_analysis.get('volatility_multiplier', 1.0)
     
     def _calculate_4d_opportunity_factor(self, four_d_score: float, 
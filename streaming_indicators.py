@@ -0,0 +1,275 @@
+"""
+📈 Streaming Indicators - O(1) Incremental Technical Indicators
+streaming_indicators.py
+
+🎯 FEATURES:
+✅ Wilder RSI
+✅ SMA / EMA
+✅ Rolling Volume Mean / StdDev
+✅ Wilder ATR
+✅ อัปเดต O(1) ต่อแท่งที่ปิด + preview แท่งที่กำลังก่อตัว (ไม่แก้ state)
+
+** เก็บ state ข้าม cycle - ไม่ต้องคำนวณย้อนหลังทั้ง array ทุกครั้ง **
+"""
+
+import math
+import numpy as np
+from collections import deque
+from datetime import datetime
+from typing import Dict, Optional
+
+# ========================================================================================
+# 📈 SINGLE INDICATORS
+# ========================================================================================
+# ทุกตัวใช้รูปแบบเดียวกัน:
+#   commit(...)  -> แท่งปิดแล้ว อัปเดต state ถาวร
+#   preview(...) -> ค่าที่รวมแท่งที่กำลังก่อตัว โดยไม่แก้ state
+
+class StreamingSMA:
+    """📈 Simple Moving Average - หน้าต่าง N แท่ง (รวมแท่งที่กำลังก่อตัว)"""
+
+    def __init__(self, period: int):
+        self.period = max(1, int(period))
+        self._window = deque(maxlen=self.period - 1)
+        self._sum = 0.0
+
+    def commit(self, value: float):
+        if self.period == 1:
+            return
+        if len(self._window) == self._window.maxlen:
+            self._sum -= self._window[0]
+        self._window.append(value)
+        self._sum += value
+
+    def preview(self, value: float) -> float:
+        return (self._sum + value) / (len(self._window) + 1)
+
+    @property
+    def ready(self) -> bool:
+        return len(self._window) >= self.period - 1
+
+
+class StreamingEMA:
+    """📈 Exponential Moving Average"""
+
+    def __init__(self, period: int):
+        self.period = max(1, int(period))
+        self.alpha = 2.0 / (self.period + 1)
+        self._value: Optional[float] = None
+        self._count = 0
+
+    def commit(self, value: float):
+        self._value = value if self._value is None else self._value + self.alpha * (value - self._value)
+        self._count += 1
+
+    def preview(self, value: float) -> float:
+        if self._value is None:
+            return value
+        return self._value + self.alpha * (value - self._value)
+
+    @property
+    def ready(self) -> bool:
+        return self._count >= self.period
+
+
+class StreamingRSI:
+    """📈 Wilder RSI - smoothing แบบ Wilder (seed ด้วยค่าเฉลี่ย N ช่วงแรก)"""
+
+    def __init__(self, period: int = 14):
+        self.period = max(1, int(period))
+        self._prev_close: Optional[float] = None
+        self._avg_gain = 0.0
+        self._avg_loss = 0.0
+        self._seed_count = 0
+
+    def commit(self, close: float):
+        if self._prev_close is not None:
+            self._avg_gain, self._avg_loss, self._seed_count = self._step(close)
+        self._prev_close = close
+
+    def preview(self, close: float) -> float:
+        if self._prev_close is None:
+            return 50.0
+        avg_gain, avg_loss, seed_count = self._step(close)
+        if seed_count < self.period:
+            return 50.0
+        return self._to_rsi(avg_gain, avg_loss)
+
+    def _step(self, close: float):
+        """🔧 คำนวณ state ถัดไปจาก close ใหม่ (pure - ไม่แก้ state)"""
+        delta = close - self._prev_close
+        gain = delta if delta > 0 else 0.0
+        loss = -delta if delta < 0 else 0.0
+
+        if self._seed_count < self.period:
+            n = self._seed_count + 1
+            return (self._avg_gain * self._seed_count + gain) / n, \
+                   (self._avg_loss * self._seed_count + loss) / n, n
+
+        p = self.period
+        return (self._avg_gain * (p - 1) + gain) / p, \
+               (self._avg_loss * (p - 1) + loss) / p, self._seed_count
+
+    @staticmethod
+    def _to_rsi(avg_gain: float, avg_loss: float) -> float:
+        if avg_loss == 0:
+            return 100.0 if avg_gain > 0 else 50.0
+        rs = avg_gain / avg_loss
+        return max(0.0, min(100.0, 100.0 - 100.0 / (1.0 + rs)))
+
+    @property
+    def ready(self) -> bool:
+        return self._seed_count >= self.period
+
+
+class StreamingStats:
+    """📈 Rolling mean / stddev - หน้าต่าง N แท่ง (รวมแท่งที่กำลังก่อตัว)"""
+
+    def __init__(self, period: int):
+        self.period = max(2, int(period))
+        self._window = deque(maxlen=self.period - 1)
+        self._sum = 0.0
+        self._sum_sq = 0.0
+
+    def commit(self, value: float):
+        if len(self._window) == self._window.maxlen:
+            old = self._window[0]
+            self._sum -= old
+            self._sum_sq -= old * old
+        self._window.append(value)
+        self._sum += value
+        self._sum_sq += value * value
+
+    def preview(self, value: float):
+        """คืนค่า (mean, std, n)"""
+        n = len(self._window) + 1
+        mean = (self._sum + value) / n
+        variance = max(0.0, (self._sum_sq + value * value) / n - mean * mean)
+        return mean, math.sqrt(variance), n
+
+
+class StreamingATR:
+    """📈 Wilder ATR"""
+
+    def __init__(self, period: int = 14):
+        self.period = max(1, int(period))
+        self._prev_close: Optional[float] = None
+        self._atr = 0.0
+        self._seed_count = 0
+
+    def commit(self, high: float, low: float, close: float):
+        self._atr, self._seed_count = self._step(high, low)
+        self._prev_close = close
+
+    def preview(self, high: float, low: float) -> float:
+        return self._step(high, low)[0]
+
+    def true_range(self, high: float, low: float) -> float:
+        if self._prev_close is None:
+            return high - low
+        return max(high - low, abs(high - self._prev_close), abs(low - self._prev_close))
+
+    def _step(self, high: float, low: float):
+        tr = self.true_range(high, low)
+        if self._seed_count < self.period:
+            n = self._seed_count + 1
+            return (self._atr * self._seed_count + tr) / n, n
+        return (self._atr * (self.period - 1) + tr) / self.period, self._seed_count
+
+    @property
+    def ready(self) -> bool:
+        return self._seed_count >= self.period
+
+# ========================================================================================
+# 📈 INDICATOR ENGINE (ต่อ symbol/timeframe)
+# ========================================================================================
+
+class IndicatorEngine:
+    """
+    📈 รวม streaming indicators ของ symbol/timeframe เดียว
+
+    - update_from_buffer(): commit เฉพาะแท่งที่ปิดใหม่ + preview แท่งที่กำลังก่อตัว
+    - get_values(): อ่านค่าล่าสุดจาก memory (ไม่คำนวณใหม่)
+    """
+
+    def __init__(self, symbol: str, timeframe: int, settings: Optional[Dict] = None):
+        settings = settings or {}
+        self.symbol = symbol
+        self.timeframe = timeframe
+
+        self.rsi = StreamingRSI(settings.get("rsi_period", 14))
+        self.sma_fast = StreamingSMA(settings.get("ma_fast_period", 5))
+        self.sma_slow = StreamingSMA(settings.get("ma_slow_period", 20))
+        self.ema = StreamingEMA(settings.get("ema_period", 20))
+        self.volume_stats = StreamingStats(settings.get("volume_period", 20))
+        self.atr = StreamingATR(settings.get("atr_period", 14))
+        self.range_stats = StreamingStats(settings.get("range_baseline_period", 100))
+
+        self.last_closed_time = 0
+        self._forming_key = None
+        self.closed_bars_processed = 0
+        self.values: Dict = {}
+
+    def update_from_buffer(self, buffer) -> Dict:
+        """📈 อัปเดตจาก BarRingBuffer - O(จำนวนแท่งใหม่)"""
+        bars = buffer.view()
+        if len(bars) == 0:
+            return self.values
+
+        closed = bars[:-1]
+        forming = bars[-1]
+
+        # 1. Commit แท่งที่ปิดใหม่เท่านั้น
+        if len(closed):
+            start = int(np.searchsorted(closed['time'], self.last_closed_time, side='right'))
+            for bar in closed[start:]:
+                self._commit_bar(bar)
+            self.last_closed_time = int(closed['time'][-1])
+
+        # 2. Preview แท่งที่กำลังก่อตัว (ข้ามถ้าไม่เปลี่ยน)
+        forming_key = (int(forming['time']), int(forming['tick_volume']), float(forming['close']),
+                       self.closed_bars_processed)
+        if forming_key != self._forming_key:
+            self._forming_key = forming_key
+            self.values = self._preview_bar(forming)
+
+        return self.values
+
+    def _commit_bar(self, bar):
+        high, low, close = float(bar['high']), float(bar['low']), float(bar['close'])
+        self.range_stats.commit(self.atr.true_range(high, low))
+        self.rsi.commit(close)
+        self.sma_fast.commit(close)
+        self.sma_slow.commit(close)
+        self.ema.commit(close)
+        self.volume_stats.commit(float(bar['tick_volume']))
+        self.atr.commit(high, low, close)
+        self.closed_bars_processed += 1
+
+    def _preview_bar(self, bar) -> Dict:
+        high, low, close = float(bar['high']), float(bar['low']), float(bar['close'])
+        volume = float(bar['tick_volume'])
+
+        volume_mean, volume_std, volume_n = self.volume_stats.preview(volume)
+        atr = self.atr.preview(high, low)
+        range_mean = self.range_stats.preview(self.atr.true_range(high, low))[0]
+
+        return {
+            "rsi": self.rsi.preview(close),
+            "ma_fast": self.sma_fast.preview(close),
+            "ma_slow": self.sma_slow.preview(close),
+            "ema": self.ema.preview(close),
+            "current_volume": volume,
+            "volume_mean": volume_mean,
+            "volume_std": volume_std,
+            "volume_periods": volume_n,
+            "atr": atr,
+            "atr_ratio": atr / range_mean if range_mean > 0 else 1.0,
+            "ready": self.rsi.ready and self.sma_slow.ready and self.atr.ready,
+            "bar_time": datetime.fromtimestamp(int(bar['time'])),
+            "closed_bars_processed": self.closed_bars_processed
+        }
+
+    def get_values(self) -> Dict:
+        """📊 ค่าล่าสุดทั้งหมด (copy ของ dict)"""
+        return dict(self.values)
@@ -0,0 +1,219 @@
+"""
+🗂️ Symbol Registry - Resolve Once, Share Everywhere
+symbol_registry.py
+
+🎯 FEATURES:
+✅ หา Gold Symbol ครั้งเดียว แล้ว cache ชื่อ + metadata
+✅ ใช้ร่วมกันระหว่าง MT5Connector, MarketAnalyzer, OrderManager, PositionManager
+✅ Re-resolve เฉพาะเมื่อ reconnect หรือเจอ "symbol not found"
+✅ Thread-safe
+
+** ไม่ต้อง scan symbols_get() ทุกครั้งที่ดึงราคา **
+"""
+
+from mt5_gateway import mt5_gateway as mt5   # IPC ทั้งหมดผ่าน gateway thread เดียว
+import re
+import threading
+from datetime import datetime
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+@dataclass
+class SymbolMeta:
+    """ข้อมูล symbol ที่ cache ไว้ (ไม่เปลี่ยนระหว่าง session)"""
+    name: str
+    point: float = 0.01
+    digits: int = 2
+    trade_tick_size: float = 0.01
+    trade_tick_value: float = 1.0
+    trade_contract_size: float = 100.0
+    volume_min: float = 0.01
+    volume_max: float = 100.0
+    volume_step: float = 0.01
+    filling_mode: int = 0
+    trade_mode: int = 0
+    resolved_at: datetime = None
+
+# ========================================================================================
+# 🗂️ SYMBOL REGISTRY
+# ========================================================================================
+
+class SymbolRegistry:
+    """
+    🗂️ Registry สำหรับ symbol ที่ resolve แล้ว
+
+    - resolve() ครั้งแรกจะ scan หา symbol แล้ว cache ไว้
+    - ครั้งถัดไปคืนค่าจาก memory ทันที (ไม่มี IPC)
+    - invalidate() เมื่อ reconnect / symbol not found
+    """
+
+    # Pattern สำหรับค้นหาทองคำ (เรียงตามความน่าจะเป็น)
+    GOLD_PATTERNS = [
+        r'^XAU.*USD.*$',
+        r'^GOLD.*$',
+        r'^.*GOLD.*$',
+        r'^XAU.*$'
+    ]
+
+    def __init__(self, preferred_symbols: Optional[List[str]] = None):
+        self.preferred_symbols = list(preferred_symbols or [])
+
+        self._lock = threading.RLock()
+        self._symbol: Optional[str] = None
+        self._meta: Optional[SymbolMeta] = None
+
+        # เพิ่มทุกครั้งที่ invalidate - ให้ consumer รู้ว่าต้อง refresh ข้อมูลที่ derive จาก symbol
+        self.generation = 0
+        self.resolve_count = 0
+        self.last_invalidate_reason = ""
+
+    # ========================================================================================
+    # 🔍 RESOLUTION
+    # ========================================================================================
+
+    def resolve(self, preferred: Optional[str] = None) -> Optional[str]:
+        """🔍 คืนชื่อ symbol ที่ resolve แล้ว - scan เฉพาะครั้งแรกหรือหลัง invalidate"""
+        with self._lock:
+            if self._symbol:
+                return self._symbol
+
+            try:
+                symbol = self._detect_symbol(preferred)
+                if symbol:
+                    self._symbol = symbol
+                    self._meta = self._load_meta(symbol)
+                    self.resolve_count += 1
+                    self.log(f"✅ Resolved symbol: {symbol} (generation {self.generation})")
+                else:
+                    self.log("❌ No valid gold symbol found")
+                return symbol
+
+            except Exception as e:
+                self.log(f"❌ Resolve error: {e}")
+                return None
+
+    def get_symbol(self) -> Optional[str]:
+        """📊 symbol ปัจจุบันจาก cache (ไม่ trigger การ scan)"""
+        return self._symbol
+
+    def get_meta(self) -> Optional[SymbolMeta]:
+        """📊 metadata ของ symbol ปัจจุบันจาก cache"""
+        return self._meta
+
+    def set_symbol(self, symbol: str) -> bool:
+        """🔧 กำหนด symbol ตรงๆ (เช่นจาก connector ที่ตรวจแล้ว)"""
+        with self._lock:
+            try:
+                meta = self._load_meta(symbol)
+                if not meta:
+                    return False
+                self._symbol = symbol
+                self._meta = meta
+                return True
+            except Exception as e:
+                self.log(f"❌ Set symbol error: {e}")
+                return False
+
+    def invalidate(self, reason: str = "manual"):
+        """🔄 ล้าง cache - resolve ใหม่ในการเรียกครั้งถัดไป"""
+        with self._lock:
+            if self._symbol:
+                self.log(f"🔄 Invalidated {self._symbol}: {reason}")
+            self._symbol = None
+            self._meta = None
+            self.generation += 1
+            self.last_invalidate_reason = reason
+
+    def report_symbol_not_found(self, symbol: str):
+        """⚠️ consumer แจ้งว่า symbol หายไป - invalidate เฉพาะถ้าเป็น symbol ปัจจุบัน"""
+        if symbol and symbol == self._symbol:
+            self.invalidate(f"symbol not found: {symbol}")
+
+    # ========================================================================================
+    # 🔧 DETECTION HELPERS
+    # ========================================================================================
+
+    def _detect_symbol(self, preferred: Optional[str]) -> Optional[str]:
+        """🔧 ค้นหา gold symbol - preferred ก่อน แล้วค่อย scan รายชื่อทั้งหมด"""
+        # 1. ลอง preferred ตรงๆ (symbol_info ครั้งเดียว ไม่ต้อง symbols_get)
+        if preferred and self._verify_symbol(preferred):
+            return preferred
+
+        all_symbols = mt5.symbols_get()
+        if not all_symbols:
+            return None
+
+        symbol_names = [symbol.name for symbol in all_symbols]
+        name_lookup = {name.upper(): name for name in symbol_names}
+
+        # 2. Exact match (O(1) ต่อชื่อ)
+        for candidate in self.preferred_symbols:
+            name = name_lookup.get(candidate.upper())
+            if name and self._verify_symbol(name):
+                return name
+
+        # 3. Pattern matching
+        for pattern in self.GOLD_PATTERNS:
+            compiled = re.compile(pattern, re.IGNORECASE)
+            for name in symbol_names:
+                if compiled.match(name) and self._verify_symbol(name):
+                    return name
+
+        return None
+
+    def _verify_symbol(self, symbol: str) -> bool:
+        """🧪 ตรวจสอบว่า symbol ใช้งานได้และราคาอยู่ในช่วงทองคำ"""
+        try:
+            symbol_info = mt5.symbol_info(symbol)
+            if not symbol_info:
+                return False
+
+            if not symbol_info.visible:
+                if not mt5.symbol_select(symbol, True):
+                    return False
+
+            tick = mt5.symbol_info_tick(symbol)
+            if tick and tick.bid:
+                return 1000 <= tick.bid <= 10000
+
+            # ตลาดปิด - ไม่มี tick แต่ symbol มีอยู่จริง
+            return True
+
+        except Exception as e:
+            self.log(f"❌ Verify symbol {symbol} error: {e}")
+            return False
+
+    def _load_meta(self, symbol: str) -> Optional[SymbolMeta]:
+        """📊 โหลด metadata ของ symbol ครั้งเดียว"""
+        symbol_info = mt5.symbol_info(symbol)
+        if not symbol_info:
+            return None
+
+        return SymbolMeta(
+            name=symbol,
+            point=getattr(symbol_info, 'point', 0.01),
+            digits=getattr(symbol_info, 'digits', 2),
+            trade_tick_size=getattr(symbol_info, 'trade_tick_size', 0.01),
+            trade_tick_value=getattr(symbol_info, 'trade_tick_value', 1.0),
+            trade_contract_size=getattr(symbol_info, 'trade_contract_size', 100.0),
+            volume_min=getattr(symbol_info, 'volume_min', 0.01),
+            volume_max=getattr(symbol_info, 'volume_max', 100.0),
+            volume_step=getattr(symbol_info, 'volume_step', 0.01),
+            filling_mode=getattr(symbol_info, 'filling_mode', 0),
+            trade_mode=getattr(symbol_info, 'trade_mode', 0),
+            resolved_at=datetime.now()
+        )
+
+    def get_status(self) -> Dict:
+        """📊 สถานะ registry"""
+        return {
+            "symbol": self._symbol,
+            "generation": self.generation,
+            "resolve_count": self.resolve_count,
+            "last_invalidate_reason": self.last_invalidate_reason
+        }
+
+    def log(self, message: str):
+        """Log message with timestamp"""
+        timestamp = datetime.now().strftime("%H:%M:%S.%f")[:-3]
+        print(f"[{timestamp}] 🗂️ SymbolRegistry: {message}")
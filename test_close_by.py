@@ -0,0 +1,68 @@
+"""
+🧪 Close-by netting on the simulated broker
+test_close_by.py
+
+ครอบคลุม PositionManager._close_positions_netted:
+✅ คู่ BUY/SELL volume เท่ากัน -> ปิดด้วย close-by ทั้งหมด (ไม่มี deal)
+✅ volume ไม่เท่ากัน -> close-by ส่วนที่ net ได้ + deal ปิด volume ที่เหลือ
+✅ broker ปฏิเสธ close-by -> ปิดส่วนที่เหลือทั้งหมดด้วย deal
+
+** ใช้: python -m pytest -q test_close_by.py **
+"""
+
+import contextlib
+import io
+
+import pytest
+
+from conftest import SYMBOL, mt5
+
+def close_all_netted(manager):
+    with contextlib.redirect_stdout(io.StringIO()):
+        manager.update_positions()
+        positions = list(manager.active_positions.values())
+        closed = manager._close_positions_netted(positions)
+    return positions, closed
+
+def exit_deals(broker, entry):
+    return [deal for deal in broker._deals if deal["entry"] == entry]
+
+def test_equal_volume_pairs_close_by_only(broker, manager, open_positions):
+    tickets = open_positions(("BUY", 0.02), ("SELL", 0.02), ("BUY", 0.01), ("SELL", 0.01))
+
+    positions, closed = close_all_netted(manager)
+
+    assert sorted(closed) == sorted(tickets)
+    assert not mt5.positions_get(symbol=SYMBOL)
+    assert manager.close_by_stats["requests"] == 2
+    assert manager.close_by_stats["residual_deals"] == 0
+    assert manager.close_by_stats["netted_volume"] == pytest.approx(0.03)
+    assert len(exit_deals(broker, mt5.DEAL_ENTRY_OUT_BY)) == 4
+    assert not exit_deals(broker, mt5.DEAL_ENTRY_OUT)
+
+def test_partial_netting_closes_residual_with_deal(broker, manager, open_positions):
+    buy, sell = open_positions(("BUY", 0.05), ("SELL", 0.02))
+
+    positions, closed = close_all_netted(manager)
+
+    assert sorted(closed) == sorted([buy, sell])
+    assert not mt5.positions_get(symbol=SYMBOL)
+    assert manager.close_by_stats["requests"] == 1
+    assert manager.close_by_stats["residual_deals"] == 1
+    residual = exit_deals(broker, mt5.DEAL_ENTRY_OUT)
+    assert len(residual) == 1
+    assert residual[0]["position_id"] == buy
+    assert residual[0]["volume"] == pytest.approx(0.03)
+
+def test_rejected_close_by_falls_back_to_deals(broker, manager, open_positions):
+    tickets = open_positions(("BUY", 0.02), ("SELL", 0.02), ("BUY", 0.03), ("SELL", 0.01))
+    broker.inject_retcodes(mt5.TRADE_RETCODE_INVALID)
+
+    positions, closed = close_all_netted(manager)
+
+    assert sorted(closed) == sorted(tickets)
+    assert not mt5.positions_get(symbol=SYMBOL)
+    assert manager.close_by_stats["requests"] == 1
+    assert manager.close_by_stats["failed"] == 1
+    assert not exit_deals(broker, mt5.DEAL_ENTRY_OUT_BY)
+    assert len(exit_deals(broker, mt5.DEAL_ENTRY_OUT)) == 4
@@ -0,0 +1,87 @@
+"""
+🧪 Fast flatten on the simulated broker
+test_fast_flatten.py
+
+ครอบคลุม PositionManager.fast_flatten:
+✅ requote / price changed -> ส่ง deal ซ้ำจนปิดได้ (นับใน report.retries)
+✅ position ที่เปิดหลังโหลด cache -> reconcile ก่อนปิด ไม่หลุด
+✅ MT5 ไม่เชื่อมต่อ -> ไม่ส่ง order, report ไม่ flat
+✅ emergency_close_all -> flatten ครบ คืน True + นับใน close_performance
+
+** ใช้: python -m pytest -q test_fast_flatten.py **
+"""
+
+import contextlib
+import io
+
+from conftest import SYMBOL, mt5
+
+def flatten(manager):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return manager.fast_flatten()
+
+def test_requotes_are_retried_until_closed(broker, manager, open_positions):
+    manager.four_d_config["use_close_by"] = False
+    manager.flatten_config["workers"] = 1
+    tickets = open_positions(("BUY", 0.02), ("SELL", 0.01))
+    broker.inject_retcodes(mt5.TRADE_RETCODE_REQUOTE, mt5.TRADE_RETCODE_PRICE_CHANGED)
+
+    report = flatten(manager)
+
+    assert report.success
+    assert report.retries == 2
+    assert report.deal_closes == 2
+    assert sorted(report.closed) == sorted(tickets)
+    assert not mt5.positions_get(symbol=SYMBOL)
+
+def test_requotes_beyond_max_retries_fail(broker, manager, open_positions):
+    manager.four_d_config["use_close_by"] = False
+    manager.flatten_config["max_retries"] = 1
+    ticket, = open_positions(("BUY", 0.02))
+    broker.inject_retcodes(mt5.TRADE_RETCODE_REQUOTE, mt5.TRADE_RETCODE_REQUOTE)
+
+    report = flatten(manager)
+
+    assert not report.success
+    assert not report.flat
+    assert report.failed == [ticket]
+    assert report.retries == 1
+
+def test_positions_opened_after_cache_load_are_closed(broker, manager, open_positions):
+    first = open_positions(("BUY", 0.02), ("SELL", 0.02))
+    with contextlib.redirect_stdout(io.StringIO()):
+        manager.update_positions()
+    later = open_positions(("BUY", 0.03))
+
+    report = flatten(manager)
+
+    assert report.success
+    assert report.positions == 3
+    assert sorted(report.closed) == sorted(first + later)
+    assert not mt5.positions_get(symbol=SYMBOL)
+
+def test_disconnected_sends_nothing(broker, manager, open_positions):
+    open_positions(("BUY", 0.02))
+    manager.mt5_connector.is_connected = False
+    deals = len(broker._deals)
+
+    report = flatten(manager)
+
+    assert not report.flat
+    assert report.positions == 0
+    assert len(mt5.positions_get(symbol=SYMBOL)) == 1
+    assert len(broker._deals) == deals
+
+def test_emergency_close_all_flattens_and_tracks_performance(broker, manager, open_positions):
+    tickets = open_positions(("BUY", 0.02), ("SELL", 0.01), ("BUY", 0.01))
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        success = manager.emergency_close_all()
+
+    assert success
+    assert manager.last_flatten.positions == len(tickets)
+    assert sorted(manager.last_flatten.closed) == sorted(tickets)
+    assert not mt5.positions_get(symbol=SYMBOL)
+    performance = manager.close_performance["EMERGENCY"]
+    assert performance["count"] == 1
+    assert performance["success"] == 1
@@ -0,0 +1,59 @@
+"""
+🧪 Mark-to-market on the simulated broker
+test_mark_to_market.py
+
+ครอบคลุม PositionManager + MarketDataWatcher:
+✅ positions ที่เปิดระหว่างรัน -> snapshot ของ mark-to-market มี positions ครบภายใน tick ถัดไป
+   (reload บน loader thread เมื่อ position book เปลี่ยน version)
+
+** ใช้: python -m pytest -q test_mark_to_market.py **
+"""
+
+import contextlib
+import io
+import time
+
+import pytest
+
+from conftest import SYMBOL, PositionManager, mt5
+from market_data_watcher import MarketDataWatcher
+
+def wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.005)
+    return True
+
+@pytest.fixture
+def watcher(live_connector):
+    watcher = MarketDataWatcher(live_connector.symbol_registry.get_symbol, poll_interval=0.01)
+    yield watcher
+    with contextlib.redirect_stdout(io.StringIO()):
+        watcher.stop()
+
+def test_positions_opened_while_running_are_marked_within_one_tick(broker, live_connector, watcher, open_positions):
+    with contextlib.redirect_stdout(io.StringIO()):
+        manager = PositionManager(live_connector, {})
+        manager.attach_market_watcher(watcher)
+        watcher.start()
+    assert wait_until(lambda: manager.mark_to_market.snapshot is not None)
+
+    open_positions(("BUY", 0.02), ("BUY", 0.01), ("SELL", 0.03))
+    ticks = watcher.stats["ticks"]
+    broker.advance_ticks(1)
+
+    assert wait_until(lambda: (manager.mark_to_market.snapshot.buy_count,
+                               manager.mark_to_market.snapshot.sell_count) == (2, 1))
+    assert watcher.stats["ticks"] == ticks + 1
+
+    snapshot = manager.mark_to_market.snapshot
+    account = mt5.account_info()
+    tick = mt5.symbol_info_tick(SYMBOL)
+    assert manager.mark_to_market.stats["loads"] >= 1
+    assert snapshot.bid == tick.bid
+    assert snapshot.buy_volume == pytest.approx(0.03)
+    assert snapshot.sell_volume == pytest.approx(0.03)
+    assert snapshot.equity == pytest.approx(account.equity, abs=0.01)
+    assert snapshot.margin == pytest.approx(account.margin)
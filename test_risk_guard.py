@@ -0,0 +1,106 @@
+"""
+🧪 Risk guard on the simulated broker
+test_risk_guard.py
+
+ครอบคลุม RiskGuard ที่ arm กับ PositionManager / OrderManager จริง (positions จาก position book):
+✅ BUY positions เกิน max_buy_positions -> halt + flatten + ยกเลิก pending orders
+✅ equity drawdown เกิน emergency_stop_loss (peak = equity ของ account ตอน arm) -> halt + flatten
+
+** ใช้: python -m pytest -q test_risk_guard.py **
+"""
+
+import contextlib
+import io
+import time
+
+import numpy as np
+import pytest
+
+from conftest import SYMBOL, PositionManager, mt5
+from order_manager import OrderManager
+from risk_guard import RiskGuard
+
+def wait_until(condition, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.005)
+    return True
+
+@pytest.fixture
+def make_guard(live_connector):
+    guards = []
+
+    def make(risk_management):
+        risk_management = {"safety_protocols": {"emergency_close_enabled": True},
+                           "guard_poll_interval": 0.01, **risk_management}
+        with contextlib.redirect_stdout(io.StringIO()):
+            manager = PositionManager(live_connector, {})
+            manager.flatten_config["retry_delay"] = 0.0
+            order_manager = OrderManager(live_connector, None, None, {})
+            guard = RiskGuard({"risk_management": risk_management}, manager, order_manager)
+        guards.append(guard)
+        return guard
+
+    yield make
+    with contextlib.redirect_stdout(io.StringIO()):
+        for guard in guards:
+            guard.disarm()
+
+def arm(guard):
+    with contextlib.redirect_stdout(io.StringIO()):
+        guard.arm()
+    assert guard.is_armed
+
+def wait_for_flat(guard):
+    assert wait_until(lambda: guard.flatten_thread is not None)
+    guard.flatten_thread.join(timeout=5)
+    assert not guard.flatten_thread.is_alive()
+
+def place_buy_limit(volume, price):
+    result = mt5.order_send({"action": mt5.TRADE_ACTION_PENDING, "symbol": SYMBOL, "volume": volume,
+                             "type": mt5.ORDER_TYPE_BUY_LIMIT, "price": price,
+                             "type_filling": mt5.ORDER_FILLING_RETURN})
+    assert result.retcode == mt5.TRADE_RETCODE_PLACED
+    return result.order
+
+def test_max_buy_positions_breach_halts_flattens_and_cancels_pending(broker, make_guard, open_positions):
+    guard = make_guard({"position_limits": {"max_buy_positions": 2}})
+    open_positions(("BUY", 0.01), ("BUY", 0.01), ("BUY", 0.02), ("SELL", 0.01))
+    place_buy_limit(0.01, mt5.symbol_info_tick(SYMBOL).bid - 20)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        arm(guard)
+        assert wait_until(lambda: guard.is_tripped)
+        wait_for_flat(guard)
+
+    assert guard.breach.limit == "max_buy_positions"
+    assert guard.breach.value == 3
+    assert guard.order_manager.is_trading_halted
+    assert guard.stats["pending_cancelled"] == 1
+    assert not mt5.positions_get(symbol=SYMBOL)
+    assert not mt5.orders_get(symbol=SYMBOL)
+
+def test_equity_drawdown_breach_halts_and_flattens(broker, make_guard, open_positions):
+    # tick 0-1 ที่ 2000 แล้วร่วง $10 -> BUY 2 lots ขาดทุน ~$2000 (~20% ของ balance $10000)
+    start = broker._now()
+    broker.set_price_path(start + np.arange(4.0), np.array([2000.0, 2000.0, 1990.0, 1990.0]))
+    guard = make_guard({"emergency_stop_loss": 10})
+    open_positions(("BUY", 2.0))
+
+    arm(guard)
+    assert guard.peak_equity == pytest.approx(mt5.account_info().equity)
+    assert guard.peak_equity > 0
+    assert wait_until(lambda: guard.stats["ticks"] > 0)
+    assert not guard.is_tripped
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        broker.advance_ticks(2)
+        assert wait_until(lambda: guard.is_tripped)
+        wait_for_flat(guard)
+
+    assert guard.breach.limit == "emergency_stop_loss"
+    assert guard.breach.value >= 10
+    assert guard.order_manager.is_trading_halted
+    assert not mt5.positions_get(symbol=SYMBOL)
@@ -0,0 +1,197 @@
+"""
+🛫 Trading Preflight - Background-Refreshed Trading Permission State
+trading_preflight.py
+
+🎯 FEATURES:
+✅ เก็บสถานะ terminal connected / trade allowed / expert allowed / account login / symbol trade mode
+✅ Refresh เป็นระยะบน background thread
+✅ Order path อ่านจาก memory (ไม่ต้อง terminal_info + account_info ทุกออเดอร์)
+✅ ส่งออเดอร์ล้มเหลว -> force refresh ทันที
+
+** ตัด IPC 30-60ms ออกจากทุกออเดอร์ **
+"""
+
+import threading
+import time
+from datetime import datetime
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, Tuple
+from mt5_gateway import mt5_gateway as mt5   # IPC ทั้งหมดผ่าน gateway thread เดียว
+
+@dataclass
+class PreflightState:
+    """snapshot ของสิทธิ์การเทรด"""
+    terminal_connected: bool = False
+    terminal_trade_allowed: bool = False
+    trade_allowed: bool = False
+    expert_allowed: bool = False
+    account_login: int = 0
+    symbol: Optional[str] = None
+    symbol_found: bool = False
+    symbol_trade_enabled: bool = False
+    refreshed_at: float = 0.0
+    error: str = ""
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.refreshed_at if self.refreshed_at else float("inf")
+
+# ========================================================================================
+# 🛫 TRADING PREFLIGHT
+# ========================================================================================
+
+class TradingPreflight:
+    """
+    🛫 ตรวจสิทธิ์การเทรดล่วงหน้า
+
+    - refresh() อ่าน terminal_info / account_info / symbol_info แล้วเก็บเป็น PreflightState
+    - check() คืน (ok, reason) จาก memory - refresh แบบ synchronous เฉพาะเมื่อข้อมูลเก่าเกิน max_age
+    - invalidate() เมื่อส่งออเดอร์ล้มเหลว -> refresh ทันที
+    """
+
+    def __init__(self, symbol_provider: Callable[[], Optional[str]],
+                 refresh_interval: float = 1.0, max_age: float = 5.0):
+        self.symbol_provider = symbol_provider
+        self.refresh_interval = refresh_interval
+        self.max_age = max_age
+
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._force_refresh = False
+        self.state = PreflightState()
+
+        self.is_running = False
+        self.refresh_thread = None
+
+        self.stats = {
+            "refreshes": 0,
+            "forced_refreshes": 0,
+            "checks": 0,
+            "stale_checks": 0
+        }
+
+    # ========================================================================================
+    # 🎮 CONTROL
+    # ========================================================================================
+
+    def start(self):
+        """เริ่ม background refresh"""
+        if self.is_running:
+            return
+        self.refresh()
+        self.is_running = True
+        self.refresh_thread = threading.Thread(target=self._refresh_loop, daemon=True)
+        self.refresh_thread.start()
+
+    def stop(self):
+        """หยุด background refresh"""
+        self.is_running = False
+        self._wakeup.set()
+        if self.refresh_thread:
+            self.refresh_thread.join(timeout=2)
+        self.state = PreflightState()
+
+    def _refresh_loop(self):
+        while self.is_running:
+            self._wakeup.wait(self.refresh_interval)
+            self._wakeup.clear()
+            if self.is_running:
+                self.refresh()
+
+    # ========================================================================================
+    # 🔄 REFRESH
+    # ========================================================================================
+
+    def refresh(self) -> PreflightState:
+        """🔄 อ่านสถานะจาก terminal แล้วแทนที่ snapshot ทั้งก้อน"""
+        state = PreflightState(refreshed_at=time.time())
+        try:
+            if self._force_refresh:
+                # ข้าม read cache ของ gateway - ต้องการสถานะล่าสุดจริงๆ
+                self._force_refresh = False
+                for name in ("terminal_info", "account_info", "symbol_info"):
+                    mt5.invalidate_cache(name)
+
+            terminal_info = mt5.terminal_info()
+            if terminal_info is None:
+                state.error = "MT5 terminal not accessible"
+            else:
+                state.terminal_connected = bool(terminal_info.connected)
+                state.terminal_trade_allowed = bool(getattr(terminal_info, 'trade_allowed', True))
+
+            account_info = mt5.account_info()
+            if account_info is None:
+                state.error = state.error or "MT5 account not logged in"
+            else:
+                state.account_login = account_info.login
+                state.trade_allowed = bool(account_info.trade_allowed)
+                state.expert_allowed = bool(account_info.trade_expert)
+
+            state.symbol = self.symbol_provider()
+            if state.symbol:
+                symbol_info = mt5.symbol_info(state.symbol)
+                state.symbol_found = symbol_info is not None
+                state.symbol_trade_enabled = bool(
+                    symbol_info and symbol_info.trade_mode != mt5.SYMBOL_TRADE_MODE_DISABLED)
+
+        except Exception as e:
+            state.error = f"Preflight refresh error: {e}"
+
+        with self._lock:
+            self.state = state
+            self.stats["refreshes"] += 1
+        return state
+
+    def invalidate(self, reason: str = ""):
+        """⚠️ ส่งออเดอร์ล้มเหลว -> refresh ทันที (ไม่รอรอบถัดไป)"""
+        self.stats["forced_refreshes"] += 1
+        self._force_refresh = True
+        if self.is_running:
+            self._wakeup.set()
+        else:
+            self.refresh()
+
+    # ========================================================================================
+    # ✅ CHECK
+    # ========================================================================================
+
+    def check(self) -> Tuple[bool, str]:
+        """✅ ตรวจสิทธิ์จาก memory - คืน (ok, reason)"""
+        self.stats["checks"] += 1
+        state = self.state
+        if state.age > self.max_age:
+            self.stats["stale_checks"] += 1
+            state = self.refresh()
+
+        if state.error:
+            return False, state.error
+        if not state.terminal_connected:
+            return False, "MT5 terminal not connected to trade server"
+        if not state.terminal_trade_allowed:
+            return False, "AutoTrading disabled in terminal"
+        if not state.trade_allowed:
+            return False, "Trading not allowed on account"
+        if not state.expert_allowed:
+            return False, "Expert Advisor trading not allowed"
+        if state.symbol and not state.symbol_found:
+            return False, f"Symbol {state.symbol} not found"
+        if state.symbol and not state.symbol_trade_enabled:
+            return False, f"Trading disabled for {state.symbol}"
+        return True, "OK"
+
+    def get_status(self) -> Dict:
+        """📊 สถานะ preflight"""
+        state = self.state
+        return {
+            "is_running": self.is_running,
+            "account_login": state.account_login,
+            "symbol": state.symbol,
+            "age_seconds": round(state.age, 2) if state.refreshed_at else None,
+            "ok": self.check()[0] if state.refreshed_at else False,
+            **self.stats
+        }
+
+    def log(self, message: str):
+        """Log message with timestamp"""
+        timestamp = datetime.now().strftime("%H:%M:%S.%f")[:-3]
+        print(f"[{timestamp}] 🛫 TradingPreflight: {message}")